@@ -0,0 +1,161 @@
+"""
+对比 DETAIL 导入的 upsert 模式（分批 INSERT ... ON DUPLICATE KEY UPDATE）与 bulk 模式（LOAD DATA LOCAL INFILE + INSERT ... SELECT）的耗时，并校验两种模式入库结果一致。
+需要可用的 MySQL（服务端 local_infile=ON，后端 DB_LOCAL_INFILE=true）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入简单对象构造工具，用于模拟上传任务。
+from types import SimpleNamespace
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 SQL 文本构造工具。
+from sqlalchemy import text
+
+# 复用格式基准中的合成数据生成函数。
+from bench_etl_formats import make_frames
+# 导入数据库会话工厂与配置。
+from app.core.database import SessionLocal
+from app.core.config import get_settings
+# 导入 ETL 服务。
+from app.services.etl_service import EtlService
+
+# 样本行数，可通过环境变量 BENCH_ROWS 覆盖。
+ROWS = int(os.environ.get("BENCH_ROWS", "200000"))
+# 基准数据的单号前缀，用于与真实数据隔离并在结束后清理。
+PREFIX = "BENCH-"
+
+
+def clear_bench_rows(db) -> None:
+    '''
+    功能概述：
+    删除基准测试写入 fact_ifir_detail 的数据。
+
+    输入参数：
+    - db：数据库会话。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 按单号前缀删除并提交。
+
+    异常/边界：
+    - 数据库不可用时抛出原始异常。
+
+    依赖：
+    - `PREFIX`
+
+    示例：
+    - `clear_bench_rows(SessionLocal())`
+    '''
+    # 按前缀删除基准数据。
+    db.execute(text("DELETE FROM fact_ifir_detail WHERE claim_nbr LIKE :p"), {"p": PREFIX + "%"})
+    # 提交删除。
+    db.commit()
+
+
+def snapshot(db) -> list:
+    '''
+    功能概述：
+    读取基准数据的全部字段（load_ts 除外），用于比较两种模式的入库结果。
+
+    输入参数：
+    - db：数据库会话。
+
+    返回值：
+    - 按单号排序的行列表。
+
+    关键流程：
+    - 查询表字段 → 排除 load_ts → 按前缀查询并排序。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `FactIfirDetail` 对应的 fact_ifir_detail 表
+
+    示例：
+    - `rows = snapshot(db)`
+    '''
+    # 查询除 load_ts 外的全部字段。
+    rows = db.execute(
+        text("SELECT * FROM fact_ifir_detail WHERE claim_nbr LIKE :p ORDER BY claim_nbr"),
+        {"p": PREFIX + "%"}
+    ).mappings().all()
+    return [{k: v for k, v in row.items() if k != "load_ts"} for row in rows]
+
+
+def run_mode(mode: str, path: str) -> tuple:
+    '''
+    功能概述：
+    以指定导入方式处理同一文件两次（首次为全新插入，第二次全部命中主键更新），分别计时。
+
+    输入参数：
+    - mode：`upsert` 或 `bulk`。
+    - path：DETAIL 样本文件路径。
+
+    返回值：
+    - (首次耗时, 第二次耗时, 入库快照) 三元组。
+
+    关键流程：
+    - 清理旧数据 → 首次导入计时 → 再次导入计时 → 读取快照。
+
+    异常/边界：
+    - bulk 模式在 DB_LOCAL_INFILE=false 时会回退为 upsert，脚本开头已做检查。
+
+    依赖：
+    - `EtlService`、`SessionLocal`
+
+    示例：
+    - `run_mode("bulk", "/tmp/ifir_detail.csv")`
+    '''
+    # 创建数据库会话。
+    db = SessionLocal()
+    try:
+        # 清理上一次的基准数据。
+        clear_bench_rows(db)
+        # 记录两次导入的耗时。
+        costs = []
+        for _ in range(2):
+            # 构造模拟任务，指定导入方式。
+            task = SimpleNamespace(task_id="bench-task", detail_load_mode=mode)
+            t0 = time.perf_counter()
+            EtlService(db)._process_ifir_detail(task, path)
+            costs.append(time.perf_counter() - t0)
+        # 读取入库结果。
+        rows = snapshot(db)
+        # 清理基准数据。
+        clear_bench_rows(db)
+        return costs[0], costs[1], rows
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # bulk 模式依赖 LOAD DATA LOCAL INFILE。
+    if not get_settings().DB_LOCAL_INFILE:
+        sys.exit("请先设置 DB_LOCAL_INFILE=true（MySQL 服务端需 local_infile=ON）")
+    # 生成样本数据，单号加前缀避免覆盖真实数据。
+    _, detail_df = make_frames(ROWS)
+    detail_df["Claim_Nbr"] = PREFIX + detail_df["Claim_Nbr"]
+    # 在临时目录中写出 CSV 并执行对比。
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "ifir_detail.csv")
+        detail_df.to_csv(path, index=False)
+        # 依次执行两种模式。
+        results = {mode: run_mode(mode, path) for mode in ["upsert", "bulk"]}
+    # 校验两种模式入库结果一致。
+    assert results["upsert"][2] == results["bulk"][2], "upsert 与 bulk 导入结果不一致"
+    # 输出结果。
+    base_insert, base_update, rows = results["upsert"]
+    for mode, (insert_cost, update_cost, _) in results.items():
+        print(f"{mode:<7} rows={len(rows):>8}  insert={insert_cost:7.2f}s ({base_insert / insert_cost:4.1f}x)  "
+              f"update={update_cost:7.2f}s ({base_update / update_cost:4.1f}x)")
@@ -0,0 +1,269 @@
+"""
+对比同一份合成数据在 xlsx / csv / csv.gz / parquet 四种格式下的 ETL 导入耗时，并校验各格式入库结果一致。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入简单对象构造工具，用于模拟上传任务。
+from types import SimpleNamespace
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入数值计算库，用于构造随机样本。
+import numpy as np
+# 导入 pandas，用于构造与写出样本文件。
+import pandas as pd
+
+# 导入 ETL 服务。
+from app.services.etl_service import EtlService
+# 导入按内容识别格式的读取函数。
+from app.services.etl_reader import read_table
+
+# 样本行数，可通过环境变量 BENCH_ROWS 覆盖。
+ROWS = int(os.environ.get("BENCH_ROWS", "50000"))
+
+
+class _NullSession:
+    '''
+    功能概述：
+    替代数据库会话的空实现，使 ETL 在不连接 MySQL 的情况下跑完整个处理流程。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - `execute` 不执行语句，返回空结果（查询类语句视为没有匹配行）；`commit` 不做任何事。
+
+    异常/边界：
+    - 仅适用于基准测试，不会写入任何数据。
+
+    依赖：
+    - 无
+
+    示例：
+    - `EtlService(_NullSession())`
+    '''
+
+    def execute(self, stmt, params=None):
+        # 忽略写入语句，查询返回空结果。
+        return []
+
+    def commit(self):
+        # 忽略提交。
+        return None
+
+
+class CaptureEtlService(EtlService):
+    '''
+    功能概述：
+    在列式转换环节截获入库字段，用于比较不同格式的导入结果。
+
+    输入参数：
+    - 无（使用 `_NullSession`）。
+
+    返回值：
+    - 实例属性 `captured` 保存最近一次列式转换结果。
+
+    关键流程：
+    - 重写 `_build_ifir_row_columns` / `_build_ifir_detail_columns`，调用父类后保存结果。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `EtlService`
+
+    示例：
+    - `CaptureEtlService()._process_ifir_detail(task, path)`
+    '''
+
+    def __init__(self):
+        # 使用空会话初始化父类。
+        super().__init__(_NullSession())
+        # 保存截获的列式数据。
+        self.captured = None
+
+    def _build_ifir_row_columns(self, df):
+        # 调用父类完成转换并保存结果。
+        self.captured = super()._build_ifir_row_columns(df)
+        return self.captured
+
+    def _build_ifir_detail_columns(self, df):
+        # 调用父类完成转换并保存结果。
+        self.captured = super()._build_ifir_detail_columns(df)
+        return self.captured
+
+
+def make_frames(n: int):
+    '''
+    功能概述：
+    生成 IFIR ROW 与 IFIR DETAIL 原始列名格式的合成数据。
+
+    输入参数：
+    - n：DETAIL 行数；ROW 行数取其十分之一。
+
+    返回值：
+    - (row_df, detail_df) 二元组。
+
+    关键流程：
+    - 随机生成月份、文本与数值列，并混入空值。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `numpy`、`pandas`
+
+    示例：
+    - `row_df, detail_df = make_frames(1000)`
+    '''
+    # 固定随机种子。
+    rng = np.random.default_rng(2024)
+    # ROW 行数。
+    m = max(n // 10, 1)
+    # 构造 ROW 数据。
+    row_df = pd.DataFrame({
+        "Delivery_month": pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 24, m) * 31, unit="D"),
+        "BRAND": rng.choice(["Lenovo", "Think"], m),
+        "GEO": rng.choice(["PRC", "NA", "EMEA"], m),
+        "Product_line": rng.choice(["NB", "DT"], m),
+        "Segment": rng.choice(["Consumer", "Commercial", None], m),
+        "SERIES": rng.choice(["S1", "S2"], m),
+        "Model": rng.choice([f"MODEL-{i}" for i in range(100)], m),
+        "PLANT": rng.choice(["LCFC", "WKS", "KSP"], m),
+        "Mach_type": rng.choice(["20XX", "21YY"], m),
+        "Supplier_NEW": rng.choice(["FOXCONN", "TPV", None], m),
+        "BOX CLAIM": rng.integers(0, 50, m),
+        "BOX MM": rng.integers(0, 5000, m),
+        "YEAR": rng.choice([2024, 2025], m),
+        "MONTH": rng.integers(1, 13, m),
+    })
+    # 月份统一归到月初。
+    row_df["Delivery_month"] = row_df["Delivery_month"].dt.to_period("M").dt.to_timestamp()
+    # 构造 DETAIL 数据（claim_nbr 含重复，用于覆盖去重逻辑）。
+    claim_date = pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+    detail_df = pd.DataFrame({
+        "Claim_Nbr": [f"C{i:08d}" for i in rng.integers(0, int(n * 0.9), n)],
+        "Claim_Month": claim_date.to_period("M").to_timestamp(),
+        "Claim_Date": claim_date,
+        "Delivery_Month": claim_date.to_period("M").to_timestamp(),
+        "Delivery_Day": rng.integers(1, 29, n),
+        "PLANT": rng.choice(["LCFC", "WKS"], n),
+        "Segment": rng.choice(["Consumer", None], n),
+        "Segment2": rng.choice(["SMB", "ENT"], n),
+        "Model": rng.choice([f"MODEL-{i}" for i in range(100)], n),
+        "Station_ID": rng.choice([1001, 2002, None], n),
+        "Fault_Category": rng.choice(["LCD", "Keyboard", "Battery"], n),
+        "Problem_Descr": rng.choice(["no power", "broken screen", None], n),
+        "Part_Nbr": rng.choice(["P1", "P2", "P3"], n),
+    })
+    return row_df, detail_df
+
+
+def write_formats(df: pd.DataFrame, folder: str, stem: str) -> dict:
+    '''
+    功能概述：
+    将同一个 DataFrame 写成四种格式，文件名不带扩展名以验证按内容识别格式。
+
+    输入参数：
+    - df：待写出的数据。
+    - folder：输出目录。
+    - stem：文件名前缀。
+
+    返回值：
+    - 格式名 -> 文件路径 的字典。
+
+    关键流程：
+    - 依次写出 xlsx / csv / csv.gz / parquet。
+
+    异常/边界：
+    - 缺少 pyarrow 时 parquet 写出会抛出 ImportError。
+
+    依赖：
+    - `openpyxl`、`pyarrow`
+
+    示例：
+    - `write_formats(df, "/tmp", "ifir_detail")`
+    '''
+    # 生成各格式的目标路径（刻意不带扩展名）。
+    paths = {fmt: os.path.join(folder, f"{stem}_{fmt}") for fmt in ["xlsx", "csv", "csv_gz", "parquet"]}
+    # 写出 xlsx。
+    df.to_excel(paths["xlsx"], index=False, engine="openpyxl")
+    # 写出 csv。
+    df.to_csv(paths["csv"], index=False)
+    # 写出 gzip 压缩 csv。
+    df.to_csv(paths["csv_gz"], index=False, compression="gzip")
+    # 写出 parquet。
+    df.to_parquet(paths["parquet"], index=False)
+    return paths
+
+
+def run_format(label: str, paths: dict, process_name: str) -> None:
+    '''
+    功能概述：
+    逐格式执行 ETL 处理并计时，校验所有格式的入库字段与 xlsx 完全一致（src_file 除外）。
+
+    输入参数：
+    - label：场景名称。
+    - paths：格式 -> 文件路径。
+    - process_name：`EtlService` 中的处理方法名。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 对每种格式单独计时读取 → 调用处理方法并计时 → 与 xlsx 结果逐列比较。
+
+    异常/边界：
+    - 结果不一致时抛出 AssertionError。
+
+    依赖：
+    - `CaptureEtlService`
+
+    示例：
+    - `run_format("IFIR DETAIL", paths, "_process_ifir_detail")`
+    '''
+    # 以 xlsx 结果作为基准。
+    baseline = None
+    baseline_cost = None
+    # 逐格式处理。
+    for fmt, path in paths.items():
+        # 构造服务与模拟任务。
+        svc = CaptureEtlService()
+        task = SimpleNamespace(task_id="bench-task")
+        # 单独计时文件读取（格式差异主要体现在这一步）。
+        t0 = time.perf_counter()
+        read_table(path)
+        read_cost = time.perf_counter() - t0
+        # 计时完整处理流程（读取 + 清洗 + 去重 + 构建写入语句）。
+        t0 = time.perf_counter()
+        getattr(svc, process_name)(task, path)
+        cost = time.perf_counter() - t0
+        # 去掉与文件路径相关的字段后比较。
+        columns = {k: v for k, v in svc.captured.items() if k != "src_file"}
+        if baseline is None:
+            baseline, baseline_cost = columns, cost
+        else:
+            assert columns == baseline, f"{label}: {fmt} 与 xlsx 导入结果不一致"
+        # 输出结果。
+        rows = len(next(iter(columns.values())))
+        print(f"{label:<12} {fmt:<8} rows={rows:>7}  read={read_cost:6.2f}s  total={cost:7.2f}s  "
+              f"vs xlsx={baseline_cost / cost:5.1f}x")
+
+
+if __name__ == "__main__":
+    # 生成样本数据。
+    row_df, detail_df = make_frames(ROWS)
+    # 在临时目录中写出并执行对比。
+    with tempfile.TemporaryDirectory() as folder:
+        run_format("IFIR ROW", write_formats(row_df, folder, "ifir_row"), "_process_ifir_row")
+        run_format("IFIR DETAIL", write_formats(detail_df, folder, "ifir_detail"), "_process_ifir_detail")
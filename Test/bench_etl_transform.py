@@ -0,0 +1,356 @@
+"""
+对比 ETL 入库记录构建的逐行（iterrows）与列式两种实现，校验结果一致并输出耗时。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入计时工具。
+import time
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入数值计算库，用于构造随机样本。
+import numpy as np
+# 导入 pandas，用于构造 DataFrame。
+import pandas as pd
+
+# 导入 ETL 服务（仅使用其纯计算方法，不需要数据库会话）。
+from app.services.etl_service import EtlService
+
+# 需要对比的数据规模，可通过环境变量 BENCH_SIZES（逗号分隔）覆盖。
+SIZES = [int(s) for s in os.environ.get("BENCH_SIZES", "100000,500000").split(",")]
+
+
+def make_ifir_row_frame(n: int) -> pd.DataFrame:
+    '''
+    功能概述：
+    构造与 IFIR ROW 清洗后结构一致的合成数据，包含空值、空串与 0 等边界取值。
+
+    输入参数：
+    - n：行数。
+
+    返回值：
+    - pandas.DataFrame。
+
+    关键流程：
+    - 按列生成随机取值，并人为插入 NaN / 空串。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `numpy`、`pandas`
+
+    示例：
+    - `make_ifir_row_frame(1000)`
+    '''
+    # 固定随机种子，保证多次运行结果可比。
+    rng = np.random.default_rng(42)
+    # 生成交付月份（月初日期）。
+    months = pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 24, n) * 31, unit="D")
+    # 构造文本列，其中混入空值和空串。
+    models = np.array([f"MODEL-{i}" for i in range(200)] + ["", None], dtype=object)
+    # 组装 DataFrame。
+    df = pd.DataFrame({
+        "delivery_month": months.to_period("M").to_timestamp(),
+        "brand": rng.choice(["Lenovo", "Think", None], n),
+        "geo": rng.choice(["PRC", "NA", " EMEA "], n),
+        "product_line": rng.choice(["NB", "DT"], n),
+        "segment": rng.choice(["Consumer", "Commercial", np.nan], n),
+        "series": rng.choice(["S1", "S2"], n),
+        "model": rng.choice(models, n),
+        "plant": rng.choice(["LCFC", "WKS", "KSP"], n),
+        "mach_type": rng.choice(["20XX", "21YY"], n),
+        "supplier_new": rng.choice(["FOXCONN", "None", "TPV"], n),
+        "box_claim": rng.integers(0, 50, n),
+        "box_mm": rng.integers(0, 5000, n),
+        "year_ignore": rng.choice([2024.0, 2025.0, np.nan], n),
+        "month_ignore": rng.choice([1.0, 6.0, 12.0, np.nan], n),
+    })
+    # 模拟 ETL 中追加的辅助列。
+    df["content_hash"] = [f"h{i}" for i in range(n)]
+    df["src_file"] = "/tmp/ifir_row.xlsx"
+    df["etl_batch_id"] = "bench-task"
+    return df
+
+
+def make_ifir_detail_frame(n: int) -> pd.DataFrame:
+    '''
+    功能概述：
+    构造与 IFIR DETAIL 去重后结构一致的合成数据，覆盖 segment 回退与整数空值。
+
+    输入参数：
+    - n：行数。
+
+    返回值：
+    - pandas.DataFrame。
+
+    关键流程：
+    - 生成 claim_nbr、日期列、整数列与大量文本列。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `numpy`、`pandas`
+
+    示例：
+    - `make_ifir_detail_frame(1000)`
+    '''
+    # 固定随机种子。
+    rng = np.random.default_rng(7)
+    # 生成理赔日期，并插入少量空值。
+    claim_date = pd.Series(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"))
+    claim_date[rng.random(n) < 0.05] = pd.NaT
+    # 组装基础列。
+    df = pd.DataFrame({
+        "claim_nbr": [f"C{i:08d}" for i in range(n)],
+        "claim_month": claim_date.dt.to_period("M").dt.to_timestamp(),
+        "claim_date": claim_date,
+        "delivery_month": claim_date.dt.to_period("M").dt.to_timestamp(),
+        "delivery_day": rng.choice([1.0, 15.0, np.nan], n),
+        "segment": rng.choice(["Consumer", "", np.nan], n),
+        "segment2": rng.choice(["SMB", np.nan], n),
+        "station_id": rng.choice([1001.0, 2002.0, np.nan], n),
+    })
+    # 其余文本列统一填充随机取值。
+    for key in EtlService._DETAIL_TEXT_FIELDS + EtlService._DETAIL_TEXT_FIELDS_TAIL + EtlService._DETAIL_TEXT_FIELDS_REST:
+        df[key] = rng.choice(["A ", "B", np.nan], n)
+    return df
+
+
+def legacy_ifir_row_records(svc: EtlService, df: pd.DataFrame) -> list:
+    '''
+    功能概述：
+    复刻改造前的 iterrows 逐行构建逻辑，作为一致性校验基准。
+
+    输入参数：
+    - svc：ETL 服务实例（复用 `_safe_str`）。
+    - df：IFIR ROW 数据。
+
+    返回值：
+    - 记录字典列表。
+
+    关键流程：
+    - 逐行调用 `_safe_str` / `int()` / `pd.to_datetime()`。
+
+    异常/边界：
+    - 与旧实现保持一致，不做额外容错。
+
+    依赖：
+    - `EtlService`
+
+    示例：
+    - `legacy_ifir_row_records(EtlService(None), df)`
+    '''
+    # 收集全部记录。
+    records = []
+    # 逐行构建（旧实现）。
+    for _, row in df.iterrows():
+        records.append({
+            "content_hash": row["content_hash"],
+            "delivery_month": pd.to_datetime(row["delivery_month"]).date() if pd.notna(row["delivery_month"]) else None,
+            "brand": svc._safe_str(row, "brand"),
+            "geo": svc._safe_str(row, "geo"),
+            "product_line": svc._safe_str(row, "product_line"),
+            "segment": svc._safe_str(row, "segment"),
+            "series": svc._safe_str(row, "series"),
+            "model": svc._safe_str(row, "model"),
+            "plant": svc._safe_str(row, "plant"),
+            "mach_type": svc._safe_str(row, "mach_type"),
+            "supplier_new": svc._safe_str(row, "supplier_new"),
+            "box_claim": int(row["box_claim"]),
+            "box_mm": int(row["box_mm"]),
+            "year_ignore": int(row["year_ignore"]) if pd.notna(row.get("year_ignore")) else None,
+            "month_ignore": int(row["month_ignore"]) if pd.notna(row.get("month_ignore")) else None,
+            "src_file": svc._safe_str(row, "src_file"),
+            "etl_batch_id": svc._safe_str(row, "etl_batch_id"),
+        })
+    return records
+
+
+def legacy_ifir_detail_records(svc: EtlService, df: pd.DataFrame) -> list:
+    '''
+    功能概述：
+    复刻改造前的 IFIR DETAIL 逐行构建逻辑。
+
+    输入参数：
+    - svc：ETL 服务实例。
+    - df：IFIR DETAIL 数据。
+
+    返回值：
+    - 记录字典列表。
+
+    关键流程：
+    - segment 为空时回退到 segment2，其余字段逐个清洗。
+
+    异常/边界：
+    - 与旧实现保持一致。
+
+    依赖：
+    - `EtlService`
+
+    示例：
+    - `legacy_ifir_detail_records(EtlService(None), df)`
+    '''
+    # 收集全部记录。
+    records = []
+    # 逐行构建（旧实现）。
+    for _, row in df.iterrows():
+        # 先取 segment2，供 segment 回退使用。
+        segment2_value = svc._safe_str(row, "segment2")
+        # 组装单行记录。
+        record = {
+            "claim_nbr": row["claim_nbr"],
+            "claim_month": pd.to_datetime(row.get("claim_month")).date() if pd.notna(row.get("claim_month")) else None,
+            "claim_date": pd.to_datetime(row.get("claim_date")).date() if pd.notna(row.get("claim_date")) else None,
+            "delivery_month": pd.to_datetime(row.get("delivery_month")).date() if pd.notna(row.get("delivery_month")) else None,
+            "delivery_day": int(row["delivery_day"]) if pd.notna(row.get("delivery_day")) else None,
+            "segment": svc._safe_str(row, "segment") or segment2_value,
+            "segment2": segment2_value,
+            "station_id": int(row["station_id"]) if pd.notna(row.get("station_id")) else None,
+        }
+        # 其余文本字段统一清洗。
+        for key in svc._DETAIL_TEXT_FIELDS + svc._DETAIL_TEXT_FIELDS_TAIL + svc._DETAIL_TEXT_FIELDS_REST:
+            record[key] = svc._safe_str(row, key)
+        records.append(record)
+    return records
+
+
+def columnar_records(svc: EtlService, columns: dict, total: int) -> list:
+    '''
+    功能概述：
+    以 ETL 实际使用的 500 行批次切片方式生成全部记录。
+
+    输入参数：
+    - svc：ETL 服务实例。
+    - columns：列式转换结果。
+    - total：总行数。
+
+    返回值：
+    - 记录字典列表。
+
+    关键流程：
+    - 逐批调用 `_records_from_columns` 并拼接。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `EtlService._records_from_columns`
+
+    示例：
+    - `columnar_records(svc, columns, len(df))`
+    '''
+    # 收集全部记录。
+    records = []
+    # 与 ETL 相同的批次大小。
+    for start in range(0, total, 500):
+        records.extend(svc._records_from_columns(columns, start, min(start + 500, total)))
+    return records
+
+
+def run_case(name: str, df: pd.DataFrame, legacy_fn, build_fn) -> None:
+    '''
+    功能概述：
+    对单个场景分别执行旧/新实现，比较结果并打印耗时与加速比。
+
+    输入参数：
+    - name：场景名称。
+    - df：输入数据。
+    - legacy_fn：旧实现函数。
+    - build_fn：列式转换函数。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 计时旧实现 → 计时新实现 → 断言记录完全一致。
+
+    异常/边界：
+    - 结果不一致时抛出 AssertionError。
+
+    依赖：
+    - `time.perf_counter`
+
+    示例：
+    - `run_case("IFIR ROW", df, legacy_ifir_row_records, svc._build_ifir_row_columns)`
+    '''
+    # 构造无数据库会话的服务实例。
+    svc = EtlService(None)
+    # 计时旧实现。
+    t0 = time.perf_counter()
+    expected = legacy_fn(svc, df)
+    legacy_cost = time.perf_counter() - t0
+    # 计时新实现（包含整列转换与分批组装）。
+    t0 = time.perf_counter()
+    actual = columnar_records(svc, build_fn(svc, df), len(df))
+    columnar_cost = time.perf_counter() - t0
+    # 校验逐条一致（按键比较，忽略字典键顺序）。
+    assert len(actual) == len(expected), f"{name}: 行数不一致"
+    for got, want in zip(actual, expected):
+        assert got == want, f"{name}: 记录不一致\n got={got}\nwant={want}"
+    # 输出结果。
+    print(f"{name:<12} rows={len(df):>7}  iterrows={legacy_cost:7.2f}s  "
+          f"columnar={columnar_cost:6.2f}s  speedup={legacy_cost / columnar_cost:5.1f}x")
+
+
+def run_hash_case(name: str, df: pd.DataFrame, legacy_hash, fields: list) -> None:
+    '''
+    功能概述：
+    对比逐行 `df.apply(_calc_*_row_hash)` 与列式 `_calc_row_hash_column` 的 content_hash，确保历史数据仍能去重命中。
+
+    输入参数：
+    - name：场景名称。
+    - df：ROW 数据。
+    - legacy_hash：逐行哈希函数。
+    - fields：列式哈希字段定义。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 计时逐行哈希 → 计时列式哈希 → 断言逐条相等。
+
+    异常/边界：
+    - 哈希不一致时抛出 AssertionError。
+
+    依赖：
+    - `EtlService._calc_row_hash_column`
+
+    示例：
+    - `run_hash_case("IFIR HASH", df, svc._calc_ifir_row_hash, svc._IFIR_ROW_HASH_FIELDS)`
+    '''
+    # 构造无数据库会话的服务实例。
+    svc = EtlService(None)
+    # 计时逐行哈希（旧实现）。
+    t0 = time.perf_counter()
+    expected = df.apply(lambda row: legacy_hash(svc, row), axis=1).tolist()
+    legacy_cost = time.perf_counter() - t0
+    # 计时列式哈希。
+    t0 = time.perf_counter()
+    actual = svc._calc_row_hash_column(df, fields)
+    columnar_cost = time.perf_counter() - t0
+    # 校验逐条一致。
+    assert actual == expected, f"{name}: content_hash 不一致"
+    # 输出结果。
+    print(f"{name:<12} rows={len(df):>7}  apply={legacy_cost:10.2f}s  "
+          f"columnar={columnar_cost:6.2f}s  speedup={legacy_cost / columnar_cost:5.1f}x")
+
+
+if __name__ == "__main__":
+    # 依次执行各规模的 ROW / DETAIL 对比。
+    for size in SIZES:
+        run_case("IFIR ROW", make_ifir_row_frame(size), legacy_ifir_row_records,
+                 lambda svc, df: svc._build_ifir_row_columns(df))
+        run_case("IFIR DETAIL", make_ifir_detail_frame(size), legacy_ifir_detail_records,
+                 lambda svc, df: svc._build_ifir_detail_columns(df))
+        # 哈希场景额外覆盖字符串月份与含空值的数值型机型列。
+        row_df = make_ifir_row_frame(size)
+        row_df["delivery_month"] = row_df["delivery_month"].dt.strftime("%Y-%m")
+        row_df["model"] = np.where(np.arange(size) % 7 == 0, np.nan, np.arange(size) % 300).astype(float)
+        run_hash_case("IFIR HASH", row_df, EtlService._calc_ifir_row_hash, EtlService._IFIR_ROW_HASH_FIELDS)
+        ra_df = row_df.rename(columns={"delivery_month": "claim_month", "box_claim": "ra_claim", "box_mm": "ra_mm"})
+        run_hash_case("RA HASH", ra_df, EtlService._calc_ra_row_hash, EtlService._RA_ROW_HASH_FIELDS)
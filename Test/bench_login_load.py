@@ -0,0 +1,265 @@
+"""
+登录高峰压测：并发登录（bcrypt 校验）期间 analyze 接口的 p50 / p99 延迟，对比口令校验在独立口令线程池中执行
+与改造前在默认线程池中执行（def login），并校验调整 AUTH_BCRYPT_ROUNDS 后登录时自动按新成本重新哈希、
+排队超过 AUTH_MAX_PENDING 的登录返回 429（无需 MySQL，使用 SQLite 文件库，进程内 ASGI 调用）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入异步工具。
+import asyncio
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入日志与告警工具，压测时只输出结果。
+import logging
+import warnings
+# 导入偏函数工具，用于模拟改造前的默认线程池调用。
+from functools import partial
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入异步 HTTP 客户端。
+import httpx
+# 导入线程池调度工具。
+from anyio import to_thread
+# 导入会话类。
+from sqlalchemy.orm import Session
+
+# 复用查询条数校验脚本中的样本库，以及事件循环压测中的探测与统计工具。
+from test_query_count import build_session
+from load_event_loop import percentile
+
+# 导入配置，用于关闭结果缓存（每次 analyze 都实际查询）。
+from app.core.config import get_settings
+# 导入数据库依赖，测试中替换为样本库。
+from app.core.database import get_db
+from app.core.read_routing import get_read_db
+# 导入口令工具与令牌工具。
+from app.core import security
+from app.core.security import create_access_token
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入登录路由模块，用于模拟改造前在默认线程池中校验口令。
+from app.api import auth as auth_api
+# 导入表模型。
+from app.models.tables import User
+
+# 并发登录数，可用 BENCH_LOGINS 调整。
+LOGINS = int(os.environ.get("BENCH_LOGINS", "30"))
+# analyze 探测间隔（秒）。
+ANALYZE_INTERVAL = 0.1
+PASSWORD = "Passw0rdA"
+
+ANALYZE_BODY = {
+    "time_range": {"start_month": "2024-01", "end_month": "2024-12"},
+    "filters": {"models": ["M1", "M2"]},
+}
+
+
+async def probe_analyze(client, headers, stop):
+    '''
+    功能概述：
+    按固定节拍请求 Model analyze 接口（携带真实令牌，经过 get_current_user），直到 stop 被设置。
+
+    输入参数：
+    - client：httpx 异步客户端。
+    - headers：鉴权请求头。
+    - stop：asyncio.Event，设置后停止。
+
+    返回值：
+    - 延迟列表（秒），从计划发出时间算起。
+
+    关键流程：
+    - 与 `load_event_loop.probe` 相同的节拍方式，落后时立即补发。
+
+    异常/边界：
+    - 接口返回非 200 或业务码非 0 时抛出 AssertionError。
+
+    依赖：
+    - `httpx`
+
+    示例：
+    - `await probe_analyze(client, headers, stop)`
+    '''
+    latencies = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.post("/api/ifir/model-analysis/analyze", json=ANALYZE_BODY, headers=headers)
+        latencies.append(time.perf_counter() - scheduled)
+        assert response.status_code == 200 and response.json()["code"] == 0, response.text
+        scheduled += ANALYZE_INTERVAL
+    return latencies
+
+
+async def run_phase(client, headers, logins):
+    '''
+    功能概述：
+    探测 analyze 接口；logins 大于 0 时同时发起 logins 个登录请求，探测持续到登录全部返回。
+
+    输入参数：
+    - client：httpx 异步客户端。
+    - headers：analyze 使用的鉴权请求头。
+    - logins：并发登录数，0 表示只测基线（固定 3 秒）。
+
+    返回值：
+    - {"analyze": 延迟列表, "logins": 登录耗时列表, "rejected": 返回 429 的登录数}。
+
+    关键流程：
+    - 启动探测 → 并发登录（或等待）→ 停止探测。
+
+    异常/边界：
+    - 登录既未成功也非 429 时抛出 AssertionError。
+
+    依赖：
+    - `probe_analyze`
+
+    示例：
+    - `await run_phase(client, headers, 30)`
+    '''
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe_analyze(client, headers, stop))
+    durations, rejected = [], []
+
+    async def login():
+        start = time.perf_counter()
+        response = await client.post("/api/auth/login", json={"username": "viewer", "password": PASSWORD})
+        if response.status_code == 429:
+            rejected.append(1)
+            return
+        durations.append(time.perf_counter() - start)
+        assert response.json()["code"] == 0, response.text
+
+    if logins:
+        await asyncio.gather(*(login() for _ in range(logins)))
+    else:
+        await asyncio.sleep(3)
+    stop.set()
+    return {"analyze": await prober, "logins": durations, "rejected": len(rejected)}
+
+
+def summarize(name, result):
+    '''
+    功能概述：
+    输出一个阶段的 analyze p50 / p99 延迟与登录耗时。
+
+    输入参数：
+    - name：阶段名称。
+    - result：`run_phase` 的返回值。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 计算百分位并打印。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `percentile`
+
+    示例：
+    - `summarize("基线", result)`
+    '''
+    values = result["analyze"]
+    line = (f"{name:<26} analyze: n={len(values):<4} p50={percentile(values, 50) * 1000:7.1f}ms"
+            f" p99={percentile(values, 99) * 1000:7.1f}ms")
+    if result["logins"] or result["rejected"]:
+        line += (f" | 登录 {len(result['logins'])} 次, 最长 {max(result['logins'], default=0):.2f}s,"
+                 f" 429 {result['rejected']} 次")
+    print(line)
+
+
+async def default_pool_run_auth(func, *args, **kwargs):
+    # 模拟改造前：def login 由 FastAPI 放入默认线程池执行（与 get_current_user 等同步依赖共用，无单独上限）。
+    return await to_thread.run_sync(partial(func, *args, **kwargs))
+
+
+async def main():
+    '''
+    功能概述：
+    准备样本库与用户，校验调整 bcrypt 成本后登录自动重新哈希，再依次运行基线、口令线程池模式与默认线程池模式的压测。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 构建 SQLite 文件库 → 写入低成本哈希的用户 → 登录后检查哈希成本 → 三个阶段压测 → 排队上限。
+
+    异常/边界：
+    - 登录后哈希未按 AUTH_BCRYPT_ROUNDS 更新，或超出排队上限的登录未被拒绝时抛出 AssertionError。
+
+    依赖：
+    - `httpx.ASGITransport`
+
+    示例：
+    - 运行 `python Test/bench_login_load.py`
+    '''
+    logging.disable(logging.INFO)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    settings.KPI_CACHE_ENABLED = False
+    rounds = settings.AUTH_BCRYPT_ROUNDS
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_session(f"sqlite:///{os.path.join(tmp, 'login.db')}").get_bind()
+        # 用户口令以较低成本哈希，模拟调整 AUTH_BCRYPT_ROUNDS 之前创建的账号。
+        with Session(bind=engine) as db:
+            old_hash = security.pwd_context.hash(PASSWORD, rounds=rounds - 2)
+            db.add(User(username="viewer", display_name="查看者", hashed_password=old_hash, role="viewer"))
+            db.commit()
+
+        def override_get_db():
+            db = Session(bind=engine)
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_db
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'viewer'})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=300) as client:
+            # 首次登录：按当前成本重新哈希。
+            assert (await client.post("/api/auth/login", json={"username": "viewer", "password": PASSWORD})).json()["code"] == 0
+            with Session(bind=engine) as db:
+                new_hash = db.query(User.hashed_password).filter(User.username == "viewer").scalar()
+            print(f"重新哈希: ${old_hash.split('$')[2]}$ → ${new_hash.split('$')[2]}$")
+            assert new_hash != old_hash and new_hash.split("$")[2] == f"{rounds:02d}"
+
+            print(f"CPU {os.cpu_count()} 核，口令线程 {settings.API_AUTH_THREADS}，bcrypt 成本 {rounds}，并发登录 {LOGINS}")
+            baseline = await run_phase(client, headers, 0)
+            isolated = await run_phase(client, headers, LOGINS)
+            original = auth_api.run_auth
+            auth_api.run_auth = default_pool_run_auth
+            try:
+                shared = await run_phase(client, headers, LOGINS)
+            finally:
+                auth_api.run_auth = original
+
+            # 排队上限：等待口令线程的请求超过 AUTH_MAX_PENDING 时直接返回 429。
+            original_pending = settings.AUTH_MAX_PENDING
+            settings.AUTH_MAX_PENDING = 4
+            try:
+                limited = await run_phase(client, headers, 12)
+            finally:
+                settings.AUTH_MAX_PENDING = original_pending
+        app.dependency_overrides.clear()
+
+    summarize("基线（无登录）", baseline)
+    summarize("口令线程池", isolated)
+    summarize("默认线程池（改造前）", shared)
+    summarize("排队上限 4", limited)
+    assert limited["rejected"] > 0 and len(limited["logins"]) >= settings.API_AUTH_THREADS + 4
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
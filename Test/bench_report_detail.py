@@ -0,0 +1,270 @@
+"""
+对比报告明细 Sheet 的旧实现（明细查询结果转为字典列表 + 普通 Workbook 逐格设置边框 + 遍历全部单元格计算列宽）
+与只写模式流式写入的耗时和内存峰值，并校验两种实现导出的明细内容一致（无需 MySQL，使用 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入进程资源统计，用于读取内存峰值（Linux 下单位为 KB）。
+import resource
+# 导入多进程工具，每种实现在独立子进程中运行，内存峰值互不影响。
+import multiprocessing
+# 导入日期类型，用于构造样本数据。
+from datetime import date, datetime
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 SQLAlchemy 建库工具。
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+# 导入 openpyxl，用于复现旧实现与读取导出结果。
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+
+# 导入表模型。
+from app.models.tables import Base, FactIfirDetail
+# 导入 IFIR 分析服务、指标定义（报告明细列）与报告构建器。
+from app.services.ifir_service import IfirService
+from app.services.kpi_engine import IFIR_METRIC
+from app.services.report_excel import ReportExcelBuilder, THIN_BORDER, HEADER_FONT, HEADER_FILL
+
+# 明细行数，可通过环境变量 BENCH_ROWS 覆盖。
+ROWS = int(os.environ.get("BENCH_ROWS", "100000"))
+# 参与对比的实现，可通过环境变量 BENCH_VARIANTS（逗号分隔）只运行其中一种。
+VARIANTS = os.environ.get("BENCH_VARIANTS", "legacy,streaming").split(",")
+# 校验时逐行比对的行数（全部比对耗时较长）。
+VERIFY_ROWS = 2000
+START, END = date(2024, 1, 1), date(2024, 12, 1)
+
+
+def build_database(path: str):
+    '''
+    功能概述：
+    创建 SQLite 文件库并写入 ROWS 条 IFIR DETAIL 样本，报告导出的各列均有取值。
+
+    输入参数：
+    - path：数据库文件路径。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 建表 → 分批插入。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `sqlalchemy`
+
+    示例：
+    - `build_database("/tmp/bench.db")`
+    '''
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(ROWS):
+            row = {key: f"{key}-{i % 997}" for _, key in IFIR_METRIC.detail_columns}
+            row.update(
+                claim_nbr=f"C{i:08d}", claim_month=date(2024, i % 12 + 1, 1), claim_date=date(2024, i % 12 + 1, 15),
+                delivery_month=date(2024, i % 12 + 1, 1), delivery_day=i % 28 + 1, station_id=i % 500,
+                load_ts=datetime(2024, 12, 31, 8, 0, 0), model=f"M{i % 5}",
+            )
+            batch.append(row)
+            if len(batch) == 5000:
+                conn.execute(insert(FactIfirDetail), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(FactIfirDetail), batch)
+    engine.dispose()
+
+
+def legacy_detail_sheet(db: Session, path: str):
+    '''
+    功能概述：
+    复现旧实现：查询结果逐行转为字典列表，普通 Workbook 逐格写入并设置边框，再遍历全部单元格计算列宽。
+
+    输入参数：
+    - db：数据库会话。
+    - path：输出文件路径。
+
+    返回值：
+    - 导出行数。
+
+    关键流程：
+    - 查询 → 字典列表 → 逐格写入 → 列宽 → 保存。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `openpyxl`
+
+    示例：
+    - `legacy_detail_sheet(db, "/tmp/legacy.xlsx")`
+    '''
+    engine = IfirService(db).engine
+    columns = IFIR_METRIC.detail_columns
+    detail = engine.detail_source
+    query = db.query(*[getattr(detail, key) for _, key in columns]).filter(
+        detail.delivery_month >= START, detail.delivery_month <= END)
+    rows = []
+    for idx, r in enumerate(query.order_by(detail.delivery_month.desc()).limit(ROWS + 1)):
+        rows.append({key: engine.serialize_detail_value(key, r[i]) for i, (_, key) in enumerate(columns)})
+
+    wb = Workbook()
+    ws = wb.active
+    for col, (display, _) in enumerate(columns, 1):
+        cell = ws.cell(row=1, column=col, value=display)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.border = THIN_BORDER
+    for r_idx, row_data in enumerate(rows, 2):
+        for c_idx, (_, key) in enumerate(columns, 1):
+            ws.cell(row=r_idx, column=c_idx, value=row_data.get(key)).border = THIN_BORDER
+    for col_cells in ws.columns:
+        max_len = 12
+        for cell in col_cells:
+            if cell.value:
+                max_len = max(max_len, min(len(str(cell.value)) + 4, 40))
+        ws.column_dimensions[get_column_letter(col_cells[0].column)].width = max_len
+    wb.save(path)
+    return len(rows)
+
+
+def streaming_detail_sheet(db: Session, path: str):
+    '''
+    功能概述：
+    新实现：明细查询逐行迭代，只写模式 Workbook 边迭代边写入，列宽按样本行估算。
+
+    输入参数：
+    - db：数据库会话。
+    - path：输出文件路径。
+
+    返回值：
+    - 导出行数。
+
+    关键流程：
+    - `KpiEngine.get_report_detail` → `ReportExcelBuilder.add_detail_sheet` → 保存。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `ReportExcelBuilder`
+
+    示例：
+    - `streaming_detail_sheet(db, "/tmp/streaming.xlsx")`
+    '''
+    detail_rows = IfirService(db).engine.get_report_detail(START, END, max_rows=ROWS)
+    builder = ReportExcelBuilder(kpi_type="IFIR", dimension="Model")
+    builder.add_detail_sheet(detail_rows, IFIR_METRIC.detail_columns)
+    builder.save_to_file(path)
+    return detail_rows.count
+
+
+def run_variant(name: str, db_path: str, out_path: str, queue):
+    '''
+    功能概述：
+    在子进程中运行一种实现，回传耗时、内存峰值增量（相对导入完成时）、内存峰值与导出行数。
+
+    输入参数：
+    - name：`legacy` 或 `streaming`。
+    - db_path：数据库文件路径。
+    - out_path：输出文件路径。
+    - queue：结果队列。
+
+    返回值：
+    - 无，结果写入 queue。
+
+    关键流程：
+    - 记录初始 RSS 峰值 → 运行 → 记录耗时与 RSS 峰值。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `resource`
+
+    示例：
+    - 由 `main` 通过 multiprocessing 调用。
+    '''
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = Session(bind=engine)
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    fn = legacy_detail_sheet if name == "legacy" else streaming_detail_sheet
+    count = fn(db, out_path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db.close()
+    queue.put((elapsed, (peak_kb - base_kb) / 1024, peak_kb / 1024, count))
+
+
+def read_detail(path: str, limit: int) -> list:
+    # 读取明细 Sheet 前 limit 行（含表头）的取值。
+    wb = load_workbook(path, read_only=True)
+    ws = wb.worksheets[-1]
+    rows = [list(r) for _, r in zip(range(limit), ws.iter_rows(values_only=True))]
+    wb.close()
+    return rows
+
+
+def main():
+    '''
+    功能概述：
+    构建样本库，依次在子进程中运行旧实现与新实现，输出耗时与内存峰值，并校验明细内容一致。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 建库 → 旧实现 → 新实现 → 比对前 VERIFY_ROWS 行（只运行一种实现时跳过比对）。
+
+    异常/边界：
+    - 行数或内容不一致时抛出 AssertionError。
+
+    依赖：
+    - `multiprocessing`
+
+    示例：
+    - 运行 `python Test/bench_report_detail.py`
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        build_database(db_path)
+        print(f"明细 {ROWS:,} 行 × {len(IFIR_METRIC.detail_columns)} 列")
+        ctx = multiprocessing.get_context("spawn")
+        results = {}
+        for name in VARIANTS:
+            queue = ctx.Queue()
+            out_path = os.path.join(tmp, f"{name}.xlsx")
+            proc = ctx.Process(target=run_variant, args=(name, db_path, out_path, queue))
+            proc.start()
+            results[name] = queue.get()
+            proc.join()
+            elapsed, growth_mb, peak_mb, count = results[name]
+            size_mb = os.path.getsize(out_path) / 1024 / 1024
+            print(f"{name:<10} 耗时 {elapsed:7.1f}s  内存峰值 {peak_mb:7.1f}MB（增量 {growth_mb:7.1f}MB）"
+                  f"  行数 {count:,}  文件 {size_mb:.1f}MB")
+        assert all(count == ROWS for *_, count in results.values())
+        if len(results) < 2:
+            return
+        legacy = read_detail(os.path.join(tmp, "legacy.xlsx"), VERIFY_ROWS)
+        streaming = read_detail(os.path.join(tmp, "streaming.xlsx"), VERIFY_ROWS)
+        assert legacy == streaming, "两种实现导出的明细内容不一致"
+        print(f"前 {VERIFY_ROWS:,} 行内容一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+事件循环阻塞压测：报告生成期间 /health 与筛选项接口的 p99 延迟应保持平稳（无需 MySQL，使用 SQLite 文件库，进程内 ASGI 调用）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入异步工具。
+import asyncio
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入日志与告警工具，压测时只输出结果。
+import logging
+import warnings
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入异步 HTTP 客户端。
+import httpx
+# 导入会话类。
+from sqlalchemy.orm import Session
+
+# 复用查询条数校验脚本中的样本库。
+from test_query_count import build_session
+
+# 导入配置，用于关闭结果缓存（每次报告都实际生成）。
+from app.core.config import get_settings
+# 导入数据库依赖与鉴权依赖，测试中替换为样本库与匿名用户。
+from app.core.database import get_db
+from app.core.read_routing import get_read_db, get_report_read_db
+from app.core.security import get_current_user
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入 IFIR 路由模块，用于模拟改造前在事件循环中直接生成报告。
+from app.api import ifir as ifir_api
+
+# 并发生成的报告数量，可用 LOAD_REPORTS 调整。
+REPORTS = int(os.environ.get("LOAD_REPORTS", "4"))
+# 探测请求间隔（秒）：/health 与筛选项接口，间隔需大于接口正常耗时。
+HEALTH_INTERVAL = 0.02
+OPTIONS_INTERVAL = 0.2
+# 报告生成期间 /health 的 p99 上限（秒）；报告生成占用 GIL，延迟会有小幅上升，但不应随报告耗时增长。
+HEALTH_P99_LIMIT = 0.5
+
+REPORT_BODY = {
+    "time_range": {"start_month": "2024-01", "end_month": "2024-12"},
+    "filters": {"models": ["M1", "M2", "M3", "M4"]},
+}
+
+
+def percentile(values, p):
+    '''
+    功能概述：
+    计算延迟列表的百分位数。
+
+    输入参数：
+    - values：延迟列表（秒）。
+    - p：百分位（0~100）。
+
+    返回值：
+    - 百分位数（秒），列表为空时返回 0。
+
+    关键流程：
+    - 排序后取最近秩。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - 无。
+
+    示例：
+    - `percentile([0.1, 0.2], 99)`
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def probe(client, path, interval, stop):
+    '''
+    功能概述：
+    按固定节拍请求 path，直到 stop 被设置，记录每次请求相对计划发出时间的延迟。
+
+    输入参数：
+    - client：httpx 异步客户端。
+    - path：请求路径。
+    - interval：计划发出间隔（秒）。
+    - stop：asyncio.Event，设置后停止。
+
+    返回值：
+    - 延迟列表（秒）。
+
+    关键流程：
+    - 延迟从计划发出时间算起：事件循环被阻塞导致请求未能按时发出的时间也计入，避免阻塞期间样本缺失造成低估。
+
+    异常/边界：
+    - 请求返回非 200 时抛出 AssertionError。
+
+    依赖：
+    - `httpx`
+
+    示例：
+    - `await probe(client, "/health", 0.02, stop)`
+    '''
+    latencies = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - scheduled)
+        assert response.status_code == 200, f"{path}: {response.status_code}"
+        # 下一个节拍；落后时立即补发，延迟仍从各自的计划时间算起
+        scheduled += interval
+    return latencies
+
+
+async def run_phase(client, with_reports):
+    '''
+    功能概述：
+    同时探测 /health 与筛选项接口；with_reports 为 True 时并发生成 REPORTS 份报告，探测持续到报告全部完成。
+
+    输入参数：
+    - client：httpx 异步客户端。
+    - with_reports：是否并发生成报告。
+
+    返回值：
+    - {"health": 延迟列表, "options": 延迟列表, "reports": 报告耗时列表}。
+
+    关键流程：
+    - 启动探测任务 → 生成报告（或等待固定时长）→ 停止探测。
+
+    异常/边界：
+    - 报告接口返回非 200 时抛出 AssertionError。
+
+    依赖：
+    - `probe`
+
+    示例：
+    - `await run_phase(client, True)`
+    '''
+    stop = asyncio.Event()
+    probes = [
+        asyncio.create_task(probe(client, "/health", HEALTH_INTERVAL, stop)),
+        asyncio.create_task(probe(client, "/api/ifir/options?segments=Consumer", OPTIONS_INTERVAL, stop)),
+    ]
+    durations = []
+    if with_reports:
+        async def report():
+            start = time.perf_counter()
+            response = await client.post("/api/ifir/report/model", json=REPORT_BODY)
+            durations.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+        await asyncio.gather(*(report() for _ in range(REPORTS)))
+    else:
+        await asyncio.sleep(2)
+    stop.set()
+    health, options = await asyncio.gather(*probes)
+    return {"health": health, "options": options, "reports": durations}
+
+
+def summarize(name, result):
+    '''
+    功能概述：
+    输出一个阶段的 p50 / p99 延迟与报告耗时。
+
+    输入参数：
+    - name：阶段名称。
+    - result：`run_phase` 的返回值。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 计算百分位并打印。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `percentile`
+
+    示例：
+    - `summarize("基线", result)`
+    '''
+    line = f"{name:<22}"
+    for key in ("health", "options"):
+        values = result[key]
+        line += (f" {key}: n={len(values):<4} p50={percentile(values, 50) * 1000:7.1f}ms"
+                 f" p99={percentile(values, 99) * 1000:7.1f}ms |")
+    if result["reports"]:
+        line += f" 报告 {len(result['reports'])} 份, 最长 {max(result['reports']):.2f}s"
+    print(line)
+
+
+async def blocking_run_report(func, *args, **kwargs):
+    # 模拟改造前：在事件循环中直接调用同步的报告生成。
+    return func(*args, **kwargs)
+
+
+async def main():
+    '''
+    功能概述：
+    准备样本库与应用依赖，依次运行基线、线程池模式与模拟改造前的阻塞模式，并断言线程池模式下 /health p99 不超过上限。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 构建 SQLite 文件库 → 覆盖 get_db / get_current_user → 三个阶段压测 → 断言。
+
+    异常/边界：
+    - p99 超过上限时抛出 AssertionError。
+
+    依赖：
+    - `httpx.ASGITransport`
+
+    示例：
+    - 运行 `python Test/load_event_loop.py`
+    '''
+    logging.disable(logging.INFO)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    settings.KPI_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_session(f"sqlite:///{os.path.join(tmp, 'load.db')}").get_bind()
+
+        def override_get_db():
+            db = Session(bind=engine)
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_db
+        app.dependency_overrides[get_report_read_db] = override_get_db
+        app.dependency_overrides[get_current_user] = lambda: None
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=300) as client:
+            # 预热：字体、matplotlib 与 openpyxl 的首次加载不计入。
+            await client.post("/api/ifir/report/model", json=REPORT_BODY)
+            baseline = await run_phase(client, with_reports=False)
+            threaded = await run_phase(client, with_reports=True)
+            original = ifir_api.run_report
+            ifir_api.run_report = blocking_run_report
+            try:
+                blocking = await run_phase(client, with_reports=True)
+            finally:
+                ifir_api.run_report = original
+        app.dependency_overrides.clear()
+
+    summarize("基线（无报告）", baseline)
+    summarize("报告在线程池中生成", threaded)
+    summarize("报告阻塞事件循环", blocking)
+    health_p99 = percentile(threaded["health"], 99)
+    assert health_p99 <= HEALTH_P99_LIMIT, f"报告生成期间 /health p99 {health_p99 * 1000:.1f}ms 超过上限"
+    print("通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+"""
+校验数据库连接池：连接池已满时按 DB_POOL_TIMEOUT_SECONDS 快速失败并给出连接池名称，等待耗时与超时计入统计，
+一个连接池占满不影响其他连接池，鉴权查询取不到连接时接口返回 503，管理接口返回各连接池统计
+（无需 MySQL，使用 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入线程与计时工具。
+import threading
+import time
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 HTTP 测试客户端。
+from fastapi.testclient import TestClient
+# 导入 SQLAlchemy 建库工具。
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+# 导入连接池模块。
+from app.core import database
+from app.core.database import MeteredQueuePool, PoolExhausted, PoolMeter, get_db
+# 导入鉴权模块，测试中关闭用户信息缓存，每个请求都查询 users 表。
+from app.core import security
+from app.core.security import create_access_token, require_admin
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入表模型，用于建表。
+from app.models.tables import Base
+
+POOL_TIMEOUT = 0.5
+
+
+def build_engine(path: str, name: str):
+    '''
+    功能概述：
+    创建使用 MeteredQueuePool 的 SQLite 文件库引擎：常驻 2 个连接、不允许溢出，取连接最多等待 POOL_TIMEOUT 秒。
+
+    输入参数：
+    - path：数据库文件路径。
+    - name：连接池名称。
+
+    返回值：
+    - SQLAlchemy 引擎。
+
+    关键流程：
+    - create_engine 指定 poolclass → 挂载 PoolMeter。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `MeteredQueuePool`、`PoolMeter`
+
+    示例：
+    - `build_engine("/tmp/a.db", "interactive")`
+    '''
+    engine = create_engine(f"sqlite:///{path}", poolclass=MeteredQueuePool, pool_size=2, max_overflow=0,
+                           pool_timeout=POOL_TIMEOUT, connect_args={"check_same_thread": False})
+    engine.pool.meter = PoolMeter(name)
+    return engine
+
+
+def test_db_pools():
+    '''
+    功能概述：
+    断言连接池占满后取连接在超时时间内失败并抛出 PoolExhausted，等待释放的取连接记录等待耗时，
+    ETL 连接池占满时接口连接池仍可用，鉴权取不到连接时返回 503，管理接口返回统计。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 两个 SQLite 引擎 → 占满 ETL 连接池 → 超时 / 等待 / 隔离 → HTTP 503 与统计接口。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `TestClient`
+
+    示例：
+    - 运行 `python Test/test_db_pools.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    original_engines = database.engines
+    original_ttl = security.settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+    security.settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        interactive = build_engine(os.path.join(tmp, "kpi.db"), "interactive")
+        etl = build_engine(os.path.join(tmp, "kpi.db"), "etl")
+        held = [etl.connect(), etl.connect()]
+        try:
+            # 占满后快速失败：等待 POOL_TIMEOUT 秒后抛出带连接池名称的 PoolExhausted。
+            start = time.perf_counter()
+            try:
+                etl.connect()
+                raise AssertionError("连接池已满时仍取得了连接")
+            except PoolExhausted as e:
+                elapsed = time.perf_counter() - start
+                print(f"取连接 {elapsed:.2f}s 后失败: {e}")
+                assert POOL_TIMEOUT <= elapsed < POOL_TIMEOUT + 1 and "etl" in str(e)
+            assert etl.pool.meter.timeouts == 1
+
+            # ETL 连接池占满时，接口连接池不受影响。
+            with interactive.connect() as conn:
+                assert conn.execute(text("SELECT 1")).scalar() == 1
+
+            # 等待其他线程归还连接：记录等待耗时。
+            threading.Timer(0.2, held.pop().close).start()
+            with etl.connect():
+                pass
+            stats = etl.pool.meter.snapshot()
+            print(f"ETL 连接池统计: {stats}")
+            assert stats["checkouts"] == 3 and stats["wait_ms_avg"] * stats["checkouts"] >= 150
+
+            # HTTP：鉴权查询取不到连接时返回 503；管理接口返回各连接池统计。
+            Base.metadata.create_all(interactive)
+
+            def override_get_db():
+                db = Session(bind=interactive)
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            app.dependency_overrides[get_db] = override_get_db
+            app.dependency_overrides[require_admin] = lambda: None
+            database.engines = {"interactive": interactive, "etl": etl}
+            client = TestClient(app)
+            headers = {"Authorization": f"Bearer {create_access_token({'sub': 'viewer'})}"}
+            busy = [interactive.connect(), interactive.connect()]
+            try:
+                response = client.get("/api/auth/me", headers=headers)
+            finally:
+                for conn in busy:
+                    conn.close()
+            print(f"连接池已满时 /api/auth/me → {response.status_code} {response.json()['message']}")
+            assert response.status_code == 503 and "interactive" in response.json()["message"]
+            assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+            pools = {p["name"]: p for p in client.get("/api/admin/db/pools").json()["data"]["pools"]}
+            print(f"连接池统计接口: {pools}")
+            assert pools["etl"]["checked_out"] == 1 and pools["etl"]["timeouts"] == 1
+            assert pools["interactive"]["timeouts"] == 1 and pools["interactive"]["checked_out"] == 0
+        finally:
+            for conn in held:
+                conn.close()
+            app.dependency_overrides.clear()
+            database.engines = original_engines
+            security.settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS = original_ttl
+            interactive.dispose()
+            etl.dispose()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_db_pools()
@@ -0,0 +1,201 @@
+"""
+校验 DETAIL 流式（按块）导入：数字形式的文本列（单号、料号、客户号等）在含空值的块中不会被推断为浮点数
+（"1004" 不会变成 "1004.0"），跨块的重复单号按日期保留最新记录，各格式结果一致；整表导入保持原有的类型推断，
+与流式结果只差推断出的 ".0"（xlsx / csv / parquet，无需 MySQL）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+# 导入简单对象构造工具，用于模拟上传任务。
+from types import SimpleNamespace
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 pandas，用于构造与写出样本文件。
+import pandas as pd
+
+# 导入配置，用于切换流式读取与块大小。
+from app.core.config import get_settings
+# 导入 ETL 服务与 DETAIL 模型。
+from app.services.etl_service import EtlService
+from app.models.tables import FactIfirDetail
+
+# 每块行数：让空值只出现在部分块中。
+CHUNK_SIZE = 4
+
+
+class CaptureDetailService(EtlService):
+    '''
+    功能概述：
+    不连接数据库的 ETL 服务：截获写出的 DETAIL 记录，按 claim_nbr 覆盖保存，模拟 upsert 后的表内容。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 实例属性 `rows` 为 {claim_nbr: 记录}。
+
+    关键流程：
+    - 重写 `_write_detail_columns`，按写出顺序覆盖同一单号的记录。
+
+    异常/边界：
+    - 不重算 Top Issue 汇总（不收集月份）。
+
+    依赖：
+    - `EtlService`
+
+    示例：
+    - `CaptureDetailService()._process_ifir_detail(task, path)`
+    '''
+
+    def __init__(self):
+        # 不使用数据库会话。
+        super().__init__(None)
+        self.rows = {}
+
+    def _write_detail_columns(self, model, columns, total, label, bulk_loader, affected_months):
+        # 按写出顺序覆盖，等同于 INSERT ... ON DUPLICATE KEY UPDATE 的结果。
+        for record in self._records_from_columns(columns, 0, total):
+            self.rows[record["claim_nbr"]] = record
+        return total
+
+
+def make_detail_frame() -> pd.DataFrame:
+    '''
+    功能概述：
+    构造 IFIR DETAIL 原始列名的样本：数字形式的文本列只在部分行为空，单号 1003 在两个块中各出现一次。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - DataFrame。
+
+    关键流程：
+    - 12 行，CHUNK_SIZE=4 时分为 3 块；第 2 块的 Cust_Nbr / Part_Nbr 含空值。
+
+    异常/边界：
+    - 第二条 1003 的 Claim_Date 更晚，应覆盖第一条。
+
+    依赖：
+    - `pandas`
+
+    示例：
+    - `make_detail_frame().to_excel(path, index=False)`
+    '''
+    claim_nbrs = [1001, 1002, 1003, 1004, 1005, 1006, 1007, 1008, 1009, 1003, 1010, 1011]
+    dates = pd.to_datetime([f"2024-03-{day:02d}" for day in range(1, 13)])
+    cust = [5001, 5002, 5003, 5004, None, 5006, None, 5008, 5009, 5010, 5011, 5012]
+    part = [7001, 7002, 7003, 7004, 7005, None, 7007, 7008, 7009, 7010, 7011, 7012]
+    return pd.DataFrame({
+        "Claim_Nbr": claim_nbrs,
+        "Claim_Month": dates.to_period("M").to_timestamp(),
+        "Claim_Date": dates,
+        "Delivery_Month": dates.to_period("M").to_timestamp(),
+        "PLANT": ["P1", "P2"] * 6,
+        "Segment": ["Consumer"] * 12,
+        "Model": ["M1"] * 12,
+        "Serial_Nbr": [880000 + i for i in range(12)],
+        "Station_ID": list(range(1, 13)),
+        "Fault_Category": ["LCD"] * 12,
+        # 可空整数：csv 中写出为 "5001"，与 Excel 单元格一致
+        "Part_Nbr": pd.array(part, dtype="Int64"),
+        "Claim_Item_Nbr": [1, 2] * 6,
+        "Cust_Nbr": pd.array(cust, dtype="Int64"),
+    })
+
+
+def strip_float_suffix(rows: dict) -> dict:
+    # 去掉整表导入时类型推断产生的 ".0"（含空值的数字列被推断为浮点数）。
+    return {
+        claim: {key: value[:-2] if isinstance(value, str) and value.endswith(".0") else value
+                for key, value in record.items()}
+        for claim, record in rows.items()
+    }
+
+
+def import_rows(path: str, streaming: bool) -> dict:
+    # 按指定模式导入一次，返回 {claim_nbr: 记录}。
+    settings = get_settings()
+    settings.ETL_STREAMING = streaming
+    service = CaptureDetailService()
+    task = SimpleNamespace(task_id="T-STREAM", detail_load_mode="upsert")
+    service._load_detail_file(
+        task, path, "IFIR DETAIL", service._IFIR_DETAIL_COLUMN_MAP, "claim_date",
+        service._build_ifir_detail_columns, FactIfirDetail
+    )
+    return service.rows
+
+
+def test_detail_streaming():
+    '''
+    功能概述：
+    同一文件分别按整表与流式导入：流式导入的数字形式文本列没有 ".0" 且各格式结果一致；
+    整表导入保持类型推断（含空值的客户号为 "5004.0"），去掉 ".0" 后与流式结果一致。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 写出 xlsx / csv / parquet → 两种模式导入 → 比对记录（整表结果去掉 ".0" 后比对）。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError；未安装 pyarrow 时跳过 parquet。
+
+    依赖：
+    - `CaptureDetailService`
+
+    示例：
+    - 运行 `python Test/test_detail_streaming.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original = (settings.ETL_STREAMING, settings.ETL_CHUNK_SIZE)
+    settings.ETL_CHUNK_SIZE = CHUNK_SIZE
+    df = make_detail_frame()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {"xlsx": os.path.join(tmp, "detail.xlsx"), "csv": os.path.join(tmp, "detail.csv")}
+            df.to_excel(paths["xlsx"], index=False)
+            df.to_csv(paths["csv"], index=False)
+            try:
+                df.to_parquet(os.path.join(tmp, "detail.parquet"), index=False)
+                paths["parquet"] = os.path.join(tmp, "detail.parquet")
+            except ImportError:
+                print("未安装 pyarrow，跳过 parquet")
+
+            results = {}
+            for fmt, path in paths.items():
+                whole = import_rows(path, streaming=False)
+                streamed = import_rows(path, streaming=True)
+                print(f"{fmt:<8} 整表 {len(whole)} 条, 流式 {len(streamed)} 条, "
+                      f"1004 客户号 整表 {whole['1004']['cust_nbr']!r} / 流式 {streamed['1004']['cust_nbr']!r}")
+                assert strip_float_suffix(whole) == streamed, fmt
+                results[fmt] = streamed
+            assert import_rows(paths["csv"], streaming=False)["1004"]["cust_nbr"] == "5004.0"
+
+            rows = results["xlsx"]
+            assert len(rows) == 11 and rows["1003"]["cust_nbr"] == "5010"
+            for record in rows.values():
+                for key in ("claim_nbr", "cust_nbr", "part_nbr", "serial_nbr", "claim_item_nbr"):
+                    assert record[key] is None or not record[key].endswith(".0"), (key, record[key])
+            for fmt, other in results.items():
+                assert other == rows, f"{fmt} 与 xlsx 导入结果不一致"
+    finally:
+        settings.ETL_STREAMING, settings.ETL_CHUNK_SIZE = original
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_detail_streaming()
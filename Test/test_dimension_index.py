@@ -0,0 +1,214 @@
+"""
+校验筛选项维度索引：任意 Segment / ODM / Model 组合的结果与数据库查询一致，命中索引时不执行 SQL，
+upsert 批次完成后增量并入（含同一秒结束的批次）、replace_months 批次完成后全量重建、只含 DETAIL 的批次不重建，并输出大规模组合下的过滤耗时
+（无需 MySQL，使用内存 SQLite）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入随机数与计时工具。
+import random
+import time
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+# 导入日期类型，用于构造 ROW 月份与上传任务完成时间。
+from datetime import date, datetime
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 复用查询条数校验脚本中的样本库与 SQL 计数工具。
+from test_query_count import ODMS, MODELS, SEGMENTS, build_session, count_queries
+
+# 导入配置，用于切换预聚合与检查间隔。
+from app.core.config import get_settings
+# 导入分析引擎与维度索引。
+from app.services.kpi_engine import IFIR_METRIC, RA_METRIC, KpiEngine
+from app.services import dimension_index
+from app.services.dimension_index import DimensionIndex, clear_dimension_indexes
+# 导入表模型，用于模拟 ETL 批次写入。
+from app.models.tables import FactIfirRow, UploadTask
+
+
+def filter_cases(rnd: random.Random, count: int) -> list:
+    '''
+    功能概述：
+    随机生成 Segment / ODM / Model 过滤组合，包含空列表、不存在的取值与三者同时过滤。
+
+    输入参数：
+    - rnd：随机数生成器。
+    - count：随机组合个数。
+
+    返回值：
+    - [{"segments": ..., "odms": ..., "models": ...}] 列表（首项为不过滤）。
+
+    关键流程：
+    - 每个维度随机取 None / [] / 1~3 个取值（偶尔混入不存在的取值）。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `test_query_count` 中的样本取值
+
+    示例：
+    - `filter_cases(random.Random(1), 50)`
+    '''
+    def pick(values):
+        choice = rnd.random()
+        if choice < 0.35:
+            return None
+        if choice < 0.4:
+            return []
+        picked = rnd.sample(values, rnd.randint(1, min(3, len(values))))
+        return picked + ["__missing__"] if rnd.random() < 0.1 else picked
+
+    cases = [{"segments": None, "odms": None, "models": None}]
+    for _ in range(count):
+        cases.append({"segments": pick(SEGMENTS), "odms": pick(ODMS), "models": pick(MODELS)})
+    return cases
+
+
+def assert_matches_sql(db, metric, cases, label: str):
+    # 索引结果与数据库查询（KpiEngine._get_options）逐个组合比对。
+    engine = KpiEngine(db, metric)
+    for case in cases:
+        assert engine.get_options(**case) == engine._get_options(**case), (label, case)
+    print(f"{label}: {len(cases)} 个过滤组合与数据库查询一致")
+
+
+def add_ifir_rows(db, batch_id: str, rows: list):
+    # 模拟 ETL 写入一个批次的 IFIR ROW：[(月份, segment, supplier_new, model)]。
+    next_id = (db.query(FactIfirRow.id).order_by(FactIfirRow.id.desc()).limit(1).scalar() or 0) + 1
+    for offset, (month, segment, supplier, model) in enumerate(rows):
+        db.add(FactIfirRow(id=next_id + offset, content_hash=f"{batch_id}-{offset}", delivery_month=month,
+                           segment=segment, supplier_new=supplier, model=model, plant="P1",
+                           box_claim=1, box_mm=10, etl_batch_id=batch_id))
+
+
+def complete_task(db, task_id: str, completed_at: datetime, **fields):
+    # 写入一个已结束的上传任务（上传完成即数据版本变化）。
+    db.add(UploadTask(task_id=task_id, status=fields.pop("status", "completed"), completed_at=completed_at, **fields))
+    db.commit()
+
+
+def slot(metric):
+    # 当前进程中该 KPI（ROW 明细数据源）的索引状态。
+    return dimension_index._slots[(metric.name, metric.row_model.__tablename__)]
+
+
+def test_dimension_index():
+    '''
+    功能概述：
+    断言索引结果与数据库查询一致（ROW 明细与预聚合两种数据源），索引有效期内不执行 SQL、到期只查询数据版本，
+    upsert 批次增量并入（含新的 Model 与月份范围、与上一批次同一秒结束的批次）、replace_months 批次全量重建、仅 DETAIL 批次只更新版本。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 样本库 → 随机组合比对 → SQL 计数 → 模拟三种上传批次 → 大规模组合计时。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`count_queries`、`KpiEngine`
+
+    示例：
+    - 运行 `python Test/test_dimension_index.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original = (settings.KPI_AGGREGATES_ENABLED, settings.KPI_DIMENSION_INDEX_CHECK_SECONDS)
+    cases = filter_cases(random.Random(2024), 60)
+    db = build_session()
+    try:
+        clear_dimension_indexes()
+        settings.KPI_DIMENSION_INDEX_CHECK_SECONDS = 60
+        for aggregates in (False, True):
+            settings.KPI_AGGREGATES_ENABLED = aggregates
+            for metric in (IFIR_METRIC, RA_METRIC):
+                assert_matches_sql(db, metric, cases, f"{metric.name} {'预聚合' if aggregates else 'ROW 明细'}")
+        settings.KPI_AGGREGATES_ENABLED = False
+
+        # 有效期内不执行 SQL；到期时只查询一次数据版本。
+        engine = KpiEngine(db, IFIR_METRIC)
+        cached = count_queries(db, lambda: engine.get_options(segments=["SMB"], odms=["A"]))
+        settings.KPI_DIMENSION_INDEX_CHECK_SECONDS = 0
+        checked = count_queries(db, lambda: engine.get_options(segments=["SMB"], odms=["A"]))
+        print(f"命中索引 {cached} 条 SQL，到期检查 {checked} 条 SQL")
+        assert cached == 0 and checked == 1
+
+        # upsert 批次：新 Model / ODM 与更晚的月份增量并入。
+        state = slot(IFIR_METRIC)
+        builds = state.builds
+        add_ifir_rows(db, "T-UPSERT", [
+            (date(2025, 3, 1), "Consumer", "Z", "M-NEW"),
+            (date(2025, 3, 1), "SMB", "A", "M-NEW"),
+        ])
+        complete_task(db, "T-UPSERT", datetime(2025, 4, 1, 8, 0), ifir_row_file="ifir_row.xlsx", row_load_mode="upsert")
+        options = engine.get_options(odms=["Z"])
+        print(f"upsert 批次后 ODM Z 的 Model: {options['models']}，月份上限 {options['month_max']}")
+        assert options["models"] == ["M-NEW"] and options["month_max"] == "2025-03"
+        assert state.patches == 1 and state.builds == builds
+        assert_matches_sql(db, IFIR_METRIC, cases + [{"segments": ["SMB"], "odms": None, "models": ["M-NEW"]}], "增量并入后")
+
+        # 与上一批次同一秒结束的 upsert 批次：数据版本随任务数变化，按任务 id 识别为未并入并立即并入。
+        add_ifir_rows(db, "T-SAME-SECOND", [(date(2025, 3, 1), "Consumer", "Y", "M-SAME")])
+        complete_task(db, "T-SAME-SECOND", datetime(2025, 4, 1, 8, 0), ifir_row_file="ifir_row.xlsx",
+                      row_load_mode="upsert")
+        options = engine.get_options(odms=["Y"])
+        print(f"同一秒结束的批次并入后 ODM Y 的 Model: {options['models']}")
+        assert options["models"] == ["M-SAME"] and state.patches == 2 and state.builds == builds
+
+        # 只含 DETAIL 的批次：只更新版本，不查询组合。
+        complete_task(db, "T-DETAIL", datetime(2025, 4, 2, 8, 0), ifir_detail_file="ifir_detail.xlsx")
+        detail_only = count_queries(db, lambda: engine.get_options())
+        print(f"仅 DETAIL 批次后检查 {detail_only} 条 SQL（数据版本 + 已结束的 ROW 任务）")
+        assert state.patches == 2 and state.builds == builds and detail_only == 2
+        assert state.index.version == engine.data_version()
+
+        # replace_months 批次：删除了 2025-03 的数据，全量重建。
+        db.query(FactIfirRow).filter(FactIfirRow.delivery_month == date(2025, 3, 1)).delete()
+        complete_task(db, "T-REPLACE", datetime(2025, 4, 3, 8, 0), ifir_row_file="ifir_row.xlsx",
+                      row_load_mode="replace_months")
+        options = engine.get_options(odms=["Z"])
+        print(f"replace_months 批次后 ODM Z 的 Model: {options['models']}，月份上限 {options['month_max']}")
+        assert options["models"] == [] and options["month_max"] == "2024-12"
+        assert state.builds == builds + 1
+        assert_matches_sql(db, IFIR_METRIC, cases, "全量重建后")
+    finally:
+        settings.KPI_AGGREGATES_ENABLED, settings.KPI_DIMENSION_INDEX_CHECK_SECONDS = original
+        clear_dimension_indexes()
+        db.close()
+
+    # 大规模组合（约 1.6 万个）下的过滤耗时。
+    rnd = random.Random(7)
+    segments = [f"S{i}" for i in range(12)]
+    odms = [f"O{i}" for i in range(40)]
+    models = [f"MODEL-{i}" for i in range(8000)]
+    combos = [(rnd.choice(segments), rnd.choice(odms), m) for m in models for _ in range(rnd.randint(1, 3))]
+    index = DimensionIndex(combos, "2020-01", "2024-12", "")
+    for label, case in [
+        ("不过滤", {}),
+        ("1 个 Segment", {"segments": ["S1"]}),
+        ("2 个 ODM", {"odms": ["O1", "O2"]}),
+        ("Segment + ODM", {"segments": ["S1", "S2"], "odms": ["O3"]}),
+        ("1 个 Model", {"models": ["MODEL-1"]}),
+    ]:
+        start = time.perf_counter()
+        for _ in range(200):
+            index.options(**case)
+        print(f"{len(index.combos)} 个组合，{label}: {(time.perf_counter() - start) / 200 * 1e6:.0f}µs / 次")
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_dimension_index()
@@ -0,0 +1,247 @@
+"""
+校验 ETL 任务失败时已提交的数据仍保持派生表一致：一个 ROW 文件写入完成、另一个 ROW 文件写到一半失败后，
+ROW 月度聚合表与事实表按月合计一致、ODM 映射包含已提交批次中的新组合；DETAIL 文件写到一半失败后
+Top Issue 汇总表与明细表一致（无需 MySQL，使用 SQLite，仅把 MySQL 专用的 upsert 语句换成 SQLite 写法）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+# 导入日期类型，用于构造 ROW 月份。
+from datetime import date
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 pandas，用于写出样本文件。
+import pandas as pd
+# 导入 SQLAlchemy 事件工具与 SQLite 方言的 INSERT。
+from sqlalchemy import event, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# 复用查询条数校验脚本中的样本库（同时注册 SQLite 下 BIGINT 主键自增的建表规则）。
+from test_query_count import build_session
+
+# 导入配置，用于切换串行处理。
+from app.core.config import get_settings
+# 导入 ETL 服务、预聚合维护服务与用到的表模型。
+from app.services.etl_service import EtlService
+from app.services.aggregate_service import AggregateService
+from app.models.tables import MapOdmToPlant, UploadTask
+
+# 每个 ROW 文件的行数（upsert 每 500 行提交一次，共 3 批）。
+ROW_COUNT = 1200
+
+
+class SqliteEtlService(EtlService):
+    '''
+    功能概述：
+    在 SQLite 上运行的 ETL 服务：读取、清洗、状态更新与聚合重算均为原实现，只把 MySQL 的
+    INSERT ... ON DUPLICATE KEY UPDATE 换成 SQLite 的 ON CONFLICT DO UPDATE，并可在指定批次模拟写入中断。
+
+    输入参数：
+    - db：数据库会话。
+    - fail_batch：(表名, 批次序号)，写到该批次时抛出异常；None 表示不中断。
+
+    返回值：
+    - 实例。
+
+    关键流程：
+    - 重写 `_upsert_row_columns` / `_upsert_detail_columns`，按 content_hash / claim_nbr 分批写入并逐批提交（与原实现相同）。
+
+    异常/边界：
+    - 指定批次之前的批次已提交，模拟上传任务写入部分数据后失败。
+
+    依赖：
+    - `EtlService`
+
+    示例：
+    - `SqliteEtlService(db, fail_batch=("fact_ra_row", 2))`
+    '''
+
+    def __init__(self, db, fail_batch=None):
+        super().__init__(db)
+        self.fail_batch = fail_batch
+
+    def _upsert_row_columns(self, model, columns, total, label):
+        # ROW 冲突键为 content_hash。
+        return self._upsert_batches(model, columns, total, label, "content_hash", ("id", "content_hash", "load_ts"))
+
+    def _upsert_detail_columns(self, model, columns, total, label):
+        # DETAIL 冲突键为 claim_nbr。
+        return self._upsert_batches(model, columns, total, label, "claim_nbr", ("claim_nbr", "load_ts"))
+
+    def _upsert_batches(self, model, columns, total, label, key, skip):
+        # 与原实现相同的每 500 行提交一次，到 fail_batch 指定的批次时中断。
+        batch_size = 500
+        rows_processed = 0
+        for batch_no, start_idx in enumerate(range(0, total, batch_size), start=1):
+            if self.fail_batch == (model.__tablename__, batch_no):
+                raise Exception(f"{label} 第 {batch_no} 批写入中断")
+            records = self._records_from_columns(columns, start_idx, min(start_idx + batch_size, total))
+            stmt = sqlite_insert(model).values(records)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={c.name: stmt.excluded[c.name] for c in model.__table__.columns if c.name not in skip},
+            )
+            self.db.execute(stmt)
+            self.db.commit()
+            rows_processed += len(records)
+        return rows_processed
+
+
+def use_sqlite_insert_ignore(db):
+    # ODM 映射刷新使用 MySQL 的 INSERT IGNORE，在 SQLite 中改写为 INSERT OR IGNORE。
+    def rewrite(_conn, _cursor, statement, parameters, _context, _executemany):
+        return statement.replace("INSERT IGNORE", "INSERT OR IGNORE"), parameters
+    event.listen(db.get_bind(), "before_cursor_execute", rewrite, retval=True)
+
+
+def write_row_files(tmp: str, prefix: str) -> dict:
+    '''
+    功能概述：
+    写出 IFIR ROW 与 RA ROW 的 csv 样本（原始列名），月份为 2025 年，与样本库中已有的 2024 年数据不重叠。
+
+    输入参数：
+    - tmp：输出目录。
+    - prefix：文件名与内容前缀，不同任务的行内容不同（content_hash 不冲突）。
+
+    返回值：
+    - {文件类型: 文件路径}。
+
+    关键流程：
+    - 每个文件 ROW_COUNT 行，ODM / Plant 组合包含样本库映射中没有的 (F, P5)。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `pandas`
+
+    示例：
+    - `write_row_files(tmp, "T1")`
+    '''
+    months = [date(2025, 1 + i % 3, 1) for i in range(ROW_COUNT)]
+    common = {
+        "BRAND": "ThinkPad", "GEO": "AP", "Product_line": "NB",
+        "Segment": [["Consumer", "SMB"][i % 2] for i in range(ROW_COUNT)],
+        "SERIES": [f"{prefix}-S{i}" for i in range(ROW_COUNT)],
+        "Model": [f"M{1 + i % 8}" for i in range(ROW_COUNT)],
+        "Supplier_NEW": [["A", "F"][i % 2] for i in range(ROW_COUNT)],
+        "Mach_type": "20XX",
+    }
+    ifir = pd.DataFrame({"Delivery_month": months, **common, "PLANT": [["P1", "P5"][i % 2] for i in range(ROW_COUNT)],
+                         "BOX CLAIM": [i % 7 for i in range(ROW_COUNT)], "BOX MM": [100 + i % 50 for i in range(ROW_COUNT)]})
+    ra = pd.DataFrame({"Claim_month": months, **common, "PLANT_OLD": [["P1", "P5"][i % 2] for i in range(ROW_COUNT)],
+                       "RA CLAIM": [i % 5 for i in range(ROW_COUNT)], "RA MM": [200 + i % 30 for i in range(ROW_COUNT)]})
+    paths = {"ifir_row": os.path.join(tmp, f"{prefix}_ifir_row.csv"), "ra_row": os.path.join(tmp, f"{prefix}_ra_row.csv")}
+    ifir.to_csv(paths["ifir_row"], index=False)
+    ra.to_csv(paths["ra_row"], index=False)
+    return paths
+
+
+def write_detail_file(tmp: str, prefix: str = "D") -> str:
+    # 写出 ROW_COUNT 行 IFIR DETAIL csv（2025 年、单号以 prefix 开头且不重复），返回文件路径。
+    months = [date(2025, 1 + i % 3, 1) for i in range(ROW_COUNT)]
+    df = pd.DataFrame({
+        "Claim_Nbr": [f"{prefix}{i}" for i in range(ROW_COUNT)],
+        "Claim_Month": months,
+        "Claim_Date": months,
+        "Delivery_Month": months,
+        "PLANT": [["P1", "P2"][i % 2] for i in range(ROW_COUNT)],
+        "Segment": "Consumer",
+        "Model": [f"M{1 + i % 8}" for i in range(ROW_COUNT)],
+        "Fault_Category": [["LCD", "Battery", "Keyboard"][i % 3] for i in range(ROW_COUNT)],
+    })
+    path = os.path.join(tmp, f"{prefix}_ifir_detail.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def run_task(db, task_id: str, files: dict, fail_batch=None) -> UploadTask:
+    # 登记上传任务并处理，任务失败时吞掉异常，返回处理后的任务记录。
+    db.add(UploadTask(task_id=task_id, status="queued", row_load_mode="upsert",
+                      **{f"{file_type}_file": path for file_type, path in files.items()}))
+    db.commit()
+    try:
+        SqliteEtlService(db, fail_batch).process_upload_task(task_id, files)
+    except Exception as e:
+        print(f"任务 {task_id} 失败: {e}")
+    task = db.query(UploadTask).filter(UploadTask.task_id == task_id).one()
+    db.refresh(task)
+    return task
+
+
+def test_etl_failure():
+    '''
+    功能概述：
+    IFIR ROW 写入完成、RA ROW 写完第 1 批后中断，断言任务失败、各文件状态正确，
+    check_consistency 显示 ROW 聚合表与事实表（含失败任务已提交的批次）一致，
+    且已提交批次中的 ODM / Plant 组合 (F, P5) 写入了 IFIR 与 RA 的映射；IFIR DETAIL 写完第 1 批后中断时，
+    Top Issue 汇总表包含已提交的 500 条明细。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 样本库 → 写出 ROW 文件 → 串行处理并在 RA 第 2 批中断 → 一致性检查 → ODM 映射检查 → DETAIL 中断 → 一致性检查。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`SqliteEtlService`、`AggregateService.check_consistency`
+
+    示例：
+    - 运行 `python Test/test_etl_failure.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original = settings.ETL_PARALLEL_WORKERS
+    settings.ETL_PARALLEL_WORKERS = 1
+    db = build_session()
+    use_sqlite_insert_ignore(db)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            task = run_task(db, "T-FAIL", write_row_files(tmp, "T-FAIL"), fail_batch=("fact_ra_row", 2))
+            print(f"任务状态 {task.status}, IFIR ROW {task.ifir_row_status}, RA ROW {task.ra_row_status}")
+            assert task.status == "failed" and task.completed_at is not None
+            assert task.ifir_row_status == "completed" and task.ra_row_status == "failed"
+
+            result = AggregateService(db).check_consistency()
+            print(f"一致性检查不一致月份: { {name: len(months) for name, months in result.items()} }")
+            assert all(not months for months in result.values()), result
+            ra_rows = db.execute(text(
+                "SELECT SUM(row_count) FROM agg_ra_row_month WHERE claim_month >= '2025-01-01'")).scalar()
+            print(f"RA 聚合表中失败任务已提交的行数: {ra_rows}")
+            assert ra_rows == 500
+
+            mapped = {(m.kpi_type, m.supplier_new, m.plant) for m in db.query(MapOdmToPlant).all()}
+            print(f"失败任务后 ODM 映射新增: {task.odm_map_inserted}")
+            assert {("IFIR", "F", "P5"), ("RA", "F", "P5")} <= mapped
+
+            task = run_task(db, "T-FAIL-DETAIL", {"ifir_detail": write_detail_file(tmp)},
+                            fail_batch=("fact_ifir_detail", 2))
+            assert task.status == "failed" and task.ifir_detail_status == "failed"
+            result = AggregateService(db).check_consistency("IFIR_ISSUE")
+            issues = db.execute(text(
+                "SELECT SUM(issue_count) FROM agg_ifir_detail_issue WHERE delivery_month >= '2025-01-01'")).scalar()
+            print(f"DETAIL 中断后 Top Issue 不一致月份 {len(result['IFIR_ISSUE'])} 个, 已汇总明细 {issues} 条")
+            assert not result["IFIR_ISSUE"] and issues == 500
+    finally:
+        settings.ETL_PARALLEL_WORKERS = original
+        db.close()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_etl_failure()
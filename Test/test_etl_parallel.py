@@ -0,0 +1,186 @@
+"""
+校验 ETL 多进程并行路径（`_process_files_parallel` / `_process_file_in_worker`）：各文件状态与行数由子进程写回、
+任务进度逐文件推进到 100%、多个文件失败时错误信息汇总到任务；并对同一批文件比较串行与并行的耗时
+（无需 MySQL，使用 SQLite 文件库，子进程中同样只把 MySQL 专用的 upsert 语句换成 SQLite 写法）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 SQLAlchemy 引擎、事件与会话工厂。
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# 复用查询条数校验脚本中的样本库（同时注册 SQLite 下 BIGINT 主键自增的建表规则）。
+from test_query_count import build_session
+# 复用 ETL 失败路径校验中的 SQLite 版 ETL 服务与样本文件。
+from test_etl_failure import SqliteEtlService, use_sqlite_insert_ignore, write_row_files, write_detail_file
+
+# 导入配置，用于切换并行进程数。
+from app.core.config import get_settings
+# 导入 ETL 服务模块（替换子进程入口）与任务模型。
+from app.services import etl_service
+from app.models.tables import UploadTask
+
+# 子进程连接的 SQLite 文件库地址。
+DB_URL_ENV = "ETL_PARALLEL_TEST_DB"
+# 子进程入口中直接抛出异常的文件名标记，模拟子进程异常退出。
+CRASH_MARK = "crash"
+
+
+def sqlite_engine(url: str):
+    # 创建 SQLite 文件库引擎：多进程同时写入时等待锁释放，并使用 WAL 让读写互不阻塞。
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 60})
+
+    @event.listens_for(engine, "connect")
+    def _pragma(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+    return engine
+
+
+def sqlite_worker(task_id: str, file_type: str, file_path: str):
+    '''
+    功能概述：
+    并行路径的子进程入口：把 `etl_service` 的会话工厂与服务类换成 SQLite 版本后调用原 `_process_file_in_worker`。
+
+    输入参数：
+    - task_id：上传任务 ID。
+    - file_type：文件类型（ifir_row / ifir_detail / ra_row / ra_detail）。
+    - file_path：文件路径。
+
+    返回值：
+    - 与 `_process_file_in_worker` 相同：成功返回 None，失败返回错误信息。
+
+    关键流程：
+    - 读取环境变量中的库地址 → 替换 `EtlSessionLocal` 与 `EtlService` → 调用原入口。
+
+    异常/边界：
+    - 文件名包含 CRASH_MARK 时直接抛出异常，覆盖父进程处理子进程异常的分支。
+
+    依赖：
+    - `SqliteEtlService`、`etl_service._process_file_in_worker`
+
+    示例：
+    - `sqlite_worker("T-PAR", "ifir_row", "/tmp/ifir_row.csv")`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    if CRASH_MARK in os.path.basename(file_path):
+        raise RuntimeError(f"{file_type} 子进程异常退出")
+    etl_service.EtlSessionLocal = sessionmaker(bind=sqlite_engine(os.environ[DB_URL_ENV]))
+    etl_service.EtlService = SqliteEtlService
+    return ORIGINAL_WORKER(task_id, file_type, file_path)
+
+
+# 原子进程入口，替换前保存。
+ORIGINAL_WORKER = etl_service._process_file_in_worker
+
+
+def run_task(db, task_id: str, files: dict, workers: int):
+    # 登记上传任务并按指定进程数处理，返回 (任务记录, 耗时秒数)；任务失败时吞掉异常。
+    settings = get_settings()
+    settings.ETL_PARALLEL_WORKERS = workers
+    db.add(UploadTask(task_id=task_id, status="queued", row_load_mode="upsert",
+                      **{f"{file_type}_file": path for file_type, path in files.items()}))
+    db.commit()
+    started = time.perf_counter()
+    try:
+        SqliteEtlService(db).process_upload_task(task_id, files)
+    except Exception as e:
+        print(f"任务 {task_id} 失败: {e}")
+    elapsed = time.perf_counter() - started
+    db.expire_all()
+    return db.query(UploadTask).filter(UploadTask.task_id == task_id).one(), elapsed
+
+
+def test_etl_parallel():
+    '''
+    功能概述：
+    并行处理 IFIR ROW / RA ROW / IFIR DETAIL 三个文件，断言各文件状态与行数由子进程写回、进度为 100%，
+    行数与串行处理一致并输出两者耗时；再让一个文件读取失败、一个文件的子进程抛出异常，
+    断言其余文件照常完成、两个失败文件均标记为 failed、任务错误信息包含两条失败原因。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 样本文件库 → 串行处理 → 并行处理 → 比较状态、行数与耗时 → 构造两个失败文件并行处理 → 检查错误汇总。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`SqliteEtlService`、`sqlite_worker`
+
+    示例：
+    - 运行 `python Test/test_etl_parallel.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original = settings.ETL_PARALLEL_WORKERS
+    etl_service._process_file_in_worker = sqlite_worker
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'etl.db')}"
+            os.environ[DB_URL_ENV] = url
+            build_session(url).close()
+            db = sessionmaker(bind=sqlite_engine(url))()
+            use_sqlite_insert_ignore(db)
+
+            results = {}
+            for task_id, workers in (("T-SERIAL", 1), ("T-PARALLEL", 3)):
+                files = {**write_row_files(tmp, task_id), "ifir_detail": write_detail_file(tmp, task_id)}
+                task, elapsed = run_task(db, task_id, files, workers)
+                results[task_id] = task
+                rows = {ft: getattr(task, f"{ft}_rows") for ft in files}
+                print(f"{task_id}（进程数 {workers}）耗时 {elapsed:.2f}s, 状态 {task.status}, 进度 {task.progress}%, 行数 {rows}")
+                assert task.status == "completed" and task.progress == 100, task.error_message
+                for file_type in files:
+                    assert getattr(task, f"{file_type}_status") == "completed"
+            serial, parallel = results["T-SERIAL"], results["T-PARALLEL"]
+            for file_type in ("ifir_row", "ra_row", "ifir_detail"):
+                assert getattr(serial, f"{file_type}_rows") == getattr(parallel, f"{file_type}_rows") > 0
+
+            broken = os.path.join(tmp, "broken_ra_row.csv")
+            with open(broken, "w") as f:
+                f.write("not,a,ra,row\n1,2,3,4\n")
+            files = {
+                "ifir_row": write_row_files(tmp, "T-PAR-FAIL")["ifir_row"],
+                "ra_row": broken,
+                "ifir_detail": write_detail_file(tmp, "T-PAR-FAIL"),
+                "ra_detail": os.path.join(tmp, f"{CRASH_MARK}_ra_detail.csv"),
+            }
+            task, elapsed = run_task(db, "T-PAR-FAIL", files, 4)
+            statuses = {ft: getattr(task, f"{ft}_status") for ft in files}
+            print(f"失败任务耗时 {elapsed:.2f}s, 进度 {task.progress}%, 文件状态 {statuses}")
+            print(f"错误信息: {task.error_message}")
+            assert task.status == "failed" and task.progress == 100
+            assert statuses == {"ifir_row": "completed", "ra_row": "failed",
+                                "ifir_detail": "completed", "ra_detail": "failed"}
+            assert "RA ROW处理失败" in task.error_message and "RA DETAIL处理失败" in task.error_message
+            db.close()
+    finally:
+        etl_service._process_file_in_worker = ORIGINAL_WORKER
+        settings.ETL_PARALLEL_WORKERS = original
+        os.environ.pop(DB_URL_ENV, None)
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_etl_parallel()
@@ -0,0 +1,89 @@
+"""
+校验 ETL 任务队列回收租约过期的任务：重新排队的任务进度清零，各文件状态恢复为 pending（无该文件时为空）、
+行数清空，不残留上一次处理的状态；达到最大重试次数的任务置为失败（无需 MySQL，使用 SQLite 内存库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入日志工具，测试时只输出结果。
+import logging
+# 导入时间工具，用于构造过期租约。
+from datetime import datetime, timedelta
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 SQLAlchemy 建库工具。
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# 注册 SQLite 下 BIGINT 主键自增的建表规则。
+import test_query_count  # noqa: F401
+
+# 导入配置，用于读取最大重试次数。
+from app.core.config import get_settings
+# 导入任务队列与表模型。
+from app.services.etl_queue import EtlQueue
+from app.models.tables import Base, UploadTask
+
+
+def test_etl_queue():
+    '''
+    功能概述：
+    两个租约过期的 processing 任务：一个已处理完 IFIR ROW、RA ROW 处理中，应重新排队并清除文件状态与行数；
+    另一个已达到最大重试次数，应置为失败并保留文件状态。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 建表 → 写入过期任务 → requeue_expired → 检查任务字段。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `EtlQueue.requeue_expired`
+
+    示例：
+    - 运行 `python Test/test_etl_queue.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    settings = get_settings()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = Session(bind=engine)
+    expired = datetime.now() - timedelta(minutes=1)
+    common = dict(
+        status="processing", progress=50, lease_owner="worker-1", lease_expires_at=expired,
+        ifir_row_file="/tmp/ifir_row.csv", ifir_row_status="completed", ifir_row_rows=1200,
+        ra_row_file="/tmp/ra_row.csv", ra_row_status="processing", ra_row_rows=500,
+    )
+    db.add_all([
+        UploadTask(task_id="T-REQUEUE", attempts=1, **common),
+        UploadTask(task_id="T-EXHAUSTED", attempts=settings.ETL_MAX_ATTEMPTS, **common),
+    ])
+    db.commit()
+
+    requeued = EtlQueue(db).requeue_expired()
+    db.expire_all()
+    task = db.query(UploadTask).filter(UploadTask.task_id == "T-REQUEUE").one()
+    files = {ft: (getattr(task, f"{ft}_status"), getattr(task, f"{ft}_rows"))
+             for ft in ("ifir_row", "ra_row", "ifir_detail")}
+    print(f"重新排队 {requeued} 个: 状态 {task.status}, 进度 {task.progress}, 文件 {files}")
+    assert requeued == 1 and task.status == "queued" and task.progress == 0 and task.lease_owner is None
+    assert files == {"ifir_row": ("pending", None), "ra_row": ("pending", None), "ifir_detail": (None, None)}
+
+    exhausted = db.query(UploadTask).filter(UploadTask.task_id == "T-EXHAUSTED").one()
+    print(f"达到重试上限: 状态 {exhausted.status}, IFIR ROW {exhausted.ifir_row_status}")
+    assert exhausted.status == "failed" and exhausted.ifir_row_status == "completed"
+    db.close()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_etl_queue()
@@ -0,0 +1,152 @@
+"""
+校验鉴权用户信息缓存：并发请求只查询一次 users 表，管理员禁用 / 删除 / 修改角色后立即生效，
+其他节点修改用户后在缓存 TTL 内生效，修改密码接口在缓存命中时仍写入数据库（无需 MySQL，使用 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+# 导入并发请求工具。
+from concurrent.futures import ThreadPoolExecutor
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 HTTP 测试客户端。
+from fastapi.testclient import TestClient
+# 导入 SQLAlchemy 建库与事件工具。
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+# 导入缓存后端，测试中替换为短 TTL 的缓存。
+from app.core.cache import MemoryCacheBackend
+# 导入数据库依赖，测试中替换为样本库。
+from app.core.database import get_db
+# 导入鉴权模块与令牌工具。
+from app.core import security
+from app.core.security import create_access_token
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入表模型。
+from app.models.tables import Base, User
+# 导入用户服务与请求模型。
+from app.services.auth_service import AuthService
+from app.schemas.auth import UserCreate
+
+PASSWORD = "Passw0rdA"
+
+
+def test_principal_cache():
+    '''
+    功能概述：
+    断言同一用户的 10 个并发请求只查询一次 users 表，管理员禁用、恢复与修改角色后下一次请求立即生效，
+    绕过接口直接修改数据库（模拟其他节点）时在 TTL 到期后生效，修改密码后可用新密码登录。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 建库与用户 → 统计 users 查询 → 并发请求 → 管理员操作 → 直接改库等待 TTL → 修改密码。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `TestClient`、`AuthService`
+
+    示例：
+    - 运行 `python Test/test_principal_cache.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    original_cache = security._principal_cache
+    security._principal_cache = MemoryCacheBackend(max_entries=16, ttl_seconds=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'auth.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        with Session(bind=engine) as db:
+            service = AuthService(db)
+            admin = service.create_user(UserCreate(username="admin", display_name="管理员", password=PASSWORD, role="admin"))
+            viewer = service.create_user(UserCreate(username="viewer", display_name="查看者", password=PASSWORD))
+            viewer_id = viewer.id
+            admin_headers = {"Authorization": f"Bearer {create_access_token({'sub': admin.username})}"}
+            viewer_headers = {"Authorization": f"Bearer {create_access_token({'sub': viewer.username})}"}
+
+        # 统计查询 users 表的 SQL 条数。
+        lookups = []
+
+        def on_execute(_conn, _cursor, statement, *_args):
+            if "FROM users" in statement:
+                lookups.append(statement)
+
+        def override_get_db():
+            db = Session(bind=engine)
+            try:
+                yield db
+            finally:
+                db.close()
+
+        event.listen(engine, "before_cursor_execute", on_execute)
+        app.dependency_overrides[get_db] = override_get_db
+        client = TestClient(app)
+        try:
+            # 同一用户 10 个并发请求：只查询一次。
+            with ThreadPoolExecutor(10) as pool:
+                responses = list(pool.map(lambda _: client.get("/api/auth/me", headers=viewer_headers), range(10)))
+            assert all(r.status_code == 200 and r.json()["data"]["username"] == "viewer" for r in responses)
+            print(f"10 个并发请求 → users 查询 {len(lookups)} 次，缓存统计 {security._principal_cache.stats()}")
+            assert len(lookups) == 1
+
+            # 管理员禁用：下一次请求立即拒绝；恢复后立即可用。
+            assert client.put(f"/api/admin/users/{viewer_id}", json={"is_active": False},
+                              headers=admin_headers).json()["code"] == 0
+            assert client.get("/api/auth/me", headers=viewer_headers).status_code == 401
+            client.put(f"/api/admin/users/{viewer_id}", json={"is_active": True, "role": "uploader"},
+                       headers=admin_headers)
+            me = client.get("/api/auth/me", headers=viewer_headers)
+            assert me.status_code == 200 and me.json()["data"]["role"] == "uploader"
+
+            # 管理员删除（停用）：立即拒绝。
+            assert client.delete(f"/api/admin/users/{viewer_id}", headers=admin_headers).json()["code"] == 0
+            assert client.get("/api/auth/me", headers=viewer_headers).status_code == 401
+            client.put(f"/api/admin/users/{viewer_id}", json={"is_active": True}, headers=admin_headers)
+            assert client.get("/api/auth/me", headers=viewer_headers).status_code == 200
+
+            # 其他节点直接改库（本进程未失效缓存）：TTL 内仍命中缓存，到期后拒绝。
+            with Session(bind=engine) as db:
+                db.query(User).filter(User.id == viewer_id).update({"is_active": False})
+                db.commit()
+            assert client.get("/api/auth/me", headers=viewer_headers).status_code == 200
+            time.sleep(1.1)
+            assert client.get("/api/auth/me", headers=viewer_headers).status_code == 401
+            print("直接改库后在 TTL 到期后拒绝")
+            client.put(f"/api/admin/users/{viewer_id}", json={"is_active": True}, headers=admin_headers)
+
+            # 修改密码：当前用户来自缓存时仍写入数据库，新密码可登录。
+            client.get("/api/auth/me", headers=viewer_headers)
+            changed = client.put("/api/auth/me/password", headers=viewer_headers,
+                                 json={"old_password": PASSWORD, "new_password": "NewPassw0rd"})
+            assert changed.json()["code"] == 0, changed.json()
+            login = client.post("/api/auth/login", json={"username": "viewer", "password": "NewPassw0rd"})
+            assert login.json()["code"] == 0, login.json()
+            print("修改密码后新密码登录成功")
+        finally:
+            event.remove(engine, "before_cursor_execute", on_execute)
+            app.dependency_overrides.clear()
+            security._principal_cache = original_cache
+            engine.dispose()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_principal_cache()
@@ -0,0 +1,262 @@
+"""
+校验 IFIR / RA 的 ODM、Segment、Model 分析接口执行的 SQL 条数与所选实体数量无关（无需 MySQL，使用内存 SQLite）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入随机数工具，用于构造样本数据。
+import random
+# 导入日期类型。
+from datetime import date
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 SQLAlchemy 引擎、事件与类型工具。
+from sqlalchemy import BigInteger, create_engine, event
+# 导入 SQL 方言编译扩展。
+from sqlalchemy.ext.compiler import compiles
+# 导入会话类。
+from sqlalchemy.orm import Session
+
+# 导入配置，用于切换预聚合开关。
+from app.core.config import get_settings
+# 导入 ORM 基类。
+from app.core.database import Base
+# 导入用到的表模型。
+from app.models.tables import FactIfirDetail, FactIfirRow, FactRaDetail, FactRaRow, MapOdmToPlant
+# 导入预聚合维护服务，用于初始化聚合表。
+from app.services.aggregate_service import AggregateService
+# 导入 IFIR 分析服务。
+from app.services.ifir_service import IfirService
+# 导入 RA 分析服务。
+from app.services.ra_service import RaService
+# 导入 IFIR 请求模型。
+from app.schemas import ifir as ifir_schemas
+# 导入 RA 请求模型。
+from app.schemas import ra as ra_schemas
+# 导入时间范围模型。
+from app.schemas.common import TimeRange
+
+# 样本中的 ODM / Segment / Model 取值。
+ODMS = ["A", "B", "C", "D", "E"]
+SEGMENTS = ["Consumer", "Commercial", "SMB", "Gaming"]
+MODELS = [f"M{i}" for i in range(1, 9)]
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 仅对 INTEGER 主键自增，聚合表的 BIGINT 主键按 INTEGER 建表。
+    return "INTEGER"
+
+
+def build_session(url: str = "sqlite://") -> Session:
+    '''
+    功能概述：
+    创建内存 SQLite 数据库，建表并写入 IFIR / RA 的 ROW、DETAIL 与 ODM 映射样本数据。
+
+    输入参数：
+    - url：数据库地址，默认内存库；多线程访问时传入文件库地址。
+
+    返回值：
+    - 绑定该库的 `Session`。
+
+    关键流程：
+    - 建表 → 随机生成 ROW / DETAIL 记录 → 写入部分 ODM 的 plant 映射 → 全量构建预聚合表。
+
+    异常/边界：
+    - 刻意让 ODM `E` 没有映射，覆盖哨兵值分支。
+
+    依赖：
+    - `sqlalchemy`、`AggregateService`
+
+    示例：
+    - `db = build_session()`
+    '''
+    # 创建数据库并建表（允许跨线程使用连接）。
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    db = Session(bind=engine)
+    # 固定随机种子。
+    rnd = random.Random(2024)
+    # 逐条生成 ROW 与 DETAIL 记录。
+    for i in range(3000):
+        month = date(2024, rnd.randint(1, 12), 1)
+        dims = {
+            "segment": rnd.choice(SEGMENTS),
+            "model": rnd.choice(MODELS),
+            "plant": rnd.choice(["P1", "P2", "P3", "P4"]),
+        }
+        supplier = rnd.choice(ODMS)
+        db.add(FactIfirRow(id=i + 1, content_hash=f"i{i}", delivery_month=month, supplier_new=supplier,
+                           box_claim=rnd.randint(0, 20), box_mm=rnd.randint(1, 500), **dims))
+        db.add(FactRaRow(id=i + 1, content_hash=f"r{i}", claim_month=month, supplier_new=supplier,
+                         ra_claim=rnd.randint(0, 20), ra_mm=rnd.randint(1, 500), **dims))
+        detail = {"claim_nbr": f"C{i}", "segment2": rnd.choice(SEGMENTS),
+                  "fault_category": rnd.choice(["LCD", "Keyboard", "Battery"]), **dims}
+        db.add(FactIfirDetail(delivery_month=month, **detail))
+        db.add(FactRaDetail(claim_month=month, **detail))
+    # 写入 ODM -> plant 映射（E 无映射）。
+    for kpi_type in ("IFIR", "RA"):
+        for odm, plant in [("A", "P1"), ("B", "P2"), ("C", "P3"), ("D", "P4"), ("D", "P1")]:
+            db.add(MapOdmToPlant(kpi_type=kpi_type, supplier_new=odm, plant=plant))
+    db.commit()
+    # 构建预聚合表，供开启 KPI_AGGREGATES_ENABLED 时使用。
+    AggregateService(db).rebuild_all()
+    return db
+
+
+def count_queries(db: Session, action) -> int:
+    '''
+    功能概述：
+    统计执行 `action` 期间发送到数据库的 SQL 条数。
+
+    输入参数：
+    - db：数据库会话。
+    - action：无参可调用对象。
+
+    返回值：
+    - SQL 条数。
+
+    关键流程：
+    - 在引擎上注册 `before_cursor_execute` 监听器计数，执行完成后移除。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `sqlalchemy.event`
+
+    示例：
+    - `count_queries(db, lambda: service.analyze_odm(request))`
+    '''
+    # 计数器。
+    counter = {"n": 0}
+
+    def _on_execute(*_args, **_kwargs):
+        # 每执行一条 SQL 计数一次。
+        counter["n"] += 1
+
+    # 注册监听并执行。
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+    return counter["n"]
+
+
+def build_cases(db: Session):
+    '''
+    功能概述：
+    构造各分析接口在"单个实体"与"全部实体"两种选择下的调用。
+
+    输入参数：
+    - db：数据库会话。
+
+    返回值：
+    - [(名称, 单实体调用, 多实体调用)] 列表。
+
+    关键流程：
+    - 每个接口额外带上一组筛选条件，覆盖 ODM 过滤 / Segment 过滤分支。
+
+    异常/边界：
+    - 服务在调用时才创建，确保读取到当前的预聚合开关。
+
+    依赖：
+    - `IfirService`、`RaService`
+
+    示例：
+    - `for name, single, multi in build_cases(db): ...`
+    '''
+    # 统一的时间范围。
+    tr = TimeRange(start_month="2024-02", end_month="2024-11")
+    i, r = ifir_schemas, ra_schemas
+
+    def ifir_odm(odms):
+        return lambda: IfirService(db).analyze_odm(i.IfirOdmAnalyzeRequest(
+            time_range=tr, filters=i.IfirOdmFilters(odms=odms, segments=["Consumer", "SMB"])))
+
+    def ra_odm(odms):
+        return lambda: RaService(db).analyze_odm(r.RaOdmAnalyzeRequest(
+            time_range=tr, filters=r.RaOdmFilters(odms=odms, segments=["Consumer", "SMB"])))
+
+    def ifir_segment(segments):
+        return lambda: IfirService(db).analyze_segment(i.IfirSegmentAnalyzeRequest(
+            time_range=tr, filters=i.IfirSegmentFilters(segments=segments, odms=["A", "E"])))
+
+    def ra_segment(segments):
+        return lambda: RaService(db).analyze_segment(r.RaSegmentAnalyzeRequest(
+            time_range=tr, filters=r.RaSegmentFilters(segments=segments, odms=["A", "E"])))
+
+    def ifir_model(models):
+        return lambda: IfirService(db).analyze_model(i.IfirModelAnalyzeRequest(
+            time_range=tr, filters=i.IfirModelFilters(models=models, odms=["B", "D"])))
+
+    def ra_model(models):
+        return lambda: RaService(db).analyze_model(r.RaModelAnalyzeRequest(
+            time_range=tr, filters=r.RaModelFilters(models=models, odms=["B", "D"])))
+
+    return [
+        ("IFIR analyze_odm", ifir_odm(ODMS[:2]), ifir_odm(ODMS)),
+        ("RA analyze_odm", ra_odm(ODMS[:2]), ra_odm(ODMS)),
+        ("IFIR analyze_segment", ifir_segment(SEGMENTS[:2]), ifir_segment(SEGMENTS)),
+        ("RA analyze_segment", ra_segment(SEGMENTS[:2]), ra_segment(SEGMENTS)),
+        ("IFIR analyze_model", ifir_model(MODELS[:2]), ifir_model(MODELS)),
+        ("RA analyze_model", ra_model(MODELS[:2]), ra_model(MODELS)),
+    ]
+
+
+def test_query_count_constant():
+    '''
+    功能概述：
+    断言分析接口的 SQL 条数在选择 2 个实体与全部实体时相同，且不超过固定上限。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 分别在关闭 / 开启预聚合时，对每个接口统计两种选择下的 SQL 条数并比较。
+
+    异常/边界：
+    - 条数随实体数量变化或超过上限时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`count_queries`、`build_cases`
+
+    示例：
+    - 运行 `python Test/test_query_count.py`
+    '''
+    # 准备样本库。
+    db = build_session()
+    settings = get_settings()
+    original = settings.KPI_AGGREGATES_ENABLED
+    original_cache = settings.KPI_CACHE_ENABLED
+    # 关闭结果缓存，统计的是实际执行的查询。
+    settings.KPI_CACHE_ENABLED = False
+    try:
+        for aggregates in (False, True):
+            # 切换数据源（明细表 / 预聚合表）。
+            settings.KPI_AGGREGATES_ENABLED = aggregates
+            for name, single, multi in build_cases(db):
+                few = count_queries(db, single)
+                many = count_queries(db, multi)
+                print(f"aggregates={aggregates!s:<5} {name:<22} 2 个实体: {few} 条 SQL, 全部实体: {many} 条 SQL")
+                # 查询条数必须与实体数量无关。
+                assert few == many, f"{name}: SQL 条数随实体数量变化 ({few} -> {many})"
+                # 每个接口只允许固定的少量分组查询。
+                assert many <= 6, f"{name}: SQL 条数过多 ({many})"
+    finally:
+        settings.KPI_AGGREGATES_ENABLED = original
+        settings.KPI_CACHE_ENABLED = original_cache
+        db.close()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_query_count_constant()
@@ -0,0 +1,187 @@
+"""
+校验只读副本路由：读会话在可用副本间轮询，副本不可用时跳过并在重试间隔后恢复，副本尚未复制最新上传任务时回退主库，
+分析与筛选项接口的查询落在副本上（无需 MySQL，主库与副本均为 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入文件复制工具，用于从主库复制出副本。
+import shutil
+# 导入临时目录工具。
+import tempfile
+# 导入计时工具。
+import time
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+# 导入日期类型，用于构造上传任务完成时间。
+from datetime import datetime
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 HTTP 测试客户端。
+from fastapi.testclient import TestClient
+# 导入 SQLAlchemy 建库与事件工具。
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# 复用查询条数校验脚本中的样本库。
+from test_query_count import build_session
+
+# 导入配置，用于关闭结果缓存（每次请求都实际查询）。
+from app.core.config import get_settings
+# 导入鉴权依赖，测试中替换为匿名用户。
+from app.core.security import get_current_user
+# 导入只读副本路由。
+from app.core import read_routing
+from app.core.read_routing import ReadRouter, Replica
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入上传任务模型，用于模拟 ETL 完成。
+from app.models.tables import UploadTask
+
+ANALYZE_BODY = {
+    "time_range": {"start_month": "2024-01", "end_month": "2024-12"},
+    "filters": {"models": ["M1", "M2"]},
+}
+
+
+def factories(url: str) -> dict:
+    '''
+    功能概述：
+    为一个 SQLite 文件库创建 interactive / report 两个用途的会话工厂（共用一个引擎）。
+
+    输入参数：
+    - url：数据库地址。
+
+    返回值：
+    - {用途: sessionmaker}。
+
+    关键流程：
+    - create_engine → sessionmaker。
+
+    异常/边界：
+    - 无（连接在首次查询时才建立）。
+
+    依赖：
+    - `sqlalchemy`
+
+    示例：
+    - `factories("sqlite:////tmp/a.db")`
+    '''
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    factory = sessionmaker(bind=engine)
+    return {"interactive": factory, "report": factory}
+
+
+def complete_task(factory, task_id: str, completed_at: datetime):
+    # 在指定库中写入一个已完成的上传任务（模拟 ETL 完成或复制到副本）。
+    db = factory()
+    try:
+        db.add(UploadTask(task_id=task_id, status="completed", completed_at=completed_at))
+        db.commit()
+    finally:
+        db.close()
+
+
+def picked(router: ReadRouter, count: int) -> list:
+    # 连续选择 count 次，返回选中的副本名称（回退主库记为 primary）。
+    return [(r.name if r else "primary") for r in (router.pick() for _ in range(count))]
+
+
+def test_read_replicas():
+    '''
+    功能概述：
+    断言两个副本轮询分发，不可用副本被跳过且在重试间隔后重新检查，主库完成新的上传任务后尚未复制的副本不再使用，
+    复制完成后恢复，全部副本不可用时回退主库，HTTP 分析与筛选项接口的查询只落在副本上。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 构建主库并复制出两个副本 → 轮询 → 故障 → 延迟 → HTTP 查询计数。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`ReadRouter`、`TestClient`
+
+    示例：
+    - 运行 `python Test/test_read_replicas.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original_cache = settings.KPI_CACHE_ENABLED
+    settings.KPI_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp:
+        primary_path = os.path.join(tmp, "primary.db")
+        build_session(f"sqlite:///{primary_path}").get_bind().dispose()
+        for name in ("replica1", "replica2"):
+            shutil.copy(primary_path, os.path.join(tmp, f"{name}.db"))
+        primary = factories(f"sqlite:///{primary_path}")
+        replica1 = Replica("replica1", factories(f"sqlite:///{os.path.join(tmp, 'replica1.db')}"))
+        replica2 = Replica("replica2", factories(f"sqlite:///{os.path.join(tmp, 'replica2.db')}"))
+        router = ReadRouter(primary, [replica1, replica2], check_seconds=0, retry_seconds=0.5)
+        try:
+            # 轮询：两个副本交替使用。
+            order = picked(router, 4)
+            print(f"轮询: {order}")
+            assert order == ["replica1", "replica2", "replica1", "replica2"]
+
+            # 故障：副本 2 不可用时只用副本 1，重试间隔后恢复。
+            healthy = replica2.sessions
+            replica2.sessions = factories(f"sqlite:///{os.path.join(tmp, 'missing', 'replica2.db')}")
+            order = picked(router, 4)
+            print(f"副本 2 故障: {order}，状态 {router.stats()}")
+            assert order == ["replica1"] * 4 and replica2.reason == "down"
+            replica2.sessions = healthy
+            time.sleep(0.6)
+            assert set(picked(router, 2)) == {"replica1", "replica2"}
+
+            # 延迟：主库完成新的上传任务，副本尚未复制 → 回退主库；副本 1 复制后恢复使用副本 1。
+            complete_task(primary["interactive"], "T-NEW", datetime(2025, 1, 2, 8, 0, 0))
+            order = picked(router, 2)
+            print(f"副本均未复制最新任务: {order}，回退主库 {router.fallbacks} 次")
+            assert order == ["primary", "primary"] and replica1.reason == "lagging"
+            complete_task(replica1.sessions["interactive"], "T-NEW", datetime(2025, 1, 2, 8, 0, 0))
+            order = picked(router, 4)
+            print(f"副本 1 已复制: {order}")
+            assert order == ["replica1"] * 4
+
+            # HTTP：分析与筛选项接口的查询落在副本 1，不落在主库。
+            statements = {"primary": 0, "replica1": 0}
+
+            def counter(name):
+                def on_execute(*_args):
+                    statements[name] += 1
+                return on_execute
+
+            primary_engine = primary["interactive"].kw["bind"]
+            replica_engine = replica1.sessions["interactive"].kw["bind"]
+            read_routing._router = router
+            app.dependency_overrides[get_current_user] = lambda: None
+            client = TestClient(app)
+            router.check_seconds = 60  # 检查结果已是最新，请求期间不再检查
+            event.listen(primary_engine, "before_cursor_execute", counter("primary"))
+            event.listen(replica_engine, "before_cursor_execute", counter("replica1"))
+            assert client.get("/api/ifir/options?segments=Consumer").json()["code"] == 0
+            assert client.post("/api/ifir/model-analysis/analyze", json=ANALYZE_BODY).json()["code"] == 0
+            assert client.post("/api/ra/model-analysis/analyze", json=ANALYZE_BODY).json()["code"] == 0
+            print(f"HTTP 查询条数: {statements}")
+            assert statements["primary"] == 0 and statements["replica1"] > 0
+        finally:
+            settings.KPI_CACHE_ENABLED = original_cache
+            read_routing._router = None
+            app.dependency_overrides.clear()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_read_replicas()
@@ -0,0 +1,220 @@
+"""
+校验报告明细的导出方式：sheet 截断提示、multi_sheet 按行数上限续写到多个 Sheet、csv_zip 打包汇总 Excel 与明细 CSV，
+以及 HTTP 同步下载 zip 时的 Content-Type（无需 MySQL，使用 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入 CSV 与文本流工具，读取压缩包内的明细 CSV。
+import csv
+import io
+# 导入压缩包读取工具。
+import zipfile
+# 导入临时目录工具。
+import tempfile
+# 导入日志与告警工具，测试时只输出结果。
+import logging
+import warnings
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 HTTP 测试客户端。
+from fastapi.testclient import TestClient
+# 导入 Excel 读取工具，校验导出的报告。
+from openpyxl import load_workbook
+# 导入会话类型。
+from sqlalchemy.orm import Session
+
+# 复用查询条数校验脚本中的样本库。
+from test_query_count import build_session
+
+# 导入配置，用于关闭结果缓存并调整明细行数上限。
+from app.core.config import get_settings
+# 导入数据库依赖与鉴权依赖，测试中替换为样本库与匿名用户。
+from app.core.database import get_db
+from app.core.read_routing import get_read_db, get_report_read_db
+from app.core.security import get_current_user
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入报告构建器，测试中调小单个 Sheet 的行数上限。
+from app.services.report_excel import ReportExcelBuilder, DETAIL_SHEET_TITLE
+# 导入 IFIR 分析服务。
+from app.services.ifir_service import IfirService
+# 导入 IFIR 指标定义（报告明细列）。
+from app.services.kpi_engine import IFIR_METRIC
+# 导入 IFIR 请求模型。
+from app.schemas import ifir as ifir_schemas
+
+REPORT_BODY = {
+    "time_range": {"start_month": "2024-01", "end_month": "2024-12"},
+    "filters": {"models": ["M1", "M2"]},
+}
+
+
+def detail_sheets(path: str) -> dict:
+    '''
+    功能概述：
+    读取报告中所有明细 Sheet 的数据行（不含表头）。
+
+    输入参数：
+    - path：报告文件路径。
+
+    返回值：
+    - {Sheet 名称: 数据行列表}。
+
+    关键流程：
+    - 只读模式打开 → 筛选明细 Sheet → 跳过表头读取取值。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `openpyxl`
+
+    示例：
+    - `detail_sheets("/tmp/report.xlsx")`
+    '''
+    wb = load_workbook(path, read_only=True)
+    sheets = {
+        ws.title: [list(r) for r in ws.iter_rows(min_row=2, values_only=True)]
+        for ws in wb.worksheets if ws.title.startswith(DETAIL_SHEET_TITLE)
+    }
+    wb.close()
+    return sheets
+
+
+def test_report_export():
+    '''
+    功能概述：
+    断言 sheet 方式按 REPORT_DETAIL_MAX_ROWS 截断并提示改用大数据量导出，multi_sheet 方式导出全部明细并在
+    单个 Sheet 行数上限处续写，csv_zip 方式导出全部明细到压缩包内的 CSV，HTTP 同步下载 zip 时返回 application/zip。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 构建 SQLite 文件库 → 统计明细总行数 → 三种方式分别生成报告并校验 → HTTP 下载。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`IfirService`、`TestClient`
+
+    示例：
+    - 运行 `python Test/test_report_export.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original = (settings.KPI_CACHE_ENABLED, settings.REPORT_DETAIL_MAX_ROWS, settings.REPORT_DETAIL_EXPORT_MAX_ROWS)
+    original_sheet_rows = ReportExcelBuilder.SHEET_MAX_ROWS
+    settings.KPI_CACHE_ENABLED = False
+    paths = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build_session(f"sqlite:///{os.path.join(tmp, 'export.db')}")
+        service = IfirService(db)
+        try:
+            request = ifir_schemas.IfirModelReportRequest.model_validate(REPORT_BODY)
+            start = service.engine.parse_month(request.time_range.start_month)
+            end = service.engine.parse_month(request.time_range.end_month)
+            total = service.engine.get_report_detail(start, end, models=request.filters.models, max_rows=0)
+            expected = list(total)
+            print(f"明细总行数 {len(expected):,}")
+            assert len(expected) > 300 and not total.truncated
+
+            # sheet：按 REPORT_DETAIL_MAX_ROWS 截断，末尾提示改用大数据量导出方式。
+            settings.REPORT_DETAIL_MAX_ROWS = 100
+            path, filename = service.generate_model_report(request)
+            paths.append(path)
+            sheets = detail_sheets(path)
+            rows = sheets[DETAIL_SHEET_TITLE]
+            print(f"sheet → {filename}，明细 Sheet {list(sheets)}，末行: {rows[-1][0]}")
+            assert list(sheets) == [DETAIL_SHEET_TITLE] and filename.endswith(".xlsx")
+            # 明细按月份倒序，同月份内行顺序不固定，按集合比较。
+            assert len(rows) == 100 + 2 and "多 Sheet" in rows[-1][0]
+            assert {tuple(r) for r in rows[:100]} <= {tuple(r) for r in expected}
+
+            # multi_sheet：不受 REPORT_DETAIL_MAX_ROWS 限制，超过单个 Sheet 行数上限时续写。
+            ReportExcelBuilder.SHEET_MAX_ROWS = 150
+            multi = request.model_copy(update={"detail_export": "multi_sheet"})
+            path, filename = service.generate_model_report(multi)
+            paths.append(path)
+            sheets = detail_sheets(path)
+            print(f"multi_sheet → {filename}，明细 Sheet {[(k, len(v)) for k, v in sheets.items()]}")
+            assert list(sheets)[:2] == [DETAIL_SHEET_TITLE, f"{DETAIL_SHEET_TITLE}_2"]
+            assert all(len(v) <= 150 for v in sheets.values())
+            assert sorted(map(tuple, (row for v in sheets.values() for row in v)), key=str) == sorted(expected, key=str)
+
+            # multi_sheet 的行数上限 REPORT_DETAIL_EXPORT_MAX_ROWS：达到上限时截断并提示。
+            settings.REPORT_DETAIL_EXPORT_MAX_ROWS = 200
+            path, _ = service.generate_model_report(multi)
+            paths.append(path)
+            sheets = detail_sheets(path)
+            last = list(sheets.values())[-1]
+            assert sum(len(v) for v in sheets.values()) == 200 + 2 and "上限" in last[-1][0]
+            settings.REPORT_DETAIL_EXPORT_MAX_ROWS = 0
+
+            # csv_zip：压缩包内为汇总 Excel 与全部明细 CSV。
+            bundle = request.model_copy(update={"detail_export": "csv_zip"})
+            path, filename = service.generate_model_report(bundle)
+            paths.append(path)
+            with zipfile.ZipFile(path) as zf:
+                names = zf.namelist()
+                workbook_name = next(n for n in names if n.endswith(".xlsx"))
+                csv_name = next(n for n in names if n.endswith("_Detail.csv"))
+                xlsx_path = os.path.join(tmp, "bundle.xlsx")
+                with open(xlsx_path, "wb") as f:
+                    f.write(zf.read(workbook_name))
+                with zf.open(csv_name) as raw:
+                    reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+                    header = next(reader)
+                    csv_rows = list(reader)
+            print(f"csv_zip → {filename}，压缩包 {names}，CSV {len(csv_rows):,} 行")
+            assert filename.endswith(".zip") and len(names) == 2
+            assert header == [display for display, _ in IFIR_METRIC.detail_columns]
+            assert len(csv_rows) == len(expected)
+            assert sorted(map(tuple, csv_rows)) == sorted(tuple("" if v is None else str(v) for v in r) for r in expected)
+            wb = load_workbook(xlsx_path, read_only=True)
+            assert DETAIL_SHEET_TITLE in wb.sheetnames
+            wb.close()
+
+            # HTTP 同步下载：csv_zip 返回 application/zip，默认方式仍为 Excel。
+            def override_get_db():
+                session = Session(bind=db.get_bind())
+                try:
+                    yield session
+                finally:
+                    session.close()
+
+            app.dependency_overrides[get_db] = override_get_db
+            app.dependency_overrides[get_read_db] = override_get_db
+            app.dependency_overrides[get_report_read_db] = override_get_db
+            app.dependency_overrides[get_current_user] = lambda: None
+            client = TestClient(app)
+            zipped = client.post("/api/ifir/report/model", json={**REPORT_BODY, "detail_export": "csv_zip"})
+            assert zipped.status_code == 200 and zipped.headers["content-type"] == "application/zip"
+            assert zipfile.is_zipfile(io.BytesIO(zipped.content))
+            excel = client.post("/api/ifir/report/model", json=REPORT_BODY)
+            assert excel.headers["content-type"].startswith("application/vnd.openxmlformats")
+            invalid = client.post("/api/ifir/report/model", json={**REPORT_BODY, "detail_export": "pdf"})
+            assert invalid.status_code == 422
+            print(f"HTTP 下载 zip {len(zipped.content)} 字节")
+        finally:
+            settings.KPI_CACHE_ENABLED, settings.REPORT_DETAIL_MAX_ROWS, settings.REPORT_DETAIL_EXPORT_MAX_ROWS = original
+            ReportExcelBuilder.SHEET_MAX_ROWS = original_sheet_rows
+            app.dependency_overrides.clear()
+            for path in paths:
+                os.unlink(path)
+            db.get_bind().dispose()
+            db.close()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_report_export()
@@ -0,0 +1,252 @@
+"""
+校验报告任务：相同请求并发提交只生成一次，轮询进度后下载，失败与过期清理，以及 HTTP 接口的提交 / 查询 / 下载（无需 MySQL，使用 SQLite 文件库）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入临时目录工具。
+import tempfile
+# 导入线程与计时工具。
+import threading
+import time
+# 导入日志与告警工具，测试时只输出结果（失败任务的错误日志为预期输出）。
+import logging
+import warnings
+# 导入并发提交工具。
+from concurrent.futures import ThreadPoolExecutor
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入 HTTP 测试客户端。
+from fastapi.testclient import TestClient
+# 导入 Excel 读取工具，校验下载的报告。
+from openpyxl import load_workbook
+# 导入会话工厂。
+from sqlalchemy.orm import Session, sessionmaker
+
+# 复用查询条数校验脚本中的样本库。
+from test_query_count import build_session
+
+# 导入配置，用于关闭结果缓存（去重只由报告任务完成）。
+from app.core.config import get_settings
+# 导入数据库依赖与鉴权依赖，测试中替换为样本库与匿名用户。
+from app.core.database import get_db
+from app.core.read_routing import get_read_db
+from app.core.security import get_current_user
+# 导入 FastAPI 应用。
+from app.main import app
+# 导入报告任务模块。
+from app.services import report_jobs
+from app.services.report_jobs import ReportJobManager, ReportJobQueueFull
+# 导入 KPI 计算引擎，用于统计报告实际生成次数。
+from app.services.kpi_engine import KpiEngine
+# 导入 IFIR 请求模型。
+from app.schemas import ifir as ifir_schemas
+
+REPORT_BODY = {
+    "time_range": {"start_month": "2024-01", "end_month": "2024-12"},
+    "filters": {"models": ["M1", "M2"]},
+}
+
+
+def wait_job(manager, job_id, timeout=120):
+    '''
+    功能概述：
+    轮询任务状态直到完成或失败，记录观察到的进度。
+
+    输入参数：
+    - manager：`ReportJobManager`。
+    - job_id：任务 ID。
+    - timeout：最长等待时间（秒）。
+
+    返回值：
+    - (最终任务状态, 观察到的进度列表)。
+
+    关键流程：
+    - 每 20ms 查询一次状态。
+
+    异常/边界：
+    - 超时抛出 AssertionError。
+
+    依赖：
+    - 无。
+
+    示例：
+    - `job, progress = wait_job(manager, job_id)`
+    '''
+    deadline = time.monotonic() + timeout
+    seen = []
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["progress"] not in seen:
+            seen.append(job["progress"])
+        if job["status"] in ("completed", "failed"):
+            return job, seen
+        time.sleep(0.02)
+    raise AssertionError(f"任务超时未完成: {job_id}")
+
+
+def test_report_jobs():
+    '''
+    功能概述：
+    断言相同请求并发提交只生成一次报告、进度单调递增到 100、完成后重复提交直接复用，
+    失败任务可重新提交，排队已满时拒绝提交，过期任务被清理，HTTP 接口可提交、查询与下载。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 构建 SQLite 文件库 → 并发提交 → 轮询 → 校验报告文件 → 失败 / 排队上限 / 过期 → HTTP 接口。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`ReportJobManager`、`TestClient`
+
+    示例：
+    - 运行 `python Test/test_report_jobs.py`
+    '''
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    settings = get_settings()
+    original_cache = settings.KPI_CACHE_ENABLED
+    settings.KPI_CACHE_ENABLED = False
+
+    # 统计 Model 报告实际生成次数，并放慢生成，让并发提交落在同一任务执行期间。
+    builds = []
+    original_build = KpiEngine._build_report
+
+    def counting_build(self, kind, request, analyze_request, progress=None):
+        if kind == "model":
+            builds.append(threading.get_ident())
+            time.sleep(0.3)
+        return original_build(self, kind, request, analyze_request, progress)
+
+    KpiEngine._build_report = counting_build
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_session(f"sqlite:///{os.path.join(tmp, 'jobs.db')}").get_bind()
+        factory = sessionmaker(bind=engine)
+        manager = ReportJobManager(os.path.join(tmp, "jobs"), workers=2, max_pending=20,
+                                   ttl_seconds=3600, timeout_seconds=1800, session_factory=factory)
+        request = ifir_schemas.IfirModelReportRequest.model_validate(REPORT_BODY)
+        try:
+            # 相同请求并发提交 8 次：同一个任务，只生成一次。
+            def submit(req):
+                return submit_to(manager, factory, req)
+
+            with ThreadPoolExecutor(8) as pool:
+                jobs = list(pool.map(submit, [request] * 8))
+            job_ids = {job["job_id"] for job in jobs}
+            assert len(job_ids) == 1, f"相同请求生成了 {len(job_ids)} 个任务"
+            job_id = job_ids.pop()
+            job, seen = wait_job(manager, job_id)
+            print(f"并发提交 8 次 → 任务 {job_id}，生成 {len(builds)} 次，进度 {seen}")
+            assert job["status"] == "completed", job
+            assert len(builds) == 1
+            assert seen == sorted(seen) and seen[-1] == 100
+
+            # 报告文件完整可读，下载文件名保留（任务目录中的文件扩展名为 .report，按文件对象读取）。
+            path = manager.artifact_path(job_id)
+            with open(path, "rb") as f:
+                workbook = load_workbook(f, read_only=True)
+                print(f"报告 {job['filename']}，{job['size_bytes']} 字节，工作表 {workbook.sheetnames}")
+                workbook.close()
+            assert job["size_bytes"] == path.stat().st_size and job["filename"].endswith(".xlsx")
+
+            # 完成后重复提交：直接返回已完成的任务；字段顺序不同的等价请求同样复用。
+            reordered = ifir_schemas.IfirModelReportRequest.model_validate(
+                {"filters": {"models": ["M1", "M2"]},
+                 "time_range": {"end_month": "2024-12", "start_month": "2024-01"}})
+            again = submit(reordered)
+            assert again["job_id"] == job_id and again["status"] == "completed" and len(builds) == 1
+
+            # 不同请求：新任务。
+            other = submit(ifir_schemas.IfirModelReportRequest.model_validate(
+                {**REPORT_BODY, "filters": {"models": ["M3"]}}))
+            assert other["job_id"] != job_id
+            assert wait_job(manager, other["job_id"])[0]["status"] == "completed"
+
+            # 生成失败：状态为 failed 并记录错误，再次提交重新执行。
+            bad = ifir_schemas.IfirModelReportRequest.model_validate(
+                {**REPORT_BODY, "time_range": {"start_month": "2024-13", "end_month": "2024-12"}})
+            failed, _ = wait_job(manager, submit(bad)["job_id"])
+            print(f"失败任务: {failed['error_message']}")
+            assert failed["status"] == "failed" and failed["error_message"]
+            builds_before = len(builds)
+            assert wait_job(manager, submit(bad)["job_id"])[0]["status"] == "failed"
+            assert len(builds) == builds_before + 1, "失败任务再次提交时未重新执行"
+
+            # 排队上限：执行中的任务达到上限后拒绝新的请求。
+            limited = ReportJobManager(os.path.join(tmp, "limited"), workers=1, max_pending=1,
+                                       ttl_seconds=3600, timeout_seconds=1800, session_factory=factory)
+            first = submit_to(limited, factory, request)
+            try:
+                submit_to(limited, factory, reordered.model_copy(update={"tgt": 500}))
+                raise AssertionError("排队已满时仍接受了新任务")
+            except ReportJobQueueFull as e:
+                print(f"排队已满: {e}")
+            wait_job(limited, first["job_id"])
+            limited.shutdown()
+
+            # 过期清理：TTL 为 0 时已完成任务的状态与报告文件被删除。
+            manager.ttl_seconds = 0
+            time.sleep(1.1)
+            removed = manager.sweep()
+            print(f"过期清理 {removed} 个任务")
+            assert removed >= 2 and manager.get(job_id) is None and not path.exists()
+            manager.ttl_seconds = 3600
+
+            # HTTP 接口：提交 → 轮询 → 下载。
+            def override_get_db():
+                db = Session(bind=engine)
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            app.dependency_overrides[get_db] = override_get_db
+            app.dependency_overrides[get_read_db] = override_get_db
+            app.dependency_overrides[get_current_user] = lambda: None
+            report_jobs._manager = manager
+            client = TestClient(app)
+            body = client.post("/api/ifir/report/model/jobs", json=REPORT_BODY).json()
+            assert body["code"] == 0, body
+            http_job = body["data"]["job_id"]
+            early = client.get(f"/api/report-jobs/{http_job}/download")
+            assert early.status_code in (200, 409), early.status_code
+            wait_job(manager, http_job)
+            status = client.get(f"/api/report-jobs/{http_job}").json()["data"]
+            assert status["status"] == "completed" and status["progress"] == 100
+            download = client.get(f"/api/report-jobs/{http_job}/download")
+            assert download.status_code == 200
+            assert download.content == manager.artifact_path(http_job).read_bytes()
+            assert "filename*=UTF-8''" in download.headers["content-disposition"]
+            assert client.get("/api/report-jobs/notfound").status_code == 404
+            print(f"HTTP 下载 {len(download.content)} 字节")
+        finally:
+            KpiEngine._build_report = original_build
+            settings.KPI_CACHE_ENABLED = original_cache
+            app.dependency_overrides.clear()
+            report_jobs._manager = None
+            manager.shutdown()
+            engine.dispose()
+    print("通过")
+
+
+def submit_to(manager, factory, request):
+    # 使用独立会话提交 IFIR Model 报告任务。
+    db = factory()
+    try:
+        return manager.submit(db, "ifir", "model", request)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_report_jobs()
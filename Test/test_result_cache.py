@@ -0,0 +1,122 @@
+"""
+校验 analyze 接口结果缓存：相同请求第二次命中缓存且不再执行分析查询，上传任务完成后自动失效（无需 MySQL，使用内存 SQLite）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入时间类型。
+from datetime import datetime
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 复用查询条数校验脚本中的样本库与 SQL 计数工具。
+from test_query_count import build_session, count_queries
+
+# 导入配置，用于开启缓存。
+from app.core.config import get_settings
+# 导入缓存单例。
+from app.core.cache import get_analysis_cache
+# 导入上传任务模型，用于模拟 ETL 完成。
+from app.models.tables import UploadTask
+# 导入 IFIR 分析服务。
+from app.services.ifir_service import IfirService
+# 导入 RA 分析服务。
+from app.services.ra_service import RaService
+# 导入 IFIR 请求模型。
+from app.schemas import ifir as ifir_schemas
+# 导入 RA 请求模型。
+from app.schemas import ra as ra_schemas
+# 导入时间范围模型。
+from app.schemas.common import TimeRange
+
+
+def test_result_cache():
+    '''
+    功能概述：
+    断言相同请求第二次只执行数据版本查询并返回相同结果，字段顺序不同的等价请求同样命中，
+    新的上传任务完成后缓存失效并重新计算。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 首次调用 → 再次调用（命中）→ 写入已完成的上传任务 → 再次调用（未命中）。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `build_session`、`count_queries`、`get_analysis_cache`
+
+    示例：
+    - 运行 `python Test/test_result_cache.py`
+    '''
+    # 准备样本库并开启缓存。
+    db = build_session()
+    settings = get_settings()
+    original = settings.KPI_CACHE_ENABLED
+    settings.KPI_CACHE_ENABLED = True
+    cache = get_analysis_cache()
+    cache.clear()
+    tr = TimeRange(start_month="2024-02", end_month="2024-11")
+    try:
+        ifir_request = ifir_schemas.IfirOdmAnalyzeRequest(
+            time_range=tr, filters=ifir_schemas.IfirOdmFilters(odms=["A", "B"], segments=["Consumer"]))
+        ra_request = ra_schemas.RaModelAnalyzeRequest(
+            time_range=tr, filters=ra_schemas.RaModelFilters(models=["M1", "M2"], odms=["B"]))
+        results = {}
+
+        def call(name, action):
+            results[name] = action()
+
+        # 首次调用：执行全部分析查询。
+        first = count_queries(db, lambda: call("ifir", lambda: IfirService(db).analyze_odm(ifir_request)))
+        count_queries(db, lambda: call("ra", lambda: RaService(db).analyze_model(ra_request)))
+        ifir_first, ra_first = results["ifir"], results["ra"]
+
+        # 第二次调用：仅查询数据版本。
+        second = count_queries(db, lambda: call("ifir", lambda: IfirService(db).analyze_odm(ifir_request)))
+        print(f"首次 {first} 条 SQL, 命中后 {second} 条 SQL")
+        assert second == 1, f"命中缓存后仍执行了 {second} 条 SQL"
+        assert results["ifir"] == ifir_first
+
+        # 字段顺序不同的等价请求命中同一条目。
+        reordered = ifir_schemas.IfirOdmAnalyzeRequest.model_validate(
+            {"filters": {"segments": ["Consumer"], "odms": ["A", "B"]},
+             "time_range": {"end_month": "2024-11", "start_month": "2024-02"}})
+        assert count_queries(db, lambda: IfirService(db).analyze_odm(reordered)) == 1
+
+        # IFIR 与 RA 的缓存互不影响。
+        assert count_queries(db, lambda: call("ra", lambda: RaService(db).analyze_model(ra_request))) == 1
+        assert results["ra"] == ra_first
+
+        # 模拟 ETL 完成：数据版本变化后重新计算。
+        db.add(UploadTask(task_id="cache-test", status="completed", completed_at=datetime(2030, 1, 1)))
+        db.commit()
+        third = count_queries(db, lambda: IfirService(db).analyze_odm(ifir_request))
+        print(f"上传任务完成后 {third} 条 SQL")
+        assert third == first, "数据版本变化后未重新计算"
+
+        # 同一秒内结束的第二个任务同样使数据版本变化。
+        db.add(UploadTask(task_id="cache-test-2", status="completed", completed_at=datetime(2030, 1, 1)))
+        db.commit()
+        fourth = count_queries(db, lambda: IfirService(db).analyze_odm(ifir_request))
+        print(f"同一秒内另一个任务完成后 {fourth} 条 SQL")
+        assert fourth == first, "同一秒内结束的任务未使数据版本变化"
+
+        stats = cache.stats()
+        print(f"缓存统计: {stats}")
+        assert stats["hits"] == 3 and stats["misses"] == 4
+    finally:
+        settings.KPI_CACHE_ENABLED = original
+        db.close()
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_result_cache()
@@ -0,0 +1,263 @@
+"""
+校验缓存后端：内存与 Redis（fakeredis）后端的读写、bytes 往返、并发相同请求只计算一次（含两个节点共用同一 Redis），
+以及 IFIR 分析结果与报告文件经 Redis 后端在节点间复用（无需 MySQL / Redis 服务）。
+"""
+# 导入系统模块，用于调整模块搜索路径。
+import sys
+# 导入文件路径处理所需的库。
+import os
+# 导入线程工具，用于模拟并发请求。
+import threading
+# 导入计时工具。
+import time
+
+# 将后端目录加入模块搜索路径，确保可以导入项目代码。
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入缓存后端与单例注入函数。
+from app.core.cache import MemoryCacheBackend, RedisCacheBackend, set_analysis_cache
+# 导入配置，用于开启缓存。
+from app.core.config import get_settings
+
+# 并发请求数。
+CONCURRENCY = 8
+
+
+def run_concurrently(backends, key, compute):
+    '''
+    功能概述：
+    多个线程轮流使用给定后端同时请求同一个键。
+
+    输入参数：
+    - backends：后端列表，第 i 个线程使用 backends[i % len(backends)]，模拟多个节点。
+    - key：缓存键。
+    - compute：未命中时的计算函数。
+
+    返回值：
+    - 各线程取得的结果列表。
+
+    关键流程：
+    - 用 Barrier 让所有线程同时发起请求。
+
+    异常/边界：
+    - 无。
+
+    依赖：
+    - `threading`
+
+    示例：
+    - `run_concurrently([backend], "k", compute)`
+    '''
+    barrier = threading.Barrier(CONCURRENCY)
+    results = [None] * CONCURRENCY
+
+    def worker(i):
+        barrier.wait()
+        results[i] = backends[i % len(backends)].get_or_compute(key, compute)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(CONCURRENCY)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def check_single_flight(name, backends):
+    '''
+    功能概述：
+    断言并发的相同请求只触发一次计算，其余请求取得同一结果。
+
+    输入参数：
+    - name：输出用名称。
+    - backends：参与的后端（同一进程内的一个后端，或共用同一 Redis 的多个节点）。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 计算函数休眠一段时间放大并发窗口，并记录调用次数。
+
+    异常/边界：
+    - 计算次数不为 1 时抛出 AssertionError。
+
+    依赖：
+    - `run_concurrently`
+
+    示例：
+    - `check_single_flight("memory", [MemoryCacheBackend(16, 60)])`
+    '''
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"value": 42, "content": b"\x00xlsx"}
+
+    results = run_concurrently(backends, f"single-flight-{name}", compute)
+    coalesced = sum(b.coalesced for b in backends)
+    print(f"{name:<18} 并发 {CONCURRENCY} 个相同请求: 计算 {len(calls)} 次, 合并等待 {coalesced} 次")
+    assert len(calls) == 1, f"{name}: 计算了 {len(calls)} 次"
+    assert all(r == {"value": 42, "content": b"\x00xlsx"} for r in results)
+
+
+def check_memory_budget():
+    '''
+    功能概述：
+    断言内存后端按缓存值总大小淘汰：连续写入多个报告文件后总大小不超过上限，保留最近写入的条目，
+    单个超过上限的值不写入。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 上限 1MB、条目数上限 256 → 写入 10 个 300KB 的报告 → 检查统计与命中 → 写入 2MB 的报告。
+
+    异常/边界：
+    - 任一断言不成立时抛出 AssertionError。
+
+    依赖：
+    - `MemoryCacheBackend`
+
+    示例：
+    - `check_memory_budget()`
+    '''
+    backend = MemoryCacheBackend(256, 60, max_bytes=1024 * 1024)
+    for i in range(10):
+        backend.set(f"report-{i}", {"filename": f"r{i}.xlsx", "content": bytes(300 * 1024)})
+    stats = backend.stats()
+    print(f"memory 总大小上限 1MB: 写入 10 个 300KB 报告后 {stats['entries']} 个条目, "
+          f"{stats['bytes']} 字节, 淘汰 {stats['evictions']} 次")
+    assert stats["bytes"] <= 1024 * 1024 and stats["entries"] == 3 and stats["evictions"] == 7
+    assert backend.get("report-9")[0] and not backend.get("report-0")[0]
+
+    backend.set("huge", {"filename": "huge.xlsx", "content": bytes(2 * 1024 * 1024)})
+    assert not backend.get("huge")[0] and backend.stats()["entries"] == 3
+    backend.clear()
+    assert backend.stats()["bytes"] == 0
+
+
+def check_service_sharing(make_backend):
+    '''
+    功能概述：
+    两个节点（各自的后端实例，共用同一 Redis）先后请求相同的 IFIR 分析与报告，第二个节点直接复用结果。
+
+    输入参数：
+    - make_backend：创建节点后端的无参函数。
+
+    返回值：
+    - 无。
+
+    关键流程：
+    - 节点 1 计算并写入 → 切换到节点 2 → 仅执行数据版本查询即返回。
+
+    异常/边界：
+    - 报告生成依赖 matplotlib / openpyxl，缺失时跳过报告部分。
+
+    依赖：
+    - `test_query_count.build_session`、`IfirService`
+
+    示例：
+    - `check_service_sharing(lambda: RedisCacheBackend("", 600, client=client))`
+    '''
+    from test_query_count import build_session, count_queries
+    from app.services.ifir_service import IfirService
+    from app.schemas import ifir as ifir_schemas
+    from app.schemas.common import TimeRange
+
+    db = build_session()
+    tr = TimeRange(start_month="2024-02", end_month="2024-11")
+    request = ifir_schemas.IfirSegmentAnalyzeRequest(
+        time_range=tr, filters=ifir_schemas.IfirSegmentFilters(segments=["Consumer", "SMB"]))
+    results = []
+    # 筛选项默认由进程内维度索引返回，这里关闭索引以校验数据库查询路径的结果缓存。
+    settings = get_settings()
+    index_enabled = settings.KPI_DIMENSION_INDEX_ENABLED
+    settings.KPI_DIMENSION_INDEX_ENABLED = False
+    try:
+        set_analysis_cache(make_backend())
+        first = count_queries(db, lambda: results.append(IfirService(db).analyze_segment(request)))
+        count_queries(db, lambda: IfirService(db).get_options(segments=["SMB"]))
+        set_analysis_cache(make_backend())
+        second = count_queries(db, lambda: results.append(IfirService(db).analyze_segment(request)))
+        options = count_queries(db, lambda: IfirService(db).get_options(segments=["SMB"]))
+        print(f"节点 1 计算 {first} 条 SQL, 节点 2 复用 {second} 条 SQL, 筛选项复用 {options} 条 SQL")
+        assert second == 1 and options == 1
+        assert results[0] == results[1]
+
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            print("未安装 matplotlib，跳过报告缓存校验")
+            return
+        report_request = ifir_schemas.IfirModelReportRequest(
+            time_range=tr, filters=ifir_schemas.IfirModelFilters(models=["M1", "M2"]))
+        paths = []
+        for _ in range(2):
+            set_analysis_cache(make_backend())
+            path, filename = IfirService(db).generate_model_report(report_request)
+            paths.append(path)
+        contents = [open(p, "rb").read() for p in paths]
+        print(f"报告 {filename}: 两个节点得到相同文件内容 {len(contents[0])} 字节")
+        assert paths[0] != paths[1] and contents[0] == contents[1]
+        for p in paths:
+            os.unlink(p)
+    finally:
+        settings.KPI_DIMENSION_INDEX_ENABLED = index_enabled
+        set_analysis_cache(None)
+        db.close()
+
+
+def test_shared_cache():
+    '''
+    功能概述：
+    依次校验内存后端的请求合并与总大小淘汰、Redis 后端（单节点 / 两节点）的请求合并，以及分析结果经 Redis 后端在节点间复用。
+
+    输入参数：
+    - 无。
+
+    返回值：
+    - 无，结果直接输出到控制台。
+
+    关键流程：
+    - 内存后端（请求合并、总大小淘汰） → fakeredis 单节点 → fakeredis 两节点 → 服务层端到端。
+
+    异常/边界：
+    - 未安装 fakeredis 时只校验内存后端。
+
+    依赖：
+    - `fakeredis`（可选）
+
+    示例：
+    - 运行 `python Test/test_shared_cache.py`
+    '''
+    settings = get_settings()
+    original = settings.KPI_CACHE_ENABLED
+    settings.KPI_CACHE_ENABLED = True
+    try:
+        check_single_flight("memory", [MemoryCacheBackend(16, 60)])
+        check_memory_budget()
+        try:
+            import fakeredis
+        except ImportError:
+            print("未安装 fakeredis，跳过 Redis 后端校验")
+            print("通过")
+            return
+        server = fakeredis.FakeServer()
+
+        def make_backend():
+            return RedisCacheBackend("", 600, lock_seconds=10, client=fakeredis.FakeRedis(server=server))
+
+        check_single_flight("redis 单节点", [make_backend()])
+        check_single_flight("redis 两节点", [make_backend(), make_backend()])
+        check_service_sharing(make_backend)
+    finally:
+        settings.KPI_CACHE_ENABLED = original
+    print("通过")
+
+
+if __name__ == "__main__":
+    test_shared_cache()
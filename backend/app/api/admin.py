@@ -3,9 +3,13 @@ Admin user management API.
 """
 from typing import Optional
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.cache import get_analysis_cache
+from app.core.database import get_db, pool_stats
+from app.core.executors import ExecutorBusy, run_auth
+from app.core.read_routing import get_read_router
 from app.core.security import require_admin
 from app.schemas.auth import (
     UserCreate,
@@ -16,14 +20,16 @@ from app.schemas.auth import (
     UserListData,
     UserListResponse,
 )
+from app.schemas.common import CacheStatsData, CacheStatsResponse, DbPoolStatsData, DbPoolStatsResponse
 from app.models.tables import User
 from app.services.auth_service import AuthService
+from app.services.dimension_index import clear_dimension_indexes
 
 router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
 
 
 @router.get("/users", response_model=UserListResponse)
-async def list_users(
+def list_users(
     q: Optional[str] = Query(None, description="搜索用户名或显示名"),
     role: Optional[str] = Query(None, description="角色筛选"),
     page: int = Query(1, ge=1),
@@ -51,6 +57,14 @@ async def list_users(
 
 @router.post("/users", response_model=UserResponse)
 async def create_user(payload: UserCreate, db: Session = Depends(get_db)):
+    # password hashing runs in the auth executor
+    try:
+        return await run_auth(_create_user, payload, db)
+    except ExecutorBusy as e:
+        return JSONResponse(status_code=429, content={"code": 429, "message": str(e)})
+
+
+def _create_user(payload: UserCreate, db: Session) -> UserResponse:
     service = AuthService(db)
     try:
         user = service.create_user(payload)
@@ -69,7 +83,7 @@ async def create_user(payload: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_db)):
     service = AuthService(db)
     user = service.get_user_by_id(user_id)
     if not user:
@@ -87,7 +101,7 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     payload: UserUpdate,
     db: Session = Depends(get_db),
@@ -117,7 +131,7 @@ async def update_user(
 
 
 @router.delete("/users/{user_id}", response_model=UserResponse)
-async def delete_user(
+def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin),
@@ -130,9 +144,7 @@ async def delete_user(
     if not user:
         return UserResponse(code=404, message="用户不存在")
 
-    user.is_active = False
-    db.commit()
-    db.refresh(user)
+    user = service.deactivate_user(user)
 
     user_info = UserInfo(
         id=user.id,
@@ -155,7 +167,13 @@ async def reset_password(
 ):
     if current_user.id == user_id:
         return UserResponse(code=400, message="不能重置自身密码")
+    try:
+        return await run_auth(_reset_password, user_id, payload, db)
+    except ExecutorBusy as e:
+        return JSONResponse(status_code=429, content={"code": 429, "message": str(e)})
 
+
+def _reset_password(user_id: int, payload: ResetPasswordRequest, db: Session) -> UserResponse:
     service = AuthService(db)
     user = service.get_user_by_id(user_id)
     if not user:
@@ -172,3 +190,35 @@ async def reset_password(
         last_login=user.last_login,
     )
     return UserResponse(data=user_info)
+
+
+def _cache_stats() -> CacheStatsData:
+    cache = get_analysis_cache()
+    if cache is None:
+        return CacheStatsData(enabled=False)
+    return CacheStatsData(enabled=True, **cache.stats())
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """分析结果缓存命中统计"""
+    return CacheStatsResponse(data=_cache_stats())
+
+
+@router.post("/cache/clear", response_model=CacheStatsResponse)
+def clear_cache():
+    """清空分析结果缓存与本节点的筛选项维度索引（数据版本未变但需要强制重算时使用）"""
+    cache = get_analysis_cache()
+    if cache is not None:
+        cache.clear()
+    clear_dimension_indexes()
+    return CacheStatsResponse(data=_cache_stats())
+
+
+@router.get("/db/pools", response_model=DbPoolStatsResponse)
+async def get_db_pool_stats():
+    """数据库连接池（interactive / etl / report 及只读副本）使用中连接数、溢出连接数与取连接等待统计，以及只读副本状态"""
+    router = get_read_router()
+    return DbPoolStatsResponse(data=DbPoolStatsData(
+        pools=pool_stats(), replicas=router.stats(), replica_fallbacks=router.fallbacks,
+    ))
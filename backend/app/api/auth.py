@@ -3,11 +3,13 @@ Auth API routes.
 """
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.core.database import get_db
-from app.core.security import create_access_token, get_current_user, verify_password, hash_password
+from app.core.executors import ExecutorBusy, run_auth
+from app.core.security import create_access_token, get_current_user, invalidate_principal, verify_password
 from app.schemas.auth import (
     LoginRequest,
     LoginResponse,
@@ -23,8 +25,20 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 settings = get_settings()
 
 
+def _busy(e: ExecutorBusy) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"code": 429, "message": str(e)})
+
+
 @router.post("/login", response_model=LoginResponse)
 async def login(request: LoginRequest, db: Session = Depends(get_db)):
+    # bcrypt verification runs in the auth executor, off the event loop and the default threadpool
+    try:
+        return await run_auth(_login, request, db)
+    except ExecutorBusy as e:
+        return _busy(e)
+
+
+def _login(request: LoginRequest, db: Session) -> LoginResponse:
     service = AuthService(db)
     user = service.authenticate_user(request.username, request.password)
     if not user:
@@ -34,6 +48,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 
     user.last_login = datetime.now(timezone.utc)
     db.commit()
+    invalidate_principal(user.username)
 
     expires_delta = timedelta(hours=settings.JWT_ACCESS_TOKEN_EXPIRE_HOURS)
     token = create_access_token({"sub": user.username, "role": user.role}, expires_delta=expires_delta)
@@ -78,12 +93,19 @@ async def change_password(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    try:
+        return await run_auth(_change_password, payload, db, current_user)
+    except ExecutorBusy as e:
+        return _busy(e)
+
+
+def _change_password(payload: ChangePasswordRequest, db: Session, current_user: User) -> UserResponse:
     if not verify_password(payload.old_password, current_user.hashed_password):
         return UserResponse(code=400, message="旧密码不正确")
 
-    current_user.hashed_password = hash_password(payload.new_password)
-    db.commit()
-    db.refresh(current_user)
+    # current_user may come from the principal cache (not bound to db); update through this session
+    service = AuthService(db)
+    current_user = service.set_password(service.get_user_by_id(current_user.id), payload.new_password)
 
     user_info = UserInfo(
         id=current_user.id,
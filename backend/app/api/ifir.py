@@ -4,15 +4,18 @@ IFIR分析API路由
 from pathlib import Path
 from typing import Optional
 from urllib.parse import quote
-from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.read_routing import get_read_db, get_report_read_db
+from app.core.executors import run_interactive, run_report
 from app.core.security import get_current_user
+from app.api.report import report_media_type, submit_report_job
 from app.services.ifir_service import IfirService
+from app.schemas.report import ReportJobResponse
 from app.schemas.ifir import (
-    IfirOptionsResponse, IfirOptionsData,
+    IfirOptionsResponse,
     IfirOdmAnalyzeRequest, IfirOdmAnalyzeResponse,
     IfirSegmentAnalyzeRequest, IfirSegmentAnalyzeResponse,
     IfirModelAnalyzeRequest, IfirModelAnalyzeResponse,
@@ -30,7 +33,7 @@ async def get_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取IFIR筛选项（统一接口，支持任意组合过滤）
@@ -44,7 +47,9 @@ async def get_options(
         segments_list = segments.split(",") if segments else None
         odms_list = odms.split(",") if odms else None
         models_list = models.split(",") if models else None
-        data = service.get_options(segments=segments_list, odms=odms_list, models=models_list)
+        data = await run_interactive(
+            service.get_options, segments=segments_list, odms=odms_list, models=models_list
+        )
         return IfirOptionsResponse(data=data)
     except Exception as e:
         return IfirOptionsResponse(code=500, message=str(e))
@@ -56,7 +61,7 @@ async def get_odm_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取IFIR ODM分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -67,7 +72,7 @@ async def get_segment_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取IFIR Segment分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -78,7 +83,7 @@ async def get_model_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取IFIR Model分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -89,7 +94,7 @@ async def get_model_options(
 @router.post("/odm-analysis/analyze", response_model=IfirOdmAnalyzeResponse)
 async def analyze_odm(
     request: IfirOdmAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     IFIR ODM分析
@@ -99,14 +104,14 @@ async def analyze_odm(
     - **filters.segments**: Segment列表（可选）
     - **filters.models**: Model列表（可选）
     - **view.trend_months**: 趋势月数，默认6
-    - **view.top_model_n**: Top Model数量，默认3
+    - **view.top_model_n**: Top Model数量，默认10
     """
     try:
         if not request.filters.odms:
             return IfirOdmAnalyzeResponse(code=400, message="ODM列表不能为空")
         
         service = IfirService(db)
-        data = service.analyze_odm(request)
+        data = await run_interactive(service.analyze_odm, request)
         return IfirOdmAnalyzeResponse(data=data)
     except Exception as e:
         return IfirOdmAnalyzeResponse(code=500, message=str(e))
@@ -115,7 +120,7 @@ async def analyze_odm(
 @router.post("/segment-analysis/analyze", response_model=IfirSegmentAnalyzeResponse)
 async def analyze_segment(
     request: IfirSegmentAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     IFIR Segment分析
@@ -125,14 +130,14 @@ async def analyze_segment(
     - **filters.odms**: ODM列表（可选）
     - **filters.models**: Model列表（可选）
     - **view.trend_months**: 趋势月数，默认6
-    - **view.top_n**: Top数量，默认1
+    - **view.top_n**: Top数量，默认10
     """
     try:
         if not request.filters.segments:
             return IfirSegmentAnalyzeResponse(code=400, message="Segment列表不能为空")
         
         service = IfirService(db)
-        data = service.analyze_segment(request)
+        data = await run_interactive(service.analyze_segment, request)
         return IfirSegmentAnalyzeResponse(data=data)
     except Exception as e:
         return IfirSegmentAnalyzeResponse(code=500, message=str(e))
@@ -141,7 +146,7 @@ async def analyze_segment(
 @router.post("/model-analysis/analyze", response_model=IfirModelAnalyzeResponse)
 async def analyze_model(
     request: IfirModelAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     IFIR Model分析
@@ -157,7 +162,7 @@ async def analyze_model(
             return IfirModelAnalyzeResponse(code=400, message="Model列表不能为空")
         
         service = IfirService(db)
-        data = service.analyze_model(request)
+        data = await run_interactive(service.analyze_model, request)
         return IfirModelAnalyzeResponse(data=data)
     except Exception as e:
         return IfirModelAnalyzeResponse(code=500, message=str(e))
@@ -166,7 +171,7 @@ async def analyze_model(
 @router.post("/model-analysis/issue-details", response_model=IfirModelIssueDetailResponse)
 async def model_issue_details(
     request: IfirModelIssueRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     IFIR Model Issue明细查询
@@ -180,7 +185,7 @@ async def model_issue_details(
     """
     try:
         service = IfirService(db)
-        data = service.get_model_issue_details(request)
+        data = await run_interactive(service.get_model_issue_details, request)
         return IfirModelIssueDetailResponse(data=data)
     except Exception as e:
         return IfirModelIssueDetailResponse(code=500, message=str(e))
@@ -188,23 +193,20 @@ async def model_issue_details(
 
 # ==================== Report API ====================
 
-EXCEL_MEDIA = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-
-
 @router.post("/report/model")
 async def generate_ifir_model_report(
     request: IfirModelReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 IFIR Model 分析报告 Excel"""
     try:
         service = IfirService(db)
-        file_path, filename = service.generate_model_report(request)
+        file_path, filename = await run_report(service.generate_model_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
@@ -216,16 +218,16 @@ async def generate_ifir_model_report(
 async def generate_ifir_odm_report(
     request: IfirOdmReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 IFIR ODM 分析报告 Excel"""
     try:
         service = IfirService(db)
-        file_path, filename = service.generate_odm_report(request)
+        file_path, filename = await run_report(service.generate_odm_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
@@ -237,18 +239,40 @@ async def generate_ifir_odm_report(
 async def generate_ifir_segment_report(
     request: IfirSegmentReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 IFIR Segment 分析报告 Excel"""
     try:
         service = IfirService(db)
-        file_path, filename = service.generate_segment_report(request)
+        file_path, filename = await run_report(service.generate_segment_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
     except Exception as e:
         return JSONResponse(status_code=500, content={"code": 500, "message": str(e)})
+
+
+# ==================== Report Job API ====================
+# 报告在后台生成：提交后轮询 /report-jobs/{job_id}，完成后从 /report-jobs/{job_id}/download 下载
+
+
+@router.post("/report/model/jobs", response_model=ReportJobResponse)
+async def submit_ifir_model_report_job(request: IfirModelReportRequest, db: Session = Depends(get_read_db)):
+    """提交 IFIR Model 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ifir", "model", request, db)
+
+
+@router.post("/report/odm/jobs", response_model=ReportJobResponse)
+async def submit_ifir_odm_report_job(request: IfirOdmReportRequest, db: Session = Depends(get_read_db)):
+    """提交 IFIR ODM 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ifir", "odm", request, db)
+
+
+@router.post("/report/segment/jobs", response_model=ReportJobResponse)
+async def submit_ifir_segment_report_job(request: IfirSegmentReportRequest, db: Session = Depends(get_read_db)):
+    """提交 IFIR Segment 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ifir", "segment", request, db)
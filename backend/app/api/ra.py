@@ -8,9 +8,12 @@ from fastapi import APIRouter, BackgroundTasks, Depends, Query
 from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.read_routing import get_read_db, get_report_read_db
+from app.core.executors import run_interactive, run_report
 from app.core.security import get_current_user
+from app.api.report import report_media_type, submit_report_job
 from app.services.ra_service import RaService
+from app.schemas.report import ReportJobResponse
 from app.schemas.ra import (
     RaOptionsResponse,
     RaOdmAnalyzeRequest, RaOdmAnalyzeResponse,
@@ -30,7 +33,7 @@ async def get_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取RA筛选项（统一接口，支持任意组合过滤）
@@ -44,7 +47,9 @@ async def get_options(
         segments_list = segments.split(",") if segments else None
         odms_list = odms.split(",") if odms else None
         models_list = models.split(",") if models else None
-        data = service.get_options(segments=segments_list, odms=odms_list, models=models_list)
+        data = await run_interactive(
+            service.get_options, segments=segments_list, odms=odms_list, models=models_list
+        )
         return RaOptionsResponse(data=data)
     except Exception as e:
         return RaOptionsResponse(code=500, message=str(e))
@@ -56,7 +61,7 @@ async def get_odm_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取RA ODM分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -67,7 +72,7 @@ async def get_segment_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取RA Segment分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -78,7 +83,7 @@ async def get_model_options(
     segments: Optional[str] = Query(None, description="逗号分隔的Segment列表"),
     odms: Optional[str] = Query(None, description="逗号分隔的ODM列表"),
     models: Optional[str] = Query(None, description="逗号分隔的Model列表"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取RA Model分析筛选项"""
     return await get_options(segments, odms, models, db)
@@ -89,15 +94,24 @@ async def get_model_options(
 @router.post("/odm-analysis/analyze", response_model=RaOdmAnalyzeResponse)
 async def analyze_odm(
     request: RaOdmAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """RA ODM分析"""
+    """
+    RA ODM分析
+    
+    - **time_range**: 时间范围
+    - **filters.odms**: ODM列表（必选）
+    - **filters.segments**: Segment列表（可选）
+    - **filters.models**: Model列表（可选）
+    - **view.trend_months**: 趋势月数，默认6
+    - **view.top_model_n**: Top Model数量，默认10
+    """
     try:
         if not request.filters.odms:
             return RaOdmAnalyzeResponse(code=400, message="ODM列表不能为空")
         
         service = RaService(db)
-        data = service.analyze_odm(request)
+        data = await run_interactive(service.analyze_odm, request)
         return RaOdmAnalyzeResponse(data=data)
     except Exception as e:
         return RaOdmAnalyzeResponse(code=500, message=str(e))
@@ -106,15 +120,24 @@ async def analyze_odm(
 @router.post("/segment-analysis/analyze", response_model=RaSegmentAnalyzeResponse)
 async def analyze_segment(
     request: RaSegmentAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """RA Segment分析"""
+    """
+    RA Segment分析
+    
+    - **time_range**: 时间范围
+    - **filters.segments**: Segment列表（必选）
+    - **filters.odms**: ODM列表（可选）
+    - **filters.models**: Model列表（可选）
+    - **view.trend_months**: 趋势月数，默认6
+    - **view.top_n**: Top数量，默认10
+    """
     try:
         if not request.filters.segments:
             return RaSegmentAnalyzeResponse(code=400, message="Segment列表不能为空")
         
         service = RaService(db)
-        data = service.analyze_segment(request)
+        data = await run_interactive(service.analyze_segment, request)
         return RaSegmentAnalyzeResponse(data=data)
     except Exception as e:
         return RaSegmentAnalyzeResponse(code=500, message=str(e))
@@ -123,15 +146,23 @@ async def analyze_segment(
 @router.post("/model-analysis/analyze", response_model=RaModelAnalyzeResponse)
 async def analyze_model(
     request: RaModelAnalyzeRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """RA Model分析"""
+    """
+    RA Model分析
+    
+    - **time_range**: 时间范围
+    - **filters.models**: Model列表（必选）
+    - **filters.segments**: Segment列表（可选）
+    - **filters.odms**: ODM列表（可选）
+    - **view.top_issue_n**: Top Issue数量，默认10
+    """
     try:
         if not request.filters.models:
             return RaModelAnalyzeResponse(code=400, message="Model列表不能为空")
         
         service = RaService(db)
-        data = service.analyze_model(request)
+        data = await run_interactive(service.analyze_model, request)
         return RaModelAnalyzeResponse(data=data)
     except Exception as e:
         return RaModelAnalyzeResponse(code=500, message=str(e))
@@ -140,19 +171,21 @@ async def analyze_model(
 @router.post("/model-analysis/issue-details", response_model=RaModelIssueDetailResponse)
 async def ra_model_issue_details(
     request: RaModelIssueRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     RA Model Issue明细查询
 
+    - **time_range**: 时间范围
     - **filters.model**: Model（必选）
     - **filters.issue**: Issue类型（必选）
-    - **filters.segments/odms**: 可选过滤
+    - **filters.segments**: Segment列表（可选）
+    - **filters.odms**: ODM列表（可选）
     - **pagination.page/page_size**: 分页参数
     """
     try:
         service = RaService(db)
-        data = service.get_model_issue_details(request)
+        data = await run_interactive(service.get_model_issue_details, request)
         return RaModelIssueDetailResponse(data=data)
     except Exception as e:
         return RaModelIssueDetailResponse(code=500, message=str(e))
@@ -160,23 +193,20 @@ async def ra_model_issue_details(
 
 # ==================== Report API ====================
 
-EXCEL_MEDIA = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-
-
 @router.post("/report/model")
 async def generate_ra_model_report(
     request: RaModelReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 RA Model 分析报告 Excel"""
     try:
         service = RaService(db)
-        file_path, filename = service.generate_model_report(request)
+        file_path, filename = await run_report(service.generate_model_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
@@ -188,16 +218,16 @@ async def generate_ra_model_report(
 async def generate_ra_odm_report(
     request: RaOdmReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 RA ODM 分析报告 Excel"""
     try:
         service = RaService(db)
-        file_path, filename = service.generate_odm_report(request)
+        file_path, filename = await run_report(service.generate_odm_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
@@ -209,18 +239,40 @@ async def generate_ra_odm_report(
 async def generate_ra_segment_report(
     request: RaSegmentReportRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_read_db),
 ):
     """生成 RA Segment 分析报告 Excel"""
     try:
         service = RaService(db)
-        file_path, filename = service.generate_segment_report(request)
+        file_path, filename = await run_report(service.generate_segment_report, request)
         path = Path(file_path)
         background_tasks.add_task(path.unlink, missing_ok=True)
         return FileResponse(
-            path=path, media_type=EXCEL_MEDIA,
+            path=path, media_type=report_media_type(filename),
             headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
             background=background_tasks,
         )
     except Exception as e:
         return JSONResponse(status_code=500, content={"code": 500, "message": str(e)})
+
+
+# ==================== Report Job API ====================
+# 报告在后台生成：提交后轮询 /report-jobs/{job_id}，完成后从 /report-jobs/{job_id}/download 下载
+
+
+@router.post("/report/model/jobs", response_model=ReportJobResponse)
+async def submit_ra_model_report_job(request: RaModelReportRequest, db: Session = Depends(get_read_db)):
+    """提交 RA Model 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ra", "model", request, db)
+
+
+@router.post("/report/odm/jobs", response_model=ReportJobResponse)
+async def submit_ra_odm_report_job(request: RaOdmReportRequest, db: Session = Depends(get_read_db)):
+    """提交 RA ODM 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ra", "odm", request, db)
+
+
+@router.post("/report/segment/jobs", response_model=ReportJobResponse)
+async def submit_ra_segment_report_job(request: RaSegmentReportRequest, db: Session = Depends(get_read_db)):
+    """提交 RA Segment 报告任务；相同请求共用同一任务"""
+    return await submit_report_job("ra", "segment", request, db)
@@ -0,0 +1,66 @@
+"""
+报告任务API路由
+
+- 提交：POST /ifir/report/{model|odm|segment}/jobs、POST /ra/report/{model|odm|segment}/jobs（见各 KPI 路由）
+- 查询：GET /report-jobs/{job_id}，轮询 status / progress
+- 下载：GET /report-jobs/{job_id}/download，任务完成后可重复下载，报告文件在 REPORT_JOB_TTL_SECONDS 后清理
+"""
+from urllib.parse import quote
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.orm import Session
+
+from app.core.executors import run_interactive
+from app.core.security import get_current_user
+from app.schemas.report import ReportJobResponse
+from app.services.report_jobs import ReportJobQueueFull, get_report_job_manager
+
+EXCEL_MEDIA = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MEDIA = "application/zip"
+
+router = APIRouter(prefix="/report-jobs", tags=["报告任务"], dependencies=[Depends(get_current_user)])
+
+
+def report_media_type(filename: str) -> str:
+    """按下载文件名返回报告的 Content-Type（明细 csv_zip 导出为 zip）"""
+    return ZIP_MEDIA if filename.endswith(".zip") else EXCEL_MEDIA
+
+
+async def submit_report_job(kpi: str, kind: str, request, db: Session):
+    """提交报告任务（IFIR / RA 路由共用），排队已满时返回 429"""
+    try:
+        job = await run_interactive(get_report_job_manager().submit, db, kpi, kind, request)
+        return ReportJobResponse(data=job)
+    except ReportJobQueueFull as e:
+        return JSONResponse(status_code=429, content={"code": 429, "message": str(e)})
+    except Exception as e:
+        return ReportJobResponse(code=500, message=str(e))
+
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+def get_report_job(job_id: str):
+    """查询报告任务状态与进度"""
+    job = get_report_job_manager().get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"code": 404, "message": "报告任务不存在或已过期"})
+    return ReportJobResponse(data=job)
+
+
+@router.get("/{job_id}/download")
+def download_report_job(job_id: str):
+    """下载已完成的报告"""
+    manager = get_report_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"code": 404, "message": "报告任务不存在或已过期"})
+    if job["status"] != "completed":
+        return JSONResponse(status_code=409, content={
+            "code": 409, "message": f"报告尚未生成完成: {job['status']}", "data": job,
+        })
+    path = manager.artifact_path(job_id)
+    if not path.exists():
+        return JSONResponse(status_code=404, content={"code": 404, "message": "报告文件已清理，请重新提交"})
+    return FileResponse(
+        path=path, media_type=report_media_type(job["filename"]),
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(job['filename'])}"},
+    )
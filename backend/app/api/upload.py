@@ -2,19 +2,26 @@
 文件上传API路由
 """
 import os
+import shutil
 import uuid
-import threading
 import logging
 from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db, SessionLocal
+from app.core.database import get_db
+from app.core.executors import run_interactive
 from app.core.security import require_uploader
 from app.models.tables import UploadTask
 from app.schemas.upload import UploadResponse, UploadTaskStatus, FileInfo
-from app.services.etl_service import EtlService
+from app.services.etl_reader import detect_file_format
+from app.worker import notify_new_job
+
+# DETAIL 文件导入方式：upsert 分批 INSERT ... ON DUPLICATE KEY UPDATE；bulk 使用 LOAD DATA 批量合并
+DETAIL_LOAD_MODES = ("upsert", "bulk")
+# ROW 文件导入方式：upsert 按 content_hash 合并；replace_months 整体替换文件覆盖的月份
+ROW_LOAD_MODES = ("upsert", "replace_months")
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -27,18 +34,39 @@ UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.pat
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+def _save_upload_file(upload: UploadFile, file_path: str) -> str:
+    """将上传文件分块写入磁盘并按内容识别格式，返回格式名（同步调用，在线程池中执行）"""
+    upload.file.seek(0)
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, 1024 * 1024)
+    return detect_file_format(file_path)
+
+
+def _remove_files(paths):
+    """删除已保存的上传文件，文件不存在（未写出）时跳过"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
 @router.post("", response_model=UploadResponse)
 async def upload_files(
-    ifir_detail: Optional[UploadFile] = File(None, description="IFIR Detail Excel文件"),
-    ifir_row: Optional[UploadFile] = File(None, description="IFIR Row Excel文件"),
-    ra_detail: Optional[UploadFile] = File(None, description="RA Detail Excel文件"),
-    ra_row: Optional[UploadFile] = File(None, description="RA Row Excel文件"),
+    ifir_detail: Optional[UploadFile] = File(None, description="IFIR Detail 数据文件 (xlsx/csv/csv.gz/parquet)"),
+    ifir_row: Optional[UploadFile] = File(None, description="IFIR Row 数据文件 (xlsx/csv/csv.gz/parquet)"),
+    ra_detail: Optional[UploadFile] = File(None, description="RA Detail 数据文件 (xlsx/csv/csv.gz/parquet)"),
+    ra_row: Optional[UploadFile] = File(None, description="RA Row 数据文件 (xlsx/csv/csv.gz/parquet)"),
+    detail_load_mode: str = Form("upsert", description="DETAIL 导入方式: upsert / bulk"),
+    row_load_mode: str = Form("upsert", description="ROW 导入方式: upsert / replace_months"),
     db: Session = Depends(get_db)
 ):
     """
-    上传Excel数据文件
+    上传数据文件
     
-    支持同时上传多个文件，至少需要上传一个文件
+    支持同时上传多个文件，至少需要上传一个文件；
+    支持 xlsx / xls / csv / csv.gz / parquet，格式按文件内容识别；
+    detail_load_mode / row_load_mode 选择 DETAIL / ROW 文件的导入方式
     """
     logger.info("========== 收到文件上传请求 ==========")
     
@@ -55,6 +83,11 @@ async def upload_files(
     if not uploaded_files:
         return UploadResponse(code=400, message="请至少上传一个文件")
     
+    if detail_load_mode not in DETAIL_LOAD_MODES:
+        return UploadResponse(code=400, message=f"不支持的 DETAIL 导入方式: {detail_load_mode}")
+    if row_load_mode not in ROW_LOAD_MODES:
+        return UploadResponse(code=400, message=f"不支持的 ROW 导入方式: {row_load_mode}")
+    
     # 创建任务ID
     task_id = str(uuid.uuid4())
     
@@ -63,33 +96,44 @@ async def upload_files(
         task = UploadTask(
             task_id=task_id,
             status="queued",
-            progress=0
+            progress=0,
+            detail_load_mode=detail_load_mode,
+            row_load_mode=row_load_mode
         )
         
         saved_files = {}
-        for file_type, file in uploaded_files.items():
-            # 保存文件
-            file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{file_type}_{file.filename}")
-            content = await file.read()
-            with open(file_path, "wb") as f:
-                f.write(content)
-            saved_files[file_type] = file_path
-            logger.info(f"文件已保存: {file_type} -> {file_path}")
-            
-            # 更新任务记录
-            setattr(task, f"{file_type}_file", file_path)
-            setattr(task, f"{file_type}_status", "pending")
-        
-        db.add(task)
-        db.commit()
+        try:
+            for file_type, file in uploaded_files.items():
+                # 保存文件并按内容校验文件格式
+                file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{file_type}_{file.filename}")
+                saved_files[file_type] = file_path
+                try:
+                    file_format = await run_interactive(_save_upload_file, file, file_path)
+                except ValueError as e:
+                    _remove_files(saved_files.values())
+                    return UploadResponse(code=400, message=f"{file_type} 文件格式不支持: {file.filename} ({str(e)})")
+                logger.info(f"文件已保存: {file_type} -> {file_path}, 格式: {file_format}")
+
+                # 更新任务记录
+                setattr(task, f"{file_type}_file", file_path)
+                setattr(task, f"{file_type}_status", "pending")
+
+            def _save_task():
+                db.add(task)
+                db.commit()
+
+            await run_interactive(_save_task)
+        except Exception:
+            # 写盘失败、任务记录未能保存等：任务未创建，删除已保存的文件后交给外层返回错误
+            _remove_files(saved_files.values())
+            raise
         
         logger.info(f"任务已创建: {task_id}")
         logger.info(f"保存的文件: {list(saved_files.keys())}")
         
-        # 使用线程执行ETL（替代 BackgroundTasks）
-        thread = threading.Thread(target=process_upload, args=(task_id, saved_files), daemon=True)
-        thread.start()
-        logger.info(f"后台线程已启动: {task_id}")
+        # 任务以 queued 状态入队，由 ETL worker 领取执行
+        notify_new_job()
+        logger.info(f"任务已入队: {task_id}")
         
         # 返回任务状态
         return UploadResponse(data=UploadTaskStatus(
@@ -100,6 +144,8 @@ async def upload_files(
             ifir_row=FileInfo(filename=ifir_row.filename, status="pending") if ifir_row else None,
             ra_detail=FileInfo(filename=ra_detail.filename, status="pending") if ra_detail else None,
             ra_row=FileInfo(filename=ra_row.filename, status="pending") if ra_row else None,
+            detail_load_mode=detail_load_mode,
+            row_load_mode=row_load_mode,
             created_at=datetime.now()
         ))
         
@@ -109,7 +155,7 @@ async def upload_files(
 
 
 @router.get("/{task_id}/status", response_model=UploadResponse)
-async def get_upload_status(
+def get_upload_status(
     task_id: str,
     db: Session = Depends(get_db)
 ):
@@ -145,48 +191,12 @@ async def get_upload_status(
             status=task.ra_row_status or "pending",
             rows=task.ra_row_rows
         ) if task.ra_row_file else None,
+        detail_load_mode=task.detail_load_mode or "upsert",
+        row_load_mode=task.row_load_mode or "upsert",
+        odm_map_inserted=task.odm_map_inserted,
+        odm_map_removed=task.odm_map_removed,
         error_message=task.error_message,
         created_at=task.created_at,
         started_at=task.started_at,
         completed_at=task.completed_at
     ))
-
-
-def process_upload(task_id: str, files: dict):
-    """
-    后台线程处理上传文件
-    """
-    import traceback
-    
-    logger.info(f"[ETL] ========== 后台线程启动: {task_id} ==========")
-    logger.info(f"[ETL] 文件列表: {list(files.keys())}")
-    
-    db = SessionLocal()
-    try:
-        # 验证文件是否存在
-        for file_type, file_path in files.items():
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"文件不存在: {file_path}")
-            logger.info(f"[ETL] 文件验证通过: {file_type} -> {file_path}")
-        
-        service = EtlService(db)
-        service.process_upload_task(task_id, files)
-        logger.info(f"[ETL] ========== 任务完成: {task_id} ==========")
-    except Exception as e:
-        logger.error(f"[ETL] ========== 任务失败: {task_id} ==========")
-        logger.error(f"[ETL] 错误: {str(e)}")
-        logger.error(traceback.format_exc())
-        
-        # 确保数据库状态被更新为失败
-        try:
-            task = db.query(UploadTask).filter(UploadTask.task_id == task_id).first()
-            if task and task.status != "failed":
-                task.status = "failed"
-                task.error_message = str(e)
-                task.completed_at = datetime.now()
-                db.commit()
-                logger.info(f"[ETL] 已更新任务状态为 failed")
-        except Exception as db_err:
-            logger.error(f"[ETL] 更新失败状态时出错: {str(db_err)}")
-    finally:
-        db.close()
@@ -0,0 +1,346 @@
+"""
+分析结果缓存
+
+- CacheBackend 定义缓存后端接口：get / set / get_or_compute / clear / stats
+- MemoryCacheBackend：进程内 LRU + TTL，条目数上限 KPI_CACHE_MAX_ENTRIES、缓存值总大小上限 KPI_CACHE_MAX_BYTES（近似），
+  任一超出时淘汰最久未使用的条目；单个值超过总大小上限时不写入
+- RedisCacheBackend：多个 API 节点共用的 Redis 缓存（KPI_CACHE_BACKEND=redis），条目过期交给 Redis TTL
+- get_or_compute 带请求合并（single-flight）：同一键并发未命中时只有一个调用方计算，其余等待结果；
+  内存后端在进程内合并，Redis 后端借助 SET NX 锁在所有节点间合并
+- 缓存键由调用方提供的各部分规范化后哈希得到（请求模型、数据版本等），数据版本变化后旧条目不再命中，随 LRU / TTL 自然淘汰
+- 缓存值须可 JSON 序列化，或为包含 bytes 的字典 / 列表（报告文件）
+"""
+import abc
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(*parts: Any) -> str:
+    """将各部分按键排序序列化为 JSON 后取 SHA-256，字段顺序不同的同一请求得到相同的键"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(abc.ABC):
+    """缓存后端基类：子类实现 _load / _store / _clear，以及 get_or_compute 的请求合并"""
+
+    name = ""
+
+    def __init__(self, ttl_seconds: float, lock_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds  # 单个计算的最长等待时间，超时后等待方自行计算
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # 等待其他调用方计算完成后取得结果的次数
+
+    def get(self, key: str) -> tuple:
+        """返回 (是否命中, 值)"""
+        hit, value = self._load(key)
+        self._count("hits" if hit else "misses")
+        return hit, value
+
+    def set(self, key: str, value: Any):
+        self._store(key, value)
+
+    @abc.abstractmethod
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """命中时直接返回缓存值，否则合并并发请求后计算并写入；cacheable 返回 False 的结果不写入"""
+
+    def clear(self):
+        self._clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _compute_and_store(self, key: str, compute, cacheable) -> Any:
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self._store(key, value)
+        return value
+
+    @abc.abstractmethod
+    def _load(self, key: str) -> tuple:
+        """返回 (是否命中, 值)，不计入命中统计"""
+
+    @abc.abstractmethod
+    def _store(self, key: str, value: Any):
+        """写入一个条目"""
+
+    @abc.abstractmethod
+    def _clear(self):
+        """删除全部条目"""
+
+
+def _approx_size(value: Any) -> int:
+    """缓存值的近似大小（字节）：bytes / 字符串按长度，容器按元素累加，其余标量按 8 字节"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value)
+    return 8
+
+
+class MemoryCacheBackend(CacheBackend):
+    """线程安全的进程内 LRU + TTL 缓存；max_bytes 为缓存值总大小上限（近似，None 表示不限）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float, lock_seconds: float = 60,
+                 max_bytes: Optional[int] = None):
+        super().__init__(ttl_seconds, lock_seconds)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (过期时间, 值, 近似大小)
+        self._inflight = {}  # key -> 计算完成事件
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.total_bytes = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        hit, value = self.get(key)
+        if hit:
+            return value
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            # 等待正在计算的调用方；其失败或超时则自行计算
+            event.wait(self.lock_seconds)
+            hit, value = self._load(key)
+            if hit:
+                self._count("coalesced")
+                return value
+            return self._compute_and_store(key, compute, cacheable)
+        try:
+            return self._compute_and_store(key, compute, cacheable)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update(entries=len(self._entries), max_entries=self.max_entries, evictions=self.evictions,
+                         bytes=self.total_bytes, max_bytes=self.max_bytes)
+        return stats
+
+    def _load(self, key: str) -> tuple:
+        """过期条目视为未命中并移除"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return True, entry[1]
+            if entry is not None:
+                self._remove(key)
+            return False, None
+
+    def _store(self, key: str, value: Any):
+        """写入条目，条目数或总大小超出上限时淘汰最久未使用的条目；单个值超过总大小上限时不写入"""
+        size = _approx_size(value)
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        """移除条目并扣减总大小，调用方须持有 _lock"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def delete(self, key: str):
+        """移除单个条目（数据已变更，不等 TTL 过期）"""
+        with self._lock:
+            self._remove(key)
+
+    def _clear(self):
+        """清空全部条目（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+def _encode_value(value: Any) -> bytes:
+    """JSON 序列化，bytes 以 {"__bytes__": base64} 表示"""
+    def default(obj):
+        if isinstance(obj, bytes):
+            return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+        raise TypeError(f"缓存值不支持类型 {type(obj).__name__}")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def _decode_value(raw: bytes) -> Any:
+    def object_hook(obj):
+        if len(obj) == 1 and "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        return obj
+    return json.loads(raw, object_hook=object_hook)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis 共享缓存：键前缀 KPI_CACHE_REDIS_PREFIX，值为 JSON，过期交给 Redis TTL。
+    Redis 不可用时记录告警并直接计算，不影响接口可用性。
+    """
+
+    name = "redis"
+    POLL_INTERVAL = 0.05  # 等待其他节点计算结果时的轮询间隔（秒）
+
+    def __init__(self, url: str, ttl_seconds: float, lock_seconds: float = 60,
+                 prefix: str = "kpi:cache:", client=None):
+        super().__init__(ttl_seconds, lock_seconds)
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("KPI_CACHE_BACKEND=redis 需要安装 redis 包") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        hit, value = self.get(key)
+        if hit:
+            return value
+        lock_key = f"{self.prefix}lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            leader = bool(self.client.set(lock_key, token, nx=True, px=int(self.lock_seconds * 1000)))
+        except Exception as e:
+            logger.warning(f"[CACHE] Redis 加锁失败，直接计算: {e}")
+            return compute()
+        if leader:
+            try:
+                return self._compute_and_store(key, compute, cacheable)
+            finally:
+                self._release(lock_key, token)
+
+        # 等待持锁节点写入结果；锁释放（计算失败）或超时后自行计算
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            hit, value = self._load(key)
+            if hit:
+                self._count("coalesced")
+                return value
+            try:
+                if not self.client.exists(lock_key):
+                    break
+            except Exception:
+                break
+        return self._compute_and_store(key, compute, cacheable)
+
+    def _release(self, lock_key: str, token: str):
+        """仅释放自己持有的锁（锁已过期被其他节点获取时不删除）"""
+        try:
+            current = self.client.get(lock_key)
+            if current is not None and current.decode() == token:
+                self.client.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"[CACHE] Redis 释放锁失败: {e}")
+
+    def _load(self, key: str) -> tuple:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"[CACHE] Redis 读取失败: {e}")
+            return False, None
+        if raw is None:
+            return False, None
+        return True, _decode_value(raw)
+
+    def _store(self, key: str, value: Any):
+        try:
+            self.client.set(self.prefix + key, _encode_value(value), ex=int(self.ttl_seconds))
+        except Exception as e:
+            logger.warning(f"[CACHE] Redis 写入失败: {e}")
+
+    def _clear(self):
+        """删除本前缀下的全部缓存条目"""
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"[CACHE] Redis 清空失败: {e}")
+
+
+_analysis_cache: Optional[CacheBackend] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def build_cache_backend() -> CacheBackend:
+    """按 KPI_CACHE_BACKEND 创建缓存后端"""
+    settings = get_settings()
+    if settings.KPI_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(
+            settings.KPI_CACHE_REDIS_URL, settings.KPI_CACHE_TTL_SECONDS,
+            lock_seconds=settings.KPI_CACHE_LOCK_SECONDS, prefix=settings.KPI_CACHE_REDIS_PREFIX,
+        )
+    if settings.KPI_CACHE_BACKEND != "memory":
+        raise ValueError(f"未知的 KPI_CACHE_BACKEND: {settings.KPI_CACHE_BACKEND}")
+    return MemoryCacheBackend(
+        settings.KPI_CACHE_MAX_ENTRIES, settings.KPI_CACHE_TTL_SECONDS,
+        lock_seconds=settings.KPI_CACHE_LOCK_SECONDS, max_bytes=settings.KPI_CACHE_MAX_BYTES,
+    )
+
+
+def get_analysis_cache() -> Optional[CacheBackend]:
+    """分析结果缓存单例；KPI_CACHE_ENABLED=false 时返回 None"""
+    global _analysis_cache
+    if not get_settings().KPI_CACHE_ENABLED:
+        return None
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = build_cache_backend()
+    return _analysis_cache
+
+
+def set_analysis_cache(backend: Optional[CacheBackend]):
+    """替换缓存单例（测试注入 fakeredis 或切换后端时使用），传 None 则下次按配置重新创建"""
+    global _analysis_cache
+    with _analysis_cache_lock:
+        _analysis_cache = backend
@@ -29,6 +29,20 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     DB_NAME: str = "kpi_visual"
 
+    # 数据库连接池（接口查询 / ETL 写入 / 报告生成各用一个，互不抢占连接）
+    DB_POOL_INTERACTIVE_SIZE: int = 10
+    DB_POOL_INTERACTIVE_OVERFLOW: int = 10
+    DB_POOL_ETL_SIZE: int = 4              # 每个 ETL 进程（含导入子进程）
+    DB_POOL_ETL_OVERFLOW: int = 4
+    DB_POOL_REPORT_SIZE: int = 4           # 不小于 API_REPORT_THREADS + REPORT_JOB_WORKERS
+    DB_POOL_REPORT_OVERFLOW: int = 2
+    DB_POOL_TIMEOUT_SECONDS: float = 5     # 取连接最长等待时间，超时返回 503
+
+    # 只读副本（分析 / 筛选项 / 报告查询轮询分发到副本，写入与鉴权仍走主库）
+    DB_REPLICA_URLS: str = ""              # 逗号分隔的 SQLAlchemy URL，留空则全部走主库
+    DB_REPLICA_CHECK_SECONDS: float = 2    # 副本健康与复制延迟检查间隔
+    DB_REPLICA_RETRY_SECONDS: float = 30   # 副本不可用后暂停使用的时间
+
     # CORS配置
     CORS_ORIGINS: List[str] = [
         "http://localhost:5173", "http://localhost:3000",
@@ -41,6 +55,9 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str = "change-me-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_HOURS: int = 8
+    AUTH_BCRYPT_ROUNDS: int = 12                   # bcrypt 成本因子，调整后已有口令在下次登录时按新成本重新哈希
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 30     # 鉴权用户信息进程内缓存时间（秒），禁用 / 改角色最迟在该时间后对其他节点生效；0 为不缓存
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 1024   # 鉴权用户信息缓存条目上限
 
     # 初始管理员账号（通过环境变量配置，留空则不创建）
     DEFAULT_ADMIN_USERNAME: str = ""
@@ -48,6 +65,53 @@ class Settings(BaseSettings):
     DEFAULT_ADMIN_DISPLAY_NAME: str = "系统管理员"
     DEFAULT_ADMIN_EMAIL: str = ""
 
+    # ETL配置
+    ETL_STREAMING: bool = False      # DETAIL 文件按块流式读取写入，控制大文件内存峰值
+    ETL_CHUNK_SIZE: int = 20000      # 流式模式下每块行数
+    ETL_PARALLEL_WORKERS: int = 1    # 同一任务内各文件并行处理的进程数，<=1 时串行；每个并发任务各自启动进程，
+                                     # 单节点最多 ETL_PARALLEL_WORKERS × ETL_MAX_CONCURRENT_JOBS 个，按 CPU 核数调整
+    DB_LOCAL_INFILE: bool = False    # 允许 LOAD DATA LOCAL INFILE（DETAIL bulk 导入模式需要，服务端需开启 local_infile）
+
+    # ETL任务队列配置
+    ETL_WORKER_EMBEDDED: bool = True       # 随 API 进程启动 worker；独立运行 python -m app.worker 时设为 false
+    ETL_WORKER_MODE: str = "thread"        # thread | process
+    ETL_MAX_CONCURRENT_JOBS: int = 2       # 单个 worker 同时执行的任务数
+    ETL_LEASE_SECONDS: int = 300           # 任务租约时长，worker 每 1/3 时长续租一次
+    ETL_MAX_ATTEMPTS: int = 3              # 租约过期后最多重新排队的次数
+    ETL_POLL_INTERVAL: float = 2.0         # 空闲时轮询队列的间隔（秒）
+
+    # API 线程池配置（async 路由中的同步调用在线程中执行，交互请求与报告生成分开限流）
+    API_INTERACTIVE_THREADS: int = 16      # 筛选项 / analyze / 明细查询同时占用的线程数
+    API_REPORT_THREADS: int = 2            # 报告生成同时占用的线程数，超出的报告请求排队
+    API_AUTH_THREADS: int = 2              # 口令哈希 / 校验（bcrypt）同时占用的线程数
+    AUTH_MAX_PENDING: int = 32             # 等待口令线程的请求数上限，超出时登录返回 429
+
+    # 分析查询配置
+    KPI_AGGREGATES_ENABLED: bool = False   # 分析查询改读预聚合表（agg_*_row_month / agg_*_detail_issue），开启前需执行迁移 005、006 初始化
+    KPI_CACHE_ENABLED: bool = True         # analyze 接口结果进程内缓存，按请求 + 数据版本（已结束的上传任务数与最近完成时间）命中
+    KPI_CACHE_MAX_ENTRIES: int = 256       # 缓存条目上限，超出时淘汰最久未使用的条目
+    KPI_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 内存后端缓存值总大小上限（近似，含报告文件），超出时淘汰最久未使用的条目
+    KPI_CACHE_TTL_SECONDS: int = 600       # 缓存条目存活时间（秒）
+    KPI_CACHE_BACKEND: str = "memory"       # memory | redis（多节点部署时共用 Redis 缓存）
+    KPI_CACHE_REDIS_URL: str = "redis://localhost:6379/1"
+    KPI_CACHE_REDIS_PREFIX: str = "kpi:cache:"
+    KPI_CACHE_LOCK_SECONDS: int = 120      # 相同请求合并计算时的最长等待时间（秒），超时后等待方自行计算
+    KPI_CACHE_MAX_ITEM_BYTES: int = 20 * 1024 * 1024  # 超过该大小的报告文件不写入缓存
+    KPI_DIMENSION_INDEX_ENABLED: bool = True     # 筛选项接口由进程内维度索引（Segment / ODM / Model 组合）返回，不查询数据库
+    KPI_DIMENSION_INDEX_CHECK_SECONDS: int = 5  # 维度索引检查数据版本的间隔（秒），上传完成后最迟在该时间后更新筛选项
+
+    # 报告明细配置
+    REPORT_DETAIL_MAX_ROWS: int = 100000   # 报告明细 Sheet 最多导出的行数，超出部分截断并提示
+    REPORT_DETAIL_FETCH_SIZE: int = 2000   # 明细查询使用服务端游标，每次从数据库读取的行数
+    REPORT_DETAIL_EXPORT_MAX_ROWS: int = 0  # 多 Sheet / CSV 压缩包导出的行数上限，0 为不限
+
+    # 报告任务配置（提交 → 轮询进度 → 下载）
+    REPORT_JOB_DIR: str = ""               # 报告文件与任务状态目录，留空为 backend/report_jobs；多节点部署时指向共享目录
+    REPORT_JOB_WORKERS: int = 2            # 同时生成的报告数
+    REPORT_JOB_MAX_PENDING: int = 20       # 单个节点排队 + 执行中的任务上限，超出时拒绝提交
+    REPORT_JOB_TTL_SECONDS: int = 3600     # 报告文件保留时间（秒），从生成完成算起
+    REPORT_JOB_TIMEOUT_SECONDS: int = 1800  # 排队 / 执行中的任务超过该时间未更新视为失效（节点退出遗留），可重新提交
+
     @property
     def DATABASE_URL(self) -> str:
         """构建数据库连接URL"""
@@ -1,22 +1,126 @@
 """
 数据库连接配置
+
+- 按用途分为三个引擎与连接池，互不抢占连接：
+  - interactive：接口查询（筛选项、analyze、明细、鉴权、上传登记），SessionLocal / get_db
+  - etl：ETL worker 与导入子进程的写入，EtlSessionLocal
+  - report：报告生成（同步下载与报告任务），ReportSessionLocal
+  - 分析查询与报告的只读会话经 app.core.read_routing 分发到只读副本（DB_REPLICA_URLS），未配置时使用上述主库连接池
+- 各连接池大小、溢出数由 DB_POOL_<用途>_SIZE / _OVERFLOW 配置；取连接最多等待 DB_POOL_TIMEOUT_SECONDS，
+  超时抛出 PoolExhausted（sqlalchemy TimeoutError 子类），接口返回 503，不会长时间挂起
+- 各连接池的取连接次数、等待耗时、使用中连接数与溢出连接数见 pool_stats()（/api/admin/db/pools）
 """
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
 from app.core.config import get_settings
 
 settings = get_settings()
 
-# 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.DEBUG
-)
+POOL_NAMES = ("interactive", "etl", "report")
+
+
+class PoolExhausted(exc.TimeoutError):
+    """连接池已满且等待超时"""
+
+
+class PoolMeter:
+    """连接池取连接统计（线程安全）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+
+
+_metering = threading.local()
+
+
+class MeteredQueuePool(QueuePool):
+    """记录取连接等待耗时的 QueuePool，等待超时时抛出带连接池名称的 PoolExhausted"""
+
+    meter: Optional[PoolMeter] = None
+
+    def _do_get(self):
+        # QueuePool 在竞争时会递归调用 _do_get，只在最外层计时
+        if self.meter is None or getattr(_metering, "active", False):
+            return super()._do_get()
+        _metering.active = True
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError as e:
+            self.meter.record(time.perf_counter() - start, timed_out=True)
+            raise PoolExhausted(
+                f"数据库连接池 {self.meter.name} 已满（{self.size()} 个常驻 + {self._max_overflow} 个溢出连接均在使用），"
+                f"等待 {self._timeout:g} 秒未取得连接，请稍后再试"
+            ) from e
+        finally:
+            _metering.active = False
+        self.meter.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() 会重建连接池，保留统计
+        pool = super().recreate()
+        pool.meter = self.meter
+        return pool
+
+
+def create_pool_engine(name: str, url: Optional[str] = None, label: Optional[str] = None) -> Engine:
+    """按 DB_POOL_<name>_* 配置创建引擎；url 默认为主库，label 为统计中显示的连接池名称（默认同 name）"""
+    prefix = f"DB_POOL_{name.upper()}"
+    engine = create_engine(
+        url or settings.DATABASE_URL,
+        poolclass=MeteredQueuePool,
+        pool_size=getattr(settings, f"{prefix}_SIZE"),
+        max_overflow=getattr(settings, f"{prefix}_OVERFLOW"),
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=settings.DEBUG,
+        # DETAIL bulk 导入模式使用 LOAD DATA LOCAL INFILE
+        connect_args={"local_infile": True} if settings.DB_LOCAL_INFILE else {}
+    )
+    engine.pool.meter = PoolMeter(label or name)
+    return engine
+
+
+# 创建数据库引擎（首次执行 SQL 时才建立连接）；只读副本的引擎由 read_routing 追加，键为 "<用途>@<副本>"
+engines: Dict[str, Engine] = {name: create_pool_engine(name) for name in POOL_NAMES}
+engine = engines["interactive"]
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+EtlSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engines["etl"])
+ReportSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engines["report"])
 
 # 声明基类
 Base = declarative_base()
@@ -32,3 +136,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def pool_stats() -> List[dict]:
+    """各连接池当前状态与取连接统计"""
+    stats = []
+    for pool_engine in list(engines.values()):
+        pool = pool_engine.pool
+        stats.append({
+            "name": pool.meter.name,
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool._timeout,
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            **pool.meter.snapshot(),
+        })
+    return stats
@@ -0,0 +1,61 @@
+"""
+API 阻塞调用的线程池
+
+- async 路由中的同步数据库查询与报告生成必须放到线程中执行，避免阻塞事件循环
+- 交互类调用（筛选项、analyze、明细）与报告生成使用各自的并发上限，慢报告占满报告池时不影响交互请求
+  - API_INTERACTIVE_THREADS：交互类调用同时占用的线程数
+  - API_REPORT_THREADS：报告生成同时占用的线程数，超出的报告请求排队等待
+  - API_AUTH_THREADS：口令哈希 / 校验（bcrypt，单次约数百毫秒 CPU）同时占用的线程数；
+    排队超过 AUTH_MAX_PENDING 时直接拒绝（ExecutorBusy），登录高峰不会占满默认线程池拖慢其他接口
+- 简单的增删改查路由直接写成 def，由 FastAPI 放入默认线程池执行
+"""
+from functools import partial
+from typing import Any, Callable, Optional
+
+import anyio
+from anyio import to_thread
+
+from app.core.config import get_settings
+
+_interactive_limiter: Optional[anyio.CapacityLimiter] = None
+_report_limiter: Optional[anyio.CapacityLimiter] = None
+_auth_limiter: Optional[anyio.CapacityLimiter] = None
+_auth_inflight = 0  # 执行中与排队中的口令调用数（只在事件循环中修改）
+
+
+class ExecutorBusy(Exception):
+    """线程池排队已满"""
+
+
+def _limiters() -> tuple:
+    """首次使用时按配置创建（需在事件循环中创建）"""
+    global _interactive_limiter, _report_limiter, _auth_limiter
+    if _interactive_limiter is None:
+        settings = get_settings()
+        _interactive_limiter = anyio.CapacityLimiter(settings.API_INTERACTIVE_THREADS)
+        _report_limiter = anyio.CapacityLimiter(settings.API_REPORT_THREADS)
+        _auth_limiter = anyio.CapacityLimiter(settings.API_AUTH_THREADS)
+    return _interactive_limiter, _report_limiter, _auth_limiter
+
+
+async def run_interactive(func: Callable, *args, **kwargs) -> Any:
+    """在交互线程池中执行同步调用"""
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=_limiters()[0])
+
+
+async def run_report(func: Callable, *args, **kwargs) -> Any:
+    """在报告线程池中执行同步调用"""
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=_limiters()[1])
+
+
+async def run_auth(func: Callable, *args, **kwargs) -> Any:
+    """在口令线程池中执行同步调用（含 bcrypt 哈希 / 校验），排队数达到 AUTH_MAX_PENDING 时抛出 ExecutorBusy"""
+    global _auth_inflight
+    limiter = _limiters()[2]
+    if _auth_inflight - limiter.total_tokens >= get_settings().AUTH_MAX_PENDING:
+        raise ExecutorBusy("登录请求过多，请稍后再试")
+    _auth_inflight += 1
+    try:
+        return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=limiter)
+    finally:
+        _auth_inflight -= 1
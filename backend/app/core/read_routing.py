@@ -0,0 +1,193 @@
+"""
+只读副本路由
+
+- DB_REPLICA_URLS 配置只读副本（逗号分隔的 SQLAlchemy URL），每个副本按用途各建 interactive / report 连接池
+- 分析、筛选项、明细与报告的只读会话（get_read_db / get_report_read_db / read_session_factory）轮询分发到可用副本；
+  ETL、鉴权、上传登记等写入仍使用主库（get_db）
+- 副本可用性每 DB_REPLICA_CHECK_SECONDS 检查一次（结果在两次检查之间复用，选副本只是内存判断）：
+  - 健康：查询失败（连接不上、超时）时该副本停用 DB_REPLICA_RETRY_SECONDS 后再试
+  - 延迟：副本上已结束的上传任务数、最大任务 id 或最近完成时间（与分析缓存的数据版本相同）任一落后于主库时，
+    视为尚未复制完，暂不使用
+- 没有可用副本时回退到主库连接池，接口行为与未配置副本时相同
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import database
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+READ_WORKLOADS = ("interactive", "report")
+
+# 与 KpiEngine.data_version 相同：已结束的上传任务数、最大任务 id、最近完成时间
+DATA_VERSION_SQL = text(
+    "SELECT COUNT(*), MAX(id), MAX(completed_at) FROM upload_task WHERE completed_at IS NOT NULL"
+)
+
+
+class Replica:
+    """一个只读副本：各用途的会话工厂与最近一次检查结果"""
+
+    def __init__(self, name: str, sessions: Dict[str, sessionmaker]):
+        self.name = name
+        self.sessions = sessions
+        self.usable = True
+        self.reason = ""              # 不可用原因：down | lagging
+        self.checked_at = float("-inf")
+        self.down_until = 0.0
+        self.picks = 0
+        self._lock = threading.Lock()
+
+
+class ReadRouter:
+    """按轮询顺序为只读会话选择可用副本，全部不可用时回退主库"""
+
+    def __init__(self, primary: Dict[str, sessionmaker], replicas: List[Replica],
+                 check_seconds: float, retry_seconds: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self._next = itertools.count()
+        self._primary_version = None
+        self._primary_checked_at = float("-inf")
+        self._primary_lock = threading.Lock()
+        self.fallbacks = 0  # 配置了副本但回退主库的次数
+
+    def session(self, workload: str = "interactive") -> Session:
+        """返回只读会话：可用副本（轮询）或主库"""
+        replica = self.pick()
+        if replica is None:
+            return self.primary[workload]()
+        return replica.sessions[workload]()
+
+    def pick(self) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if self._usable(replica):
+                replica.picks += 1
+                return replica
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> List[dict]:
+        return [
+            {"name": r.name, "usable": r.usable, "reason": r.reason, "picks": r.picks}
+            for r in self.replicas
+        ]
+
+    def _usable(self, replica: Replica) -> bool:
+        now = time.monotonic()
+        if now < replica.down_until:
+            return False
+        # 到期由一个线程检查，其余线程沿用上次结果
+        if now - replica.checked_at >= self.check_seconds and replica._lock.acquire(blocking=False):
+            try:
+                self._check(replica, now)
+            finally:
+                replica._lock.release()
+        return replica.usable
+
+    def _check(self, replica: Replica, now: float):
+        try:
+            replica_version = _data_version(replica.sessions["interactive"])
+        except Exception as e:
+            logger.warning(f"[DB] 只读副本 {replica.name} 不可用，{self.retry_seconds:g} 秒后重试: {e}")
+            replica.usable, replica.reason = False, "down"
+            replica.down_until = now + self.retry_seconds
+            replica.checked_at = now
+            return
+        primary_version = self._latest_primary_version(now)
+        lagging = primary_version is not None and _behind(replica_version, primary_version)
+        if lagging and replica.reason != "lagging":
+            logger.info(f"[DB] 只读副本 {replica.name} 尚未复制最新上传任务（{replica_version} < {primary_version}），读请求回退主库")
+        replica.usable, replica.reason = not lagging, "lagging" if lagging else ""
+        replica.checked_at = now
+
+    def _latest_primary_version(self, now: float):
+        """主库数据版本，同一检查周期内复用；主库查询失败时不阻止使用副本"""
+        with self._primary_lock:
+            if now - self._primary_checked_at >= self.check_seconds:
+                try:
+                    self._primary_version = _data_version(self.primary["interactive"])
+                except Exception as e:
+                    logger.warning(f"[DB] 主库数据版本查询失败: {e}")
+                    self._primary_version = None
+                self._primary_checked_at = now
+            return self._primary_version
+
+
+def _data_version(factory: sessionmaker) -> tuple:
+    db = factory()
+    try:
+        return tuple(db.execute(DATA_VERSION_SQL).one())
+    finally:
+        db.close()
+
+
+def _behind(replica_version: tuple, primary_version: tuple) -> bool:
+    """副本版本任一部分小于主库即落后；副本比本周期缓存的主库版本更新时不算落后"""
+    return any(p is not None and (r is None or r < p) for r, p in zip(replica_version, primary_version))
+
+
+def build_read_router() -> ReadRouter:
+    """按配置创建路由：主库为 interactive / report 连接池，DB_REPLICA_URLS 中每个副本各建两个连接池"""
+    settings = get_settings()
+    primary = {"interactive": database.SessionLocal, "report": database.ReportSessionLocal}
+    replicas = []
+    for index, url in enumerate(u.strip() for u in settings.DB_REPLICA_URLS.split(",") if u.strip()):
+        name = f"replica{index + 1}"
+        sessions = {}
+        for workload in READ_WORKLOADS:
+            label = f"{workload}@{name}"
+            engine = database.create_pool_engine(workload, url=url, label=label)
+            database.engines[label] = engine
+            sessions[workload] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        replicas.append(Replica(name, sessions))
+    return ReadRouter(primary, replicas, settings.DB_REPLICA_CHECK_SECONDS, settings.DB_REPLICA_RETRY_SECONDS)
+
+
+_router: Optional[ReadRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_read_router() -> ReadRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = build_read_router()
+    return _router
+
+
+def read_session_factory(workload: str = "interactive"):
+    """只读会话工厂（可替代 sessionmaker 传给报告任务等）"""
+    return lambda: get_read_router().session(workload)
+
+
+def get_read_db():
+    """只读数据库会话（分析、筛选项、明细接口），用于FastAPI依赖注入"""
+    db = get_read_router().session("interactive")
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_report_read_db():
+    """报告生成的只读数据库会话（同步下载报告的接口），用于FastAPI依赖注入"""
+    db = get_read_router().session("report")
+    try:
+        yield db
+    finally:
+        db.close()
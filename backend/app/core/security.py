@@ -1,8 +1,17 @@
 """
 Security utilities: password hashing, JWT, and auth dependencies.
+
+get_current_user caches the authenticated user's columns per token subject
+(AUTH_PRINCIPAL_CACHE_TTL_SECONDS), so hot users skip the users lookup and the
+pool checkout. Writes to a user call invalidate_principal; other nodes pick up
+the change once the entry expires.
+
+bcrypt hashing/verification costs hundreds of milliseconds of CPU; routes run it
+through app.core.executors.run_auth so logins never occupy the default threadpool.
 """
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -10,13 +19,14 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
+from app.core.cache import MemoryCacheBackend
 from app.core.config import get_settings
 from app.core.database import get_db
 from app.models.tables import User
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.AUTH_BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
@@ -30,6 +40,14 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify plain password; when it matches a hash made with other settings
+    (e.g. AUTH_BCRYPT_ROUNDS changed), also return a new hash to store.
+    """
+    return pwd_context.verify_and_update(plain, hashed)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
     to_encode = data.copy()
@@ -51,11 +69,62 @@ def decode_token(token: str) -> dict:
     return payload
 
 
-async def get_current_user(
+_principal_cache: Optional[MemoryCacheBackend] = None
+_principal_cache_lock = threading.Lock()
+
+
+def get_principal_cache() -> Optional[MemoryCacheBackend]:
+    """Process-wide principal cache (username -> user columns), None when disabled."""
+    global _principal_cache
+    if settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return None
+    if _principal_cache is None:
+        with _principal_cache_lock:
+            if _principal_cache is None:
+                _principal_cache = MemoryCacheBackend(
+                    max_entries=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+                )
+    return _principal_cache
+
+
+def invalidate_principal(username: Optional[str] = None):
+    """Drop a cached principal after the user row changes (None clears all)."""
+    cache = get_principal_cache()
+    if cache is None:
+        return
+    if username is None:
+        cache.clear()
+    else:
+        cache.delete(username)
+
+
+def _load_principal(db: Session, username: str) -> Optional[User]:
+    """
+    Return the user for a token subject. With the principal cache enabled this is a
+    transient User built from the cached columns (not bound to db); routes that
+    modify the user must load it through their own session. Concurrent misses for
+    the same subject share one lookup.
+    """
+    cache = get_principal_cache()
+    if cache is None:
+        return db.query(User).filter(User.username == username).first()
+
+    def load_columns() -> Optional[dict]:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            return None
+        return {c.key: getattr(user, c.key) for c in User.__table__.columns}
+
+    columns = cache.get_or_compute(username, load_columns)
+    return User(**columns) if columns is not None else None
+
+
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> User:
-    """Validate token and return current user."""
+    """Validate token and return current user (sync: the user lookup runs in the threadpool)."""
     payload = decode_token(token)
     username = payload.get("sub")
     if not username:
@@ -65,7 +134,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.username == username).first()
+    user = _load_principal(db, username)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
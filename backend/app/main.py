@@ -1,13 +1,16 @@
 """
 KPI可视化系统后端主入口
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.core.config import get_settings
-from app.api import ifir, ra, upload, auth, admin
-from app.core.database import SessionLocal
+from app.api import ifir, ra, report, upload, auth, admin
+from app.core.database import PoolExhausted, SessionLocal
 from app.services.auth_service import AuthService
+from app.services.report_jobs import shutdown_report_jobs
+from app.worker import start_embedded_worker, stop_embedded_worker
 
 settings = get_settings()
 
@@ -29,9 +32,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 连接池等待超时：快速返回 503，由前端稍后重试
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request: Request, exc: PoolExhausted):
+    return JSONResponse(status_code=503, content={"code": 503, "message": str(exc)})
+
+
 # 注册路由
 app.include_router(ifir.router, prefix="/api")
 app.include_router(ra.router, prefix="/api")
+app.include_router(report.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
@@ -55,6 +65,25 @@ def ensure_default_admin():
         db.close()
 
 
+@app.on_event("startup")
+def start_etl_worker():
+    """内嵌模式下随 API 进程启动 ETL worker；独立部署 worker 时关闭此项"""
+    if settings.ETL_WORKER_EMBEDDED:
+        start_embedded_worker()
+
+
+@app.on_event("shutdown")
+def stop_etl_worker():
+    """停止内嵌 ETL worker"""
+    stop_embedded_worker()
+
+
+@app.on_event("shutdown")
+def stop_report_jobs():
+    """停止报告任务线程池，未开始的任务标记为失败"""
+    shutdown_report_jobs()
+
+
 @app.get("/")
 async def root():
     """根路由"""
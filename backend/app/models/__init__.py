@@ -5,5 +5,9 @@ from app.models.tables import (
     FactRaRow,
     FactRaDetail,
     MapOdmToPlant,
+    AggIfirRowMonth,
+    AggRaRowMonth,
+    AggIfirDetailIssue,
+    AggRaDetailIssue,
     UploadTask
 )
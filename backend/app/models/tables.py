@@ -214,6 +214,84 @@ class MapOdmToPlant(Base):
     load_ts = Column(DateTime, server_default=func.now())
 
 
+class AggIfirRowMonth(Base):
+    """
+    IFIR ROW 月度聚合表（由 fact_ifir_row 汇总，ETL 按批次涉及的月份增量维护）
+    粒度: 出货月 × Segment × ODM × Model × Plant
+    字段名与 fact_ifir_row 保持一致，分析查询可直接替换数据源
+    """
+    __tablename__ = "agg_ifir_row_month"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    delivery_month = Column(Date, nullable=False)
+    segment = Column(String(64), nullable=True)
+    supplier_new = Column(String(128), nullable=True)
+    model = Column(String(128), nullable=True)
+    plant = Column(String(64), nullable=True)
+    box_claim = Column(BigInteger, nullable=False, default=0, comment="IFIR分子合计")
+    box_mm = Column(BigInteger, nullable=False, default=0, comment="IFIR分母合计")
+    row_count = Column(Integer, nullable=False, default=0, comment="汇总的ROW行数")
+    load_ts = Column(DateTime, server_default=func.now())
+
+
+class AggRaRowMonth(Base):
+    """
+    RA ROW 月度聚合表（由 fact_ra_row 汇总，ETL 按批次涉及的月份增量维护）
+    粒度: 索赔月 × Segment × ODM × Model × Plant
+    字段名与 fact_ra_row 保持一致，分析查询可直接替换数据源
+    """
+    __tablename__ = "agg_ra_row_month"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    claim_month = Column(Date, nullable=False)
+    segment = Column(String(64), nullable=True)
+    supplier_new = Column(String(128), nullable=True)
+    model = Column(String(128), nullable=True)
+    plant = Column(String(64), nullable=True)
+    ra_claim = Column(BigInteger, nullable=False, default=0, comment="RA分子合计")
+    ra_mm = Column(BigInteger, nullable=False, default=0, comment="RA分母合计")
+    row_count = Column(Integer, nullable=False, default=0, comment="汇总的ROW行数")
+    load_ts = Column(DateTime, server_default=func.now())
+
+
+class AggIfirDetailIssue(Base):
+    """
+    IFIR DETAIL Top Issue 汇总表（由 fact_ifir_detail 计数，ETL 按涉及的出货月增量维护）
+    粒度: 出货月 × Model × Plant × Segment × Segment2 × 故障大类
+    字段名与 fact_ifir_detail 保持一致，Top Issue 查询以 SUM(issue_count) 代替 COUNT(*)
+    """
+    __tablename__ = "agg_ifir_detail_issue"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    delivery_month = Column(Date, nullable=False)
+    model = Column(String(128), nullable=True)
+    plant = Column(String(64), nullable=True)
+    segment = Column(String(64), nullable=True)
+    segment2 = Column(String(64), nullable=True)
+    fault_category = Column(String(128), nullable=False)
+    issue_count = Column(Integer, nullable=False, default=0, comment="明细条数")
+    load_ts = Column(DateTime, server_default=func.now())
+
+
+class AggRaDetailIssue(Base):
+    """
+    RA DETAIL Top Issue 汇总表（由 fact_ra_detail 计数，ETL 按涉及的索赔月增量维护）
+    粒度: 索赔月 × Model × Plant × Segment × Segment2 × 故障大类
+    字段名与 fact_ra_detail 保持一致，Top Issue 查询以 SUM(issue_count) 代替 COUNT(*)
+    """
+    __tablename__ = "agg_ra_detail_issue"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    claim_month = Column(Date, nullable=False)
+    model = Column(String(128), nullable=True)
+    plant = Column(String(64), nullable=True)
+    segment = Column(String(64), nullable=True)
+    segment2 = Column(String(64), nullable=True)
+    fault_category = Column(String(128), nullable=False)
+    issue_count = Column(Integer, nullable=False, default=0, comment="明细条数")
+    load_ts = Column(DateTime, server_default=func.now())
+
+
 class UploadTask(Base):
     """上传任务表"""
     __tablename__ = "upload_task"
@@ -242,6 +320,19 @@ class UploadTask(Base):
     
     error_message = Column(Text, nullable=True)
     
+    # 队列租约（worker 领取任务后定期续期，过期视为 worker 已失联）
+    lease_owner = Column(String(100), nullable=True, comment="持有租约的worker")
+    lease_expires_at = Column(DateTime, nullable=True, comment="租约过期时间")
+    attempts = Column(Integer, nullable=False, default=0, comment="已领取次数")
+    
+    # 导入方式
+    detail_load_mode = Column(String(16), nullable=True, comment="DETAIL导入方式: upsert/bulk")
+    row_load_mode = Column(String(16), nullable=True, comment="ROW导入方式: upsert/replace_months")
+    
+    # ODM映射增量刷新结果
+    odm_map_inserted = Column(Integer, nullable=True, comment="ODM映射新增条数")
+    odm_map_removed = Column(Integer, nullable=True, comment="ODM映射移除条数")
+    
     created_at = Column(DateTime, server_default=func.now())
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
@@ -1,7 +1,7 @@
 ﻿"""
 通用Schema定义
 """
-from typing import TypeVar, Generic, Optional, Any
+from typing import TypeVar, Generic, Optional, Any, List, Literal
 from pydantic import BaseModel
 
 T = TypeVar("T")
@@ -20,6 +20,13 @@ class TimeRange(BaseModel):
     end_month: str    # YYYY-MM
 
 
+# 报告明细导出方式：
+# sheet 单个明细 Sheet（最多 REPORT_DETAIL_MAX_ROWS 行）；
+# multi_sheet 导出全部明细，超过 Excel 行数上限时拆分为多个 Sheet；
+# csv_zip 导出全部明细为 CSV，与汇总 Excel 一起打包为 zip
+DetailExportMode = Literal["sheet", "multi_sheet", "csv_zip"]
+
+
 class OptionsTimeRange(BaseModel):
     """Options 鏃堕棿鑼冨洿"""
     min_month: str  # YYYY-MM
@@ -58,3 +65,60 @@ class PieItem(BaseModel):
     numerator: Optional[int] = None
     denominator: Optional[int] = None
 
+
+
+class CacheStatsData(BaseModel):
+    """分析结果缓存统计"""
+    enabled: bool
+    backend: Optional[str] = None
+    entries: Optional[int] = None      # 仅内存后端
+    max_entries: Optional[int] = None  # 仅内存后端
+    ttl_seconds: float = 0
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0                 # 等待并发的相同请求计算完成后取得结果的次数
+    evictions: Optional[int] = None    # 仅内存后端
+    hit_rate: float = 0.0
+
+
+class CacheStatsResponse(BaseModel):
+    """分析结果缓存统计响应"""
+    code: int = 0
+    message: str = "success"
+    data: Optional[CacheStatsData] = None
+
+
+class DbPoolStats(BaseModel):
+    """数据库连接池状态与取连接统计"""
+    name: str                  # interactive | etl | report，只读副本为 <用途>@replicaN
+    size: int
+    max_overflow: int
+    timeout_seconds: float
+    checked_out: int           # 使用中的连接数
+    overflow: int              # 超出常驻连接数后额外建立的连接数
+    checkouts: int             # 累计取连接次数
+    timeouts: int              # 累计等待超时次数
+    wait_ms_avg: float
+    wait_ms_max: float
+
+
+class DbReplicaStats(BaseModel):
+    """只读副本状态"""
+    name: str
+    usable: bool
+    reason: str = ""           # down（不可用）| lagging（尚未复制最新上传任务）
+    picks: int = 0             # 分发到该副本的会话数
+
+
+class DbPoolStatsData(BaseModel):
+    """数据库连接池与只读副本统计"""
+    pools: List[DbPoolStats] = []
+    replicas: List[DbReplicaStats] = []
+    replica_fallbacks: int = 0  # 配置了副本但回退主库的会话数
+
+
+class DbPoolStatsResponse(BaseModel):
+    """数据库连接池统计响应"""
+    code: int = 0
+    message: str = "success"
+    data: Optional[DbPoolStatsData] = None
@@ -3,7 +3,7 @@ IFIR相关Schema定义
 """
 from typing import Optional, List, Union, Literal
 from pydantic import BaseModel
-from app.schemas.common import TimeRange, OptionsTimeRange
+from app.schemas.common import TimeRange, OptionsTimeRange, DetailExportMode
 
 
 # ==================== Options ====================
@@ -319,6 +319,7 @@ class IfirModelReportRequest(BaseModel):
     time_range: TimeRange
     filters: IfirModelFilters
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 class IfirOdmReportRequest(BaseModel):
@@ -327,6 +328,7 @@ class IfirOdmReportRequest(BaseModel):
     filters: IfirOdmFilters
     view: Optional[IfirOdmViewConfig] = None
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 class IfirSegmentReportRequest(BaseModel):
@@ -335,6 +337,7 @@ class IfirSegmentReportRequest(BaseModel):
     filters: IfirSegmentFilters
     view: Optional[IfirSegmentViewConfig] = None
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 # ==================== 通用别名 ====================
@@ -3,7 +3,7 @@ RA相关Schema定义
 """
 from typing import Optional, List, Literal
 from pydantic import BaseModel
-from app.schemas.common import TimeRange, OptionsTimeRange
+from app.schemas.common import TimeRange, OptionsTimeRange, DetailExportMode
 
 
 # ==================== Options ====================
@@ -274,6 +274,7 @@ class RaModelReportRequest(BaseModel):
     time_range: TimeRange
     filters: RaModelFilters
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 class RaOdmReportRequest(BaseModel):
@@ -282,6 +283,7 @@ class RaOdmReportRequest(BaseModel):
     filters: RaOdmFilters
     view: Optional[RaOdmViewConfig] = None
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 class RaSegmentReportRequest(BaseModel):
@@ -290,6 +292,7 @@ class RaSegmentReportRequest(BaseModel):
     filters: RaSegmentFilters
     view: Optional[RaSegmentViewConfig] = None
     tgt: Optional[int] = 1500
+    detail_export: DetailExportMode = "sheet"
 
 
 class RaModelIssueFilters(BaseModel):
@@ -0,0 +1,29 @@
+"""
+报告任务相关Schema
+"""
+from typing import Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class ReportJobStatus(BaseModel):
+    """报告任务状态"""
+    job_id: str
+    kpi: str                      # ifir | ra
+    kind: str                     # model | odm | segment
+    status: str                   # queued | running | completed | failed
+    progress: int = 0
+    filename: Optional[str] = None
+    size_bytes: Optional[int] = None
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # 报告文件清理时间
+
+
+class ReportJobResponse(BaseModel):
+    """报告任务响应"""
+    code: int = 0
+    message: str = "success"
+    data: Optional[ReportJobStatus] = None
@@ -33,6 +33,10 @@ class UploadTaskStatus(BaseModel):
     ra_detail: Optional[FileInfo] = None
     ra_row: Optional[FileInfo] = None
     
+    detail_load_mode: Optional[str] = None
+    row_load_mode: Optional[str] = None
+    odm_map_inserted: Optional[int] = None
+    odm_map_removed: Optional[int] = None
     error_message: Optional[str] = None
     created_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
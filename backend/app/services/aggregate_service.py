@@ -0,0 +1,160 @@
+"""
+预聚合表维护服务
+
+- ROW 月度聚合：agg_ifir_row_month / agg_ra_row_month 按 (月, segment, supplier_new, model, plant) 预先汇总分子分母
+- DETAIL Top Issue 汇总：agg_ifir_detail_issue / agg_ra_detail_issue 按 (月, model, plant, segment, segment2, fault_category) 计数
+- ETL 写入后只重算涉及的月份（DELETE + INSERT ... SELECT，同一事务）
+- check_consistency 按月比对聚合表与源表的合计
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.models.tables import (
+    AggIfirDetailIssue, AggIfirRowMonth, AggRaDetailIssue, AggRaRowMonth,
+    FactIfirDetail, FactIfirRow, FactRaDetail, FactRaRow,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _AggregateSpec:
+    """
+    一张聚合表与其源表的对应关系
+    measures: [(聚合表字段, 源表汇总表达式)]，一致性检查时聚合表一侧对字段求和
+    """
+
+    def __init__(self, name: str, fact_model, agg_model, month_key: str, dims: List[str],
+                 measures: List[tuple], fact_filter: str = ""):
+        self.name = name
+        self.fact_table = fact_model.__tablename__
+        self.agg_table = agg_model.__tablename__
+        self.month_key = month_key
+        self.dims = [month_key] + dims
+        self.measures = measures
+        self.fact_filter = f"{month_key} IS NOT NULL" + (f" AND {fact_filter}" if fact_filter else "")
+
+
+_ROW_DIMS = ["segment", "supplier_new", "model", "plant"]
+_ISSUE_DIMS = ["model", "plant", "segment", "segment2", "fault_category"]
+
+AGGREGATE_SPECS = {
+    "IFIR": _AggregateSpec(
+        "IFIR", FactIfirRow, AggIfirRowMonth, "delivery_month", _ROW_DIMS,
+        [("box_claim", "SUM(box_claim)"), ("box_mm", "SUM(box_mm)"), ("row_count", "COUNT(*)")]
+    ),
+    "RA": _AggregateSpec(
+        "RA", FactRaRow, AggRaRowMonth, "claim_month", _ROW_DIMS,
+        [("ra_claim", "SUM(ra_claim)"), ("ra_mm", "SUM(ra_mm)"), ("row_count", "COUNT(*)")]
+    ),
+    "IFIR_ISSUE": _AggregateSpec(
+        "IFIR_ISSUE", FactIfirDetail, AggIfirDetailIssue, "delivery_month", _ISSUE_DIMS,
+        [("issue_count", "COUNT(*)")], fact_filter="fault_category IS NOT NULL"
+    ),
+    "RA_ISSUE": _AggregateSpec(
+        "RA_ISSUE", FactRaDetail, AggRaDetailIssue, "claim_month", _ISSUE_DIMS,
+        [("issue_count", "COUNT(*)")], fact_filter="fault_category IS NOT NULL"
+    ),
+}
+
+# ROW 文件类型 -> 聚合名称
+FILE_TYPE_KPI = {"ifir_row": "IFIR", "ra_row": "RA"}
+
+# DETAIL 表 -> 聚合名称
+DETAIL_ISSUE_SPECS = {"fact_ifir_detail": "IFIR_ISSUE", "fact_ra_detail": "RA_ISSUE"}
+
+
+class AggregateService:
+    """预聚合表维护"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refresh_batch(self, name: str, batch_id: str) -> List[date]:
+        """重算某个 ETL 批次涉及的月份（源表需有 etl_batch_id），返回重算的月份列表"""
+        spec = AGGREGATE_SPECS[name]
+        months = [row[0] for row in self.db.execute(text(
+            f"SELECT DISTINCT {spec.month_key} FROM {spec.fact_table} "
+            f"WHERE etl_batch_id = :batch_id AND {spec.month_key} IS NOT NULL"
+        ), {"batch_id": batch_id})]
+        self.refresh_months(name, months)
+        return months
+
+    def refresh_months(self, name: str, months: Iterable[date]):
+        """按月整体重算聚合数据（同一事务内删除旧汇总并写入新汇总）"""
+        months = sorted(m for m in set(months) if m is not None)
+        if not months:
+            return
+        spec = AGGREGATE_SPECS[name]
+        month_filter = f"{spec.month_key} IN :months"
+        try:
+            self.db.execute(
+                text(f"DELETE FROM {spec.agg_table} WHERE {month_filter}").bindparams(
+                    bindparam("months", expanding=True)
+                ),
+                {"months": months}
+            )
+            self.db.execute(
+                text(self._insert_select_sql(spec, f"{spec.fact_filter} AND {month_filter}")).bindparams(
+                    bindparam("months", expanding=True)
+                ),
+                {"months": months}
+            )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        logger.info(f"[AGG] {name} 聚合已重算, 月份数: {len(months)}")
+
+    def rebuild_all(self, name: Optional[str] = None):
+        """全量重建聚合表（初始化或修复用）"""
+        for spec in self._specs(name):
+            try:
+                self.db.execute(text(f"DELETE FROM {spec.agg_table}"))
+                self.db.execute(text(self._insert_select_sql(spec, spec.fact_filter)))
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            logger.info(f"[AGG] {spec.name} 聚合表全量重建完成")
+
+    def check_consistency(self, name: Optional[str] = None) -> Dict[str, list]:
+        """
+        按月比对聚合表与源表的各项合计。
+        返回 聚合名称 -> 不一致月份列表（为空表示一致）；每项包含月份及两边的合计。
+        """
+        result = {}
+        for spec in self._specs(name):
+            fact = self._monthly_totals(spec, spec.fact_table, [expr for _, expr in spec.measures],
+                                        spec.fact_filter)
+            agg = self._monthly_totals(spec, spec.agg_table, [f"SUM({col})" for col, _ in spec.measures],
+                                       f"{spec.month_key} IS NOT NULL")
+            mismatches = []
+            for month in sorted(set(fact) | set(agg)):
+                if fact.get(month) != agg.get(month):
+                    mismatches.append({"month": month, "fact": fact.get(month), "agg": agg.get(month)})
+            result[spec.name] = mismatches
+            logger.info(f"[AGG] {spec.name} 一致性检查: 月份 {len(fact)}, 不一致 {len(mismatches)}")
+        return result
+
+    def _specs(self, name: Optional[str]) -> List[_AggregateSpec]:
+        return [AGGREGATE_SPECS[name]] if name else list(AGGREGATE_SPECS.values())
+
+    def _insert_select_sql(self, spec: _AggregateSpec, where: str) -> str:
+        dims = ", ".join(spec.dims)
+        columns = ", ".join(col for col, _ in spec.measures)
+        exprs = ", ".join(expr for _, expr in spec.measures)
+        return (
+            f"INSERT INTO {spec.agg_table} ({dims}, {columns}) "
+            f"SELECT {dims}, {exprs} FROM {spec.fact_table} WHERE {where} GROUP BY {dims}"
+        )
+
+    def _monthly_totals(self, spec: _AggregateSpec, table: str, exprs: List[str], where: str) -> dict:
+        rows = self.db.execute(text(
+            f"SELECT {spec.month_key}, {', '.join(exprs)} FROM {table} "
+            f"WHERE {where} GROUP BY {spec.month_key}"
+        )).all()
+        return {row[0]: tuple(int(v or 0) for v in row[1:]) for row in rows}
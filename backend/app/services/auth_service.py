@@ -9,7 +9,7 @@ from sqlalchemy import or_
 
 from app.models.tables import User
 from app.schemas.auth import UserCreate, UserUpdate
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password, invalidate_principal, verify_and_update_password
 from passlib.exc import UnknownHashError
 
 
@@ -24,19 +24,24 @@ class AuthService:
         return self.db.query(User).filter(User.id == user_id).first()
 
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        """Check credentials (bcrypt: call from the auth executor, see run_auth)."""
         user = self.get_user_by_username(username)
         if not user:
             return None
         try:
-            if not verify_password(password, user.hashed_password):
-                return None
+            valid, new_hash = verify_and_update_password(password, user.hashed_password)
         except UnknownHashError:
             # Legacy/plaintext password fallback; upgrade to bcrypt after first successful login.
-            if password != user.hashed_password:
-                return None
-            user.hashed_password = hash_password(password)
+            valid = password == user.hashed_password
+            new_hash = hash_password(password) if valid else None
+        if not valid:
+            return None
+        if new_hash:
+            # Plaintext or hashed with a different AUTH_BCRYPT_ROUNDS: store the new hash.
+            user.hashed_password = new_hash
             self.db.commit()
             self.db.refresh(user)
+            invalidate_principal(user.username)
         return user
 
     def list_users(
@@ -83,6 +88,7 @@ class AuthService:
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
+        invalidate_principal(user.username)
         return user
 
     def update_user(self, user: User, data: UserUpdate) -> User:
@@ -100,12 +106,21 @@ class AuthService:
 
         self.db.commit()
         self.db.refresh(user)
+        invalidate_principal(user.username)
         return user
 
     def set_password(self, user: User, new_password: str) -> User:
         user.hashed_password = hash_password(new_password)
         self.db.commit()
         self.db.refresh(user)
+        invalidate_principal(user.username)
+        return user
+
+    def deactivate_user(self, user: User) -> User:
+        user.is_active = False
+        self.db.commit()
+        self.db.refresh(user)
+        invalidate_principal(user.username)
         return user
 
     def ensure_default_admin(
@@ -0,0 +1,221 @@
+"""
+筛选项维度索引
+
+- 每个 KPI 在进程内保存 ROW 数据源中出现过的 (segment, supplier_new, model) 组合与全局月份范围，
+  筛选项接口（/ifir/options、/ra/options）在内存中按任意 Segment / ODM / Model 组合过滤，不查询数据库
+- 每个取值对应含该取值的组合序号集合，过滤即集合的并 / 交运算，耗时与命中的组合数成正比
+- 数据版本（已结束的上传任务数与最近完成时间，与分析缓存相同）每 KPI_DIMENSION_INDEX_CHECK_SECONDS 检查一次，变化时
+  与索引已反映的任务（导入了本 KPI ROW 文件的已结束任务 id 与完成时间）比对，不依赖完成时间的先后：
+  - 没有新结束的 ROW 任务：只更新版本
+  - 均为 upsert 方式成功导入（ROW 只增不删）：按 etl_batch_id 查出这些批次的组合并入索引
+  - 其他情况（replace_months 会删除月份数据、任务失败可能只写入一部分）：全量重建
+- 检查与重建由一个请求完成，其余请求继续使用当前索引；首次构建时并发请求等待同一次构建
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.core.config import get_settings
+from app.models.tables import UploadTask
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("segment", "supplier_new", "model")
+
+
+class DimensionIndex:
+    """一个 KPI 的维度组合快照，构建后只读"""
+
+    def __init__(self, combos: Iterable[Tuple], month_min: str, month_max: str, version: str):
+        self.combos: List[Tuple] = list(dict.fromkeys(combos))
+        self.month_min = month_min
+        self.month_max = month_max
+        self.version = version
+        # 每个维度：取值 -> 含该取值的组合序号集合
+        self.ids: Tuple[Dict[str, frozenset], ...] = tuple({} for _ in DIMENSIONS)
+        positions = tuple({} for _ in DIMENSIONS)
+        for i, combo in enumerate(self.combos):
+            for dim_positions, value in zip(positions, combo):
+                if value is not None:
+                    dim_positions.setdefault(value, []).append(i)
+        for dim_ids, dim_positions in zip(self.ids, positions):
+            dim_ids.update((value, frozenset(p)) for value, p in dim_positions.items())
+        self.values: Tuple[List[str], ...] = tuple(sorted(dim_ids) for dim_ids in self.ids)
+
+    def patched(self, combos: Iterable[Tuple], month_min: str, month_max: str, version: str) -> "DimensionIndex":
+        """并入新批次的组合与月份范围，返回新的快照"""
+        months_min = [m for m in (self.month_min, month_min) if m]
+        months_max = [m for m in (self.month_max, month_max) if m]
+        return DimensionIndex(
+            self.combos + list(combos),
+            min(months_min) if months_min else "",
+            max(months_max) if months_max else "",
+            version,
+        )
+
+    def options(self, segments=None, odms=None, models=None) -> dict:
+        """筛选项：每个维度的取值按其他两个维度的已选项过滤（与 KpiEngine._get_options 结果一致）"""
+        selected = (segments, odms, models)
+        lists = []
+        for dim in range(len(DIMENSIONS)):
+            candidates = self._candidates(selected, skip=dim)
+            if candidates is None:
+                lists.append(list(self.values[dim]))
+            else:
+                present = {self.combos[i][dim] for i in candidates}
+                present.discard(None)
+                lists.append(sorted(present))
+        return {
+            "month_min": self.month_min,
+            "month_max": self.month_max,
+            "data_as_of": self.month_max,
+            "time_range": {"min_month": self.month_min, "max_month": self.month_max},
+            "segments": lists[0],
+            "odms": lists[1],
+            "models": lists[2],
+        }
+
+    def _candidates(self, selected, skip: int) -> Optional[set]:
+        """除 skip 外各维度已选项对应组合的交集，没有过滤条件时返回 None"""
+        result = None
+        for dim, values in enumerate(selected):
+            if dim == skip or not values:
+                continue
+            ids = self.ids[dim]
+            matched = set().union(*(ids.get(value, ()) for value in values))
+            result = matched if result is None else result & matched
+            if not result:
+                break
+        return result
+
+
+class _IndexSlot:
+    """一个 KPI + 数据源的当前索引与检查状态"""
+
+    def __init__(self):
+        self.index: Optional[DimensionIndex] = None
+        self.checked_at = float("-inf")
+        self.lock = threading.Lock()
+        # 索引已反映的 ROW 任务：upload_task.id -> completed_at
+        self.tasks: Dict[int, datetime] = {}
+        self.builds = 0
+        self.patches = 0
+
+
+_slots: Dict[Tuple[str, str], _IndexSlot] = {}
+_slots_lock = threading.Lock()
+
+
+def get_dimension_index(engine) -> DimensionIndex:
+    """
+    返回 engine（KpiEngine）所属 KPI 与数据源的维度索引；
+    距上次检查超过 KPI_DIMENSION_INDEX_CHECK_SECONDS 时先比对数据版本并重建或增量并入
+    """
+    key = (engine.metric.name, engine.row_source.__tablename__)
+    with _slots_lock:
+        slot = _slots.setdefault(key, _IndexSlot())
+    check_seconds = get_settings().KPI_DIMENSION_INDEX_CHECK_SECONDS
+    if slot.index is not None and time.monotonic() - slot.checked_at < check_seconds:
+        return slot.index
+    # 已有索引时由一个请求检查，其余请求沿用当前索引
+    if not slot.lock.acquire(blocking=slot.index is None):
+        return slot.index
+    try:
+        if slot.index is None or time.monotonic() - slot.checked_at >= check_seconds:
+            _refresh(slot, engine)
+        return slot.index
+    finally:
+        slot.lock.release()
+
+
+def clear_dimension_indexes():
+    """丢弃全部索引，下次请求时重建"""
+    with _slots_lock:
+        _slots.clear()
+
+
+def _refresh(slot: _IndexSlot, engine):
+    version = engine.data_version()
+    current = slot.index
+    if current is not None and version == current.version:
+        slot.checked_at = time.monotonic()
+        return
+    # 先查任务再查组合：两次查询之间结束的批次下次检查时会再并入一次（并入是幂等的）
+    tasks = _finished_row_tasks(engine)
+    batches = None if current is None else _new_row_batches(tasks, slot.tasks)
+    if batches is None:
+        slot.index = _build(engine, version)
+        slot.builds += 1
+    elif batches:
+        slot.index = current.patched(*_query_combos(engine, batches), version)
+        slot.patches += 1
+        logger.info(f"[KPI] {engine.metric.name} 筛选项索引并入批次 {batches}，组合 {len(slot.index.combos)} 个")
+    else:
+        current.version = version
+    slot.tasks = {task_pk: task[3] for task_pk, task in tasks.items()}
+    slot.checked_at = time.monotonic()
+
+
+def _build(engine, version: str) -> DimensionIndex:
+    start = time.perf_counter()
+    combos, month_min, month_max = _query_combos(engine)
+    index = DimensionIndex(combos, month_min, month_max, version)
+    logger.info(
+        f"[KPI] {engine.metric.name} 筛选项索引构建完成: 组合 {len(index.combos)} 个, "
+        f"数据版本 {version or '-'}, 耗时 {time.perf_counter() - start:.3f}s"
+    )
+    return index
+
+
+def _finished_row_tasks(engine) -> Dict[int, tuple]:
+    """导入了本 KPI ROW 文件的已结束任务：upload_task.id -> (批次号, 状态, ROW 导入方式, 完成时间)"""
+    file_column = getattr(UploadTask, f"{engine.metric.name.lower()}_row_file")
+    rows = engine.db.query(
+        UploadTask.id, UploadTask.task_id, UploadTask.status, UploadTask.row_load_mode, UploadTask.completed_at
+    ).filter(UploadTask.completed_at.isnot(None), file_column.isnot(None)).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def _new_row_batches(tasks: Dict[int, tuple], applied: Dict[int, datetime]) -> Optional[List[str]]:
+    """
+    索引尚未反映的任务（新结束，或回收判失败后又由原 worker 完成、完成时间变化）的批次号；
+    存在无法增量并入的任务（失败、replace_months）时返回 None
+    """
+    batches = []
+    for task_pk, (task_id, status, row_load_mode, completed_at) in tasks.items():
+        if applied.get(task_pk) == completed_at:
+            continue
+        if status != "completed" or (row_load_mode or "upsert") != "upsert":
+            return None
+        batches.append(task_id)
+    return batches
+
+
+def _query_combos(engine, batches: Optional[List[str]] = None) -> tuple:
+    """查询 (segment, supplier_new, model) 组合与月份范围；batches 不为空时只查这些批次的 ROW 明细"""
+    if batches:
+        source = engine.metric.row_model
+    else:
+        source = engine.row_source
+    month_column = engine._month_of(source)
+    query = engine.db.query(
+        source.segment, source.supplier_new, source.model,
+        func.min(month_column), func.max(month_column),
+    )
+    if batches:
+        query = query.filter(source.etl_batch_id.in_(batches))
+        if source is not engine.row_source:
+            # 聚合表不含时间为空的行
+            query = query.filter(month_column.isnot(None))
+    rows = query.group_by(source.segment, source.supplier_new, source.model).all()
+    months_min = [r[3] for r in rows if r[3] is not None]
+    months_max = [r[4] for r in rows if r[4] is not None]
+    return (
+        [tuple(r[:3]) for r in rows],
+        engine.format_month(min(months_min)) if months_min else "",
+        engine.format_month(max(months_max)) if months_max else "",
+    )
@@ -0,0 +1,117 @@
+"""
+DETAIL 批量导入 - LOAD DATA LOCAL INFILE 写入临时表，再一次性 INSERT ... SELECT 合并到事实表
+
+流程：
+1. 列式数据逐批追加到本地临时 TSV 文件
+2. 同一事务内：CREATE TEMPORARY TABLE stg LIKE fact → LOAD DATA → INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+3. 任一步骤失败整体回滚，事实表保持导入前状态
+
+要求 MySQL 服务端 local_infile=ON，且后端设置 DB_LOCAL_INFILE=true。
+"""
+import logging
+import os
+import tempfile
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# TSV 中的 NULL 标记（LOAD DATA 默认 ESCAPED BY '\\' 时识别）
+_TSV_NULL = "\\N"
+
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _tsv_value(value) -> str:
+    """单个取值转换为 LOAD DATA 可识别的 TSV 字段"""
+    if value is None:
+        return _TSV_NULL
+    if isinstance(value, str):
+        return value.translate(_TSV_ESCAPES)
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class DetailBulkLoader:
+    """
+    DETAIL 批量导入器
+
+    - append() 可多次调用（流式模式每块一次），同一主键后写入的行覆盖先写入的行
+    - load() 执行导入并提交事务，返回临时表行数
+    - cleanup() 删除临时文件，调用方应在 finally 中执行
+    """
+
+    # 由数据库默认值维护的列，不从文件写入
+    _SKIP_COLUMNS = ("load_ts",)
+
+    def __init__(self, db: Session, model, label: str):
+        self.db = db
+        self.label = label
+        self.table = model.__tablename__
+        self.columns: List[str] = [
+            col.name for col in model.__table__.columns if col.name not in self._SKIP_COLUMNS
+        ]
+        self.key_columns = [col.name for col in model.__table__.primary_key.columns]
+        self.rows_written = 0
+        handle = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", newline="", suffix=".tsv", prefix="etl_bulk_", delete=False
+        )
+        self.path = handle.name
+        self._file = handle
+
+    def append(self, columns: dict, total: int):
+        """按列式数据追加 total 行到临时文件"""
+        values = [columns.get(name, [None] * total) for name in self.columns]
+        self._file.writelines(
+            "\t".join(_tsv_value(col[i]) for col in values) + "\n" for i in range(total)
+        )
+        self.rows_written += total
+        logger.info(f"[{self.label}] 已写入临时文件: {self.rows_written} 行")
+
+    def load(self) -> int:
+        """LOAD DATA 写入临时表并合并到事实表（单事务）"""
+        self._file.close()
+        staging = f"stg_{self.table}"
+        column_list = ", ".join(self.columns)
+        select_list = ", ".join(f"s.{name}" for name in self.columns)
+        update_list = ", ".join(
+            f"{name} = s.{name}" for name in self.columns if name not in self.key_columns
+        )
+
+        try:
+            self.db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+            self.db.execute(text(f"CREATE TEMPORARY TABLE {staging} LIKE {self.table}"))
+            # REPLACE：文件内主键重复时保留最后写入的行，与 upsert 模式的覆盖语义一致
+            loaded = self.db.execute(text(
+                f"LOAD DATA LOCAL INFILE :path REPLACE INTO TABLE {staging} "
+                f"CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ({column_list})"
+            ), {"path": self.path}).rowcount
+            logger.info(f"[{self.label}] LOAD DATA 完成: {loaded}")
+
+            self.db.execute(text(
+                f"INSERT INTO {self.table} ({column_list}) "
+                f"SELECT {select_list} FROM {staging} AS s "
+                f"ON DUPLICATE KEY UPDATE {update_list}"
+            ))
+            rows = self.db.execute(text(f"SELECT COUNT(*) FROM {staging}")).scalar()
+            self.db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        logger.info(f"[{self.label}] 批量合并完成: {rows} 行")
+        return rows
+
+    def cleanup(self):
+        """关闭并删除临时文件"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,135 @@
+"""
+ETL任务队列 - 基于 upload_task 表的持久化队列（领取 + 租约）
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.tables import UploadTask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# upload_task 中各文件路径字段对应的文件类型
+FILE_TYPES = ["ifir_row", "ifir_detail", "ra_row", "ra_detail"]
+
+
+def _reset_file_values() -> dict:
+    """各文件的状态与行数恢复为上传时的初始值：有文件为 pending，无文件为空"""
+    values = {}
+    for file_type in FILE_TYPES:
+        file_column = getattr(UploadTask, f"{file_type}_file")
+        values[f"{file_type}_status"] = case((file_column.isnot(None), "pending"), else_=None)
+        values[f"{file_type}_rows"] = None
+    return values
+
+
+class EtlQueue:
+    """
+    ETL任务队列
+
+    - 上传接口写入 status=queued 的任务即为入队
+    - worker 通过条件更新领取任务（status queued -> processing），同一任务只会被一个 worker 领到
+    - 处理期间 worker 定期续租；租约过期的 processing 任务会被重新排队或在超过重试次数后置为失败
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def claim_next(self, owner: str) -> Optional[str]:
+        """领取最早入队的任务，返回 task_id；没有可领取任务时返回 None"""
+        while True:
+            candidate = self.db.query(UploadTask.id, UploadTask.task_id).filter(
+                UploadTask.status == "queued"
+            ).order_by(UploadTask.created_at, UploadTask.id).first()
+            if not candidate:
+                self.db.commit()
+                return None
+
+            now = datetime.now()
+            result = self.db.execute(
+                update(UploadTask)
+                .where(UploadTask.id == candidate.id, UploadTask.status == "queued")
+                .values(
+                    status="processing",
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=settings.ETL_LEASE_SECONDS),
+                    attempts=UploadTask.attempts + 1,
+                )
+            )
+            self.db.commit()
+            if result.rowcount == 1:
+                logger.info(f"[ETL] 任务已领取: {candidate.task_id}, worker: {owner}")
+                return candidate.task_id
+            # 被其他 worker 抢先领取，继续找下一个
+
+    def renew_lease(self, task_id: str, owner: str) -> bool:
+        """续租，返回 False 表示租约已不属于当前 worker"""
+        result = self.db.execute(
+            update(UploadTask)
+            .where(
+                UploadTask.task_id == task_id,
+                UploadTask.lease_owner == owner,
+                UploadTask.status == "processing",
+            )
+            .values(lease_expires_at=datetime.now() + timedelta(seconds=settings.ETL_LEASE_SECONDS))
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def release(self, task_id: str, owner: str):
+        """任务结束后释放租约"""
+        self.db.execute(
+            update(UploadTask)
+            .where(UploadTask.task_id == task_id, UploadTask.lease_owner == owner)
+            .values(lease_owner=None, lease_expires_at=None)
+        )
+        self.db.commit()
+
+    def requeue_expired(self) -> int:
+        """
+        回收租约过期的 processing 任务：未超过重试次数的重新排队，否则置为失败。
+        重新排队时各文件状态恢复为 pending（无该文件时为空）、行数清空，与新上传的任务一致。
+        lease_expires_at 为空的 processing 任务来自旧的线程模式，同样视为已失联。
+        返回重新排队的任务数。
+        """
+        now = datetime.now()
+        expired = or_(UploadTask.lease_expires_at < now, UploadTask.lease_expires_at.is_(None))
+
+        failed = self.db.execute(
+            update(UploadTask)
+            .where(UploadTask.status == "processing", expired,
+                   UploadTask.attempts >= settings.ETL_MAX_ATTEMPTS)
+            .values(
+                status="failed",
+                error_message=f"处理中断且已达到最大重试次数({settings.ETL_MAX_ATTEMPTS})",
+                lease_owner=None,
+                lease_expires_at=None,
+                completed_at=now,
+            )
+        ).rowcount
+        requeued = self.db.execute(
+            update(UploadTask)
+            .where(UploadTask.status == "processing", expired)
+            .values(status="queued", progress=0, lease_owner=None, lease_expires_at=None, **_reset_file_values())
+        ).rowcount
+        self.db.commit()
+
+        if failed or requeued:
+            logger.warning(f"[ETL] 回收过期任务: 重新排队 {requeued} 个, 置为失败 {failed} 个")
+        return requeued
+
+    def get_task_files(self, task_id: str) -> dict:
+        """从任务记录还原文件列表 {file_type: file_path}"""
+        task = self.db.query(UploadTask).filter(UploadTask.task_id == task_id).first()
+        if not task:
+            return {}
+        return {
+            file_type: getattr(task, f"{file_type}_file")
+            for file_type in FILE_TYPES
+            if getattr(task, f"{file_type}_file")
+        }
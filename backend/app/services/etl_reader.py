@@ -0,0 +1,215 @@
+"""
+ETL 文件读取 - 按内容识别格式（xlsx / xls / csv / csv.gz / parquet），支持整表与按块读取
+
+text_columns 指定的列（按去除首尾空格后的表头匹配）固定按文本读取，不做类型推断：
+整表与按块读取、各块之间结果一致（如 "1004" 不会因同列存在空值被推断为浮点数而变成 "1004.0"）
+"""
+import logging
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+logger = logging.getLogger(__name__)
+
+
+def _convert_cell(cell):
+    """单元格取值转换，与 pandas.read_excel(openpyxl) 的规则保持一致"""
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == "e":
+        return np.nan
+    if cell.data_type == "n":
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return float(value)
+    return value
+
+
+def _text_dtype(header: Iterable, text_columns: Optional[Iterable[str]]) -> dict:
+    """表头中属于 text_columns 的列 -> str（读取函数的 dtype 参数）"""
+    if not text_columns:
+        return {}
+    wanted = set(text_columns)
+    return {col: str for col in header if str(col).strip() in wanted}
+
+
+def _to_frame(header: List, rows: List[List], dtype: dict) -> pd.DataFrame:
+    """用与 read_excel 相同的 TextParser 把原始行转换为 DataFrame（空值识别、类型推断一致）"""
+    width = len(header)
+    padded = [row + [""] * (width - len(row)) if len(row) < width else row[:width] for row in rows]
+    parser = TextParser([header] + padded, header=0, dtype=dtype)
+    try:
+        return parser.read()
+    finally:
+        parser.close()
+
+
+def iter_excel_chunks(file_path: str, chunk_size: int,
+                      text_columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    按块读取 Excel 首个工作表，每次产出不超过 chunk_size 行的 DataFrame。
+
+    - 首个非空行作为表头，与 pd.read_excel 默认行为一致
+    - 整行为空的行直接跳过
+    - text_columns 按文本读取；其余列每块独立做类型推断，调用方不应依赖这些列跨块一致的 dtype
+    """
+    # 以文件对象打开，openpyxl 不再按扩展名校验（上传文件名的扩展名不可信）
+    with open(file_path, "rb") as handle:
+        workbook = load_workbook(handle, read_only=True, data_only=True, keep_links=False)
+        try:
+            sheet = workbook.worksheets[0]
+            sheet.reset_dimensions()
+
+            header = None
+            dtype = {}
+            buffer: List[List] = []
+            for row in sheet.iter_rows():
+                values = [_convert_cell(cell) for cell in row]
+                while values and values[-1] == "":
+                    values.pop()
+                if not values:
+                    continue
+                if header is None:
+                    header = values
+                    dtype = _text_dtype(header, text_columns)
+                    continue
+                buffer.append(values)
+                if len(buffer) >= chunk_size:
+                    yield _to_frame(header, buffer, dtype)
+                    buffer = []
+
+            if header is None:
+                logger.warning(f"[ETL] 文件为空: {file_path}")
+                return
+            if buffer:
+                yield _to_frame(header, buffer, dtype)
+        finally:
+            workbook.close()
+
+
+# ==================== 多格式读取 ====================
+
+# 文件头魔数 -> 格式
+_MAGIC_FORMATS = [
+    (b"PK\x03\x04", "xlsx"),
+    (b"\x1f\x8b", "csv_gz"),
+    (b"PAR1", "parquet"),
+    (b"\xd0\xcf\x11\xe0", "xls"),
+]
+
+SUPPORTED_FORMATS = ["xlsx", "xls", "csv", "csv_gz", "parquet"]
+
+# CSV 统一按 UTF-8 读取（兼容 Excel 导出的 BOM）
+CSV_ENCODING = "utf-8-sig"
+
+# read_excel / read_csv 默认识别为空值的字符串（pandas 文档中的默认 na_values）。
+# parquet 保留原始字符串，需按同一规则处理，否则 "NA" 等取值会与 Excel 导入结果不一致。
+DEFAULT_NA_STRINGS = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+]
+
+
+def detect_file_format(file_path: str) -> str:
+    """
+    根据文件内容（而非扩展名）识别格式。
+    无法识别的二进制文件抛出 ValueError；其余按 UTF-8 文本视为 CSV。
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(4096)
+
+    for magic, fmt in _MAGIC_FORMATS:
+        if head.startswith(magic):
+            return fmt
+
+    if not head:
+        raise ValueError("文件为空")
+    if b"\x00" in head:
+        raise ValueError("无法识别的文件格式")
+    try:
+        # 截断位置可能落在多字节字符中间，忽略末尾不完整的字节
+        head.decode(CSV_ENCODING, errors="strict")
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:
+            raise ValueError("无法识别的文件格式（CSV 需为 UTF-8 编码）")
+    return "csv"
+
+
+def read_table(file_path: str, text_columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """整表读取，按内容识别格式；text_columns 按文本读取"""
+    fmt = detect_file_format(file_path)
+    logger.info(f"[ETL] 文件格式: {fmt} -> {file_path}")
+    if fmt in ("xlsx", "xls"):
+        return pd.read_excel(file_path, dtype=_header_text_dtype(fmt, file_path, text_columns))
+    if fmt in ("csv", "csv_gz"):
+        return pd.read_csv(file_path, encoding=CSV_ENCODING, compression=_csv_compression(fmt),
+                           dtype=_header_text_dtype(fmt, file_path, text_columns))
+    return _parquet_text(_apply_default_na(pd.read_parquet(file_path)), text_columns)
+
+
+def _apply_default_na(df: pd.DataFrame) -> pd.DataFrame:
+    """文本列按 DEFAULT_NA_STRINGS 置空，与 Excel / CSV 的空值识别保持一致"""
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].mask(df[col].isin(DEFAULT_NA_STRINGS))
+    return df
+
+
+def _csv_compression(fmt: str) -> Optional[str]:
+    return "gzip" if fmt == "csv_gz" else None
+
+
+def _header_text_dtype(fmt: str, file_path: str, text_columns: Optional[Iterable[str]]) -> Optional[dict]:
+    """读取表头（不读数据行），返回 text_columns 对应的 dtype；未指定时返回 None（保持类型推断）"""
+    if not text_columns:
+        return None
+    if fmt in ("xlsx", "xls"):
+        header = pd.read_excel(file_path, nrows=0).columns
+    else:
+        header = pd.read_csv(file_path, encoding=CSV_ENCODING, compression=_csv_compression(fmt), nrows=0).columns
+    return _text_dtype(header, text_columns)
+
+
+def _format_text_value(value):
+    """parquet 数值列按 Excel 读取的规则转为文本：整数值的浮点数不带 .0"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _parquet_text(df: pd.DataFrame, text_columns: Optional[Iterable[str]]) -> pd.DataFrame:
+    """parquet 列类型来自文件 schema，text_columns 中的非文本列转为文本（空值保持为空）"""
+    for col in _text_dtype(df.columns, text_columns):
+        if df[col].dtype != object:
+            df[col] = df[col].map(_format_text_value, na_action="ignore").astype(object)
+    return df
+
+
+def iter_table_chunks(file_path: str, chunk_size: int,
+                      text_columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """按块读取，按内容识别格式；xls 无法流式解析，整表读取后切块；text_columns 按文本读取"""
+    fmt = detect_file_format(file_path)
+    logger.info(f"[ETL] 文件格式: {fmt} (流式) -> {file_path}")
+    if fmt == "xlsx":
+        yield from iter_excel_chunks(file_path, chunk_size, text_columns)
+    elif fmt in ("csv", "csv_gz"):
+        with pd.read_csv(file_path, encoding=CSV_ENCODING, compression=_csv_compression(fmt),
+                         dtype=_header_text_dtype(fmt, file_path, text_columns),
+                         chunksize=chunk_size) as reader:
+            yield from reader
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield _parquet_text(_apply_default_na(batch.to_pandas()), text_columns)
+    else:
+        df = pd.read_excel(file_path, dtype=_header_text_dtype(fmt, file_path, text_columns))
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
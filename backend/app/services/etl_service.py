@@ -1,23 +1,34 @@
 """
-ETL服务 - 处理Excel文件导入
+ETL服务 - 处理数据文件导入（xlsx / csv / csv.gz / parquet）
 """
 import hashlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import String, bindparam, text
 from sqlalchemy.dialects.mysql import insert as mysql_insert
 
+from app.core.config import get_settings
+from app.core.database import EtlSessionLocal
 from app.models.tables import (
     UploadTask, FactIfirRow, FactIfirDetail, 
     FactRaRow, FactRaDetail, MapOdmToPlant
 )
+from app.services.aggregate_service import (
+    AGGREGATE_SPECS, DETAIL_ISSUE_SPECS, FILE_TYPE_KPI, AggregateService,
+)
+from app.services.etl_bulk_loader import DetailBulkLoader
+from app.services.etl_reader import iter_table_chunks, read_table
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class EtlService:
@@ -26,6 +37,14 @@ class EtlService:
     def __init__(self, db: Session):
         self.db = db
     
+    # 文件类型 -> 处理方法名，顺序即串行模式下的处理顺序
+    _FILE_PROCESSORS = {
+        "ifir_row": "_process_ifir_row",
+        "ifir_detail": "_process_ifir_detail",
+        "ra_row": "_process_ra_row",
+        "ra_detail": "_process_ra_detail",
+    }
+
     def process_upload_task(self, task_id: str, files: dict):
         """处理上传任务"""
         logger.info(f"[ETL] 开始处理任务: {task_id}")
@@ -41,48 +60,24 @@ class EtlService:
         self.db.commit()
         logger.info(f"[ETL] 任务状态更新为 processing")
         
-        total_files = len(files)
-        processed = 0
+        jobs = [(file_type, files[file_type]) for file_type in self._FILE_PROCESSORS if file_type in files]
+        workers = min(settings.ETL_PARALLEL_WORKERS, len(jobs))
         
         try:
             # 处理各个文件
-            if "ifir_row" in files:
-                logger.info(f"[ETL] 开始处理 IFIR ROW: {files['ifir_row']}")
-                self._process_ifir_row(task, files["ifir_row"])
-                processed += 1
-                task.progress = int(processed / total_files * 100)
-                self.db.commit()
-                logger.info(f"[ETL] IFIR ROW 处理完成, 进度: {task.progress}%")
-            
-            if "ifir_detail" in files:
-                logger.info(f"[ETL] 开始处理 IFIR DETAIL: {files['ifir_detail']}")
-                self._process_ifir_detail(task, files["ifir_detail"])
-                processed += 1
-                task.progress = int(processed / total_files * 100)
-                self.db.commit()
-                logger.info(f"[ETL] IFIR DETAIL 处理完成, 进度: {task.progress}%")
-            
-            if "ra_row" in files:
-                logger.info(f"[ETL] 开始处理 RA ROW: {files['ra_row']}")
-                self._process_ra_row(task, files["ra_row"])
-                processed += 1
-                task.progress = int(processed / total_files * 100)
-                self.db.commit()
-                logger.info(f"[ETL] RA ROW 处理完成, 进度: {task.progress}%")
-            
-            if "ra_detail" in files:
-                logger.info(f"[ETL] 开始处理 RA DETAIL: {files['ra_detail']}")
-                self._process_ra_detail(task, files["ra_detail"])
-                processed += 1
-                task.progress = int(processed / total_files * 100)
-                self.db.commit()
-                logger.info(f"[ETL] RA DETAIL 处理完成, 进度: {task.progress}%")
+            if workers > 1:
+                self._process_files_parallel(task, jobs, workers)
+            else:
+                self._process_files_serial(task, jobs)
             
-            # 更新ODM映射表
+            # 更新ODM映射表（所有文件写入完成后只刷新一次）
             logger.info("[ETL] 开始刷新ODM映射表")
-            self._refresh_odm_mapping()
+            self._refresh_odm_mapping(task, files)
             logger.info("[ETL] ODM映射表刷新完成")
             
+            # 重算本批次涉及月份的 ROW 聚合
+            self._refresh_row_aggregates(task, files)
+            
             task.status = "completed"
             task.progress = 100
             task.completed_at = datetime.now()
@@ -91,19 +86,87 @@ class EtlService:
             
         except Exception as e:
             logger.error(f"[ETL] 任务失败: {task_id}, 错误: {str(e)}", exc_info=True)
+            self._refresh_after_failure(task, files)
             task.status = "failed"
             task.error_message = str(e)
             task.completed_at = datetime.now()
             self.db.commit()
             raise
-    
+
+    def _refresh_after_failure(self, task: UploadTask, files: dict):
+        """
+        任务失败时按已提交的批次刷新 ODM 映射与 ROW 聚合：upsert 每批提交、并行模式下其他文件照常写入，
+        失败任务可能已写入部分 ROW 数据；两者都只按本批次增量刷新，之后的上传不会再补上这些批次。
+        刷新失败只记录日志，不掩盖原始错误。
+        """
+        for name, refresh in (("ODM映射", self._refresh_odm_mapping), ("ROW 聚合", self._refresh_row_aggregates)):
+            try:
+                refresh(task, files)
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"[ETL] 失败任务的{name}刷新失败: {task.task_id}, 错误: {str(e)}", exc_info=True)
+
+    def _process_files_serial(self, task: UploadTask, jobs: list):
+        """在当前会话中依次处理各文件，遇到失败立即中止"""
+        total_files = len(jobs)
+        for processed, (file_type, file_path) in enumerate(jobs, start=1):
+            label = file_type.upper().replace("_", " ")
+            logger.info(f"[ETL] 开始处理 {label}: {file_path}")
+            getattr(self, self._FILE_PROCESSORS[file_type])(task, file_path)
+            task.progress = int(processed / total_files * 100)
+            self.db.commit()
+            logger.info(f"[ETL] {label} 处理完成, 进度: {task.progress}%")
+
+    def _process_files_parallel(self, task: UploadTask, jobs: list, workers: int):
+        """
+        多进程并行处理各文件：每个文件在独立进程中解析、转换并用独立会话写库。
+        每完成一个文件即刷新任务进度；全部结束后汇总失败信息。
+        """
+        total_files = len(jobs)
+        for file_type, _ in jobs:
+            setattr(task, f"{file_type}_status", "processing")
+        self.db.commit()
+        logger.info(f"[ETL] 并行处理 {total_files} 个文件, 进程数: {workers}")
+
+        errors = []
+        processed = 0
+        # spawn 启动子进程，避免在多线程的 Web 进程中 fork
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(_process_file_in_worker, task.task_id, file_type, file_path): file_type
+                for file_type, file_path in jobs
+            }
+            for future in as_completed(futures):
+                file_type = futures[future]
+                label = file_type.upper().replace("_", " ")
+                # 子进程已提交各自的文件状态与行数，先刷新再更新整体进度
+                self.db.refresh(task)
+                try:
+                    error = future.result()
+                except Exception as e:
+                    # 子进程异常退出（如被系统杀掉），文件状态未能由子进程写回
+                    error = f"{label}处理失败: {str(e)}"
+                    setattr(task, f"{file_type}_status", "failed")
+                if error:
+                    errors.append(error)
+                    logger.error(f"[ETL] {label} 失败: {error}")
+
+                processed += 1
+                task.progress = int(processed / total_files * 100)
+                self.db.commit()
+                logger.info(f"[ETL] {label} 处理结束, 进度: {task.progress}%")
+
+        if errors:
+            raise Exception("; ".join(errors))
+
     # ==================== IFIR ROW ====================
     
     def _process_ifir_row(self, task: UploadTask, file_path: str):
         """处理IFIR ROW文件"""
         try:
-            df = pd.read_excel(file_path)
-            logger.info(f"[IFIR ROW] 读取Excel完成, 原始行数: {len(df)}")
+            df = read_table(file_path)
+            logger.info(f"[IFIR ROW] 读取文件完成, 原始行数: {len(df)}")
             
             # 字段映射
             column_map = {
@@ -140,50 +203,15 @@ class EtlService:
             df["box_mm"] = pd.to_numeric(df["box_mm"], errors="coerce").fillna(0).astype(int)
             
             # 计算content_hash
-            df["content_hash"] = df.apply(self._calc_ifir_row_hash, axis=1)
+            df["content_hash"] = self._calc_row_hash_column(df, self._IFIR_ROW_HASH_FIELDS)
             df["src_file"] = file_path
             df["etl_batch_id"] = task.task_id
             
-            # 批量写入数据库 (使用 INSERT ON DUPLICATE KEY UPDATE)
-            total = len(df)
-            batch_size = 500
-            rows_processed = 0
-            
-            for start_idx in range(0, total, batch_size):
-                end_idx = min(start_idx + batch_size, total)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                records = []
-                for _, row in batch_df.iterrows():
-                    records.append({
-                        "content_hash": row["content_hash"],
-                        "delivery_month": pd.to_datetime(row["delivery_month"]).date() if pd.notna(row["delivery_month"]) else None,
-                        "brand": self._safe_str(row, "brand"),
-                        "geo": self._safe_str(row, "geo"),
-                        "product_line": self._safe_str(row, "product_line"),
-                        "segment": self._safe_str(row, "segment"),
-                        "series": self._safe_str(row, "series"),
-                        "model": self._safe_str(row, "model"),
-                        "plant": self._safe_str(row, "plant"),
-                        "mach_type": self._safe_str(row, "mach_type"),
-                        "supplier_new": self._safe_str(row, "supplier_new"),
-                        "box_claim": int(row["box_claim"]),
-                        "box_mm": int(row["box_mm"]),
-                        "year_ignore": int(row["year_ignore"]) if pd.notna(row.get("year_ignore")) else None,
-                        "month_ignore": int(row["month_ignore"]) if pd.notna(row.get("month_ignore")) else None,
-                        "src_file": self._safe_str(row, "src_file"),
-                        "etl_batch_id": self._safe_str(row, "etl_batch_id")
-                    })
-                
-                if records:
-                    stmt = mysql_insert(FactIfirRow).values(records)
-                    update_dict = {c.name: stmt.inserted[c.name] for c in FactIfirRow.__table__.columns if c.name not in ['id', 'content_hash', 'load_ts']}
-                    stmt = stmt.on_duplicate_key_update(**update_dict)
-                    self.db.execute(stmt)
-                    self.db.commit()
-                
-                rows_processed += len(records)
-                logger.info(f"[IFIR ROW] 进度: {rows_processed}/{total}")
+            # 列式转换：整列清洗一次，批次内直接按数组切片生成记录
+            columns = self._build_ifir_row_columns(df)
+
+            # 写入数据库（upsert 或按月替换，由任务的 row_load_mode 决定）
+            rows_processed = self._write_row_columns(task, FactIfirRow, columns, len(df), "IFIR ROW", "delivery_month")
             
             task.ifir_row_status = "completed"
             task.ifir_row_rows = rows_processed
@@ -194,8 +222,26 @@ class EtlService:
             task.ifir_row_status = "failed"
             raise Exception(f"IFIR ROW处理失败: {str(e)}")
     
+    # 参与 content_hash 的字段及归一化方式，顺序必须与 _calc_ifir_row_hash 一致
+    _IFIR_ROW_HASH_FIELDS = [
+        ("date", "delivery_month"),
+        ("text", "brand"),
+        ("text", "geo"),
+        ("text", "product_line"),
+        ("text", "segment"),
+        ("text", "series"),
+        ("text", "model"),
+        ("text", "plant"),
+        ("text", "mach_type"),
+        ("text", "supplier_new"),
+        ("int", "box_claim"),
+        ("int", "box_mm"),
+        ("int", "year_ignore"),
+        ("int", "month_ignore"),
+    ]
+
     def _calc_ifir_row_hash(self, row) -> str:
-        """计算IFIR ROW行哈希"""
+        """计算IFIR ROW行哈希（逐行版本，作为列式实现的参照）"""
         parts = [
             self._norm_date(row.get("delivery_month")),
             self._norm_text(row.get("brand")),
@@ -216,143 +262,59 @@ class EtlService:
         return hashlib.md5(raw.encode("utf-8")).hexdigest()
     
     # ==================== IFIR DETAIL ====================
-    
+
+    # 字段映射
+    _IFIR_DETAIL_COLUMN_MAP = {
+        "Claim_Nbr": "claim_nbr",
+        "Claim_Month": "claim_month",
+        "Claim_Date": "claim_date",
+        "Delivery_Month": "delivery_month",
+        "Delivery_Day": "delivery_day",
+        "Geo_2012": "geo_2012",
+        "Financial Region": "financial_region",
+        "PLANT": "plant",
+        "Brand": "brand",
+        "Segment": "segment",
+        "Segment2": "segment2",
+        "Style": "style",
+        "Series": "series",
+        "Model": "model",
+        "MTM": "mtm",
+        "Serial_Nbr": "serial_nbr",
+        "StationName": "stationname",
+        "Station_ID": "station_id",
+        "Data_Source": "data_source",
+        "LastSln": "lastsln",
+        "Failure_Code": "failure_code",
+        "Fault_Category": "fault_category",
+        "Mach_Desc": "mach_desc",
+        "Problem_Descr": "problem_descr",
+        "Problem_Descr_by_Tech": "problem_descr_by_tech",
+        "Commodity": "commodity",
+        "Down_Part_Code": "down_part_code",
+        "Part_Nbr": "part_nbr",
+        "Part_desc": "part_desc",
+        "Part_Supplier": "part_supplier",
+        "Part_Barcode": "part_barcode",
+        "Packing_Lot_No": "packing_lot_no",
+        "Claim_Item_Nbr": "claim_item_nbr",
+        "Claim_Status": "claim_status",
+        "Channel": "channel",
+        "Cust_Nbr": "cust_nbr"
+    }
+
     def _process_ifir_detail(self, task: UploadTask, file_path: str):
         """处理IFIR DETAIL文件"""
         try:
-            df = pd.read_excel(file_path)
-            logger.info(f"[IFIR DETAIL] 读取Excel完成, 原始行数: {len(df)}")
-            
-            # 清理列名：去除前后空格，统一格式
-            df.columns = df.columns.str.strip()
-            logger.info(f"[IFIR DETAIL] 实际列名: {list(df.columns)}")
-            
-            # 字段映射
-            column_map = {
-                "Claim_Nbr": "claim_nbr",
-                "Claim_Month": "claim_month",
-                "Claim_Date": "claim_date",
-                "Delivery_Month": "delivery_month",
-                "Delivery_Day": "delivery_day",
-                "Geo_2012": "geo_2012",
-                "Financial Region": "financial_region",
-                "PLANT": "plant",
-                "Brand": "brand",
-                "Segment": "segment",
-                "Segment2": "segment2",
-                "Style": "style",
-                "Series": "series",
-                "Model": "model",
-                "MTM": "mtm",
-                "Serial_Nbr": "serial_nbr",
-                "StationName": "stationname",
-                "Station_ID": "station_id",
-                "Data_Source": "data_source",
-                "LastSln": "lastsln",
-                "Failure_Code": "failure_code",
-                "Fault_Category": "fault_category",
-                "Mach_Desc": "mach_desc",
-                "Problem_Descr": "problem_descr",
-                "Problem_Descr_by_Tech": "problem_descr_by_tech",
-                "Commodity": "commodity",
-                "Down_Part_Code": "down_part_code",
-                "Part_Nbr": "part_nbr",
-                "Part_desc": "part_desc",
-                "Part_Supplier": "part_supplier",
-                "Part_Barcode": "part_barcode",
-                "Packing_Lot_No": "packing_lot_no",
-                "Claim_Item_Nbr": "claim_item_nbr",
-                "Claim_Status": "claim_status",
-                "Channel": "channel",
-                "Cust_Nbr": "cust_nbr"
-            }
-            
-            df = df.rename(columns=column_map)
-            
-            # 去除claim_nbr为空的行
-            if "claim_nbr" not in df.columns:
-                raise Exception(f"缺少必需列 claim_nbr, 现有列: {list(df.columns)}")
-            
-            df = df[df["claim_nbr"].notna()].copy()
-            df["claim_nbr"] = df["claim_nbr"].astype(str).str.strip()
-            
-            # 去重（如果有claim_date则按日期排序，否则直接去重）
-            if "claim_date" in df.columns:
-                df["claim_date_sort"] = pd.to_datetime(df["claim_date"], errors="coerce")
-                df = df.sort_values(["claim_nbr", "claim_date_sort"], ascending=[True, False])
-                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
-                df = df.drop(columns=["claim_date_sort"])
-            else:
-                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
-            
-            logger.info(f"[IFIR DETAIL] 去重后行数: {len(df)}")
-            
-            # 批量写入数据库 (使用 INSERT ON DUPLICATE KEY UPDATE)
-            total = len(df)
-            batch_size = 500
-            rows_processed = 0
-            
-            for start_idx in range(0, total, batch_size):
-                end_idx = min(start_idx + batch_size, total)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                records = []
-                for _, row in batch_df.iterrows():
-                    segment2_value = self._safe_str(row, "segment2")
-                    segment_value = self._safe_str(row, "segment") or segment2_value
-                    records.append({
-                        "claim_nbr": row["claim_nbr"],
-                        "claim_month": pd.to_datetime(row.get("claim_month")).date() if pd.notna(row.get("claim_month")) else None,
-                        "claim_date": pd.to_datetime(row.get("claim_date")).date() if pd.notna(row.get("claim_date")) else None,
-                        "delivery_month": pd.to_datetime(row.get("delivery_month")).date() if pd.notna(row.get("delivery_month")) else None,
-                        "delivery_day": int(row["delivery_day"]) if pd.notna(row.get("delivery_day")) else None,
-                        "geo_2012": self._safe_str(row, "geo_2012"),
-                        "financial_region": self._safe_str(row, "financial_region"),
-                        "plant": self._safe_str(row, "plant"),
-                        "brand": self._safe_str(row, "brand"),
-                        "segment": segment_value,
-                        "segment2": segment2_value,
-                        "style": self._safe_str(row, "style"),
-                        "series": self._safe_str(row, "series"),
-                        "model": self._safe_str(row, "model"),
-                        "mtm": self._safe_str(row, "mtm"),
-                        "serial_nbr": self._safe_str(row, "serial_nbr"),
-                        "stationname": self._safe_str(row, "stationname"),
-                        "station_id": int(row["station_id"]) if pd.notna(row.get("station_id")) else None,
-                        "data_source": self._safe_str(row, "data_source"),
-                        "lastsln": self._safe_str(row, "lastsln"),
-                        "failure_code": self._safe_str(row, "failure_code"),
-                        "fault_category": self._safe_str(row, "fault_category"),
-                        "mach_desc": self._safe_str(row, "mach_desc"),
-                        "problem_descr": self._safe_str(row, "problem_descr"),
-                        "problem_descr_by_tech": self._safe_str(row, "problem_descr_by_tech"),
-                        "commodity": self._safe_str(row, "commodity"),
-                        "down_part_code": self._safe_str(row, "down_part_code"),
-                        "part_nbr": self._safe_str(row, "part_nbr"),
-                        "part_desc": self._safe_str(row, "part_desc"),
-                        "part_supplier": self._safe_str(row, "part_supplier"),
-                        "part_barcode": self._safe_str(row, "part_barcode"),
-                        "packing_lot_no": self._safe_str(row, "packing_lot_no"),
-                        "claim_item_nbr": self._safe_str(row, "claim_item_nbr"),
-                        "claim_status": self._safe_str(row, "claim_status"),
-                        "channel": self._safe_str(row, "channel"),
-                        "cust_nbr": self._safe_str(row, "cust_nbr")
-                    })
-                
-                if records:
-                    stmt = mysql_insert(FactIfirDetail).values(records)
-                    update_dict = {c.name: stmt.inserted[c.name] for c in FactIfirDetail.__table__.columns if c.name not in ['claim_nbr', 'load_ts']}
-                    stmt = stmt.on_duplicate_key_update(**update_dict)
-                    self.db.execute(stmt)
-                    self.db.commit()
-                
-                rows_processed += len(records)
-                logger.info(f"[IFIR DETAIL] 进度: {rows_processed}/{total}")
-            
+            rows_processed = self._load_detail_file(
+                task, file_path, "IFIR DETAIL", self._IFIR_DETAIL_COLUMN_MAP, "claim_date",
+                self._build_ifir_detail_columns, FactIfirDetail
+            )
+
             task.ifir_detail_status = "completed"
             task.ifir_detail_rows = rows_processed
             logger.info(f"[IFIR DETAIL] 完成, 插入/更新: {rows_processed} 行")
-            
+
         except Exception as e:
             logger.error(f"[IFIR DETAIL] 处理失败: {str(e)}", exc_info=True)
             task.ifir_detail_status = "failed"
@@ -363,8 +325,8 @@ class EtlService:
     def _process_ra_row(self, task: UploadTask, file_path: str):
         """处理RA ROW文件"""
         try:
-            df = pd.read_excel(file_path)
-            logger.info(f"[RA ROW] 读取Excel完成, 原始行数: {len(df)}")
+            df = read_table(file_path)
+            logger.info(f"[RA ROW] 读取文件完成, 原始行数: {len(df)}")
             
             # 字段映射
             column_map = {
@@ -401,50 +363,15 @@ class EtlService:
             df["ra_mm"] = pd.to_numeric(df["ra_mm"], errors="coerce").fillna(0).astype(int)
             
             # 计算content_hash
-            df["content_hash"] = df.apply(self._calc_ra_row_hash, axis=1)
+            df["content_hash"] = self._calc_row_hash_column(df, self._RA_ROW_HASH_FIELDS)
             df["src_file"] = file_path
             df["etl_batch_id"] = task.task_id
             
-            # 批量写入数据库 (使用 INSERT ON DUPLICATE KEY UPDATE)
-            total = len(df)
-            batch_size = 500
-            rows_processed = 0
-            
-            for start_idx in range(0, total, batch_size):
-                end_idx = min(start_idx + batch_size, total)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                records = []
-                for _, row in batch_df.iterrows():
-                    records.append({
-                        "content_hash": row["content_hash"],
-                        "claim_month": pd.to_datetime(row["claim_month"]).date() if pd.notna(row["claim_month"]) else None,
-                        "brand": self._safe_str(row, "brand"),
-                        "geo": self._safe_str(row, "geo"),
-                        "product_line": self._safe_str(row, "product_line"),
-                        "segment": self._safe_str(row, "segment"),
-                        "series": self._safe_str(row, "series"),
-                        "model": self._safe_str(row, "model"),
-                        "plant": self._safe_str(row, "plant"),
-                        "supplier_new": self._safe_str(row, "supplier_new"),
-                        "mach_type": self._safe_str(row, "mach_type"),
-                        "ra_claim": int(row["ra_claim"]),
-                        "ra_mm": int(row["ra_mm"]),
-                        "year_ignore": int(row["year_ignore"]) if pd.notna(row.get("year_ignore")) else None,
-                        "month_ignore": int(row["month_ignore"]) if pd.notna(row.get("month_ignore")) else None,
-                        "src_file": self._safe_str(row, "src_file"),
-                        "etl_batch_id": self._safe_str(row, "etl_batch_id")
-                    })
-                
-                if records:
-                    stmt = mysql_insert(FactRaRow).values(records)
-                    update_dict = {c.name: stmt.inserted[c.name] for c in FactRaRow.__table__.columns if c.name not in ['id', 'content_hash', 'load_ts']}
-                    stmt = stmt.on_duplicate_key_update(**update_dict)
-                    self.db.execute(stmt)
-                    self.db.commit()
-                
-                rows_processed += len(records)
-                logger.info(f"[RA ROW] 进度: {rows_processed}/{total}")
+            # 列式转换：整列清洗一次，批次内直接按数组切片生成记录
+            columns = self._build_ra_row_columns(df)
+
+            # 写入数据库（upsert 或按月替换，由任务的 row_load_mode 决定）
+            rows_processed = self._write_row_columns(task, FactRaRow, columns, len(df), "RA ROW", "claim_month")
             
             task.ra_row_status = "completed"
             task.ra_row_rows = rows_processed
@@ -455,8 +382,26 @@ class EtlService:
             task.ra_row_status = "failed"
             raise Exception(f"RA ROW处理失败: {str(e)}")
     
+    # 参与 content_hash 的字段及归一化方式，顺序必须与 _calc_ra_row_hash 一致
+    _RA_ROW_HASH_FIELDS = [
+        ("date", "claim_month"),
+        ("text", "brand"),
+        ("text", "geo"),
+        ("text", "product_line"),
+        ("text", "segment"),
+        ("text", "series"),
+        ("text", "model"),
+        ("text", "plant"),
+        ("text", "supplier_new"),
+        ("text", "mach_type"),
+        ("int", "ra_claim"),
+        ("int", "ra_mm"),
+        ("int", "year_ignore"),
+        ("int", "month_ignore"),
+    ]
+
     def _calc_ra_row_hash(self, row) -> str:
-        """计算RA ROW行哈希"""
+        """计算RA ROW行哈希（逐行版本，作为列式实现的参照）"""
         parts = [
             self._norm_date(row.get("claim_month")),
             self._norm_text(row.get("brand")),
@@ -477,188 +422,583 @@ class EtlService:
         return hashlib.md5(raw.encode("utf-8")).hexdigest()
     
     # ==================== RA DETAIL ====================
-    
+
+    # 字段映射 (与IFIR DETAIL类似)
+    _RA_DETAIL_COLUMN_MAP = {
+        "Claim_Nbr": "claim_nbr",
+        "Claim_Month": "claim_month",
+        "Geo_2012": "geo_2012",
+        "Financial Region": "financial_region",
+        "PLANT": "plant",
+        "Brand": "brand",
+        "Segment": "segment",
+        "Segment2": "segment2",
+        "Style": "style",
+        "Series": "series",
+        "Model": "model",
+        "MTM": "mtm",
+        "Serial_Nbr": "serial_nbr",
+        "StationName": "stationname",
+        "Station_ID": "station_id",
+        "Data_Source": "data_source",
+        "LastSln": "lastsln",
+        "Failure_Code": "failure_code",
+        "Fault_Category": "fault_category",
+        "Mach_Desc": "mach_desc",
+        "Problem_Descr": "problem_descr",
+        "Problem_Descr_by_Tech": "problem_descr_by_tech",
+        "Commodity": "commodity",
+        "Down_Part_Code": "down_part_code",
+        "Part_Nbr": "part_nbr",
+        "Part_desc": "part_desc",
+        "Part_Supplier": "part_supplier",
+        "Part_Barcode": "part_barcode",
+        "Packing_Lot_No": "packing_lot_no",
+        "Claim_Item_Nbr": "claim_item_nbr",
+        "Claim_Status": "claim_status",
+        "Channel": "channel",
+        "Cust_Nbr": "cust_nbr"
+    }
+
     def _process_ra_detail(self, task: UploadTask, file_path: str):
         """处理RA DETAIL文件"""
         try:
-            df = pd.read_excel(file_path)
-            logger.info(f"[RA DETAIL] 读取Excel完成, 原始行数: {len(df)}")
-            
-            # 清理列名：去除前后空格，统一格式
-            df.columns = df.columns.str.strip()
-            logger.info(f"[RA DETAIL] 实际列名: {list(df.columns)}")
-            
-            # 字段映射 (与IFIR DETAIL类似)
-            column_map = {
-                "Claim_Nbr": "claim_nbr",
-                "Claim_Month": "claim_month",
-                "Geo_2012": "geo_2012",
-                "Financial Region": "financial_region",
-                "PLANT": "plant",
-                "Brand": "brand",
-                "Segment": "segment",
-                "Segment2": "segment2",
-                "Style": "style",
-                "Series": "series",
-                "Model": "model",
-                "MTM": "mtm",
-                "Serial_Nbr": "serial_nbr",
-                "StationName": "stationname",
-                "Station_ID": "station_id",
-                "Data_Source": "data_source",
-                "LastSln": "lastsln",
-                "Failure_Code": "failure_code",
-                "Fault_Category": "fault_category",
-                "Mach_Desc": "mach_desc",
-                "Problem_Descr": "problem_descr",
-                "Problem_Descr_by_Tech": "problem_descr_by_tech",
-                "Commodity": "commodity",
-                "Down_Part_Code": "down_part_code",
-                "Part_Nbr": "part_nbr",
-                "Part_desc": "part_desc",
-                "Part_Supplier": "part_supplier",
-                "Part_Barcode": "part_barcode",
-                "Packing_Lot_No": "packing_lot_no",
-                "Claim_Item_Nbr": "claim_item_nbr",
-                "Claim_Status": "claim_status",
-                "Channel": "channel",
-                "Cust_Nbr": "cust_nbr"
-            }
-            
-            df = df.rename(columns=column_map)
-            
-            # 去除claim_nbr为空的行
-            if "claim_nbr" not in df.columns:
-                raise Exception(f"缺少必需列 claim_nbr, 现有列: {list(df.columns)}")
-            
-            df = df[df["claim_nbr"].notna()].copy()
-            df["claim_nbr"] = df["claim_nbr"].astype(str).str.strip()
-            
-            # 去重（按claim_month排序，保留最新的记录）
-            if "claim_month" in df.columns:
-                df["claim_month_sort"] = pd.to_datetime(df["claim_month"], errors="coerce")
-                df = df.sort_values(["claim_nbr", "claim_month_sort"], ascending=[True, False])
-                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
-                df = df.drop(columns=["claim_month_sort"])
-            else:
-                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
-            
-            logger.info(f"[RA DETAIL] 去重后行数: {len(df)}")
-            
-            # 批量写入数据库 (使用 INSERT ON DUPLICATE KEY UPDATE)
-            total = len(df)
-            batch_size = 500
-            rows_processed = 0
-            
-            for start_idx in range(0, total, batch_size):
-                end_idx = min(start_idx + batch_size, total)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                records = []
-                for _, row in batch_df.iterrows():
-                    segment2_value = self._safe_str(row, "segment2")
-                    segment_value = self._safe_str(row, "segment") or segment2_value
-                    records.append({
-                        "claim_nbr": row["claim_nbr"],
-                        "claim_month": pd.to_datetime(row.get("claim_month")).date() if pd.notna(row.get("claim_month")) else None,
-                        "geo_2012": self._safe_str(row, "geo_2012"),
-                        "financial_region": self._safe_str(row, "financial_region"),
-                        "plant": self._safe_str(row, "plant"),
-                        "brand": self._safe_str(row, "brand"),
-                        "segment": segment_value,
-                        "segment2": segment2_value,
-                        "style": self._safe_str(row, "style"),
-                        "series": self._safe_str(row, "series"),
-                        "model": self._safe_str(row, "model"),
-                        "mtm": self._safe_str(row, "mtm"),
-                        "serial_nbr": self._safe_str(row, "serial_nbr"),
-                        "stationname": self._safe_str(row, "stationname"),
-                        "station_id": int(row["station_id"]) if pd.notna(row.get("station_id")) else None,
-                        "data_source": self._safe_str(row, "data_source"),
-                        "lastsln": self._safe_str(row, "lastsln"),
-                        "failure_code": self._safe_str(row, "failure_code"),
-                        "fault_category": self._safe_str(row, "fault_category"),
-                        "mach_desc": self._safe_str(row, "mach_desc"),
-                        "problem_descr": self._safe_str(row, "problem_descr"),
-                        "problem_descr_by_tech": self._safe_str(row, "problem_descr_by_tech"),
-                        "commodity": self._safe_str(row, "commodity"),
-                        "down_part_code": self._safe_str(row, "down_part_code"),
-                        "part_nbr": self._safe_str(row, "part_nbr"),
-                        "part_desc": self._safe_str(row, "part_desc"),
-                        "part_supplier": self._safe_str(row, "part_supplier"),
-                        "part_barcode": self._safe_str(row, "part_barcode"),
-                        "packing_lot_no": self._safe_str(row, "packing_lot_no"),
-                        "claim_item_nbr": self._safe_str(row, "claim_item_nbr"),
-                        "claim_status": self._safe_str(row, "claim_status"),
-                        "channel": self._safe_str(row, "channel"),
-                        "cust_nbr": self._safe_str(row, "cust_nbr")
-                    })
-                
-                if records:
-                    stmt = mysql_insert(FactRaDetail).values(records)
-                    update_dict = {c.name: stmt.inserted[c.name] for c in FactRaDetail.__table__.columns if c.name not in ['claim_nbr', 'load_ts']}
-                    stmt = stmt.on_duplicate_key_update(**update_dict)
-                    self.db.execute(stmt)
-                    self.db.commit()
-                
-                rows_processed += len(records)
-                logger.info(f"[RA DETAIL] 进度: {rows_processed}/{total}")
-            
+            rows_processed = self._load_detail_file(
+                task, file_path, "RA DETAIL", self._RA_DETAIL_COLUMN_MAP, "claim_month",
+                self._build_ra_detail_columns, FactRaDetail
+            )
+
             task.ra_detail_status = "completed"
             task.ra_detail_rows = rows_processed
             logger.info(f"[RA DETAIL] 完成, 插入/更新: {rows_processed} 行")
-            
+
         except Exception as e:
             logger.error(f"[RA DETAIL] 处理失败: {str(e)}", exc_info=True)
             task.ra_detail_status = "failed"
             raise Exception(f"RA DETAIL处理失败: {str(e)}")
+
+    # ==================== ROW 公共流程 ====================
+
+    def _write_row_columns(self, task: UploadTask, model, columns: dict, total: int,
+                           label: str, month_key: str) -> int:
+        """
+        写入 ROW 列式数据，返回写入行数。
+        - upsert：按 content_hash 分批 INSERT ... ON DUPLICATE KEY UPDATE（默认）
+        - replace_months：文件覆盖的月份整体替换，见 _replace_row_months
+        """
+        if (getattr(task, "row_load_mode", None) or "upsert") == "replace_months":
+            return self._replace_row_months(model, columns, total, label, month_key)
+        return self._upsert_row_columns(model, columns, total, label)
+
+    def _upsert_row_columns(self, model, columns: dict, total: int, label: str) -> int:
+        """按 content_hash 分批 upsert，每批提交一次"""
+        batch_size = 500
+        rows_processed = 0
+
+        for start_idx in range(0, total, batch_size):
+            end_idx = min(start_idx + batch_size, total)
+            records = self._records_from_columns(columns, start_idx, end_idx)
+
+            if records:
+                stmt = mysql_insert(model).values(records)
+                update_dict = {c.name: stmt.inserted[c.name] for c in model.__table__.columns if c.name not in ['id', 'content_hash', 'load_ts']}
+                stmt = stmt.on_duplicate_key_update(**update_dict)
+                self.db.execute(stmt)
+                self.db.commit()
+
+            rows_processed += len(records)
+            logger.info(f"[{label}] 进度: {rows_processed}/{total}")
+
+        return rows_processed
+
+    def _replace_row_months(self, model, columns: dict, total: int, label: str, month_key: str) -> int:
+        """
+        按月整体替换：上游修改数值后旧 content_hash 不会被覆盖，upsert 会导致重复累计。
+        1. 文件数据写入临时表（CREATE TEMPORARY TABLE ... LIKE，不锁事实表）
+        2. 同一事务内 DELETE 文件覆盖月份的旧数据 + INSERT ... SELECT 临时表
+        3. 提交后读者一次性看到新数据；删除走月份前缀索引，代价与涉及月份的数据量成正比
+        """
+        table = model.__tablename__
+        staging = f"stg_{table}"
+        names = [c.name for c in model.__table__.columns if c.name not in ("id", "load_ts")]
+        column_list = ", ".join(names)
+        # 临时表内 content_hash 唯一，文件内 content_hash 相同的行以最后一条为准（与 upsert 一致）；
+        # 不用 INSERT IGNORE：严格模式下截断、类型转换错误照常报错，任务失败而不是静默写入错误数据
+        insert_staging = text(
+            f"INSERT INTO {staging} ({column_list}) "
+            f"VALUES ({', '.join(':' + name for name in names)}) "
+            f"ON DUPLICATE KEY UPDATE "
+            f"{', '.join(f'{name} = VALUES({name})' for name in names if name != 'content_hash')}"
+        )
+
+        try:
+            self.db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+            self.db.execute(text(f"CREATE TEMPORARY TABLE {staging} LIKE {table}"))
+
+            batch_size = 5000
+            for start_idx in range(0, total, batch_size):
+                end_idx = min(start_idx + batch_size, total)
+                self.db.execute(insert_staging, self._records_from_columns(columns, start_idx, end_idx))
+                logger.info(f"[{label}] 写入临时表: {end_idx}/{total}")
+
+            months = [row[0] for row in self.db.execute(
+                text(f"SELECT DISTINCT {month_key} FROM {staging} WHERE {month_key} IS NOT NULL")
+            )]
+            deleted = 0
+            if months:
+                deleted = self.db.execute(
+                    text(f"DELETE FROM {table} WHERE {month_key} IN :months").bindparams(
+                        bindparam("months", expanding=True)
+                    ),
+                    {"months": months}
+                ).rowcount
+            inserted = self.db.execute(text(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}"
+            )).rowcount
+            self.db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        logger.info(
+            f"[{label}] 按月替换完成, 月份: {[str(m) for m in sorted(months)]}, "
+            f"删除: {deleted} 行, 写入: {inserted} 行"
+        )
+        return inserted
+
+    # ==================== DETAIL 公共流程 ====================
+
+    def _prepare_detail_frame(self, df: pd.DataFrame, column_map: dict) -> pd.DataFrame:
+        """DETAIL 预处理：清理列名、字段映射、去除 claim_nbr 为空的行"""
+        # 清理列名：去除前后空格，统一格式
+        df.columns = df.columns.str.strip()
+        df = df.rename(columns=column_map)
+
+        # 去除claim_nbr为空的行
+        if "claim_nbr" not in df.columns:
+            raise Exception(f"缺少必需列 claim_nbr, 现有列: {list(df.columns)}")
+
+        df = df[df["claim_nbr"].notna()].copy()
+        df["claim_nbr"] = df["claim_nbr"].astype(str).str.strip()
+        return df
+
+    def _detail_text_columns(self, column_map: dict, model) -> list:
+        """
+        映射到文本字段的源列名：流式读取时固定按文本读取，避免各块独立推断类型导致同一列取值不一致。
+        整表读取保持类型推断：已入库数据按推断后的取值写入（0 视为空、含空值的数字列为 "1004.0"），
+        改为文本读取会改变这些取值，重新上传时按 claim_nbr upsert 会产生重复记录。
+        """
+        table_columns = model.__table__.columns
+        return [
+            source for source, target in column_map.items()
+            if target in table_columns and isinstance(table_columns[target].type, String)
+        ]
+
+    def _dedupe_detail_frame(self, df: pd.DataFrame, sort_key: str) -> pd.DataFrame:
+        """按 claim_nbr 去重，存在 sort_key 时保留日期最新的一条"""
+        if sort_key in df.columns:
+            df["_sort_date"] = pd.to_datetime(df[sort_key], errors="coerce")
+            df = df.sort_values(["claim_nbr", "_sort_date"], ascending=[True, False])
+            df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
+            return df.drop(columns=["_sort_date"])
+        return df.drop_duplicates(subset=["claim_nbr"], keep="first")
+
+    def _load_detail_file(self, task: UploadTask, file_path: str, label: str, column_map: dict,
+                          sort_key: str, build_columns, model) -> int:
+        """
+        DETAIL 导入主流程，返回写入行数。
+        读取方式由 ETL_STREAMING 决定（流式读取时文本字段按文本读取，见 _detail_text_columns）；
+        写入方式由任务的 detail_load_mode 决定（upsert / bulk）。
+        写入完成后按涉及的月份重算 Top Issue 汇总表；中途失败时 upsert 已提交的批次同样按收集到的月份重算。
+        """
+        bulk_loader = self._new_detail_bulk_loader(task, model, label)
+        affected_months = set()
+        issue_spec = DETAIL_ISSUE_SPECS[model.__tablename__]
+        try:
+            if settings.ETL_STREAMING:
+                rows_processed = self._load_detail_streaming(
+                    file_path, label, column_map, sort_key, build_columns, model, bulk_loader, affected_months
+                )
+            else:
+                df = read_table(file_path)
+                logger.info(f"[{label}] 读取文件完成, 原始行数: {len(df)}")
+
+                df = self._prepare_detail_frame(df, column_map)
+                logger.info(f"[{label}] 实际列名: {list(df.columns)}")
+
+                # 去重（存在排序日期列时保留最新的记录）
+                df = self._dedupe_detail_frame(df, sort_key)
+                logger.info(f"[{label}] 去重后行数: {len(df)}")
+
+                # 列式转换：整列清洗一次，批次内直接按数组切片生成记录
+                columns = build_columns(df)
+                rows_processed = self._write_detail_columns(
+                    model, columns, len(df), label, bulk_loader, affected_months
+                )
+
+            if bulk_loader:
+                bulk_loader.load()
+        except Exception:
+            # 失败前已提交的批次所在月份不重算，汇总表会一直与明细表不一致；重算失败不掩盖原始错误
+            self.db.rollback()
+            try:
+                AggregateService(self.db).refresh_months(issue_spec, affected_months)
+                logger.info(f"[{label}] 导入失败, 已重算已写入部分的 Top Issue 汇总月份数: {len(affected_months)}")
+            except Exception as e:
+                logger.error(f"[{label}] 导入失败后 Top Issue 汇总重算失败: {str(e)}", exc_info=True)
+            raise
+        finally:
+            if bulk_loader:
+                bulk_loader.cleanup()
+
+        AggregateService(self.db).refresh_months(issue_spec, affected_months)
+        logger.info(f"[{label}] Top Issue 汇总重算月份数: {len(affected_months)}")
+        return rows_processed
+
+    def _new_detail_bulk_loader(self, task: UploadTask, model, label: str) -> Optional[DetailBulkLoader]:
+        """按任务的 detail_load_mode 创建批量导入器；upsert 模式返回 None"""
+        if (getattr(task, "detail_load_mode", None) or "upsert") != "bulk":
+            return None
+        if not settings.DB_LOCAL_INFILE:
+            logger.warning(f"[{label}] 未开启 DB_LOCAL_INFILE，bulk 模式回退为 upsert")
+            return None
+        logger.info(f"[{label}] 使用 bulk 模式 (LOAD DATA LOCAL INFILE)")
+        return DetailBulkLoader(self.db, model, label)
+
+    def _write_detail_columns(self, model, columns: dict, total: int, label: str,
+                              bulk_loader: Optional[DetailBulkLoader], affected_months: set) -> int:
+        """写出一批 DETAIL 列式数据：bulk 模式追加到临时文件，否则直接 upsert"""
+        self._collect_detail_months(model, columns, affected_months)
+        if bulk_loader:
+            bulk_loader.append(columns, total)
+            return total
+        return self._upsert_detail_columns(model, columns, total, label)
+
+    def _collect_detail_months(self, model, columns: dict, affected_months: set):
+        """
+        收集本批数据影响的汇总月份：新记录所在月份 + 已存在单号原来所在的月份
+        （单号更新后可能换月，原月份的汇总同样需要重算）。须在写入前调用。
+        """
+        month_key = AGGREGATE_SPECS[DETAIL_ISSUE_SPECS[model.__tablename__]].month_key
+        affected_months.update(m for m in columns[month_key] if m is not None)
+
+        claim_nbrs = columns["claim_nbr"]
+        lookup = text(
+            f"SELECT DISTINCT {month_key} FROM {model.__tablename__} WHERE claim_nbr IN :claim_nbrs"
+        ).bindparams(bindparam("claim_nbrs", expanding=True))
+        batch_size = 1000
+        for start_idx in range(0, len(claim_nbrs), batch_size):
+            rows = self.db.execute(lookup, {"claim_nbrs": claim_nbrs[start_idx:start_idx + batch_size]})
+            affected_months.update(row[0] for row in rows if row[0] is not None)
+
+    def _upsert_detail_columns(self, model, columns: dict, total: int, label: str) -> int:
+        """DETAIL 分批写入 (INSERT ON DUPLICATE KEY UPDATE)，返回写入行数"""
+        batch_size = 500
+        rows_processed = 0
+
+        for start_idx in range(0, total, batch_size):
+            end_idx = min(start_idx + batch_size, total)
+            records = self._records_from_columns(columns, start_idx, end_idx)
+
+            if records:
+                stmt = mysql_insert(model).values(records)
+                update_dict = {c.name: stmt.inserted[c.name] for c in model.__table__.columns if c.name not in ['claim_nbr', 'load_ts']}
+                stmt = stmt.on_duplicate_key_update(**update_dict)
+                self.db.execute(stmt)
+                self.db.commit()
+
+            rows_processed += len(records)
+            logger.info(f"[{label}] 进度: {rows_processed}/{total}")
+
+        return rows_processed
+
+    def _load_detail_streaming(self, file_path: str, label: str, column_map: dict,
+                               sort_key: str, build_columns, model,
+                               bulk_loader: Optional[DetailBulkLoader] = None,
+                               affected_months: Optional[set] = None) -> int:
+        """
+        流式导入 DETAIL：按块读取、清洗并写入，内存峰值由 ETL_CHUNK_SIZE 决定。
+
+        跨块去重规则与整表模式一致（同一 claim_nbr 保留 sort_key 最新的记录）：
+        - 记录每个 claim_nbr 已写入行的日期，后续块只有日期更新时才覆盖写入
+        - 日期为空的记录不会覆盖已有日期的记录；日期相同时先出现的记录保留
+        返回去重后的 claim_nbr 数量，与整表模式的写入行数口径一致。
+        """
+        # claim_nbr -> 已写入记录的排序日期（NaT 记为 None）
+        seen = {}
+        chunk_no = 0
+
+        text_columns = self._detail_text_columns(column_map, model)
+        for chunk in iter_table_chunks(file_path, settings.ETL_CHUNK_SIZE, text_columns):
+            chunk_no += 1
+            raw_rows = len(chunk)
+            df = self._prepare_detail_frame(chunk, column_map)
+            if chunk_no == 1:
+                logger.info(f"[{label}] 实际列名: {list(df.columns)}")
+
+            if sort_key in df.columns:
+                df["_sort_date"] = pd.to_datetime(df[sort_key], errors="coerce")
+                # 稳定排序，保证日期相同时先出现的记录优先
+                df = df.sort_values(["claim_nbr", "_sort_date"], ascending=[True, False], kind="mergesort")
+                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
+                sort_dates = [None if pd.isna(v) else v for v in df["_sort_date"].tolist()]
+                df = df.drop(columns=["_sort_date"])
+            else:
+                df = df.drop_duplicates(subset=["claim_nbr"], keep="first")
+                sort_dates = [None] * len(df)
+
+            keep = []
+            for claim_nbr, sort_date in zip(df["claim_nbr"].tolist(), sort_dates):
+                if claim_nbr in seen:
+                    previous = seen[claim_nbr]
+                    if sort_date is None or (previous is not None and previous >= sort_date):
+                        keep.append(False)
+                        continue
+                seen[claim_nbr] = sort_date
+                keep.append(True)
+            df = df[keep]
+
+            columns = build_columns(df)
+            self._write_detail_columns(
+                model, columns, len(df), label, bulk_loader,
+                affected_months if affected_months is not None else set()
+            )
+            logger.info(f"[{label}] 第 {chunk_no} 块完成, 读取 {raw_rows} 行, 写入 {len(df)} 行, 累计去重 {len(seen)} 条")
+
+        return len(seen)
     
     # ==================== ODM映射表刷新 ====================
     
-    def _refresh_odm_mapping(self):
-        """从ROW表刷新ODM到Plant映射"""
-        # IFIR映射
-        ifir_mappings = self.db.query(
-            FactIfirRow.supplier_new,
-            FactIfirRow.plant
-        ).filter(
-            FactIfirRow.supplier_new.isnot(None),
-            FactIfirRow.plant.isnot(None)
-        ).distinct().all()
-        
-        for odm, plant in ifir_mappings:
-            odm = odm.strip() if odm else "None"
-            plant = plant.strip() if plant else ""
-            if plant:
-                mapping = MapOdmToPlant(
-                    kpi_type="IFIR",
-                    supplier_new=odm,
-                    plant=plant
-                )
-                self.db.merge(mapping)
-        
-        # RA映射
-        ra_mappings = self.db.query(
-            FactRaRow.supplier_new,
-            FactRaRow.plant
-        ).filter(
-            FactRaRow.supplier_new.isnot(None),
-            FactRaRow.plant.isnot(None)
-        ).distinct().all()
-        
-        for odm, plant in ra_mappings:
-            odm = odm.strip() if odm else "None"
-            plant = plant.strip() if plant else ""
-            if plant:
-                mapping = MapOdmToPlant(
-                    kpi_type="RA",
-                    supplier_new=odm,
-                    plant=plant
-                )
-                self.db.merge(mapping)
-        
+    # ROW 文件类型 -> (kpi_type, 事实表)
+    _ODM_MAPPING_SOURCES = {
+        "ifir_row": ("IFIR", FactIfirRow),
+        "ra_row": ("RA", FactRaRow),
+    }
+
+    def _refresh_odm_mapping(self, task: UploadTask, files: dict):
+        """
+        增量刷新 ODM 到 Plant 映射，只处理本次上传的 ROW 文件。
+        - 新增：本批次（etl_batch_id）涉及的 (supplier_new, plant) 组合，INSERT IGNORE ... SELECT DISTINCT 一次写入
+        - 移除：仅 replace_months 模式会删除 ROW 数据，此时清理事实表中已不存在的组合
+        新增/移除条数记录到 task.odm_map_inserted / task.odm_map_removed
+        """
+        map_table = MapOdmToPlant.__tablename__
+        inserted = 0
+        removed = 0
+
+        for file_type, (kpi_type, model) in self._ODM_MAPPING_SOURCES.items():
+            if file_type not in files:
+                continue
+            table = model.__tablename__
+
+            inserted += self.db.execute(text(
+                f"INSERT IGNORE INTO {map_table} (kpi_type, supplier_new, plant) "
+                f"SELECT DISTINCT :kpi_type, supplier_new, plant FROM {table} "
+                f"WHERE etl_batch_id = :batch_id "
+                f"AND supplier_new IS NOT NULL AND plant IS NOT NULL AND plant <> ''"
+            ), {"kpi_type": kpi_type, "batch_id": task.task_id}).rowcount
+
+            if (task.row_load_mode or "upsert") == "replace_months":
+                # 映射表规模很小，逐条按 idx_odm_plant 探测事实表
+                removed += self.db.execute(text(
+                    f"DELETE FROM {map_table} WHERE kpi_type = :kpi_type AND NOT EXISTS ("
+                    f"SELECT 1 FROM {table} f WHERE f.supplier_new = {map_table}.supplier_new "
+                    f"AND f.plant = {map_table}.plant)"
+                ), {"kpi_type": kpi_type}).rowcount
+
+        task.odm_map_inserted = inserted
+        task.odm_map_removed = removed
         self.db.commit()
+        logger.info(f"[ETL] ODM映射新增: {inserted}, 移除: {removed}")
     
+    def _refresh_row_aggregates(self, task: UploadTask, files: dict):
+        """按批次重算 ROW 月度聚合表（只处理本次上传的 ROW 文件涉及的月份）"""
+        service = AggregateService(self.db)
+        for file_type, kpi_type in FILE_TYPE_KPI.items():
+            if file_type in files:
+                months = service.refresh_batch(kpi_type, task.task_id)
+                logger.info(f"[ETL] {kpi_type} 聚合重算月份: {[str(m) for m in sorted(months)]}")
+
+    # ==================== 列式转换 ====================
+
+    # DETAIL 文件共用的文本字段（segment/segment2 单独处理）
+    _DETAIL_TEXT_FIELDS = [
+        "geo_2012", "financial_region", "plant", "brand",
+    ]
+    _DETAIL_TEXT_FIELDS_TAIL = [
+        "style", "series", "model", "mtm", "serial_nbr", "stationname",
+    ]
+    _DETAIL_TEXT_FIELDS_REST = [
+        "data_source", "lastsln", "failure_code", "fault_category", "mach_desc",
+        "problem_descr", "problem_descr_by_tech", "commodity", "down_part_code",
+        "part_nbr", "part_desc", "part_supplier", "part_barcode", "packing_lot_no",
+        "claim_item_nbr", "claim_status", "channel", "cust_nbr",
+    ]
+
+    def _build_ifir_row_columns(self, df: pd.DataFrame) -> dict:
+        """IFIR ROW: 整列转换为入库字段（键顺序与表字段一致）"""
+        return {
+            "content_hash": df["content_hash"].tolist(),
+            "delivery_month": self._date_column(df, "delivery_month"),
+            "brand": self._str_column(df, "brand"),
+            "geo": self._str_column(df, "geo"),
+            "product_line": self._str_column(df, "product_line"),
+            "segment": self._str_column(df, "segment"),
+            "series": self._str_column(df, "series"),
+            "model": self._str_column(df, "model"),
+            "plant": self._str_column(df, "plant"),
+            "mach_type": self._str_column(df, "mach_type"),
+            "supplier_new": self._str_column(df, "supplier_new"),
+            "box_claim": self._int_column(df, "box_claim"),
+            "box_mm": self._int_column(df, "box_mm"),
+            "year_ignore": self._int_column(df, "year_ignore"),
+            "month_ignore": self._int_column(df, "month_ignore"),
+            "src_file": self._str_column(df, "src_file"),
+            "etl_batch_id": self._str_column(df, "etl_batch_id"),
+        }
+
+    def _build_ra_row_columns(self, df: pd.DataFrame) -> dict:
+        """RA ROW: 整列转换为入库字段"""
+        return {
+            "content_hash": df["content_hash"].tolist(),
+            "claim_month": self._date_column(df, "claim_month"),
+            "brand": self._str_column(df, "brand"),
+            "geo": self._str_column(df, "geo"),
+            "product_line": self._str_column(df, "product_line"),
+            "segment": self._str_column(df, "segment"),
+            "series": self._str_column(df, "series"),
+            "model": self._str_column(df, "model"),
+            "plant": self._str_column(df, "plant"),
+            "supplier_new": self._str_column(df, "supplier_new"),
+            "mach_type": self._str_column(df, "mach_type"),
+            "ra_claim": self._int_column(df, "ra_claim"),
+            "ra_mm": self._int_column(df, "ra_mm"),
+            "year_ignore": self._int_column(df, "year_ignore"),
+            "month_ignore": self._int_column(df, "month_ignore"),
+            "src_file": self._str_column(df, "src_file"),
+            "etl_batch_id": self._str_column(df, "etl_batch_id"),
+        }
+
+    def _build_ifir_detail_columns(self, df: pd.DataFrame) -> dict:
+        """IFIR DETAIL: 整列转换为入库字段"""
+        columns = {
+            "claim_nbr": df["claim_nbr"].tolist(),
+            "claim_month": self._date_column(df, "claim_month"),
+            "claim_date": self._date_column(df, "claim_date"),
+            "delivery_month": self._date_column(df, "delivery_month"),
+            "delivery_day": self._int_column(df, "delivery_day"),
+        }
+        columns.update(self._build_detail_common_columns(df))
+        return columns
+
+    def _build_ra_detail_columns(self, df: pd.DataFrame) -> dict:
+        """RA DETAIL: 整列转换为入库字段"""
+        columns = {
+            "claim_nbr": df["claim_nbr"].tolist(),
+            "claim_month": self._date_column(df, "claim_month"),
+        }
+        columns.update(self._build_detail_common_columns(df))
+        return columns
+
+    def _build_detail_common_columns(self, df: pd.DataFrame) -> dict:
+        """DETAIL 公共字段；segment 为空时回退到 segment2"""
+        columns = {key: self._str_column(df, key) for key in self._DETAIL_TEXT_FIELDS}
+        segment2 = self._str_column(df, "segment2")
+        segment = self._str_column(df, "segment")
+        columns["segment"] = [seg or seg2 for seg, seg2 in zip(segment, segment2)]
+        columns["segment2"] = segment2
+        for key in self._DETAIL_TEXT_FIELDS_TAIL:
+            columns[key] = self._str_column(df, key)
+        columns["station_id"] = self._int_column(df, "station_id")
+        for key in self._DETAIL_TEXT_FIELDS_REST:
+            columns[key] = self._str_column(df, key)
+        return columns
+
+    def _calc_row_hash_column(self, df: pd.DataFrame, fields: list) -> list:
+        """
+        列式计算 content_hash，结果与逐行 _calc_*_row_hash 完全一致。
+        先整列归一化为字符串，再按行拼接 "|" 并做 MD5。
+        """
+        normalizers = {
+            "text": self._norm_text_column,
+            "int": self._norm_int_column,
+            "date": self._norm_date_column,
+        }
+        parts = [normalizers[kind](df, key) for kind, key in fields]
+        md5 = hashlib.md5
+        return [md5("|".join(values).encode("utf-8")).hexdigest() for values in zip(*parts)]
+
+    def _norm_text_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 _norm_text"""
+        if key not in df.columns:
+            return ["None"] * len(df)
+        values = df[key].to_numpy(dtype=object)
+        stripped = pd.Series(values, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        return np.where(pd.isna(values), "None", stripped).tolist()
+
+    def _norm_int_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 _norm_int"""
+        if key not in df.columns:
+            return ["None"] * len(df)
+        series = df[key]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            missing = series.isna().to_numpy()
+            ints = series.fillna(0).astype("int64").astype(str).to_numpy(dtype=object)
+            return np.where(missing, "None", ints).tolist()
+        return [self._norm_int(val) for val in series.tolist()]
+
+    def _norm_date_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 _norm_date"""
+        if key not in df.columns:
+            return ["None"] * len(df)
+        dates = self._date_column(df, key)
+        return ["None" if d is None else d.isoformat() for d in dates]
+
+    def _records_from_columns(self, columns: dict, start: int, end: int) -> list:
+        """按 [start, end) 切片组装一批记录，避免一次性生成全部 dict"""
+        keys = list(columns.keys())
+        slices = [columns[key][start:end] for key in keys]
+        return [dict(zip(keys, values)) for values in zip(*slices)]
+
+    def _str_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 _safe_str：空值/空串/0 转为 None，其余 str().strip()"""
+        if key not in df.columns:
+            return [None] * len(df)
+        values = df[key].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        # 可空整数列（如 parquet 的 Int64）的 pd.NA 不能参与比较，先换成 None
+        values = np.where(missing, None, values)
+        empty = missing | (values == "") | (values == 0)
+        stripped = pd.Series(values, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        return np.where(empty, None, stripped).tolist()
+
+    def _int_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 int()：空值转为 None，数值列直接向量化截断"""
+        if key not in df.columns:
+            return [None] * len(df)
+        series = df[key]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            ints = series.fillna(0).astype("int64").to_numpy(dtype=object)
+            return np.where(missing, None, ints).tolist()
+        # 非数值列（文本数字等）保持逐个 int()，与原逻辑的报错行为一致
+        return [None if miss else int(val) for val, miss in zip(series.tolist(), missing)]
+
+    def _date_column(self, df: pd.DataFrame, key: str) -> list:
+        """整列版 pd.to_datetime(x).date()：空值转为 None"""
+        if key not in df.columns:
+            return [None] * len(df)
+        series = df[key]
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            if series.dtype == object:
+                series = pd.to_datetime(series, format="mixed")
+            else:
+                series = pd.to_datetime(series)
+        missing = series.isna().to_numpy()
+        dates = series.dt.date.to_numpy(dtype=object)
+        return np.where(missing, None, dates).tolist()
+
     # ==================== 工具方法 ====================
     
     def _safe_get(self, row, key):
@@ -689,3 +1029,27 @@ class EtlService:
         if pd.isna(x):
             return "None"
         return pd.to_datetime(x).date().isoformat()
+
+
+def _process_file_in_worker(task_id: str, file_type: str, file_path: str) -> Optional[str]:
+    """
+    子进程入口：使用独立会话处理单个文件，成功返回 None，失败返回错误信息。
+    文件状态与行数由对应的 _process_* 方法写入 upload_task 并在此提交。
+    """
+    db = EtlSessionLocal()
+    try:
+        service = EtlService(db)
+        task = db.query(UploadTask).filter(UploadTask.task_id == task_id).first()
+        if not task:
+            return f"任务不存在: {task_id}"
+        try:
+            getattr(service, EtlService._FILE_PROCESSORS[file_type])(task, file_path)
+            return None
+        except Exception as e:
+            db.rollback()
+            setattr(task, f"{file_type}_status", "failed")
+            return str(e)
+        finally:
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,1059 @@
+"""
+KPI 分析引擎 - IFIR / RA 共用的查询与汇总逻辑
+
+- KpiMetric 描述一个 KPI 的 ROW / DETAIL 表、预聚合表、时间主轴、分子分母字段与报告明细列
+- KpiEngine 按 KpiMetric 构建筛选项、ODM / Segment / Model 分析、Issue 明细、报告明细查询与分析报告 Excel
+- 结果以字典返回，字段名取自 KpiMetric（如 box_claim / ra_claim、ifir / ra），由各 KPI 服务转换为响应模型
+- analyze 结果与报告文件按请求 + 数据版本缓存（app.core.cache），上传任务完成后自动失效
+- 筛选项由进程内维度索引（app.services.dimension_index）返回，数据版本变化后重建或增量并入
+"""
+import logging
+from datetime import date, datetime
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Integer, cast, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.cache import get_analysis_cache, make_cache_key
+from app.core.config import get_settings
+from app.services.dimension_index import get_dimension_index
+from app.models.tables import (
+    AggIfirDetailIssue, AggIfirRowMonth, AggRaDetailIssue, AggRaRowMonth,
+    FactIfirDetail, FactIfirRow, FactRaDetail, FactRaRow, MapOdmToPlant, UploadTask,
+)
+
+logger = logging.getLogger(__name__)
+
+# ODM 无可用 plant 时使用的哨兵值，避免 Top Issue / 明细泄露为全量数据
+NO_MATCH_PLANT = "__no_match__"
+
+
+def report_progress(progress, percent: int):
+    """报告生成进度回调（报告任务传入，同步接口为 None）"""
+    if progress is not None:
+        progress(percent)
+
+
+# 报告明细 Sheet 的 (表头, 字段名)：IFIR / RA 共用的 DETAIL 字段，各 KPI 在前面加上自己的单号与时间字段
+_DETAIL_COMMON_COLUMNS = [
+    ("Geo_2012", "geo_2012"),
+    ("Financial_Region", "financial_region"),
+    ("Plant", "plant"),
+    ("Brand", "brand"),
+    ("Segment", "segment"),
+    ("Segment2", "segment2"),
+    ("Style", "style"),
+    ("Series", "series"),
+    ("Model", "model"),
+    ("MTM", "mtm"),
+    ("Serial_Nbr", "serial_nbr"),
+    ("StationName", "stationname"),
+    ("Station_Id", "station_id"),
+    ("Data_Source", "data_source"),
+    ("Lastsln", "lastsln"),
+    ("Failure_Code", "failure_code"),
+    ("Fault_Category", "fault_category"),
+    ("Mach_Desc", "mach_desc"),
+    ("Problem_Descr", "problem_descr"),
+    ("Problem_Descr_By_Tech", "problem_descr_by_tech"),
+    ("Commodity", "commodity"),
+    ("Down_Part_Code", "down_part_code"),
+    ("Part_Nbr", "part_nbr"),
+    ("Part_Desc", "part_desc"),
+    ("Part_Supplier", "part_supplier"),
+    ("Part_Barcode", "part_barcode"),
+    ("Packing_Lot_No", "packing_lot_no"),
+    ("Claim_Item_Nbr", "claim_item_nbr"),
+    ("Claim_Status", "claim_status"),
+    ("Channel", "channel"),
+    ("Cust_Nbr", "cust_nbr"),
+    ("Load_Ts", "load_ts"),
+]
+
+# 报告类别 -> (维度表头, 卡片实体字段, 分析方法, 缓存与临时文件名中的类别)
+_REPORT_KINDS = {
+    "model": ("Model", "model", "analyze_model", "model"),
+    "odm": ("ODM", "odm", "analyze_odm", "odm"),
+    "segment": ("Segment", "segment", "analyze_segment", "seg"),
+}
+
+
+class KpiMetric:
+    """一个 KPI 的表与字段定义"""
+
+    def __init__(self, name: str, row_model, row_agg_model, detail_model, issue_agg_model,
+                 month_key: str, claim_key: str, mm_key: str, value_key: str, detail_columns: List[tuple]):
+        self.name = name  # 与 map_odm_to_plant.kpi_type 一致
+        self.row_model = row_model
+        self.row_agg_model = row_agg_model
+        self.detail_model = detail_model
+        self.issue_agg_model = issue_agg_model
+        self.month_key = month_key  # 时间主轴
+        self.claim_key = claim_key  # 分子
+        self.mm_key = mm_key  # 分母
+        self.value_key = value_key  # 指标值（分子 / 分母）
+        self.detail_columns = detail_columns  # 报告明细 Sheet 的 [(表头, 字段名)]
+
+
+IFIR_METRIC = KpiMetric(
+    "IFIR", FactIfirRow, AggIfirRowMonth, FactIfirDetail, AggIfirDetailIssue,
+    month_key="delivery_month", claim_key="box_claim", mm_key="box_mm", value_key="ifir",
+    detail_columns=[
+        ("Claim_Nbr", "claim_nbr"),
+        ("Claim_Month", "claim_month"),
+        ("Claim_Date", "claim_date"),
+        ("Delivery_Month", "delivery_month"),
+        ("Delivery_Day", "delivery_day"),
+    ] + _DETAIL_COMMON_COLUMNS,
+)
+
+RA_METRIC = KpiMetric(
+    "RA", FactRaRow, AggRaRowMonth, FactRaDetail, AggRaDetailIssue,
+    month_key="claim_month", claim_key="ra_claim", mm_key="ra_mm", value_key="ra",
+    detail_columns=[
+        ("Claim_Nbr", "claim_nbr"),
+        ("Claim_Month", "claim_month"),
+    ] + _DETAIL_COMMON_COLUMNS,
+)
+
+
+class ReportDetailRows:
+    """
+    报告明细行：迭代时执行查询，逐行产出按 columns 顺序序列化后的元组，不在内存中保留全部行。
+    查询使用服务端游标（stream_results），每次从数据库取 fetch_size 行，内存占用与 max_rows 无关；
+    迭代期间该会话的连接被游标占用，不能在同一会话上执行其他查询。
+    最多产出 max_rows 行（0 为不限）；迭代结束后 count 为产出行数，truncated 表示是否还有更多行。
+    """
+
+    def __init__(self, engine: "KpiEngine", query, keys: List[str], max_rows: int, fetch_size: int):
+        self.engine = engine
+        self.query = query
+        self.keys = keys
+        self.max_rows = max_rows
+        self.fetch_size = fetch_size
+        self.count = 0
+        self.truncated = False
+
+    def __iter__(self):
+        serialize = self.engine.serialize_detail_value
+        keys = self.keys
+        self.count = 0
+        self.truncated = False
+        query = self.query.limit(self.max_rows + 1) if self.max_rows else self.query
+        # yield_per 同时开启 stream_results：PyMySQL 使用 SSCursor，不再把整个结果集读入客户端
+        for r in query.yield_per(self.fetch_size):
+            if self.max_rows and self.count >= self.max_rows:
+                self.truncated = True
+                break
+            self.count += 1
+            yield tuple(serialize(key, value) for key, value in zip(keys, r))
+
+
+class KpiEngine:
+    """按 KpiMetric 执行分析查询"""
+
+    def __init__(self, db: Session, metric: KpiMetric):
+        self.db = db
+        self.metric = metric
+        aggregates = get_settings().KPI_AGGREGATES_ENABLED
+        # ROW 查询数据源：开启预聚合时读月度聚合表（字段名与 ROW 表一致），否则读 ROW 明细
+        self.row_source = metric.row_agg_model if aggregates else metric.row_model
+        # Top Issue 数据源：开启预聚合时读 Top Issue 汇总表（计数用 SUM(issue_count)），否则读 DETAIL 明细
+        self.issue_source = metric.issue_agg_model if aggregates else metric.detail_model
+        # Issue 明细 / 报告明细始终读 DETAIL 明细
+        self.detail_source = metric.detail_model
+
+    # ==================== 工具方法 ====================
+
+    def parse_month(self, month_str: str) -> date:
+        """解析月份字符串为日期"""
+        return date.fromisoformat(f"{month_str}-01")
+
+    def format_month(self, d: date) -> str:
+        """格式化日期为月份字符串"""
+        return d.strftime("%Y-%m")
+
+    def serialize_detail_value(self, key: str, value):
+        """导出明细时序列化取值，月份字段输出 YYYY-MM，bytes 按 UTF-8 解码，其余保持原值"""
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray)):
+            return value.decode("utf-8", errors="replace")
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, date):
+            if key in {"claim_month", "delivery_month"}:
+                return self.format_month(value)
+            return value.strftime("%Y-%m-%d")
+        return value
+
+    def calc_value(self, claim: int, mm: int) -> float:
+        """计算指标值（分子 / 分母）"""
+        if mm == 0:
+            return 0.0
+        return round(claim / mm, 8)
+
+    def calc_share(self, value: int, total: int) -> float:
+        """计算占比"""
+        if total == 0:
+            return 0.0
+        return round(value / total, 4)
+
+    def _sort_top_items(self, items: List[dict], sort_key: str) -> None:
+        claim_key, value_key = self.metric.claim_key, self.metric.value_key
+        if sort_key == "claim":
+            items.sort(
+                key=lambda x: (x.get(claim_key) or 0, x.get(value_key) or 0),
+                reverse=True
+            )
+        else:
+            items.sort(
+                key=lambda x: (x.get(value_key) or 0, x.get(claim_key) or 0),
+                reverse=True
+            )
+
+    def _month_of(self, source):
+        """数据源的时间主轴字段"""
+        return getattr(source, self.metric.month_key)
+
+    def _measure_item(self, name_key: str, name, claim: int, mm: int, **extra) -> dict:
+        """构建带分子分母与指标值的一行结果"""
+        return {
+            name_key: name,
+            self.metric.value_key: self.calc_value(claim, mm),
+            self.metric.claim_key: claim,
+            self.metric.mm_key: mm,
+            **extra,
+        }
+
+    def _query_row_totals(self, start_date: date, end_date: date, group_by: List[str],
+                          odms: Optional[List[str]] = None, segments: Optional[List[str]] = None,
+                          models: Optional[List[str]] = None) -> list:
+        """
+        按 group_by（ROW 字段名，时间主轴用 "month"）分组汇总分子分母，结果按分组字段排序；
+        行上的分子 / 分母合计字段名为 claim_sum / mm_sum
+        """
+        month_column = self._month_of(self.row_source)
+        columns = [
+            month_column.label("month") if name == "month" else getattr(self.row_source, name)
+            for name in group_by
+        ]
+        query = self.db.query(
+            *columns,
+            func.sum(getattr(self.row_source, self.metric.claim_key)).label("claim_sum"),
+            func.sum(getattr(self.row_source, self.metric.mm_key)).label("mm_sum")
+        ).filter(
+            month_column >= start_date,
+            month_column <= end_date
+        )
+        if odms:
+            query = query.filter(self.row_source.supplier_new.in_(odms))
+        if segments:
+            query = query.filter(self.row_source.segment.in_(segments))
+        if models:
+            query = query.filter(self.row_source.model.in_(models))
+        return query.group_by(*columns).order_by(*columns).all()
+
+    def _sum_by_key(self, rows, key) -> dict:
+        """按 key(row) 累加 claim_sum / mm_sum，返回 key -> (分子, 分母)，保持首次出现顺序"""
+        totals = {}
+        for r in rows:
+            k = key(r)
+            claim, mm = totals.get(k, (0, 0))
+            totals[k] = (claim + r.claim_sum, mm + r.mm_sum)
+        return totals
+
+    def _apply_detail_segment_filter(self, query, segments: Optional[List[str]], source=None):
+        """DETAIL 的 Segment 实际可能落在 segment2，查询时兼容两个字段。"""
+        if not segments:
+            return query
+        source = source or self.detail_source
+        return query.filter(
+            or_(
+                source.segment.in_(segments),
+                source.segment2.in_(segments),
+            )
+        )
+
+    def _issue_count(self):
+        """Top Issue 计数表达式：汇总表为 SUM(issue_count)，明细表为 COUNT(*)"""
+        if self.issue_source is self.detail_source:
+            return func.count()
+        # 转为整数，与 COUNT(*) 的返回类型保持一致
+        return cast(func.sum(self.issue_source.issue_count), Integer)
+
+    def resolve_detail_plants(
+        self,
+        start_date: date,
+        end_date: date,
+        odms: Optional[List[str]] = None,
+        segments: Optional[List[str]] = None,
+        models: Optional[List[str]] = None,
+    ) -> Optional[List[str]]:
+        """优先按当前 ROW 过滤范围动态解析 plant，避免静态映射缺失导致明细/Top Issue 少算。"""
+        if not odms:
+            return None
+        plant_map = self._resolve_detail_plants_batch(
+            start_date, end_date, odms=odms, segments=segments, models=models, by=None
+        )
+        return plant_map[None]
+
+    def _resolve_detail_plants_batch(
+        self,
+        start_date: date,
+        end_date: date,
+        odms: Optional[List[str]] = None,
+        segments: Optional[List[str]] = None,
+        models: Optional[List[str]] = None,
+        by: Optional[str] = "supplier_new",
+    ) -> dict:
+        """
+        一次查询解析每个 ODM（by="supplier_new"）或每个 Segment（by="segment"）各自的 plant 列表，
+        返回 取值 -> plant 列表；by=None 时整体解析，结果放在键 None 下。未选 ODM 时返回空字典。
+        """
+        if not odms:
+            return {}
+
+        month_column = self._month_of(self.row_source)
+        group_columns = [getattr(self.row_source, by)] if by else []
+        row_query = self.db.query(*group_columns, self.row_source.plant).filter(
+            month_column >= start_date,
+            month_column <= end_date,
+            self.row_source.supplier_new.in_(odms),
+            self.row_source.plant.isnot(None),
+            func.trim(self.row_source.plant) != "",
+        )
+        if segments:
+            row_query = row_query.filter(self.row_source.segment.in_(segments))
+        if models:
+            row_query = row_query.filter(self.row_source.model.in_(models))
+
+        row_plants = {}
+        for row in row_query.distinct().all():
+            key, plant = (row[0], row[1]) if by else (None, row[0])
+            if plant and plant.strip():
+                row_plants.setdefault(key, set()).add(plant.strip())
+
+        map_rows = self.db.query(MapOdmToPlant.supplier_new, MapOdmToPlant.plant).filter(
+            MapOdmToPlant.kpi_type == self.metric.name,
+            MapOdmToPlant.supplier_new.in_(odms),
+        ).distinct().all()
+        map_plants = {}
+        for odm, plant in map_rows:
+            if plant and plant.strip():
+                map_plants.setdefault(odm, set()).add(plant.strip())
+
+        if by == "supplier_new":
+            keys = odms
+        elif by:
+            keys = segments or []
+        else:
+            keys = [None]
+
+        result = {}
+        for key in keys:
+            plants = set(row_plants.get(key, ()))
+            if by == "supplier_new":
+                plants.update(map_plants.get(key, ()))
+            else:
+                # 按 Segment 或整体解析时沿用全部已选 ODM 的映射 plant
+                for odm_plants in map_plants.values():
+                    plants.update(odm_plants)
+            result[key] = sorted(plants) if plants else [NO_MATCH_PLANT]
+        return result
+
+    def _query_issue_counts(
+        self,
+        start_date: date,
+        end_date: date,
+        models: List[str],
+        segments: Optional[List[str]] = None,
+        plant_list: Optional[List[str]] = None,
+        dims: Tuple[str, ...] = ()
+    ) -> list:
+        """
+        一次查询多个Model的Issue计数，按 dims + model + fault_category 分组（时间主轴用 "month"）；
+        调用方按 dims 在内存中拆分到各卡片 / 月份，再用 _build_top_issues 生成 Top Issue
+        """
+        if not models:
+            return []
+
+        dim_columns = [
+            self._month_of(self.issue_source).label("month") if name == "month"
+            else getattr(self.issue_source, name)
+            for name in dims
+        ]
+        month_column = self._month_of(self.issue_source)
+        issue_query = self.db.query(
+            *dim_columns,
+            self.issue_source.model,
+            self.issue_source.fault_category,
+            self._issue_count().label("issue_count")
+        ).filter(
+            month_column >= start_date,
+            month_column <= end_date,
+            self.issue_source.model.in_(models),
+            self.issue_source.fault_category.isnot(None),
+            func.trim(self.issue_source.fault_category) != ""
+        )
+        issue_query = self._apply_detail_segment_filter(issue_query, segments, self.issue_source)
+        if plant_list:
+            issue_query = issue_query.filter(self.issue_source.plant.in_(plant_list))
+
+        return issue_query.group_by(
+            *dim_columns, self.issue_source.model, self.issue_source.fault_category
+        ).all()
+
+    def _rank_issues(self, counts: dict, top_n: int, share_of_top: bool = False) -> List[dict]:
+        """
+        fault_category -> 计数 排序取前 top_n；
+        占比默认以全部计数为分母，share_of_top=True 时以入选的前 top_n 合计为分母
+        """
+        ranked = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        total = sum(count for _, count in ranked) if share_of_top else sum(counts.values())
+        return [
+            {
+                "rank": i + 1,
+                "issue": issue,
+                "count": count,
+                "share": self.calc_share(count, total) if total > 0 else 0
+            }
+            for i, (issue, count) in enumerate(ranked)
+        ]
+
+    def _build_top_issues(self, issue_rows, top_n: int = 1) -> dict:
+        """由 _query_issue_counts 的结果生成每个Model的Top Issue列表（fault_category）"""
+        counts_by_model = {}
+        for r in issue_rows:
+            counts = counts_by_model.setdefault(r.model, {})
+            counts[r.fault_category] = counts.get(r.fault_category, 0) + r.issue_count
+        return {model: self._rank_issues(counts, top_n) for model, counts in counts_by_model.items()}
+
+    def _top_models_by_month(self, rows, name_key: str, top_n: int, sort_key: str,
+                             issue_rows=None) -> List[dict]:
+        """
+        (月份, 实体) 汇总行 -> 每月 Top N 列表；
+        issue_rows 不为 None 时按当月 DETAIL 数据附加每个 Model 的 Top Issue
+        """
+        monthly_dict = {}
+        for (month, name), (claim, mm) in self._sum_by_key(rows, lambda r: (r.month, getattr(r, name_key))).items():
+            monthly_dict.setdefault(self.format_month(month), []).append(self._measure_item(name_key, name, claim, mm))
+
+        monthly_issue_rows = {}
+        for r in issue_rows or []:
+            monthly_issue_rows.setdefault(self.format_month(r.month), []).append(r)
+
+        result = []
+        for month_str in sorted(monthly_dict.keys()):
+            items = monthly_dict[month_str]
+            if issue_rows is not None:
+                month_issue_map = self._build_top_issues(monthly_issue_rows.get(month_str, []))
+                for item in items:
+                    item["top_issues"] = month_issue_map.get(item[name_key])
+            self._sort_top_items(items, sort_key)
+            result.append({
+                "month": month_str,
+                "items": [{"rank": i + 1, **item} for i, item in enumerate(items[:top_n])]
+            })
+        return result
+
+    def _top_items(self, rows, name_key: str, top_n: int, sort_key: str, top_issues_map=None) -> List[dict]:
+        """实体汇总 Top N；top_issues_map 不为 None 时附加每个 Model 的 Top Issue"""
+        items = []
+        for name, (claim, mm) in self._sum_by_key(rows, lambda r: getattr(r, name_key)).items():
+            extra = {"top_issues": top_issues_map.get(name)} if top_issues_map is not None else {}
+            items.append(self._measure_item(name_key, name, claim, mm, **extra))
+        self._sort_top_items(items, sort_key)
+        return [{"rank": i + 1, **item} for i, item in enumerate(items[:top_n])]
+
+    def _trend(self, rows) -> List[dict]:
+        """按月汇总的趋势（返回完整时间范围数据）"""
+        return [
+            {"month": self.format_month(month), self.metric.value_key: self.calc_value(claim, mm)}
+            for month, (claim, mm) in sorted(self._sum_by_key(rows, lambda r: r.month).items())
+        ]
+
+    def _pie(self, rows, name_key: str) -> List[dict]:
+        """饼图：各实体的指标值与分子占比"""
+        totals = self._sum_by_key(rows, lambda r: getattr(r, name_key))
+        total_claim = sum(claim for claim, _ in totals.values())
+        return [
+            self._measure_item(name_key, name, claim, mm, share=self.calc_share(claim, total_claim))
+            for name, (claim, mm) in totals.items()
+        ]
+
+    def _meta(self, request) -> dict:
+        """data_as_of 取 ROW 数据的最大月份，无数据时取请求的结束月份"""
+        max_month = self.db.query(func.max(self._month_of(self.row_source))).scalar()
+        data_as_of = self.format_month(max_month) if max_month else request.time_range.end_month
+        return {"data_as_of": data_as_of, "time_range": request.time_range.model_dump()}
+
+    def data_version(self) -> str:
+        """
+        数据版本：已结束的上传任务数 + 最大任务 id + 最近完成时间（失败任务也可能已写入部分文件，一并计入）。
+        结束的任务不会重新排队、也不会删除，任务数只增不减，同一秒内结束的两个任务也会得到不同的版本；
+        完成时间用于覆盖已被回收判为失败的任务又由原 worker 完成的情况
+        """
+        count, max_id, latest = self.db.query(
+            func.count(UploadTask.id), func.max(UploadTask.id), func.max(UploadTask.completed_at)
+        ).filter(UploadTask.completed_at.isnot(None)).one()
+        return f"{count}:{max_id}:{latest.isoformat()}" if count else ""
+
+    def _cached(self, kind: str, params, compute, cacheable=None):
+        """
+        结果缓存：键为 KPI + 类别 + 数据源 + 数据版本 + 请求内容（请求模型或可 JSON 序列化的参数）；
+        缓存的是结果字典，调用方只读不改。相同请求并发未命中时只计算一次。
+        """
+        cache = get_analysis_cache()
+        if cache is None:
+            return compute()
+        if hasattr(params, "model_dump"):
+            params = params.model_dump(mode="json")
+        key = make_cache_key(
+            self.metric.name, kind, self.row_source.__tablename__, self.data_version(), params,
+        )
+        return cache.get_or_compute(key, compute, cacheable=cacheable)
+
+    def cached_report(self, kind: str, request, build) -> Tuple[str, str]:
+        """
+        报告文件缓存：build 返回 (临时文件路径, 下载文件名)；
+        缓存文件内容，命中时写出新的临时文件（调用方发送后删除）；
+        超过 KPI_CACHE_MAX_ITEM_BYTES 的文件不读入内存也不缓存，直接返回 build 生成的文件
+        """
+        if get_analysis_cache() is None:
+            return build()
+
+        max_bytes = get_settings().KPI_CACHE_MAX_ITEM_BYTES
+
+        def compute() -> dict:
+            path, filename = build()
+            if Path(path).stat().st_size > max_bytes:
+                return {"filename": filename, "path": path}
+            try:
+                content = Path(path).read_bytes()
+            finally:
+                Path(path).unlink(missing_ok=True)
+            return {"filename": filename, "content": content}
+
+        artifact = self._cached(
+            f"report:{kind}", request, compute,
+            cacheable=lambda a: "content" in a,
+        )
+        if "path" in artifact:
+            return artifact["path"], artifact["filename"]
+        prefix = f"{self.metric.name.lower()}-{kind}-"
+        with NamedTemporaryFile(prefix=prefix, suffix=Path(artifact["filename"]).suffix, delete=False) as tmp:
+            tmp.write(artifact["content"])
+            return tmp.name, artifact["filename"]
+
+    # ==================== Options ====================
+
+    def get_options(
+        self,
+        segments: Optional[List[str]] = None,
+        odms: Optional[List[str]] = None,
+        models: Optional[List[str]] = None
+    ) -> dict:
+        """
+        获取筛选项
+        支持任意组合过滤: 任一条件变化都会影响其他选项
+        开启 KPI_DIMENSION_INDEX_ENABLED 时由维度索引在内存中过滤，否则查询数据库（结果缓存）
+        """
+        if get_settings().KPI_DIMENSION_INDEX_ENABLED:
+            return get_dimension_index(self).options(segments=segments, odms=odms, models=models)
+        params = {"segments": segments, "odms": odms, "models": models}
+        return self._cached("options", params, lambda: self._get_options(segments, odms, models))
+
+    def _get_options(self, segments, odms, models) -> dict:
+        month_column = self._month_of(self.row_source)
+        # 获取月份范围（全局）
+        month_result = self.db.query(
+            func.min(month_column).label("month_min"),
+            func.max(month_column).label("month_max")
+        ).first()
+
+        month_min = self.format_month(month_result.month_min) if month_result.month_min else ""
+        month_max = self.format_month(month_result.month_max) if month_result.month_max else ""
+
+        # Segment列表 (根据odms和models过滤)
+        segment_query = self.db.query(self.row_source.segment).filter(self.row_source.segment.isnot(None))
+        if odms:
+            segment_query = segment_query.filter(self.row_source.supplier_new.in_(odms))
+        if models:
+            segment_query = segment_query.filter(self.row_source.model.in_(models))
+        segments_list = [r[0] for r in segment_query.distinct().order_by(self.row_source.segment).all()]
+
+        # ODM列表 (根据segments和models过滤)
+        odm_query = self.db.query(self.row_source.supplier_new).filter(self.row_source.supplier_new.isnot(None))
+        if segments:
+            odm_query = odm_query.filter(self.row_source.segment.in_(segments))
+        if models:
+            odm_query = odm_query.filter(self.row_source.model.in_(models))
+        odms_list = [r[0] for r in odm_query.distinct().order_by(self.row_source.supplier_new).all()]
+
+        # Model列表 (根据segments和odms过滤)
+        model_query = self.db.query(self.row_source.model).filter(self.row_source.model.isnot(None))
+        if segments:
+            model_query = model_query.filter(self.row_source.segment.in_(segments))
+        if odms:
+            model_query = model_query.filter(self.row_source.supplier_new.in_(odms))
+        models_list = [r[0] for r in model_query.distinct().order_by(self.row_source.model).all()]
+
+        return {
+            "month_min": month_min,
+            "month_max": month_max,
+            "data_as_of": month_max,
+            "time_range": {"min_month": month_min, "max_month": month_max},
+            "segments": segments_list,
+            "odms": odms_list,
+            "models": models_list,
+        }
+
+    # ==================== ODM Analyze ====================
+
+    def analyze_odm(self, request) -> dict:
+        """ODM分析"""
+        return self._cached("odm", request, lambda: self._analyze_odm(request))
+
+    def _analyze_odm(self, request) -> dict:
+        start_date = self.parse_month(request.time_range.start_month)
+        end_date = self.parse_month(request.time_range.end_month)
+        view = request.view
+        top_model_n = view.top_model_n if view else 10
+        top_model_sort = view.top_model_sort if view else "claim"
+
+        odms = request.filters.odms
+        segments = request.filters.segments
+        models = request.filters.models
+
+        # 一次查询所有ODM的 (ODM, Model, 月份) 汇总，饼图/趋势/Top Model/月度明细在内存中拆分
+        row_data = self._query_row_totals(
+            start_date, end_date, ["supplier_new", "model", "month"],
+            odms=odms or [NO_MATCH_PLANT], segments=segments, models=models
+        )
+        rows_by_odm = {}
+        for r in row_data:
+            rows_by_odm.setdefault(r.supplier_new, []).append(r)
+
+        # Block D - ODM饼图汇总 (多ODM时)
+        summary = None
+        if len(odms) > 1:
+            summary = {"odm_pie": [
+                {**item, "odm": item.pop("supplier_new")} for item in self._pie(row_data, "supplier_new")
+            ]}
+
+        # Top Issue 按 (月份, plant) 一次查出，再按各ODM的 plant 拆分
+        odm_plant_map = self._resolve_detail_plants_batch(
+            start_date, end_date, odms=odms, segments=segments, models=models
+        )
+        issue_rows = self._query_issue_counts(
+            start_date=start_date,
+            end_date=end_date,
+            models=sorted({r.model for r in row_data if r.model is not None}),
+            segments=segments,
+            plant_list=sorted({plant for plants in odm_plant_map.values() for plant in plants}),
+            dims=("month", "plant")
+        )
+
+        # 为每个ODM生成卡片
+        cards = []
+        for odm in odms:
+            odm_rows = rows_by_odm.get(odm, [])
+            model_rows = [r for r in odm_rows if r.model is not None]
+            odm_plants = set(odm_plant_map.get(odm, []))
+            odm_issue_rows = [r for r in issue_rows if r.plant in odm_plants]
+
+            cards.append({
+                "odm": odm,
+                # Block A - 趋势
+                "trend": self._trend(odm_rows),
+                # Block B - Top Model (汇总)
+                "top_models": self._top_items(
+                    model_rows, "model", top_model_n, top_model_sort,
+                    top_issues_map=self._build_top_issues(odm_issue_rows)
+                ),
+                # 月度明细 - Top Model（Top Issue 取当月数据）
+                "monthly_top_models": self._top_models_by_month(
+                    model_rows, "model", top_model_n, top_model_sort, issue_rows=odm_issue_rows
+                ),
+                "ai_summary": ""
+            })
+
+        return {"meta": self._meta(request), "summary": summary, "cards": cards}
+
+    # ==================== Segment Analyze ====================
+
+    def analyze_segment(self, request) -> dict:
+        """Segment分析"""
+        return self._cached("segment", request, lambda: self._analyze_segment(request))
+
+    def _analyze_segment(self, request) -> dict:
+        start_date = self.parse_month(request.time_range.start_month)
+        end_date = self.parse_month(request.time_range.end_month)
+        view = request.view
+        top_n = view.top_n if view else 10
+        top_odm_sort = view.top_odm_sort if view else "claim"
+        top_model_sort = view.top_model_sort if view else "claim"
+
+        segments = request.filters.segments
+        odms = request.filters.odms
+        models = request.filters.models
+
+        # 一次查询所有Segment的 (Segment, ODM, Model, 月份) 汇总，各区块在内存中拆分
+        row_data = self._query_row_totals(
+            start_date, end_date, ["segment", "supplier_new", "model", "month"],
+            odms=odms, segments=segments or [NO_MATCH_PLANT], models=models
+        )
+        rows_by_segment = {}
+        for r in row_data:
+            rows_by_segment.setdefault(r.segment, []).append(r)
+
+        # Block D - Segment饼图汇总
+        summary = None
+        if len(segments) > 1:
+            summary = {"segment_pie": self._pie(row_data, "segment")}
+
+        # Top Issue 按 (月份, plant, segment, segment2) 一次查出，再按各Segment拆分
+        seg_plant_map = self._resolve_detail_plants_batch(
+            start_date, end_date, odms=odms, segments=segments, models=models, by="segment"
+        )
+        issue_rows = self._query_issue_counts(
+            start_date=start_date,
+            end_date=end_date,
+            models=sorted({r.model for r in row_data if r.model is not None}),
+            segments=segments,
+            plant_list=sorted({plant for plants in seg_plant_map.values() for plant in plants}),
+            dims=("month", "plant", "segment", "segment2")
+        )
+
+        # 为每个Segment生成卡片
+        cards = []
+        for segment in segments:
+            segment_rows = rows_by_segment.get(segment, [])
+            odm_rows = [r for r in segment_rows if r.supplier_new is not None]
+            model_rows = [r for r in segment_rows if r.model is not None]
+            seg_plants = set(seg_plant_map[segment]) if odms else None
+            seg_issue_rows = [
+                r for r in issue_rows
+                if (r.segment == segment or r.segment2 == segment)
+                and (seg_plants is None or r.plant in seg_plants)
+            ]
+
+            top_odms = self._top_items(odm_rows, "supplier_new", top_n, top_odm_sort)
+            monthly_top_odms = self._top_models_by_month(odm_rows, "supplier_new", top_n, top_odm_sort)
+            cards.append({
+                "segment": segment,
+                # Block A - 趋势
+                "trend": self._trend(segment_rows),
+                # Block B - Top ODM / Top Model (汇总)
+                "top_odms": [self._rename_odm(item) for item in top_odms],
+                "top_models": self._top_items(
+                    model_rows, "model", top_n, top_model_sort,
+                    top_issues_map=self._build_top_issues(seg_issue_rows)
+                ),
+                # 月度明细 - Top ODM / Top Model（Top Issue 取当月数据）
+                "monthly_top_odms": [
+                    {"month": m["month"], "items": [self._rename_odm(item) for item in m["items"]]}
+                    for m in monthly_top_odms
+                ],
+                "monthly_top_models": self._top_models_by_month(
+                    model_rows, "model", top_n, top_model_sort, issue_rows=seg_issue_rows
+                ),
+                "ai_summary": ""
+            })
+
+        return {"meta": self._meta(request), "summary": summary, "cards": cards}
+
+    def _rename_odm(self, item: dict) -> dict:
+        """ROW 字段 supplier_new 在响应中命名为 odm"""
+        item = dict(item)
+        item["odm"] = item.pop("supplier_new")
+        return item
+
+    # ==================== Model Analyze ====================
+
+    def analyze_model(self, request) -> dict:
+        """Model分析 - 使用DETAIL表获取Top Issue"""
+        return self._cached("model", request, lambda: self._analyze_model(request))
+
+    def _analyze_model(self, request) -> dict:
+        start_date = self.parse_month(request.time_range.start_month)
+        end_date = self.parse_month(request.time_range.end_month)
+        view = request.view
+        top_issue_n = view.top_issue_n if view else 10
+
+        models_list = request.filters.models
+        segments = list(request.filters.segments or [])
+        # 兼容单选 segment 参数
+        segment = getattr(request.filters, "segment", None)
+        if segment and segment not in segments:
+            segments.append(segment)
+        segments = segments or None
+        odms = request.filters.odms
+
+        plant_list = self.resolve_detail_plants(
+            start_date, end_date, odms=odms, segments=segments, models=models_list
+        )
+
+        # 一次查询所有Model的 (Model, 月份) 汇总，饼图与趋势在内存中拆分
+        row_data = self._query_row_totals(
+            start_date, end_date, ["model", "month"],
+            odms=odms, segments=segments, models=models_list or [NO_MATCH_PLANT]
+        )
+        rows_by_model = {}
+        for r in row_data:
+            rows_by_model.setdefault(r.model, []).append(r)
+
+        # Block D - Model饼图汇总
+        summary = None
+        if len(models_list) > 1:
+            summary = {"model_pie": self._pie(row_data, "model")}
+
+        # Top Issue (从DETAIL表) - 一次查询所有Model的 (Model, 月份, Issue) 计数
+        issue_rows = self._query_issue_counts(
+            start_date=start_date,
+            end_date=end_date,
+            models=models_list,
+            segments=segments,
+            plant_list=plant_list,
+            dims=("month",)
+        )
+        issues_by_model = {}
+        for r in issue_rows:
+            issues_by_model.setdefault(r.model, []).append(r)
+
+        # 为每个Model生成卡片
+        cards = []
+        for model in models_list:
+            model_issues = issues_by_model.get(model, [])
+
+            # Block B - Top Issue (汇总)，占比以入选的 Top N 合计为分母
+            issue_totals = {}
+            for r in model_issues:
+                issue_totals[r.fault_category] = issue_totals.get(r.fault_category, 0) + r.issue_count
+
+            # 月度明细 - Top Issue，占比以当月全部计数为分母
+            monthly_counts = {}
+            for r in model_issues:
+                counts = monthly_counts.setdefault(self.format_month(r.month), {})
+                counts[r.fault_category] = counts.get(r.fault_category, 0) + r.issue_count
+
+            cards.append({
+                "model": model,
+                # Block A - 趋势 (从ROW表)
+                "trend": self._trend(rows_by_model.get(model, [])),
+                "top_issues": self._rank_issues(issue_totals, top_issue_n, share_of_top=True),
+                "monthly_top_issues": [
+                    {"month": month_str, "items": self._rank_issues(monthly_counts[month_str], top_issue_n)}
+                    for month_str in sorted(monthly_counts.keys())
+                ],
+                "ai_summary": ""
+            })
+
+        return {"meta": self._meta(request), "summary": summary, "cards": cards}
+
+    # ==================== Model Issue Details ====================
+
+    def get_model_issue_details(self, request) -> dict:
+        """Model Issue明细查询（分页）"""
+        start_date = self.parse_month(request.time_range.start_month)
+        end_date = self.parse_month(request.time_range.end_month)
+        model = request.filters.model
+        issue = request.filters.issue
+        month = getattr(request.filters, "month", None)
+        segments = request.filters.segments
+        odms = request.filters.odms
+        page = request.pagination.page if request.pagination else 1
+        page_size = request.pagination.page_size if request.pagination else 10
+
+        plant_list = self.resolve_detail_plants(
+            start_date, end_date, odms=odms, segments=segments, models=[model]
+        )
+
+        detail = self.detail_source
+        month_column = self._month_of(detail)
+        query = self.db.query(detail).filter(
+            month_column >= start_date,
+            month_column <= end_date,
+            detail.model == model,
+            detail.fault_category == issue
+        )
+        if month:
+            query = query.filter(month_column == self.parse_month(month))
+        query = self._apply_detail_segment_filter(query, segments)
+        if plant_list:
+            query = query.filter(detail.plant.in_(plant_list))
+
+        total = query.count()
+        rows = query.order_by(month_column.desc()).offset((page - 1) * page_size).limit(page_size).all()
+
+        items = [
+            {
+                "model": r.model,
+                "fault_category": r.fault_category,
+                "problem_descr_by_tech": r.problem_descr_by_tech,
+                "claim_nbr": r.claim_nbr,
+                # 明细列表的月份统一取时间主轴
+                "claim_month": self.format_month(getattr(r, self.metric.month_key)),
+                "plant": r.plant
+            }
+            for r in rows
+        ]
+        return {"total": total, "page": page, "page_size": page_size, "items": items}
+
+    # ==================== Report Detail ====================
+
+    def get_report_detail(
+        self,
+        start_date: date,
+        end_date: date,
+        models: Optional[List[str]] = None,
+        segments: Optional[List[str]] = None,
+        odms: Optional[List[str]] = None,
+        max_rows: Optional[int] = None,
+        detail_export: str = "sheet",
+    ) -> "ReportDetailRows":
+        """
+        获取 DETAIL 全量数据（供报告使用），字段为 KpiMetric.detail_columns；返回逐行迭代的结果，迭代时才执行查询。
+        max_rows 默认按导出方式取 REPORT_DETAIL_MAX_ROWS（sheet）或 REPORT_DETAIL_EXPORT_MAX_ROWS（multi_sheet / csv_zip），0 为不限
+        """
+        settings = get_settings()
+        if max_rows is None:
+            max_rows = (settings.REPORT_DETAIL_MAX_ROWS if detail_export == "sheet"
+                        else settings.REPORT_DETAIL_EXPORT_MAX_ROWS)
+        detail = self.detail_source
+        month_column = self._month_of(detail)
+        columns = self.metric.detail_columns
+        detail_fields = [getattr(detail, key) for _, key in columns]
+
+        query = self.db.query(*detail_fields).filter(
+            month_column >= start_date,
+            month_column <= end_date,
+        )
+
+        if models:
+            query = query.filter(detail.model.in_(models))
+        query = self._apply_detail_segment_filter(query, segments)
+
+        plant_list = self.resolve_detail_plants(
+            start_date, end_date, odms=odms, segments=segments, models=models
+        )
+        if plant_list:
+            query = query.filter(detail.plant.in_(plant_list))
+
+        return ReportDetailRows(
+            self, query.order_by(month_column.desc()), [k for _, k in columns],
+            max_rows, settings.REPORT_DETAIL_FETCH_SIZE,
+        )
+
+    # ==================== Report Generation ====================
+
+    def generate_report(self, kind: str, request, analyze_request,
+                        progress: Optional[Callable[[int], None]] = None) -> Tuple[str, str]:
+        """
+        生成分析报告 Excel（kind：model / odm / segment），返回 (临时文件路径, 下载文件名)；
+        analyze_request 为对应的分析请求（分析结果与 analyze 接口共用缓存），相同请求与数据版本复用已生成的文件；
+        progress 接收生成进度（百分比）
+        """
+        return self.cached_report(
+            _REPORT_KINDS[kind][3], request, lambda: self._build_report(kind, request, analyze_request, progress)
+        )
+
+    def _build_report(self, kind: str, request, analyze_request, progress=None) -> Tuple[str, str]:
+        from app.services.report_chart import generate_trend_chart, generate_pie_chart
+        from app.services.report_excel import ReportExcelBuilder, build_report_filename
+
+        dimension, entity_key, analyze, short_kind = _REPORT_KINDS[kind]
+        name, value_key = self.metric.name, self.metric.value_key
+        claim_key, mm_key = self.metric.claim_key, self.metric.mm_key
+        filters = request.filters
+
+        data = getattr(self, analyze)(analyze_request)
+        report_progress(progress, 30)
+
+        detail_rows = self.get_report_detail(
+            self.parse_month(request.time_range.start_month),
+            self.parse_month(request.time_range.end_month),
+            models=filters.models,
+            segments=filters.segments,
+            odms=filters.odms,
+            detail_export=request.detail_export,
+        )
+
+        report_progress(progress, 50)
+        cards = data["cards"]
+        trend_entities = [
+            {"name": c[entity_key], "trend": [{"month": t["month"], "value": t[value_key]} for t in c["trend"]]}
+            for c in cards
+        ]
+        trend_png = generate_trend_chart(trend_entities, tgt=request.tgt,
+                                         value_label=name, title=f"{name} {dimension} 趋势对比")
+
+        pie_png = None
+        pie_table = []
+        pie = (data["summary"] or {}).get(f"{entity_key}_pie")
+        if pie:
+            pie_items = [{"name": p[entity_key], "value": p[value_key] * 1_000_000, "share": p["share"]}
+                         for p in pie]
+            pie_png = generate_pie_chart(pie_items, value_label=name, title=f"{dimension} {name} 占比")
+            pie_table = [
+                {"name": p[entity_key], "dppm": round(p[value_key] * 1_000_000),
+                 "share": p["share"], claim_key: p[claim_key], mm_key: p[mm_key]}
+                for p in pie
+            ]
+
+        report_progress(progress, 60)
+        entities, extra_filters = self._report_filters(kind, request)
+        builder = ReportExcelBuilder(kpi_type=name, dimension=dimension)
+        builder.add_info_sheet(meta={
+            "data_as_of": data["meta"]["data_as_of"],
+            "time_range": f"{request.time_range.start_month} ~ {request.time_range.end_month}",
+            "entities": ", ".join(entities),
+            "extra_filters": extra_filters,
+        }, tgt=request.tgt)
+        builder.add_trend_sheet(trend_entities, trend_png, value_key=value_key, unit_label=name)
+
+        measure = {"value_label": name, "claim_key": claim_key, "mm_key": mm_key}
+        if kind == "model":
+            builder.add_top_issue_sheet(cards, entity_key="model")
+            builder.add_monthly_top_issue_sheet(cards, entity_key="model")
+        else:
+            if kind == "segment":
+                builder.add_top_odm_sheet(cards, **measure)
+                builder.add_monthly_top_odm_sheet(cards, **measure)
+            builder.add_top_model_sheet(cards, entity_key=entity_key, **measure)
+            builder.add_monthly_top_model_sheet(cards, entity_key=entity_key, **measure)
+        builder.add_detail_sheet(detail_rows, self.metric.detail_columns, export=request.detail_export)
+
+        if pie_png:
+            builder.add_comparison_sheet(pie_table, pie_png, entity_key="name", **measure)
+
+        report_progress(progress, 90)
+        filename = build_report_filename(name, dimension, entities,
+                                         request.time_range.start_month, request.time_range.end_month)
+        return builder.save_report(filename, prefix=f"{name.lower()}-{short_kind}-")
+
+    def _report_filters(self, kind: str, request) -> Tuple[List[str], dict]:
+        """报告信息页：本报告的实体列表与其余筛选条件（未选为"全部"）"""
+        filters = request.filters
+        view = getattr(request, "view", None)
+
+        def joined(values):
+            return ", ".join(values) if values else "全部"
+
+        if kind == "model":
+            return filters.models, {"筛选Segment": joined(filters.segments), "筛选ODM": joined(filters.odms)}
+        if kind == "odm":
+            return filters.odms, {
+                "筛选Segment": joined(filters.segments),
+                "筛选Model": joined(filters.models),
+                "Top Model排序": (view.top_model_sort if view else "claim").upper(),
+            }
+        return filters.segments, {
+            "筛选ODM": joined(filters.odms),
+            "筛选Model": joined(filters.models),
+            "Top ODM排序": (view.top_odm_sort if view else "claim").upper(),
+            "Top Model排序": (view.top_model_sort if view else "claim").upper(),
+        }
@@ -11,6 +11,8 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+# 报告在多个线程中并发生成，使用不经过 pyplot 全局状态的 Figure 对象
+from matplotlib.figure import Figure
 
 logger = logging.getLogger(__name__)
 
@@ -93,7 +95,8 @@ def generate_trend_chart(
     value_label : str
         Y 轴标签前缀，"IFIR" 或 "RA"。
     """
-    fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
 
     all_months = sorted({p["month"] for e in entities for p in e["trend"]})
 
@@ -119,7 +122,6 @@ def generate_trend_chart(
     fig.tight_layout()
     buf = BytesIO()
     fig.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
     buf.seek(0)
     return buf.getvalue()
 
@@ -140,7 +142,8 @@ def generate_pie_chart(
         [{"name": "ModelA", "value": 1234, "share": 0.452}, ...]
         value 为 DPPM 值。
     """
-    fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
 
     names = [it["name"] for it in items]
     values = [it["value"] for it in items]
@@ -160,6 +163,5 @@ def generate_pie_chart(
     fig.tight_layout()
     buf = BytesIO()
     fig.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
     buf.seek(0)
     return buf.getvalue()
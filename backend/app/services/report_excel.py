@@ -1,12 +1,19 @@
 """
 报告 Excel 构建模块
-使用 openpyxl 生成多 Sheet Excel 并嵌入图表图片
+使用 openpyxl 只写模式生成多 Sheet Excel 并嵌入图表图片
 """
+import csv
+import io
+import os
+import zipfile
 from io import BytesIO
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from tempfile import NamedTemporaryFile
+from itertools import chain, islice
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.drawing.image import Image as XlImage
@@ -26,45 +33,78 @@ THIN_BORDER = Border(
 NUMBER_FMT = '#,##0'
 PCT_FMT = '0.0%'
 DPPM_FMT = '#,##0'
+CENTER = Alignment(horizontal='center')
 INVALID_FILENAME_CHARS = '\\/:*?"<>|'
+EXCEL_MAX_ROWS = 1_048_576  # 单个 Sheet 的行数上限（含表头）
+DETAIL_SHEET_TITLE = "Detail明细数据"
 
 
 class ReportExcelBuilder:
-    """报告 Excel 构建器"""
+    """
+    报告 Excel 构建器
+
+    使用 openpyxl 只写模式（write_only）：行写入后即序列化到临时文件，不在内存中保留单元格，
+    明细 Sheet 的内存占用与行数无关。只写模式下列宽须在写入行之前设置，按表头与前 WIDTH_SAMPLE_ROWS 行估算。
+    """
+
+    WIDTH_SAMPLE_ROWS = 1000
+    SHEET_MAX_ROWS = EXCEL_MAX_ROWS - 1  # 每个明细 Sheet 的数据行数（扣除表头）
 
     def __init__(self, kpi_type: str, dimension: str):
         self.kpi_type = kpi_type
         self.dimension = dimension
-        self.wb = Workbook()
-        self.wb.remove(self.wb.active)
+        self.wb = Workbook(write_only=True)
+        self._csv_detail = None  # csv_zip 方式导出时的 (明细行, 列定义)，保存时写出
 
     # ------------------------------------------------------------------
     # helpers
     # ------------------------------------------------------------------
-    def _write_header(self, ws, row: int, headers: List[str]):
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=h)
-            cell.font = HEADER_FONT
-            cell.fill = HEADER_FILL
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = THIN_BORDER
-
-    def _write_row(self, ws, row: int, values: list, fmt_map: Optional[Dict[int, str]] = None):
-        for col, v in enumerate(values, 1):
-            cell = ws.cell(row=row, column=col, value=v)
-            cell.border = THIN_BORDER
-            cell.alignment = Alignment(horizontal='center')
-            if fmt_map and col in fmt_map:
-                cell.number_format = fmt_map[col]
-
-    def _auto_width(self, ws, min_width: int = 12, max_width: int = 40):
-        for col_cells in ws.columns:
-            max_len = min_width
-            col_letter = get_column_letter(col_cells[0].column)
-            for cell in col_cells:
-                if cell.value:
-                    max_len = max(max_len, min(len(str(cell.value)) + 4, max_width))
-            ws.column_dimensions[col_letter].width = max_len
+    def _cell(self, ws, value, font=None, fill=None, alignment=None, border=None, number_format=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        if border is not None:
+            cell.border = border
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
+
+    def _write_header(self, ws, headers: List[str]):
+        ws.append([
+            self._cell(ws, h, font=HEADER_FONT, fill=HEADER_FILL, alignment=CENTER, border=THIN_BORDER)
+            for h in headers
+        ])
+
+    def _write_row(self, ws, values: list, fmt_map: Optional[Dict[int, str]] = None, align: bool = True):
+        ws.append([
+            self._cell(ws, v, alignment=CENTER if align else None, border=THIN_BORDER,
+                       number_format=fmt_map.get(col) if fmt_map else None)
+            for col, v in enumerate(values, 1)
+        ])
+
+    def _write_table(self, ws, headers: List[str], rows: List[list],
+                     fmt_map: Optional[Dict[int, str]] = None, align: bool = True):
+        """设置列宽后写入表头与数据行（汇总类 Sheet）"""
+        self._auto_width(ws, [headers] + rows[:self.WIDTH_SAMPLE_ROWS])
+        self._write_header(ws, headers)
+        for values in rows:
+            self._write_row(ws, values, fmt_map, align)
+
+    def _auto_width(self, ws, rows: List[list], min_width: int = 12, max_width: int = 40):
+        """按样本行估算列宽（须在写入行之前调用）"""
+        widths: Dict[int, int] = {}
+        for values in rows:
+            for col, value in enumerate(values, 1):
+                width = widths.get(col, min_width)
+                if value:
+                    width = max(width, min(len(str(value)) + 4, max_width))
+                widths[col] = width
+        for col, width in widths.items():
+            ws.column_dimensions[get_column_letter(col)].width = width
 
     def _embed_image(self, ws, png_bytes: bytes, anchor: str,
                      width: int = 800, height: int = 400):
@@ -82,8 +122,8 @@ class ReportExcelBuilder:
         ws.column_dimensions['B'].width = 60
 
         title = f"{self.kpi_type} {self.dimension}分析报告"
-        cell = ws.cell(row=1, column=1, value=title)
-        cell.font = TITLE_FONT
+        ws.append([self._cell(ws, title, font=TITLE_FONT)])
+        ws.append([])
 
         rows = [
             ("数据截至", meta.get("data_as_of", "")),
@@ -97,9 +137,8 @@ class ReportExcelBuilder:
             rows.append(("TGT目标", f"{tgt:,} DPPM"))
         rows.append(("报告生成时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
 
-        for i, (label, val) in enumerate(rows, 3):
-            ws.cell(row=i, column=1, value=label).font = META_LABEL_FONT
-            ws.cell(row=i, column=2, value=val)
+        for label, val in rows:
+            ws.append([self._cell(ws, label, font=META_LABEL_FONT), val])
 
     def add_trend_sheet(
         self,
@@ -111,19 +150,18 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet("趋势数据")
         all_months = sorted({p["month"] for e in entities for p in e["trend"]})
         headers = ["Month"] + [f'{e["name"]} {unit_label}(DPPM)' for e in entities]
-        self._write_header(ws, 1, headers)
+        month_maps = [{p["month"]: p["value"] for p in e["trend"]} for e in entities]
 
-        for r_idx, month in enumerate(all_months, 2):
-            ws.cell(row=r_idx, column=1, value=month).border = THIN_BORDER
-            for c_idx, entity in enumerate(entities, 2):
-                month_map = {p["month"]: p["value"] for p in entity["trend"]}
+        rows = []
+        for month in all_months:
+            values = [month]
+            for month_map in month_maps:
                 raw = month_map.get(month)
-                dppm = round(raw * 1_000_000) if raw is not None else None
-                cell = ws.cell(row=r_idx, column=c_idx, value=dppm)
-                cell.border = THIN_BORDER
-                cell.number_format = DPPM_FMT
+                values.append(round(raw * 1_000_000) if raw is not None else None)
+            rows.append(values)
+        fmt_map = {col: DPPM_FMT for col in range(2, len(headers) + 1)}
+        self._write_table(ws, headers, rows, fmt_map=fmt_map, align=False)
 
-        self._auto_width(ws)
         if chart_png:
             anchor_row = len(all_months) + 4
             self._embed_image(ws, chart_png, f"A{anchor_row}")
@@ -131,39 +169,31 @@ class ReportExcelBuilder:
     def add_top_issue_sheet(self, cards_data: List[Dict], entity_key: str = "model"):
         ws = self.wb.create_sheet("Top Issue汇总")
         headers = [self.dimension, "Rank", "Issue", "Count", "Share(%)"]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             name = card.get(entity_key, "")
             for issue in card.get("top_issues", []):
-                self._write_row(ws, row, [
+                rows.append([
                     name, issue.get("rank"), issue.get("issue"),
                     issue.get("count"),
                     issue.get("share"),
-                ], fmt_map={5: PCT_FMT})
-                row += 1
-        self._auto_width(ws)
+                ])
+        self._write_table(ws, headers, rows, fmt_map={5: PCT_FMT})
 
     def add_monthly_top_issue_sheet(self, cards_data: List[Dict], entity_key: str = "model"):
         ws = self.wb.create_sheet("月度Top Issue")
         headers = ["Month", self.dimension, "Rank", "Issue", "Count", "Share(%)"]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             name = card.get(entity_key, "")
             for monthly in card.get("monthly_top_issues", []) or []:
                 month = monthly.get("month", "")
                 for issue in monthly.get("items", []):
-                    self._write_row(ws, row, [
+                    rows.append([
                         month, name, issue.get("rank"), issue.get("issue"),
                         issue.get("count"), issue.get("share"),
-                    ], fmt_map={6: PCT_FMT})
-                    row += 1
-        self._auto_width(ws)
+                    ])
+        self._write_table(ws, headers, rows, fmt_map={6: PCT_FMT})
 
     def add_top_model_sheet(self, cards_data: List[Dict], entity_key: str = "odm",
                             value_label: str = "IFIR",
@@ -171,22 +201,18 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet("Top Model汇总")
         headers = [self.dimension, "Rank", "Model", "Top Issues",
                    f"{value_label}(DPPM)", claim_key.upper(), mm_key.upper()]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             name = card.get(entity_key, "")
             for m in card.get("top_models", []):
                 issues_str = self._format_top_issues(m.get("top_issues"))
                 kpi_val = m.get(value_label.lower()) or m.get("ifir") or m.get("ra") or 0
                 dppm = round(kpi_val * 1_000_000)
-                self._write_row(ws, row, [
+                rows.append([
                     name, m.get("rank"), m.get("model"), issues_str,
                     dppm, m.get(claim_key), m.get(mm_key),
-                ], fmt_map={5: DPPM_FMT, 6: NUMBER_FMT, 7: NUMBER_FMT})
-                row += 1
-        self._auto_width(ws)
+                ])
+        self._write_table(ws, headers, rows, fmt_map={5: DPPM_FMT, 6: NUMBER_FMT, 7: NUMBER_FMT})
 
     def add_monthly_top_model_sheet(self, cards_data: List[Dict], entity_key: str = "odm",
                                      value_label: str = "IFIR",
@@ -194,10 +220,7 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet("月度Top Model")
         headers = ["Month", self.dimension, "Rank", "Model", "Top Issues",
                    f"{value_label}(DPPM)", claim_key.upper(), mm_key.upper()]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             name = card.get(entity_key, "")
             for monthly in card.get("monthly_top_models", []) or []:
@@ -206,12 +229,11 @@ class ReportExcelBuilder:
                     issues_str = self._format_top_issues(m.get("top_issues"))
                     kpi_val = m.get(value_label.lower()) or m.get("ifir") or m.get("ra") or 0
                     dppm = round(kpi_val * 1_000_000)
-                    self._write_row(ws, row, [
+                    rows.append([
                         month, name, m.get("rank"), m.get("model"), issues_str,
                         dppm, m.get(claim_key), m.get(mm_key),
-                    ], fmt_map={6: DPPM_FMT, 7: NUMBER_FMT, 8: NUMBER_FMT})
-                    row += 1
-        self._auto_width(ws)
+                    ])
+        self._write_table(ws, headers, rows, fmt_map={6: DPPM_FMT, 7: NUMBER_FMT, 8: NUMBER_FMT})
 
     def add_top_odm_sheet(self, cards_data: List[Dict],
                           value_label: str = "IFIR",
@@ -219,21 +241,17 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet("Top ODM汇总")
         headers = ["Segment", "Rank", "ODM",
                    f"{value_label}(DPPM)", claim_key.upper(), mm_key.upper()]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             seg = card.get("segment", "")
             for o in card.get("top_odms", []):
                 kpi_val = o.get(value_label.lower()) or o.get("ifir") or o.get("ra") or 0
                 dppm = round(kpi_val * 1_000_000)
-                self._write_row(ws, row, [
+                rows.append([
                     seg, o.get("rank"), o.get("odm"),
                     dppm, o.get(claim_key), o.get(mm_key),
-                ], fmt_map={4: DPPM_FMT, 5: NUMBER_FMT, 6: NUMBER_FMT})
-                row += 1
-        self._auto_width(ws)
+                ])
+        self._write_table(ws, headers, rows, fmt_map={4: DPPM_FMT, 5: NUMBER_FMT, 6: NUMBER_FMT})
 
     def add_monthly_top_odm_sheet(self, cards_data: List[Dict],
                                    value_label: str = "IFIR",
@@ -241,10 +259,7 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet("月度Top ODM")
         headers = ["Month", "Segment", "Rank", "ODM",
                    f"{value_label}(DPPM)", claim_key.upper(), mm_key.upper()]
-        row = 1
-        self._write_header(ws, row, headers)
-        row += 1
-
+        rows = []
         for card in cards_data:
             seg = card.get("segment", "")
             for monthly in card.get("monthly_top_odms", []) or []:
@@ -252,39 +267,60 @@ class ReportExcelBuilder:
                 for o in monthly.get("items", []):
                     kpi_val = o.get(value_label.lower()) or o.get("ifir") or o.get("ra") or 0
                     dppm = round(kpi_val * 1_000_000)
-                    self._write_row(ws, row, [
+                    rows.append([
                         month, seg, o.get("rank"), o.get("odm"),
                         dppm, o.get(claim_key), o.get(mm_key),
-                    ], fmt_map={5: DPPM_FMT, 6: NUMBER_FMT, 7: NUMBER_FMT})
-                    row += 1
-        self._auto_width(ws)
+                    ])
+        self._write_table(ws, headers, rows, fmt_map={5: DPPM_FMT, 6: NUMBER_FMT, 7: NUMBER_FMT})
+
+    def add_detail_sheet(self, detail_rows: Iterable[Sequence], columns: List[Tuple[str, str]],
+                         export: str = "sheet"):
+        """
+        明细 Sheet：detail_rows 逐行产出与 columns 顺序一致的取值（如 KpiEngine.get_report_detail 的结果），
+        边迭代边写入，不保留全部行；明细行不设边框（百万级单元格逐个设置样式的耗时远超写入本身）。
+        - sheet / multi_sheet：超过 Excel 行数上限时续写到 "Detail明细数据_2" 等后续 Sheet
+        - csv_zip：此处只写入说明 Sheet，明细在 save_report 时写为 CSV 并与 Excel 一起打包
+        detail_rows 迭代结束后 truncated 为 True 时在末尾追加截断提示。
+        """
+        if export == "csv_zip":
+            self._csv_detail = (detail_rows, columns)
+            ws = self.wb.create_sheet(DETAIL_SHEET_TITLE)
+            ws.column_dimensions['A'].width = 80
+            ws.append([self._cell(ws, "明细数据见同一压缩包内的 CSV 文件（UTF-8 编码，可直接用 Excel 打开）。",
+                                  font=META_LABEL_FONT)])
+            return
 
-    def add_detail_sheet(
-        self,
-        detail_rows: List[Dict],
-        columns: List[Tuple[str, str]],
-        total: int = 0,
-        truncated: bool = False,
-    ):
-        ws = self.wb.create_sheet("Detail明细数据")
         headers = [display for display, _ in columns]
-        self._write_header(ws, 1, headers)
-
-        for r_idx, row_data in enumerate(detail_rows, 2):
-            for c_idx, (_, db_key) in enumerate(columns, 1):
-                val = row_data.get(db_key)
-                if isinstance(val, (bytes, bytearray)):
-                    val = val.decode("utf-8", errors="replace")
-                cell = ws.cell(row=r_idx, column=c_idx, value=val)
-                cell.border = THIN_BORDER
-
-        self._auto_width(ws)
+        rows = iter(detail_rows)
+        sample = list(islice(rows, self.WIDTH_SAMPLE_ROWS))
+        width_rows = [headers] + sample
+
+        sheet_no = 1
+        ws = self._new_detail_sheet(DETAIL_SHEET_TITLE, headers, width_rows)
+        sheet_rows = written = 0
+        for values in chain(sample, rows):
+            if sheet_rows >= self.SHEET_MAX_ROWS:
+                sheet_no += 1
+                ws = self._new_detail_sheet(f"{DETAIL_SHEET_TITLE}_{sheet_no}", headers, width_rows)
+                sheet_rows = 0
+            ws.append(values)
+            sheet_rows += 1
+            written += 1
+
+        if getattr(detail_rows, "truncated", False):
+            if export == "sheet":
+                note = f"数据量过大，仅导出前 {written:,} 行，完整数据请选择多 Sheet 或 CSV 压缩包方式导出。"
+            else:
+                note = f"已达导出行数上限，仅导出前 {written:,} 行。"
+            ws.append([])
+            ws.append([self._cell(ws, note, font=Font(color="FF0000", italic=True))])
 
-        if truncated:
-            note_row = len(detail_rows) + 3
-            cell = ws.cell(row=note_row, column=1,
-                           value=f"数据量过大，仅导出前 {len(detail_rows):,} 行（共约 {total:,} 行），完整数据请联系管理员。")
-            cell.font = Font(color="FF0000", italic=True)
+    def _new_detail_sheet(self, title: str, headers: List[str], width_rows: List[list]):
+        ws = self.wb.create_sheet(title)
+        self._auto_width(ws, width_rows)
+        ws.freeze_panes = "A2"
+        self._write_header(ws, headers)
+        return ws
 
     def add_comparison_sheet(
         self,
@@ -298,18 +334,18 @@ class ReportExcelBuilder:
         ws = self.wb.create_sheet(f"多{self.dimension}对比")
         headers = [self.dimension, f"{value_label}(DPPM)", "Share(%)",
                    claim_key.upper(), mm_key.upper()]
-        self._write_header(ws, 1, headers)
-
-        for r_idx, item in enumerate(pie_data, 2):
-            self._write_row(ws, r_idx, [
+        rows = [
+            [
                 item.get(entity_key, ""),
                 item.get("dppm") or round((item.get(value_label.lower(), 0) or 0) * 1_000_000),
                 item.get("share"),
                 item.get(claim_key),
                 item.get(mm_key),
-            ], fmt_map={2: DPPM_FMT, 3: PCT_FMT, 4: NUMBER_FMT, 5: NUMBER_FMT})
+            ]
+            for item in pie_data
+        ]
+        self._write_table(ws, headers, rows, fmt_map={2: DPPM_FMT, 3: PCT_FMT, 4: NUMBER_FMT, 5: NUMBER_FMT})
 
-        self._auto_width(ws)
         if chart_png:
             anchor_row = len(pie_data) + 4
             self._embed_image(ws, chart_png, f"A{anchor_row}", width=640, height=480)
@@ -336,6 +372,43 @@ class ReportExcelBuilder:
         self.wb.save(file_path)
         return file_path
 
+    def save_report(self, filename: str, prefix: str) -> Tuple[str, str]:
+        """
+        保存报告到临时文件，返回 (临时文件路径, 下载文件名)。
+        明细为 csv_zip 方式时，打包汇总 Excel 与明细 CSV（逐行写入压缩流），下载文件名改为 .zip
+        """
+        if self._csv_detail is None:
+            with NamedTemporaryFile(prefix=prefix, suffix=".xlsx", delete=False) as tmp:
+                self.save_to_file(tmp.name)
+                return tmp.name, filename
+
+        detail_rows, columns = self._csv_detail
+        stem = filename[:-len(".xlsx")] if filename.endswith(".xlsx") else filename
+        with NamedTemporaryFile(prefix=prefix, suffix=".xlsx", delete=False) as tmp:
+            xlsx_path = tmp.name
+        with NamedTemporaryFile(prefix=prefix, suffix=".zip", delete=False) as tmp:
+            zip_path = tmp.name
+        try:
+            self.save_to_file(xlsx_path)
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.write(xlsx_path, arcname=filename)
+                # 明细行数未知，强制 ZIP64 以支持超过 2GB 的 CSV
+                with zf.open(f"{stem}_Detail.csv", "w", force_zip64=True) as raw:
+                    text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                    writer = csv.writer(text)
+                    writer.writerow([display for display, _ in columns])
+                    writer.writerows(detail_rows)
+                    if getattr(detail_rows, "truncated", False):
+                        writer.writerow([f"已达导出行数上限，仅导出前 {detail_rows.count:,} 行。"])
+                    text.flush()
+                    text.detach()
+        except Exception:
+            os.unlink(zip_path)
+            raise
+        finally:
+            os.unlink(xlsx_path)
+        return zip_path, f"{stem}.zip"
+
 
 # ---------------------------------------------------------------------------
 # 文件名构建
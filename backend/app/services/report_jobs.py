@@ -0,0 +1,240 @@
+"""
+报告任务 - 报告在后台线程池中生成，前端提交后轮询进度，完成后下载
+
+- 任务 ID 由 KPI、报告类型、请求参数与数据版本哈希得到：相同请求并发提交时共用同一个任务，
+  已完成且未过期的任务直接返回，上传新数据后数据版本变化，重新生成
+- 任务状态写入 REPORT_JOB_DIR/<job_id>.json，报告文件为 <job_id>.report（Excel 或明细 csv_zip 导出的 zip，下载文件名见任务状态）；
+  多节点部署时目录指向共享存储，任一节点都可以查询与下载
+- 最多同时生成 REPORT_JOB_WORKERS 份报告，单个节点排队 + 执行中的任务超过 REPORT_JOB_MAX_PENDING 时拒绝提交
+- 报告文件生成完成 REPORT_JOB_TTL_SECONDS 后清理；排队 / 执行中超过 REPORT_JOB_TIMEOUT_SECONDS 未更新的任务视为失效
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.cache import make_cache_key
+from app.core.config import get_settings
+from app.core.read_routing import read_session_factory
+from app.services.ifir_service import IfirService
+from app.services.ra_service import RaService
+
+logger = logging.getLogger(__name__)
+
+REPORT_SERVICES = {"ifir": IfirService, "ra": RaService}
+REPORT_METHODS = {
+    "model": "generate_model_report",
+    "odm": "generate_odm_report",
+    "segment": "generate_segment_report",
+}
+DEFAULT_JOB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "report_jobs")
+
+
+class ReportJobQueueFull(Exception):
+    """排队任务已达上限"""
+
+
+class ReportJobManager:
+    """报告任务管理：提交（去重）、状态查询、执行与过期清理"""
+
+    def __init__(self, job_dir: str, workers: int, max_pending: int,
+                 ttl_seconds: float, timeout_seconds: float, session_factory=None):
+        self.job_dir = Path(job_dir)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        # 每个任务使用独立的数据库会话，默认为报告连接池的只读会话（配置只读副本时读副本）
+        self.session_factory = session_factory or read_session_factory("report")
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="report-job")
+        self._active: Dict[str, Future] = {}  # 本节点排队或执行中的任务
+        self._lock = threading.Lock()
+
+    # ==================== 提交与查询 ====================
+
+    def submit(self, db, kpi: str, kind: str, request) -> dict:
+        """提交报告任务，返回任务状态；相同请求已有进行中或已完成的任务时直接返回该任务"""
+        service = REPORT_SERVICES[kpi](db)
+        job_id = make_cache_key(
+            "report-job", kpi, kind, request.model_dump(mode="json"), service.engine.data_version()
+        )[:32]
+        self.sweep()
+        with self._lock:
+            job = self._load(job_id)
+            if job is not None and self._reusable(job):
+                return job
+            if len(self._active) >= self.max_pending:
+                raise ReportJobQueueFull(f"报告任务排队已满（{self.max_pending}），请稍后再试")
+            now = datetime.now().isoformat(timespec="seconds")
+            job = {
+                "job_id": job_id, "kpi": kpi, "kind": kind, "status": "queued", "progress": 0,
+                "filename": None, "size_bytes": None, "error_message": None,
+                "created_at": now, "updated_at": now,
+                "started_at": None, "completed_at": None, "expires_at": None,
+            }
+            self._save(job)
+            self._active[job_id] = self._executor.submit(self._run, job_id, kpi, kind, request)
+        logger.info(f"[REPORT] 提交报告任务 {job_id}: {kpi} {kind}")
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """返回任务状态，不存在或已过期时返回 None"""
+        if not job_id.isalnum():
+            return None
+        with self._lock:
+            job = self._load(job_id)
+            if job is not None and self._expired(job):
+                self._remove(job_id)
+                return None
+            return job
+
+    def artifact_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.report"
+
+    def _reusable(self, job: dict) -> bool:
+        """失败、过期或报告文件丢失的任务需要重新生成"""
+        if job["status"] == "failed" or self._expired(job):
+            return False
+        if job["status"] == "completed":
+            return self.artifact_path(job["job_id"]).exists()
+        return True
+
+    def _expired(self, job: dict) -> bool:
+        now = datetime.now()
+        if job["status"] in ("completed", "failed"):
+            finished = datetime.fromisoformat(job["completed_at"] or job["updated_at"])
+            return now > finished + timedelta(seconds=self.ttl_seconds)
+        # 排队 / 执行中：本节点的任务以线程池为准，其他节点的任务长时间未更新视为节点已退出
+        if job["job_id"] in self._active:
+            return False
+        return now > datetime.fromisoformat(job["updated_at"]) + timedelta(seconds=self.timeout_seconds)
+
+    # ==================== 执行 ====================
+
+    def _run(self, job_id: str, kpi: str, kind: str, request):
+        """在报告线程中生成报告并移入任务目录"""
+        db = self.session_factory()
+        try:
+            self._update(job_id, status="running", progress=5,
+                         started_at=datetime.now().isoformat(timespec="seconds"))
+            service = REPORT_SERVICES[kpi](db)
+            generate = getattr(service, REPORT_METHODS[kind])
+            tmp_path, filename = generate(request, progress=lambda p: self._update(job_id, progress=p))
+
+            # 先移到同目录的临时名再改名，下载方不会读到写了一半的文件
+            target = self.artifact_path(job_id)
+            partial = target.with_suffix(".report.part")
+            shutil.move(tmp_path, partial)
+            os.replace(partial, target)
+            completed = datetime.now()
+            self._update(
+                job_id, status="completed", progress=100, filename=filename,
+                size_bytes=target.stat().st_size,
+                completed_at=completed.isoformat(timespec="seconds"),
+                expires_at=(completed + timedelta(seconds=self.ttl_seconds)).isoformat(timespec="seconds"),
+            )
+            logger.info(f"[REPORT] 报告任务完成 {job_id}: {filename}")
+        except Exception as e:
+            logger.error(f"[REPORT] 报告任务失败 {job_id}: {e}")
+            logger.error(traceback.format_exc())
+            self._update(job_id, status="failed", error_message=str(e),
+                         completed_at=datetime.now().isoformat(timespec="seconds"))
+        finally:
+            db.close()
+            with self._lock:
+                self._active.pop(job_id, None)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return
+            job.update(fields, updated_at=datetime.now().isoformat(timespec="seconds"))
+            self._save(job)
+
+    # ==================== 存储与清理 ====================
+
+    def _status_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.json"
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        try:
+            return json.loads(self._status_path(job_id).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save(self, job: dict):
+        """写临时文件后改名，其他节点读取时不会读到不完整的 JSON"""
+        path = self._status_path(job["job_id"])
+        tmp = path.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_text(json.dumps(job, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _remove(self, job_id: str):
+        self._status_path(job_id).unlink(missing_ok=True)
+        self.artifact_path(job_id).unlink(missing_ok=True)
+
+    def sweep(self) -> int:
+        """清理过期任务与无状态文件对应的报告文件，返回清理的任务数"""
+        removed = 0
+        orphan_before = datetime.now().timestamp() - self.ttl_seconds
+        with self._lock:
+            for path in self.job_dir.glob("*.json"):
+                job = self._load(path.stem)
+                if job is None or self._expired(job):
+                    self._remove(path.stem)
+                    removed += 1
+            for path in self.job_dir.glob("*.report*"):
+                job_id = path.name.split(".", 1)[0]
+                if not self._status_path(job_id).exists() and path.stat().st_mtime < orphan_before:
+                    path.unlink(missing_ok=True)
+        if removed:
+            logger.info(f"[REPORT] 清理过期报告任务 {removed} 个")
+        return removed
+
+    def shutdown(self):
+        """停止线程池：未开始的任务标记为失败，执行中的任务不等待"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            cancelled = [job_id for job_id, future in self._active.items() if future.cancelled()]
+        for job_id in cancelled:
+            self._update(job_id, status="failed", error_message="服务停止，任务已取消",
+                         completed_at=datetime.now().isoformat(timespec="seconds"))
+            with self._lock:
+                self._active.pop(job_id, None)
+
+
+_manager: Optional[ReportJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_report_job_manager() -> ReportJobManager:
+    """报告任务管理器单例，首次使用时按配置创建"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                settings = get_settings()
+                _manager = ReportJobManager(
+                    settings.REPORT_JOB_DIR or DEFAULT_JOB_DIR,
+                    workers=settings.REPORT_JOB_WORKERS,
+                    max_pending=settings.REPORT_JOB_MAX_PENDING,
+                    ttl_seconds=settings.REPORT_JOB_TTL_SECONDS,
+                    timeout_seconds=settings.REPORT_JOB_TIMEOUT_SECONDS,
+                )
+    return _manager
+
+
+def shutdown_report_jobs():
+    """停止报告任务线程池（应用关闭时调用）"""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
@@ -0,0 +1,216 @@
+"""
+ETL Worker - 从 upload_task 队列领取任务并执行
+
+运行方式：
+- 内嵌：FastAPI 启动时自动拉起（ETL_WORKER_EMBEDDED=true）
+- 独立进程：python -m app.worker（此时 API 端应设置 ETL_WORKER_EMBEDDED=false）
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core.config import get_settings
+from app.core.database import EtlSessionLocal
+from app.models.tables import UploadTask
+from app.services.etl_queue import EtlQueue
+from app.services.etl_service import EtlService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def run_etl_job(task_id: str):
+    """
+    执行单个 ETL 任务（线程或子进程中运行）
+    """
+    logger.info(f"[ETL] ========== 开始执行任务: {task_id} ==========")
+    db = EtlSessionLocal()
+    try:
+        files = EtlQueue(db).get_task_files(task_id)
+        if not files:
+            raise FileNotFoundError(f"任务没有可处理的文件: {task_id}")
+        logger.info(f"[ETL] 文件列表: {list(files.keys())}")
+
+        # 验证文件是否存在
+        for file_type, file_path in files.items():
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"文件不存在: {file_path}")
+            logger.info(f"[ETL] 文件验证通过: {file_type} -> {file_path}")
+
+        EtlService(db).process_upload_task(task_id, files)
+        logger.info(f"[ETL] ========== 任务完成: {task_id} ==========")
+    except Exception as e:
+        logger.error(f"[ETL] ========== 任务失败: {task_id} ==========")
+        logger.error(f"[ETL] 错误: {str(e)}")
+        logger.error(traceback.format_exc())
+
+        # 确保数据库状态被更新为失败
+        try:
+            db.rollback()
+            task = db.query(UploadTask).filter(UploadTask.task_id == task_id).first()
+            if task and task.status != "failed":
+                task.status = "failed"
+                task.error_message = str(e)
+                task.completed_at = datetime.now()
+                db.commit()
+                logger.info(f"[ETL] 已更新任务状态为 failed")
+        except Exception as db_err:
+            logger.error(f"[ETL] 更新失败状态时出错: {str(db_err)}")
+    finally:
+        db.close()
+
+
+class EtlWorker:
+    """
+    ETL Worker
+
+    - 最多同时执行 ETL_MAX_CONCURRENT_JOBS 个任务
+    - ETL_WORKER_MODE=thread 时任务在线程池中执行，process 时在独立子进程中执行
+    - 后台心跳线程为执行中的任务续租，并定期回收其他 worker 遗留的过期任务
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_jobs: Optional[int] = None):
+        self.mode = mode or settings.ETL_WORKER_MODE
+        self.max_jobs = max(1, max_jobs or settings.ETL_MAX_CONCURRENT_JOBS)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._active: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._executor = None
+        self._threads = []
+
+    def start(self):
+        """启动调度线程与心跳线程（非阻塞）"""
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_jobs, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="etl-job")
+
+        # 启动时回收崩溃遗留的任务
+        self._with_queue(lambda queue: queue.requeue_expired())
+
+        for target, name in [(self._dispatch_loop, "etl-dispatch"), (self._heartbeat_loop, "etl-heartbeat")]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"[ETL] Worker 已启动: {self.owner}, 模式: {self.mode}, 最大并发: {self.max_jobs}")
+
+    def stop(self, wait: bool = True):
+        """停止领取新任务；wait=True 时等待执行中的任务结束"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+        logger.info(f"[ETL] Worker 已停止: {self.owner}")
+
+    def notify(self):
+        """有新任务入队时唤醒调度线程，避免等待轮询间隔"""
+        self._wakeup.set()
+
+    def run_forever(self):
+        """独立进程模式：启动后阻塞直到收到退出信号"""
+        self.start()
+        signal.signal(signal.SIGTERM, lambda *_: self._stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stopping.set())
+        while not self._stopping.wait(1):
+            pass
+        self.stop(wait=True)
+
+    def _with_queue(self, action):
+        """在独立会话中执行队列操作"""
+        db = EtlSessionLocal()
+        try:
+            return action(EtlQueue(db))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"[ETL] 队列操作失败: {str(e)}", exc_info=True)
+            return None
+        finally:
+            db.close()
+
+    def _dispatch_loop(self):
+        """调度循环：有空闲名额时领取任务并提交执行"""
+        while not self._stopping.is_set():
+            claimed = False
+            with self._lock:
+                has_slot = len(self._active) < self.max_jobs
+            if has_slot:
+                task_id = self._with_queue(lambda queue: queue.claim_next(self.owner))
+                if task_id:
+                    claimed = True
+                    future = self._executor.submit(run_etl_job, task_id)
+                    with self._lock:
+                        self._active[task_id] = future
+                    future.add_done_callback(lambda _, tid=task_id: self._on_job_done(tid))
+            if not claimed:
+                self._wakeup.wait(settings.ETL_POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def _on_job_done(self, task_id: str):
+        """任务结束：释放租约与并发名额"""
+        with self._lock:
+            future = self._active.pop(task_id, None)
+        if future is not None and future.exception() is not None:
+            # 子进程异常退出等情况，任务状态未写回，留给租约过期后重试
+            logger.error(f"[ETL] 任务执行异常: {task_id}, {future.exception()}")
+            self._wakeup.set()
+            return
+        self._with_queue(lambda queue: queue.release(task_id, self.owner))
+        self._wakeup.set()
+
+    def _heartbeat_loop(self):
+        """心跳：为执行中的任务续租，并回收过期任务"""
+        interval = max(1, settings.ETL_LEASE_SECONDS // 3)
+        while not self._stopping.wait(interval):
+            with self._lock:
+                task_ids = list(self._active.keys())
+            for task_id in task_ids:
+                renewed = self._with_queue(lambda queue, tid=task_id: queue.renew_lease(tid, self.owner))
+                if renewed is False:
+                    logger.warning(f"[ETL] 任务租约已丢失: {task_id}")
+            self._with_queue(lambda queue: queue.requeue_expired())
+
+
+# ==================== 内嵌模式 ====================
+
+_embedded_worker: Optional[EtlWorker] = None
+
+
+def start_embedded_worker():
+    """FastAPI 启动时拉起内嵌 worker"""
+    global _embedded_worker
+    if _embedded_worker is None:
+        _embedded_worker = EtlWorker()
+        _embedded_worker.start()
+
+
+def stop_embedded_worker():
+    """FastAPI 关闭时停止内嵌 worker（不等待执行中的任务，未完成的任务由租约过期后重新排队）"""
+    global _embedded_worker
+    if _embedded_worker is not None:
+        _embedded_worker.stop(wait=False)
+        _embedded_worker = None
+
+
+def notify_new_job():
+    """上传接口入队后调用；独立 worker 模式下无操作，由轮询发现新任务"""
+    if _embedded_worker is not None:
+        _embedded_worker.notify()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    EtlWorker().run_forever()
@@ -0,0 +1,38 @@
+"""
+重建 / 校验预聚合表（ROW 月度聚合、DETAIL Top Issue 汇总）
+
+用法（在 backend 目录下执行）：
+    python rebuild_aggregates.py rebuild [IFIR|RA|IFIR_ISSUE|RA_ISSUE]   全量重建，不指定时处理全部
+    python rebuild_aggregates.py check [IFIR|RA|IFIR_ISSUE|RA_ISSUE]     按月比对聚合表与源表合计，不一致时退出码为 1
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.services.aggregate_service import AggregateService
+
+if len(sys.argv) < 2 or sys.argv[1] not in ("rebuild", "check"):
+    print(__doc__)
+    sys.exit(2)
+
+action = sys.argv[1]
+kpi_type = sys.argv[2].upper() if len(sys.argv) > 2 else None
+
+db = SessionLocal()
+try:
+    service = AggregateService(db)
+    if action == "rebuild":
+        service.rebuild_all(kpi_type)
+        print('聚合表已重建')
+    result = service.check_consistency(kpi_type)
+    for name, mismatches in result.items():
+        if not mismatches:
+            print(f'{name}: 聚合表与源表一致')
+            continue
+        print(f'{name}: {len(mismatches)} 个月份不一致')
+        for item in mismatches:
+            print(f"  {item['month']}  源表={item['fact']}  聚合表={item['agg']}")
+    sys.exit(1 if any(result.values()) else 0)
+finally:
+    db.close()
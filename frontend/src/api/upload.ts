@@ -11,6 +11,12 @@ export interface FileInfo {
   error?: string
 }
 
+// DETAIL 文件导入方式：upsert 分批写入；bulk 使用 LOAD DATA 批量合并
+export type DetailLoadMode = 'upsert' | 'bulk'
+
+// ROW 文件导入方式：upsert 按内容合并；replace_months 整体替换文件覆盖的月份
+export type RowLoadMode = 'upsert' | 'replace_months'
+
 export interface UploadTaskStatus {
   task_id: string
   status: 'queued' | 'processing' | 'completed' | 'failed'
@@ -19,6 +25,10 @@ export interface UploadTaskStatus {
   ifir_row?: FileInfo
   ra_detail?: FileInfo
   ra_row?: FileInfo
+  detail_load_mode?: DetailLoadMode
+  row_load_mode?: RowLoadMode
+  odm_map_inserted?: number
+  odm_map_removed?: number
   error_message?: string
   created_at: string
   started_at?: string
@@ -33,7 +43,10 @@ export async function uploadFiles(files: {
   ifir_row?: File
   ra_detail?: File
   ra_row?: File
-}): Promise<UploadTaskStatus> {
+}, options: {
+  detail_load_mode?: DetailLoadMode
+  row_load_mode?: RowLoadMode
+} = {}): Promise<UploadTaskStatus> {
   const formData = new FormData()
   
   if (files.ifir_detail) {
@@ -48,6 +61,12 @@ export async function uploadFiles(files: {
   if (files.ra_row) {
     formData.append('ra_row', files.ra_row)
   }
+  if (options.detail_load_mode) {
+    formData.append('detail_load_mode', options.detail_load_mode)
+  }
+  if (options.row_load_mode) {
+    formData.append('row_load_mode', options.row_load_mode)
+  }
   
   const response = await apiClient.post('/upload', formData, {
     headers: {
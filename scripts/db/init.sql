@@ -58,7 +58,8 @@ CREATE TABLE fact_ifir_row (
   KEY idx_month_odm_model (delivery_month, supplier_new, model) COMMENT '支撑ODM层月→ODM→Model趋势',
   KEY idx_month_segment (delivery_month, segment) COMMENT '支撑Segment层趋势',
   KEY idx_odm_plant (supplier_new, plant) COMMENT '支撑ODM下钻时的工厂集合过滤',
-  KEY idx_month_plant (delivery_month, plant) COMMENT '支撑按月按工厂去找明细入口'
+  KEY idx_month_plant (delivery_month, plant) COMMENT '支撑按月按工厂去找明细入口',
+  KEY idx_etl_batch (etl_batch_id) COMMENT '支撑按批次增量刷新ODM映射'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='IFIR ROW月度聚合事实表';
 
@@ -182,7 +183,8 @@ CREATE TABLE fact_ra_row (
   KEY idx_month_odm_model (claim_month, supplier_new, model),
   KEY idx_month_segment (claim_month, segment),
   KEY idx_odm_plant (supplier_new, plant),
-  KEY idx_month_plant (claim_month, plant)
+  KEY idx_month_plant (claim_month, plant),
+  KEY idx_etl_batch (etl_batch_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='RA ROW月度聚合事实表';
 
@@ -280,6 +282,93 @@ CREATE TABLE map_odm_to_plant (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='ODM到工厂映射表（从ROW表计算得出）';
 
+-- ============================================================
+-- 5.1 ROW 月度聚合表
+-- 粒度: 月 × Segment × ODM × Model × Plant，分子分母预先求和
+-- 维护: ETL 按批次涉及的月份重算；KPI_AGGREGATES_ENABLED=true 时分析查询改读此表
+-- 说明: 维度可能为 NULL，不设维度唯一键，按月整体替换保证不重复
+-- ============================================================
+DROP TABLE IF EXISTS agg_ifir_row_month;
+CREATE TABLE agg_ifir_row_month (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  delivery_month DATE NOT NULL COMMENT '出货月',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  supplier_new VARCHAR(128) NULL COMMENT 'ODM',
+  model VARCHAR(128) NULL COMMENT '机型',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  box_claim BIGINT NOT NULL DEFAULT 0 COMMENT 'IFIR分子合计',
+  box_mm BIGINT NOT NULL DEFAULT 0 COMMENT 'IFIR分母合计',
+  row_count INT NOT NULL DEFAULT 0 COMMENT '汇总的ROW行数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_month_odm_model (delivery_month, supplier_new, model),
+  KEY idx_month_segment (delivery_month, segment),
+  KEY idx_odm_plant (supplier_new, plant)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='IFIR ROW月度聚合表';
+
+DROP TABLE IF EXISTS agg_ra_row_month;
+CREATE TABLE agg_ra_row_month (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  claim_month DATE NOT NULL COMMENT '索赔月',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  supplier_new VARCHAR(128) NULL COMMENT 'ODM',
+  model VARCHAR(128) NULL COMMENT '机型',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  ra_claim BIGINT NOT NULL DEFAULT 0 COMMENT 'RA分子合计',
+  ra_mm BIGINT NOT NULL DEFAULT 0 COMMENT 'RA分母合计',
+  row_count INT NOT NULL DEFAULT 0 COMMENT '汇总的ROW行数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_month_odm_model (claim_month, supplier_new, model),
+  KEY idx_month_segment (claim_month, segment),
+  KEY idx_odm_plant (supplier_new, plant)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='RA ROW月度聚合表';
+
+-- ============================================================
+-- 5.2 DETAIL Top Issue 汇总表
+-- 粒度: 月 × Model × Plant × Segment × Segment2 × 故障大类，预先计数
+-- 维护: DETAIL 导入后按涉及的月份（含被更新单号原来所在的月份）重算
+-- ============================================================
+DROP TABLE IF EXISTS agg_ifir_detail_issue;
+CREATE TABLE agg_ifir_detail_issue (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  delivery_month DATE NOT NULL COMMENT '出货月',
+  model VARCHAR(128) NULL COMMENT '型号',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  segment2 VARCHAR(64) NULL COMMENT '子业务段',
+  fault_category VARCHAR(128) NOT NULL COMMENT '故障大类',
+  issue_count INT NOT NULL DEFAULT 0 COMMENT '明细条数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_model_month (model, delivery_month) COMMENT '支撑Model的Top Issue',
+  KEY idx_month (delivery_month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='IFIR DETAIL Top Issue汇总表';
+
+DROP TABLE IF EXISTS agg_ra_detail_issue;
+CREATE TABLE agg_ra_detail_issue (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  claim_month DATE NOT NULL COMMENT '索赔月',
+  model VARCHAR(128) NULL COMMENT '型号',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  segment2 VARCHAR(64) NULL COMMENT '子业务段',
+  fault_category VARCHAR(128) NOT NULL COMMENT '故障大类',
+  issue_count INT NOT NULL DEFAULT 0 COMMENT '明细条数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_model_month (model, claim_month) COMMENT '支撑Model的Top Issue',
+  KEY idx_month (claim_month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='RA DETAIL Top Issue汇总表';
+
 -- ============================================================
 -- 6. 上传任务表
 -- ============================================================
@@ -310,6 +399,19 @@ CREATE TABLE upload_task (
   -- 错误信息
   error_message TEXT NULL COMMENT '错误信息',
   
+  -- 队列租约
+  lease_owner VARCHAR(100) NULL COMMENT '持有租约的worker',
+  lease_expires_at DATETIME NULL COMMENT '租约过期时间',
+  attempts INT NOT NULL DEFAULT 0 COMMENT '已领取次数',
+  
+  -- 导入方式
+  detail_load_mode VARCHAR(16) NULL COMMENT 'DETAIL导入方式: upsert/bulk',
+  row_load_mode VARCHAR(16) NULL COMMENT 'ROW导入方式: upsert/replace_months',
+  
+  -- ODM映射增量刷新结果
+  odm_map_inserted INT NULL COMMENT 'ODM映射新增条数',
+  odm_map_removed INT NULL COMMENT 'ODM映射移除条数',
+  
   -- 时间戳
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   started_at DATETIME NULL COMMENT '开始处理时间',
@@ -317,6 +419,7 @@ CREATE TABLE upload_task (
   
   UNIQUE KEY uk_task_id (task_id),
   KEY idx_status (status),
+  KEY idx_status_lease (status, lease_expires_at),
   KEY idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='上传任务表';
@@ -0,0 +1,21 @@
+-- ============================================================
+-- 迁移 001: upload_task 增加队列租约字段
+-- 用途: ETL 任务改为由 worker 从 upload_task 领取（claim + lease），
+--       worker 崩溃后租约过期的任务可被重新排队
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- ============================================================
+
+USE kpi_visual;
+
+ALTER TABLE upload_task
+  ADD COLUMN lease_owner VARCHAR(100) NULL COMMENT '持有租约的worker' AFTER error_message,
+  ADD COLUMN lease_expires_at DATETIME NULL COMMENT '租约过期时间' AFTER lease_owner,
+  ADD COLUMN attempts INT NOT NULL DEFAULT 0 COMMENT '已领取次数' AFTER lease_expires_at,
+  ADD KEY idx_status_lease (status, lease_expires_at);
+
+-- 回滚:
+-- ALTER TABLE upload_task
+--   DROP KEY idx_status_lease,
+--   DROP COLUMN attempts,
+--   DROP COLUMN lease_expires_at,
+--   DROP COLUMN lease_owner;
@@ -0,0 +1,15 @@
+-- ============================================================
+-- 迁移 002: upload_task 增加导入方式字段
+-- 用途: DETAIL 文件可按上传选择 upsert（分批 INSERT ... ON DUPLICATE KEY UPDATE）
+--       或 bulk（LOAD DATA LOCAL INFILE 写入临时表后一次性合并）
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- ============================================================
+
+USE kpi_visual;
+
+ALTER TABLE upload_task
+  ADD COLUMN detail_load_mode VARCHAR(16) NULL COMMENT 'DETAIL导入方式: upsert/bulk' AFTER attempts;
+
+-- 回滚:
+-- ALTER TABLE upload_task
+--   DROP COLUMN detail_load_mode;
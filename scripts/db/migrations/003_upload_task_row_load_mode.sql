@@ -0,0 +1,15 @@
+-- ============================================================
+-- 迁移 003: upload_task 增加 ROW 导入方式字段
+-- 用途: ROW 文件可按上传选择 upsert（按 content_hash 合并）
+--       或 replace_months（整体替换文件覆盖的月份，避免上游修正数值后旧行残留）
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- ============================================================
+
+USE kpi_visual;
+
+ALTER TABLE upload_task
+  ADD COLUMN row_load_mode VARCHAR(16) NULL COMMENT 'ROW导入方式: upsert/replace_months' AFTER detail_load_mode;
+
+-- 回滚:
+-- ALTER TABLE upload_task
+--   DROP COLUMN row_load_mode;
@@ -0,0 +1,25 @@
+-- ============================================================
+-- 迁移 004: ODM 映射增量刷新
+-- 用途: 上传完成后只按本批次（etl_batch_id）刷新 map_odm_to_plant，
+--       不再全表扫描 ROW 表；新增/移除条数记录到 upload_task
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- ============================================================
+
+USE kpi_visual;
+
+ALTER TABLE fact_ifir_row
+  ADD KEY idx_etl_batch (etl_batch_id) COMMENT '支撑按批次增量刷新ODM映射';
+
+ALTER TABLE fact_ra_row
+  ADD KEY idx_etl_batch (etl_batch_id);
+
+ALTER TABLE upload_task
+  ADD COLUMN odm_map_inserted INT NULL COMMENT 'ODM映射新增条数' AFTER row_load_mode,
+  ADD COLUMN odm_map_removed INT NULL COMMENT 'ODM映射移除条数' AFTER odm_map_inserted;
+
+-- 回滚:
+-- ALTER TABLE upload_task
+--   DROP COLUMN odm_map_removed,
+--   DROP COLUMN odm_map_inserted;
+-- ALTER TABLE fact_ra_row DROP KEY idx_etl_batch;
+-- ALTER TABLE fact_ifir_row DROP KEY idx_etl_batch;
@@ -0,0 +1,66 @@
+-- ============================================================
+-- 迁移 005: ROW 月度聚合表
+-- 用途: 新增 agg_ifir_row_month / agg_ra_row_month 并从现有 ROW 数据初始化；
+--       之后由 ETL 按批次涉及的月份增量维护，KPI_AGGREGATES_ENABLED=true 时分析查询改读聚合表
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- 校验: python rebuild_aggregates.py check（在 backend 目录下执行）
+-- ============================================================
+
+USE kpi_visual;
+
+CREATE TABLE IF NOT EXISTS agg_ifir_row_month (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  delivery_month DATE NOT NULL COMMENT '出货月',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  supplier_new VARCHAR(128) NULL COMMENT 'ODM',
+  model VARCHAR(128) NULL COMMENT '机型',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  box_claim BIGINT NOT NULL DEFAULT 0 COMMENT 'IFIR分子合计',
+  box_mm BIGINT NOT NULL DEFAULT 0 COMMENT 'IFIR分母合计',
+  row_count INT NOT NULL DEFAULT 0 COMMENT '汇总的ROW行数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_month_odm_model (delivery_month, supplier_new, model),
+  KEY idx_month_segment (delivery_month, segment),
+  KEY idx_odm_plant (supplier_new, plant)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='IFIR ROW月度聚合表';
+
+CREATE TABLE IF NOT EXISTS agg_ra_row_month (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  claim_month DATE NOT NULL COMMENT '索赔月',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  supplier_new VARCHAR(128) NULL COMMENT 'ODM',
+  model VARCHAR(128) NULL COMMENT '机型',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  ra_claim BIGINT NOT NULL DEFAULT 0 COMMENT 'RA分子合计',
+  ra_mm BIGINT NOT NULL DEFAULT 0 COMMENT 'RA分母合计',
+  row_count INT NOT NULL DEFAULT 0 COMMENT '汇总的ROW行数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_month_odm_model (claim_month, supplier_new, model),
+  KEY idx_month_segment (claim_month, segment),
+  KEY idx_odm_plant (supplier_new, plant)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='RA ROW月度聚合表';
+
+-- 初始化（可重复执行）
+TRUNCATE TABLE agg_ifir_row_month;
+INSERT INTO agg_ifir_row_month (delivery_month, segment, supplier_new, model, plant, box_claim, box_mm, row_count)
+SELECT delivery_month, segment, supplier_new, model, plant, SUM(box_claim), SUM(box_mm), COUNT(*)
+FROM fact_ifir_row
+WHERE delivery_month IS NOT NULL
+GROUP BY delivery_month, segment, supplier_new, model, plant;
+
+TRUNCATE TABLE agg_ra_row_month;
+INSERT INTO agg_ra_row_month (claim_month, segment, supplier_new, model, plant, ra_claim, ra_mm, row_count)
+SELECT claim_month, segment, supplier_new, model, plant, SUM(ra_claim), SUM(ra_mm), COUNT(*)
+FROM fact_ra_row
+WHERE claim_month IS NOT NULL
+GROUP BY claim_month, segment, supplier_new, model, plant;
+
+-- 回滚:
+-- DROP TABLE IF EXISTS agg_ra_row_month;
+-- DROP TABLE IF EXISTS agg_ifir_row_month;
@@ -0,0 +1,62 @@
+-- ============================================================
+-- 迁移 006: DETAIL Top Issue 汇总表
+-- 用途: 新增 agg_ifir_detail_issue / agg_ra_detail_issue 并从现有 DETAIL 数据初始化；
+--       之后由 DETAIL 导入按涉及的月份增量维护，KPI_AGGREGATES_ENABLED=true 时 Top Issue 查询改读汇总表
+-- 适用: 已按旧版 init.sql 建库的环境（新环境直接执行 init.sql 即可）
+-- 校验: python rebuild_aggregates.py check（在 backend 目录下执行）
+-- ============================================================
+
+USE kpi_visual;
+
+CREATE TABLE IF NOT EXISTS agg_ifir_detail_issue (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  delivery_month DATE NOT NULL COMMENT '出货月',
+  model VARCHAR(128) NULL COMMENT '型号',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  segment2 VARCHAR(64) NULL COMMENT '子业务段',
+  fault_category VARCHAR(128) NOT NULL COMMENT '故障大类',
+  issue_count INT NOT NULL DEFAULT 0 COMMENT '明细条数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_model_month (model, delivery_month) COMMENT '支撑Model的Top Issue',
+  KEY idx_month (delivery_month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='IFIR DETAIL Top Issue汇总表';
+
+CREATE TABLE IF NOT EXISTS agg_ra_detail_issue (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  claim_month DATE NOT NULL COMMENT '索赔月',
+  model VARCHAR(128) NULL COMMENT '型号',
+  plant VARCHAR(64) NULL COMMENT '工厂',
+  segment VARCHAR(64) NULL COMMENT '业务段',
+  segment2 VARCHAR(64) NULL COMMENT '子业务段',
+  fault_category VARCHAR(128) NOT NULL COMMENT '故障大类',
+  issue_count INT NOT NULL DEFAULT 0 COMMENT '明细条数',
+  load_ts DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '汇总时间',
+
+  PRIMARY KEY (id),
+  KEY idx_model_month (model, claim_month) COMMENT '支撑Model的Top Issue',
+  KEY idx_month (claim_month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='RA DETAIL Top Issue汇总表';
+
+-- 初始化（可重复执行）
+TRUNCATE TABLE agg_ifir_detail_issue;
+INSERT INTO agg_ifir_detail_issue (delivery_month, model, plant, segment, segment2, fault_category, issue_count)
+SELECT delivery_month, model, plant, segment, segment2, fault_category, COUNT(*)
+FROM fact_ifir_detail
+WHERE delivery_month IS NOT NULL AND fault_category IS NOT NULL
+GROUP BY delivery_month, model, plant, segment, segment2, fault_category;
+
+TRUNCATE TABLE agg_ra_detail_issue;
+INSERT INTO agg_ra_detail_issue (claim_month, model, plant, segment, segment2, fault_category, issue_count)
+SELECT claim_month, model, plant, segment, segment2, fault_category, COUNT(*)
+FROM fact_ra_detail
+WHERE claim_month IS NOT NULL AND fault_category IS NOT NULL
+GROUP BY claim_month, model, plant, segment, segment2, fault_category;
+
+-- 回滚:
+-- DROP TABLE IF EXISTS agg_ra_detail_issue;
+-- DROP TABLE IF EXISTS agg_ifir_detail_issue;